@@ -4,6 +4,7 @@
 from PySide.QtGui import *
 from PySide.QtCore import *
 from PySide.QtOpenGL import *
+import glconfig # PyOpenGL flags, must come before the OpenGL import
 from OpenGL.GL import *
 
 class GLWindow(QGLWidget):
@@ -6,6 +6,7 @@ import ctypes
 from PySide.QtGui import *
 from PySide.QtCore import *
 from PySide.QtOpenGL import *
+import glconfig # PyOpenGL flags, must come before the OpenGL import
 from OpenGL.GL import *
 from OpenGL.GL import shaders
 import cffi
@@ -8,6 +8,7 @@ import inspect
 from PySide.QtGui import *
 from PySide.QtCore import *
 from PySide.QtOpenGL import *
+import glconfig # PyOpenGL flags, must come before the OpenGL import
 from OpenGL.GL import *
 from OpenGL.GL import shaders
 import numpy as np
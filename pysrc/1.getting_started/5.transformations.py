@@ -8,6 +8,7 @@ import inspect
 from PySide.QtGui import *
 from PySide.QtCore import *
 from PySide.QtOpenGL import *
+import glconfig # PyOpenGL flags, must come before the OpenGL import
 from OpenGL.GL import *
 from OpenGL.GL import shaders
 from PIL import Image
@@ -58,7 +59,7 @@ class GLWindow(QGLWidget):
             -0.5, 0.5, 0.0,     1.0, 1.0, 0.0,  0.0, 1.0,
             ], np.float32)
 
-        indices = np.array([0, 1, 3, 1, 2, 3], np.uint)
+        indices = np.array([0, 1, 3, 1, 2, 3], np.uint32)
 
         self.__vao = glGenVertexArrays(1)
         vbo = glGenBuffers(1)
@@ -9,6 +9,7 @@ import inspect
 from PySide.QtGui import *
 from PySide.QtCore import *
 from PySide.QtOpenGL import *
+import glconfig # PyOpenGL flags, must come before the OpenGL import
 from OpenGL.GL import *
 from OpenGL.GL import shaders
 from PIL import Image
@@ -16,6 +17,7 @@ import numpy as np
 
 import glm
 import camera
+import texture
 
 currentFile = inspect.getframeinfo(inspect.currentframe()).filename
 abPath = os.path.dirname(os.path.abspath(currentFile))
@@ -276,6 +278,10 @@ class GLWindow(QGLWidget):
         self.updateGL()
 
 def loadTexture(texPath):
+    textureID = texture.loadMipmappedTexture(texPath, clampAlpha=True)
+    if textureID is not None:
+        return textureID
+
     textureID = glGenTextures(1)
     im = Image.open(texPath)
     alpha = im.mode == 'RGBA'
@@ -9,6 +9,7 @@ import inspect
 from PySide.QtGui import *
 from PySide.QtCore import *
 from PySide.QtOpenGL import *
+import glconfig # PyOpenGL flags, must come before the OpenGL import
 from OpenGL.GL import *
 from OpenGL.GL import shaders
 from PIL import Image
@@ -16,6 +17,8 @@ import numpy as np
 
 import glm
 import camera
+import texture
+import rendertarget
 
 currentFile = inspect.getframeinfo(inspect.currentframe()).filename
 abPath = os.path.dirname(os.path.abspath(currentFile))
@@ -58,33 +61,6 @@ class GLWindow(QGLWidget):
         fragmentShader = shaders.compileShader(fragmentShaderSource, GL_FRAGMENT_SHADER)
         return vertexShader, fragmentShader
 
-    # Generate a texture that is suited for attachments to a framebufer
-    def generateAttachmentTexture(self, depth, stencil):
-        # what enum to use?
-        attachment_type = GL_RGB
-        if not depth and not stencil:
-            #attachment_type = GL_RGB
-            pass
-        elif depth and not stencil:
-            attachment_type = GL_DEPTH_COMPONENT
-        elif not depth and stencil:
-            attachment_type = GL_STENCIL_INDEX
-
-        # generate texture ID and load texture data
-        textureId = glGenTextures(1)
-        glBindTexture(GL_TEXTURE_2D, textureId)
-        if not depth and not stencil:
-            glTexImage2D(GL_TEXTURE_2D, 0, attachment_type, self.width(), self.height(), 0,
-                         attachment_type, GL_UNSIGNED_BYTE, ctypes.c_void_p(0))
-        else:
-            # Using both a stencil and depth test, needs special format arguments
-            glTexImage2D(GL_TEXTURE_2D, 0, GL_DEPTH24_STENCIL8, self.width(), self.height(), 0,
-                         GL_DEPTH_STENCIL, GL_UNSIGNED_INT_24_8, ctypes.c_void_p(0))
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
-        glBindTexture(GL_TEXTURE_2D, 0)
-        return textureId
-    
     def initializeGL(self):
         # setup some OpenGL options
         glDepthFunc(GL_LESS)
@@ -208,22 +184,8 @@ class GLWindow(QGLWidget):
         texture2Path = os.path.join(abPath, '..', '..', 'resources', 'textures', 'metal.png')
         self.floorTexture = loadTexture(texture2Path)
 
-        # Framebuffers
-        self.framebuffer = glGenFramebuffers(1)
-        glBindFramebuffer(GL_FRAMEBUFFER, self.framebuffer)
-        # create a color attachment texture
-        self.textureColorBuffer = self.generateAttachmentTexture(False, False)
-        glFramebufferTexture2D(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, GL_TEXTURE_2D, self.textureColorBuffer, 0)
-        # create a renderbuffer object for depth and stencil attachment (we won't be sampling these)
-        self.rbo = glGenRenderbuffers(1)
-        glBindRenderbuffer(GL_RENDERBUFFER, self.rbo)
-        glRenderbufferStorage(GL_RENDERBUFFER, GL_DEPTH24_STENCIL8, self.width(), self.height())
-        glBindRenderbuffer(GL_RENDERBUFFER, 0)
-        glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_DEPTH_STENCIL_ATTACHMENT, GL_RENDERBUFFER, self.rbo)
-        if glCheckFramebufferStatus(GL_FRAMEBUFFER) != GL_FRAMEBUFFER_COMPLETE:
-            print 'ERROR::FRAMEBUFFER:: Framebuffer is not complete!'
-            #raise Exception('ERROR::FRAMEBUFFER:: Framebuffer is not complete!')
-        glBindFramebuffer(GL_FRAMEBUFFER, 0)
+        # Framebuffers, handed out by size and format and given back after each frame
+        self.targets = rendertarget.Pool()
 
     def resizeGL(self, w, h):
         glViewport(0, 0, w, h)
@@ -233,9 +195,12 @@ class GLWindow(QGLWidget):
         self.__deltaTime = currentTime - self.__lastTime
         self.__lastTime = currentTime
 
+        # a color texture and a depth and stencil renderbuffer (we won't be sampling these) at the window's size,
+        # the same one every frame until the window is resized
+        target = self.targets.acquire(self.width(), self.height(), GL_RGB, depth=GL_DEPTH24_STENCIL8)
         # Bind to framebuffer and draw to color texture
         # as we normally would
-        glBindFramebuffer(GL_FRAMEBUFFER, self.framebuffer)
+        glBindFramebuffer(GL_FRAMEBUFFER, target.fbo)
         # Render
         # Clear the colorbuffer
         glClearColor(0.1, 0.1, 0.1, 1.0)
@@ -283,10 +248,13 @@ class GLWindow(QGLWidget):
         # Draw Screen
         glUseProgram(self.__screenShaderProgram)
         glBindVertexArray(self.quadVAO)
-        glBindTexture(GL_TEXTURE_2D, self.textureColorBuffer)
+        glBindTexture(GL_TEXTURE_2D, target.texture)
         glDrawArrays(GL_TRIANGLES, 0, 6)
         glBindVertexArray(0)
 
+        self.targets.release(target)
+        self.targets.endFrame()
+
     def keyPressEvent(self, event):
         if event.key() == Qt.Key_Escape:
             qApp.quit()
@@ -325,10 +293,14 @@ class GLWindow(QGLWidget):
         self.updateGL()
 
     def closeEvent(self, event):
-        glDeleteFramebuffers(1, self.framebuffer)
+        self.targets.delete()
         return super(GLWindow, self).closeEvent(event)
 
 def loadTexture(texPath):
+    textureID = texture.loadMipmappedTexture(texPath, clampAlpha=True)
+    if textureID is not None:
+        return textureID
+
     textureID = glGenTextures(1)
     im = Image.open(texPath)
     alpha = im.mode == 'RGBA'
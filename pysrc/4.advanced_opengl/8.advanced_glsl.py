@@ -9,6 +9,7 @@ import inspect
 from PySide.QtGui import *
 from PySide.QtCore import *
 from PySide.QtOpenGL import *
+import glconfig # PyOpenGL flags, must come before the OpenGL import
 from OpenGL.GL import *
 from OpenGL.GL import shaders
 from PIL import Image
@@ -16,6 +17,7 @@ import numpy as np
 
 import glm
 import camera
+import texture
 
 currentFile = inspect.getframeinfo(inspect.currentframe()).filename
 abPath = os.path.dirname(os.path.abspath(currentFile))
@@ -129,10 +131,10 @@ class GLWindow(QGLWidget):
 
         # Create a uniform buffer object
         # First. We get the relevant block indices
-        uniformBlockIndexRed = glGetUniformBlockIndex(self.__shaderRed, 'Matrices')
-        uniformBlockIndexGreen= glGetUniformBlockIndex(self.__shaderGreen, 'Matrices')
-        uniformBlockIndexBlue = glGetUniformBlockIndex(self.__shaderBlue, 'Matrices')
-        uniformBlockIndexYellow = glGetUniformBlockIndex(self.__shaderYellow, 'Matrices')
+        uniformBlockIndexRed = glGetUniformBlockIndex(self.__shaderRed, b'Matrices')
+        uniformBlockIndexGreen= glGetUniformBlockIndex(self.__shaderGreen, b'Matrices')
+        uniformBlockIndexBlue = glGetUniformBlockIndex(self.__shaderBlue, b'Matrices')
+        uniformBlockIndexYellow = glGetUniformBlockIndex(self.__shaderYellow, b'Matrices')
         # Then we link each shader's uniform block to this uniform binding point
         glUniformBlockBinding(self.__shaderRed, uniformBlockIndexRed, 0)
         glUniformBlockBinding(self.__shaderGreen, uniformBlockIndexGreen, 0)
@@ -232,6 +234,10 @@ class GLWindow(QGLWidget):
         self.updateGL()
 
 def loadTexture(texPath):
+    textureID = texture.loadMipmappedTexture(texPath, clampAlpha=True)
+    if textureID is not None:
+        return textureID
+
     textureID = glGenTextures(1)
     im = Image.open(texPath)
     alpha = im.mode == 'RGBA'
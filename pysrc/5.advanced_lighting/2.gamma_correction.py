@@ -9,6 +9,7 @@ import inspect
 from PySide.QtGui import *
 from PySide.QtCore import *
 from PySide.QtOpenGL import *
+import glconfig # PyOpenGL flags, must come before the OpenGL import
 from OpenGL.GL import *
 from OpenGL.GL import shaders
 from PIL import Image
@@ -16,6 +17,7 @@ import numpy as np
 
 import glm
 import camera
+import texture
 
 currentFile = inspect.getframeinfo(inspect.currentframe()).filename
 abPath = os.path.dirname(os.path.abspath(currentFile))
@@ -137,7 +139,7 @@ class GLWindow(QGLWidget):
         glDrawArrays(GL_TRIANGLES, 0, 6)
         glBindVertexArray(0)
 
-        print "Gamma enabled" if self.gammaEnabled else "Gamma disabled"
+        print("Gamma enabled" if self.gammaEnabled else "Gamma disabled")
 
     def keyPressEvent(self, event):
         if event.key() == Qt.Key_Escape:
@@ -179,6 +181,10 @@ class GLWindow(QGLWidget):
         self.updateGL()
 
 def loadTexture(texPath, gammaCorrection=False):
+    textureID = texture.loadMipmappedTexture(texPath, gammaCorrection, clampAlpha=True)
+    if textureID is not None:
+        return textureID
+
     textureID = glGenTextures(1)
     im = Image.open(texPath)
     alpha = im.mode == 'RGBA'
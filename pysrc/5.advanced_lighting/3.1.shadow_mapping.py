@@ -9,6 +9,7 @@ import inspect
 from PySide.QtGui import *
 from PySide.QtCore import *
 from PySide.QtOpenGL import *
+import glconfig # PyOpenGL flags, must come before the OpenGL import
 from OpenGL.GL import *
 from OpenGL.GL import shaders
 from PIL import Image
@@ -16,6 +17,9 @@ import numpy as np
 
 import glm
 import camera
+import texture
+import primitives
+import shadowcache
 
 currentFile = inspect.getframeinfo(inspect.currentframe()).filename
 abPath = os.path.dirname(os.path.abspath(currentFile))
@@ -41,9 +45,9 @@ class GLWindow(QGLWidget):
         self.__deltaTime = 0.0
         self.__lastTime = 0.0
 
-        self.quadVAO = 0
-        self.cubeVAO = 0
         self.shadows = True
+        self.moveLight = False
+        self.spinCube = False
 
         # if you want press mouse button to active camera rotation set it to false
         self.setMouseTracking(True)
@@ -73,30 +77,9 @@ class GLWindow(QGLWidget):
         vertexShader, fragmentShader = self.loadShaders('3.1.debug_quad.vs', '3.1.debug_quad_depth.frag')
         self.__debugDepthQuad = shaders.compileProgram(vertexShader, fragmentShader)
 
-        vertices = np.array([
-            # positions          # normals       # texture coords
-             25.0, -0.5,  25.0,  0.0, 1.0, 0.0,  25.0, 0.0,
-            -25.0, -0.5, -25.0,  0.0, 1.0, 0.0,  0.0, 25.0,
-            -25.0, -0.5,  25.0,  0.0, 1.0, 0.0,  0.0, 0.0,
-
-             25.0, -0.5,  25.0,  0.0, 1.0, 0.0,  25.0, 0.0,
-             25.0, -0.5, -25.0,  0.0, 1.0, 0.0,  25.0, 25.0,
-            -25.0, -0.5, -25.0,  0.0, 1.0, 0.0,  0.0, 25.0,
-            ], np.float32)
-
-        # setup cube VAO
-        self.planeVAO = glGenVertexArrays(1)
-        vbo = glGenBuffers(1)
-        glBindVertexArray(self.planeVAO)
-        glBindBuffer(GL_ARRAY_BUFFER, vbo)
-        glBufferData(GL_ARRAY_BUFFER, vertices.nbytes, vertices, GL_STATIC_DRAW)
-        glEnableVertexAttribArray(0)
-        glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE, 8 * vertices.itemsize, None)
-        glEnableVertexAttribArray(1)
-        glVertexAttribPointer(1, 3, GL_FLOAT, GL_FALSE, 8 * vertices.itemsize, ctypes.c_void_p(3 * vertices.itemsize))
-        glEnableVertexAttribArray(2)
-        glVertexAttribPointer(2, 2, GL_FLOAT, GL_FALSE, 8 * vertices.itemsize, ctypes.c_void_p(6 * vertices.itemsize))
-        glBindVertexArray(0)
+        glUseProgram(self.__shader)
+        glUniform1i(glGetUniformLocation(self.__shader, 'diffuseTexture'), 0)
+        glUniform1i(glGetUniformLocation(self.__shader, 'shadowMap'), 1)
 
         # light source
         self.lightPos = np.array([-2.0, 4.0, -1.0], np.float32)
@@ -126,6 +109,32 @@ class GLWindow(QGLWidget):
         glReadBuffer(GL_NONE)
         glBindFramebuffer(GL_FRAMEBUFFER, 0)
 
+        # the static casters' depth, kept between frames and copied under the dynamic ones
+        self.staticDepthMapFBO = glGenFramebuffers(1)
+        self.staticDepthMap = glGenTextures(1)
+        glBindTexture(GL_TEXTURE_2D, self.staticDepthMap)
+        glTexImage2D(GL_TEXTURE_2D, 0, GL_DEPTH_COMPONENT, self.shadowWidth, self.shadowHeight, 0, GL_DEPTH_COMPONENT, GL_FLOAT, None)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
+        glBindFramebuffer(GL_FRAMEBUFFER, self.staticDepthMapFBO)
+        glFramebufferTexture2D(GL_FRAMEBUFFER, GL_DEPTH_ATTACHMENT, GL_TEXTURE_2D, self.staticDepthMap, 0)
+        glDrawBuffer(GL_NONE)
+        glReadBuffer(GL_NONE)
+        glBindFramebuffer(GL_FRAMEBUFFER, 0)
+        self.depthCopy = shadowcache.DepthCopy()
+        self.shadowCache = shadowcache.ShadowCache()
+
+        # shadow casters: the floor and two cubes never move, the third cube spins if you press 'R'
+        planeBounds = [[-25.0, -0.5, -25.0], [25.0, -0.5, 25.0]]
+        cubeBounds = [[-0.5, -0.5, -0.5], [0.5, 0.5, 0.5]]
+        self.staticCasters = [
+            shadowcache.Caster(np.identity(4, np.float32), planeBounds, lambda shader: self.renderPlane()),
+            shadowcache.Caster(glm.translate(np.identity(4, np.float32), 0.0, 1.5, 0.0), cubeBounds, lambda shader: self.renderCube()),
+            shadowcache.Caster(glm.translate(np.identity(4, np.float32), 2.0, 0.0, 1.0), cubeBounds, lambda shader: self.renderCube()),
+        ]
+        self.spinningCube = shadowcache.Caster(spinningCubeModel(60.0), cubeBounds, lambda shader: self.renderCube())
+        self.dynamicCasters = [self.spinningCube]
+
         glClearColor(0.1, 0.1, 0.1, 1.0)
 
     def resizeGL(self, w, h):
@@ -137,7 +146,10 @@ class GLWindow(QGLWidget):
         self.__lastTime = currentTime
 
         # change light position over time
-        self.lightPos[2] = math.cos(currentTime) * 2.0
+        if self.moveLight:
+            self.lightPos[2] = math.cos(currentTime) * 2.0
+        if self.spinCube:
+            self.spinningCube.model = spinningCubeModel(60.0 + 45.0 * currentTime)
 
         # 1. Render depth of scene to texture (from light's perspective)
         # Get light projection/view matrix.
@@ -146,15 +158,22 @@ class GLWindow(QGLWidget):
         lightProjection = glm.ortho(-10.0, 10.0, -10.0, 10.0, near_plane, far_plane)
         #lightProjection = glm.perspective(45.0, float(self.width())/self.height(), near_plane, far_plane)
         lightView = glm.lookAt(self.lightPos, np.zeros(3, np.float32), np.ones(3, np.float32))
-        lightSpaceMatrix = lightProjection * lightView
-        # now render scene from light's point of view
-        glUseProgram(self.__simpleDepthShader)
-        glUniformMatrix4fv(glGetUniformLocation(self.__simpleDepthShader, 'lightSpaceMatrix'), 1, GL_FALSE, lightSpaceMatrix)
-        glViewport(0, 0, self.shadowWidth, self.shadowHeight)
-        glBindFramebuffer(GL_FRAMEBUFFER, self.depthMapFBO)
-        glClear(GL_DEPTH_BUFFER_BIT)
-        self.renderScene(self.__simpleDepthShader)
-        glBindFramebuffer(GL_FRAMEBUFFER, 0)
+        lightSpaceMatrix = lightView.dot(lightProjection)
+        # now render scene from light's point of view, if the light or a caster moved since the last time
+        renderStatic, renderDynamic = self.shadowCache.check(lightSpaceMatrix, self.staticCasters, self.dynamicCasters)
+        if renderDynamic:
+            glUseProgram(self.__simpleDepthShader)
+            glUniformMatrix4fv(glGetUniformLocation(self.__simpleDepthShader, 'lightSpaceMatrix'), 1, GL_FALSE, lightSpaceMatrix)
+            glViewport(0, 0, self.shadowWidth, self.shadowHeight)
+            if renderStatic:
+                glBindFramebuffer(GL_FRAMEBUFFER, self.staticDepthMapFBO)
+                glClear(GL_DEPTH_BUFFER_BIT)
+                self.renderScene(self.__simpleDepthShader, self.staticCasters)
+            # dynamic casters on top of the static ones
+            self.depthCopy.copy(self.staticDepthMap, self.depthMap, self.shadowWidth, self.shadowHeight)
+            glBindFramebuffer(GL_FRAMEBUFFER, self.depthMapFBO)
+            self.renderScene(self.__simpleDepthShader, self.dynamicCasters)
+            glBindFramebuffer(GL_FRAMEBUFFER, 0)
 
         # 2. render scene as normal
         glViewport(0, 0, self.width(), self.height())
@@ -185,118 +204,22 @@ class GLWindow(QGLWidget):
         #self.renderQuad() # uncomment this line to see depth map
         glUseProgram(0)
 
-    def renderScene(self, shader):
+    def renderScene(self, shader, casters=None):
+        if casters is None:
+            casters = self.staticCasters + self.dynamicCasters
+        for caster in casters:
+            glUniformMatrix4fv(glGetUniformLocation(shader, 'model'), 1, GL_FALSE, caster.model)
+            caster.draw(shader)
+
+    def renderPlane(self):
         # Floor
-        model = np.identity(4, np.float32)
-        glUniformMatrix4fv(glGetUniformLocation(shader, 'model'), 1, GL_FALSE, model)
-        glBindVertexArray(self.planeVAO)
-        glDrawArrays(GL_TRIANGLES, 0, 6)
-        glBindVertexArray(0)
-        # Cubes
-        model = glm.translate(model, 0.0, 1.5, 0.0)
-        glUniformMatrix4fv(glGetUniformLocation(shader, 'model'), 1, GL_FALSE, model)
-        self.renderCube()
-        model = glm.translate(np.identity(4, np.float32), 2.0, 0.0, 1.0)
-        glUniformMatrix4fv(glGetUniformLocation(shader, 'model'), 1, GL_FALSE, model)
-        self.renderCube()
-        model = glm.rotate(np.identity(4, np.float32), 60.0, 1.0, 0.0, 1.0)
-        model = glm.scale(model, 0.5, 0.5, 0.5)
-        model = glm.translate(model, -1.0, 0.0, 2.0)
-        glUniformMatrix4fv(glGetUniformLocation(shader, 'model'), 1, GL_FALSE, model)
-        self.renderCube()
+        primitives.mesh('plane', 25.0, -0.5, 25.0).draw()
 
     def renderQuad(self):
-        if self.quadVAO == 0:
-            quadVertices = np.array([
-                # positions       # texture coords
-                -1.0,  1.0, 0.0,  0.0, 1.0,
-                -1.0, -1.0, 0.0,  0.0, 0.0,
-                 1.0,  1.0, 0.0,  1.0, 1.0,
-                 1.0, -1.0, 0.0,  1.0, 0.0,
-            ], np.float32)
-
-            # setup plane VAO
-            self.quadVAO = glGenVertexArrays(1)
-            quadVBO = glGenBuffers(1)
-            glBindVertexArray(self.quadVAO)
-            glBindBuffer(GL_ARRAY_BUFFER, quadVBO)
-            glBufferData(GL_ARRAY_BUFFER, quadVertices.nbytes, quadVertices, GL_STATIC_DRAW)
-            glEnableVertexAttribArray(0)
-            glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE, 5 * quadVertices.itemsize, None)
-            glEnableVertexAttribArray(1)
-            glVertexAttribPointer(1, 2, GL_FLOAT, GL_FALSE, 5 * quadVertices.itemsize, ctypes.c_void_p(3 * quadVertices.itemsize))
-
-        glBindVertexArray(self.quadVAO)
-        glDrawArrays(GL_TRIANGLE_STRIP, 0, 4)
-        glBindVertexArray(0)
+        primitives.mesh('quad').draw()
 
     def renderCube(self):
-        # initilize (if necessary)
-        if self.cubeVAO == 0:
-            vertices = np.array([
-                # Back face
-                -0.5, -0.5, -0.5, 0.0, 0.0, -1.0, 0.0, 0.0, # Bottom-left
-                0.5, 0.5, -0.5, 0.0, 0.0, -1.0, 1.0, 1.0, # top-right
-                0.5, -0.5, -0.5, 0.0, 0.0, -1.0, 1.0, 0.0, # bottom-right
-                0.5, 0.5, -0.5, 0.0, 0.0, -1.0, 1.0, 1.0,  # top-right
-                -0.5, -0.5, -0.5, 0.0, 0.0, -1.0, 0.0, 0.0,  # bottom-left
-                -0.5, 0.5, -0.5, 0.0, 0.0, -1.0, 0.0, 1.0,# top-left
-                # Front face
-                -0.5, -0.5, 0.5, 0.0, 0.0, 1.0, 0.0, 0.0, # bottom-left
-                0.5, -0.5, 0.5, 0.0, 0.0, 1.0, 1.0, 0.0,  # bottom-right
-                0.5, 0.5, 0.5, 0.0, 0.0, 1.0, 1.0, 1.0,  # top-right
-                0.5, 0.5, 0.5, 0.0, 0.0, 1.0, 1.0, 1.0, # top-right
-                -0.5, 0.5, 0.5, 0.0, 0.0, 1.0, 0.0, 1.0,  # top-left
-                -0.5, -0.5, 0.5, 0.0, 0.0, 1.0, 0.0, 0.0,  # bottom-left
-                # Left face
-                -0.5, 0.5, 0.5, -1.0, 0.0, 0.0, 1.0, 0.0, # top-right
-                -0.5, 0.5, -0.5, -1.0, 0.0, 0.0, 1.0, 1.0, # top-left
-                -0.5, -0.5, -0.5, -1.0, 0.0, 0.0, 0.0, 1.0,  # bottom-left
-                -0.5, -0.5, -0.5, -1.0, 0.0, 0.0, 0.0, 1.0, # bottom-left
-                -0.5, -0.5, 0.5, -1.0, 0.0, 0.0, 0.0, 0.0,  # bottom-right
-                -0.5, 0.5, 0.5, -1.0, 0.0, 0.0, 1.0, 0.0, # top-right
-                # Right face
-                0.5, 0.5, 0.5, 1.0, 0.0, 0.0, 1.0, 0.0, # top-left
-                0.5, -0.5, -0.5, 1.0, 0.0, 0.0, 0.0, 1.0, # bottom-right
-                0.5, 0.5, -0.5, 1.0, 0.0, 0.0, 1.0, 1.0, # top-right
-                0.5, -0.5, -0.5, 1.0, 0.0, 0.0, 0.0, 1.0,  # bottom-right
-                0.5, 0.5, 0.5, 1.0, 0.0, 0.0, 1.0, 0.0,  # top-left
-                0.5, -0.5, 0.5, 1.0, 0.0, 0.0, 0.0, 0.0, # bottom-left
-                # Bottom face
-                -0.5, -0.5, -0.5, 0.0, -1.0, 0.0, 0.0, 1.0, # top-right
-                0.5, -0.5, -0.5, 0.0, -1.0, 0.0, 1.0, 1.0, # top-left
-                0.5, -0.5, 0.5, 0.0, -1.0, 0.0, 1.0, 0.0,# bottom-left
-                0.5, -0.5, 0.5, 0.0, -1.0, 0.0, 1.0, 0.0, # bottom-left
-                -0.5, -0.5, 0.5, 0.0, -1.0, 0.0, 0.0, 0.0, # bottom-right
-                -0.5, -0.5, -0.5, 0.0, -1.0, 0.0, 0.0, 1.0, # top-right
-                # Top face
-                -0.5, 0.5, -0.5, 0.0, 1.0, 0.0, 0.0, 1.0,# top-left
-                0.5, 0.5, 0.5, 0.0, 1.0, 0.0, 1.0, 0.0, # bottom-right
-                0.5, 0.5, -0.5, 0.0, 1.0, 0.0, 1.0, 1.0, # top-right
-                0.5, 0.5, 0.5, 0.0, 1.0, 0.0, 1.0, 0.0, # bottom-right
-                -0.5, 0.5, -0.5, 0.0, 1.0, 0.0, 0.0, 1.0,# top-left
-                -0.5, 0.5, 0.5, 0.0, 1.0, 0.0, 0.0, 0.0, # bottom-left
-            ], np.float32)
-
-            self.cubeVAO = glGenVertexArrays(1)
-            cubeVBO = glGenBuffers(1)
-            glBindVertexArray(self.cubeVAO)
-            # fill buffer
-            glBindBuffer(GL_ARRAY_BUFFER, cubeVBO)
-            glBufferData(GL_ARRAY_BUFFER, vertices.nbytes, vertices, GL_STATIC_DRAW)
-            # link vertex attributes
-            glEnableVertexAttribArray(0)
-            glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE, 8 * vertices.itemsize, None)
-            glEnableVertexAttribArray(1)
-            glVertexAttribPointer(1, 3, GL_FLOAT, GL_FALSE, 8 * vertices.itemsize, ctypes.c_void_p(3 * vertices.itemsize))
-            glEnableVertexAttribArray(2)
-            glVertexAttribPointer(2, 2, GL_FLOAT, GL_FALSE, 8 * vertices.itemsize, ctypes.c_void_p(6 * vertices.itemsize))
-            glBindBuffer(GL_ARRAY_BUFFER, 0)
-            glBindVertexArray(0)
-        # render cube
-        glBindVertexArray(self.cubeVAO)
-        glDrawArrays(GL_TRIANGLES, 0, 36)
-        glBindVertexArray(0)
+        primitives.mesh('cube').draw()
 
     def keyPressEvent(self, event):
         if event.key() == Qt.Key_Escape:
@@ -311,6 +234,10 @@ class GLWindow(QGLWidget):
             self.camera.processKeyboard(camera.Camera_Movement.RIGHT, self.__deltaTime)
         if event.key() == Qt.Key_Space:
             self.shadows = not self.shadows
+        if event.key() == Qt.Key_P:
+            self.moveLight = not self.moveLight
+        if event.key() == Qt.Key_R:
+            self.spinCube = not self.spinCube
 
         self.updateGL()
         return super(GLWindow, self).keyPressEvent(event)
@@ -337,7 +264,17 @@ class GLWindow(QGLWidget):
         self.camera.processMouseScroll(event.delta())
         self.updateGL()
 
+def spinningCubeModel(angle):
+    model = glm.rotate(np.identity(4, np.float32), angle, 1.0, 0.0, 1.0)
+    model = glm.scale(model, 0.5, 0.5, 0.5)
+    model = glm.translate(model, -1.0, 0.0, 2.0)
+    return model
+
 def loadTexture(texPath, gammaCorrection=False):
+    textureID = texture.loadMipmappedTexture(texPath, gammaCorrection, clampAlpha=True)
+    if textureID is not None:
+        return textureID
+
     textureID = glGenTextures(1)
     im = Image.open(texPath)
     alpha = im.mode == 'RGBA'
@@ -9,6 +9,7 @@ import inspect
 from PySide.QtGui import *
 from PySide.QtCore import *
 from PySide.QtOpenGL import *
+import glconfig # PyOpenGL flags, must come before the OpenGL import
 from OpenGL.GL import *
 from OpenGL.GL import shaders
 from PIL import Image
@@ -16,6 +17,10 @@ import numpy as np
 
 import glm
 import camera
+import texture
+import primitives
+import shadowcache
+import pointshadow
 
 currentFile = inspect.getframeinfo(inspect.currentframe()).filename
 abPath = os.path.dirname(os.path.abspath(currentFile))
@@ -41,9 +46,9 @@ class GLWindow(QGLWidget):
         self.__deltaTime = 0.0
         self.__lastTime = 0.0
 
-        self.quadVAO = 0
-        self.cubeVAO = 0
         self.shadows = True
+        self.moveLight = False
+        self.spinCube = False
 
         # if you want press mouse button to active camera rotation set it to false
         self.setMouseTracking(True)
@@ -95,28 +100,21 @@ class GLWindow(QGLWidget):
         # load texture
         self.woodTexture = loadTexture(os.path.join(abPath, '..', '..', 'resources', 'textures', 'wood.png'))
 
-        # Configure depth map FBO
-        self.shadowWidth = 1024
-        self.shadowHeight = 1024
-        self.depthMapFBO = glGenFramebuffers(1)
-        # Create depth texture
-        self.depthCubeMap = glGenTextures(1)
-        glBindTexture(GL_TEXTURE_CUBE_MAP, self.depthCubeMap)
-        for i in range(6):
-            glTexImage2D(GL_TEXTURE_CUBE_MAP_POSITIVE_X + i, 0, GL_DEPTH_COMPONENT, self.shadowWidth, self.shadowHeight, 0, GL_DEPTH_COMPONENT, GL_FLOAT, None)
-        glTexParameteri(GL_TEXTURE_CUBE_MAP, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
-        glTexParameteri(GL_TEXTURE_CUBE_MAP, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
-        glTexParameteri(GL_TEXTURE_CUBE_MAP, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_EDGE)
-        glTexParameteri(GL_TEXTURE_CUBE_MAP, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_EDGE)
-        glTexParameteri(GL_TEXTURE_CUBE_MAP, GL_TEXTURE_WRAP_R, GL_CLAMP_TO_EDGE)
-        # Attach cubemap as depth map FBO's color buffer
-        glBindFramebuffer(GL_FRAMEBUFFER, self.depthMapFBO)
-        glFramebufferTexture(GL_FRAMEBUFFER, GL_DEPTH_ATTACHMENT, self.depthCubeMap, 0)
-        glDrawBuffer(GL_NONE)
-        glReadBuffer(GL_NONE)
-        if glCheckFramebufferStatus(GL_FRAMEBUFFER) != GL_FRAMEBUFFER_COMPLETE:
-            print 'Framebuffer not complete!'
-        glBindFramebuffer(GL_FRAMEBUFFER, 0)
+        # Configure depth cubemap and its layered FBO, near plane 1 and far plane 25
+        self.pointShadows = pointshadow.PointShadows(1, 1024, 1.0, 25.0)
+        # the static casters' depth, kept between frames and copied under the dynamic ones
+        self.staticDepthCubeMap, self.staticDepthMapFBO = pointshadow.depthCubeMap(1, self.pointShadows.size)
+        self.depthCopy = shadowcache.DepthCopy()
+        self.shadowCache = shadowcache.ShadowCache()
+
+        # shadow casters: the room and four cubes never move, the last cube spins if you press 'R'
+        cubeBounds = [[-0.5, -0.5, -0.5], [0.5, 0.5, 0.5]]
+        self.staticCasters = [shadowcache.Caster(glm.scale(np.identity(4, np.float32), 10.0, 10.0, 10.0), cubeBounds, self.renderRoom)]
+        for position in ([4.0, -3.5, 0.0], [2.0, 3.0, 1.0], [-3.0, -1.0, 0.0], [-1.5, 1.0, 1.5]):
+            model = glm.translate(np.identity(4, np.float32), *position)
+            self.staticCasters.append(shadowcache.Caster(model, cubeBounds, lambda shader: self.renderCube()))
+        self.spinningCube = shadowcache.Caster(spinningCubeModel(60.0), cubeBounds, lambda shader: self.renderCube())
+        self.dynamicCasters = [self.spinningCube]
 
         glClearColor(0.1, 0.1, 0.1, 1.0)
 
@@ -128,34 +126,31 @@ class GLWindow(QGLWidget):
         self.__deltaTime = currentTime - self.__lastTime
         self.__lastTime = currentTime
 
-        # change light position over time
-        #self.lightPos[2] = math.cos(currentTime) * 2.0
-
-        # 0. Create depth cubemap transformation matrices
-        aspect = float(self.shadowWidth) / self.shadowHeight
-        near_plane = 1.0
-        far_plane = 25.0
-        shadowProj = glm.perspective(90.0, aspect, near_plane, far_plane)
-        shadowTransforms = []
-        shadowTransforms.append(shadowProj * glm.lookAt(self.lightPos, self.lightPos + np.array([1.0, 0.0, 0.0], np.float32), np.array([0.0, -1.0, 0.0], np.float32)))
-        shadowTransforms.append(shadowProj * glm.lookAt(self.lightPos, self.lightPos + np.array([-1.0, 0.0, 0.0], np.float32), np.array([0.0, -1.0, 0.0], np.float32)))
-        shadowTransforms.append(shadowProj * glm.lookAt(self.lightPos, self.lightPos + np.array([0.0, 1.0, 0.0], np.float32), np.array([0.0, 0.0, 1.0], np.float32)))
-        shadowTransforms.append(shadowProj * glm.lookAt(self.lightPos, self.lightPos + np.array([0.0, -1.0, 0.0], np.float32), np.array([0.0, 0.0, -1.0], np.float32)))
-        shadowTransforms.append(shadowProj * glm.lookAt(self.lightPos, self.lightPos + np.array([0.0, 0.0, 1.0], np.float32), np.array([0.0, -1.0, 0.0], np.float32)))
-        shadowTransforms.append(shadowProj * glm.lookAt(self.lightPos, self.lightPos + np.array([0.0, 0.0, -1.0], np.float32), np.array([0.0, -1.0, 0.0], np.float32)))
-        # shadowTransforms = np.array(shadowTransforms, np.float32)
-
-        # 1. Render scene to depth cubemap
-        glViewport(0, 0, self.shadowWidth, self.shadowHeight)
-        glBindFramebuffer(GL_FRAMEBUFFER, self.depthMapFBO)
-        glClear(GL_DEPTH_BUFFER_BIT)
-        glUseProgram(self.__simpleDepthShader)
-        for i in range(6):
-            glUniformMatrix4fv(glGetUniformLocation(self.__simpleDepthShader, 'shadowTransforms[{}]'.format(i)), 1, GL_FALSE, shadowTransforms[i])
-        glUniform1f(glGetUniformLocation(self.__simpleDepthShader, 'far_plane'), far_plane)
-        glUniform3fv(glGetUniformLocation(self.__simpleDepthShader, 'lightPos'), 1, self.lightPos)
-        self.renderScene(self.__simpleDepthShader)
-        glBindFramebuffer(GL_FRAMEBUFFER, 0)
+        # change light position over time, press 'P'
+        if self.moveLight:
+            self.lightPos[2] = math.cos(currentTime) * 2.0
+        if self.spinCube:
+            self.spinningCube.model = spinningCubeModel(60.0 + 45.0 * currentTime)
+
+        # 0. Depth cubemap transformation matrices, recomputed when the light moved
+        self.pointShadows.update(self.lightPos)
+
+        # 1. Render scene to depth cubemap, if the light or a caster moved since the last time
+        shadowSize = self.pointShadows.size
+        renderStatic, renderDynamic = self.shadowCache.check(np.append(self.lightPos, self.pointShadows.far), self.staticCasters, self.dynamicCasters)
+        if renderDynamic:
+            glViewport(0, 0, shadowSize, shadowSize)
+            glUseProgram(self.__simpleDepthShader)
+            self.pointShadows.bind(self.__simpleDepthShader)
+            if renderStatic:
+                glBindFramebuffer(GL_FRAMEBUFFER, self.staticDepthMapFBO)
+                glClear(GL_DEPTH_BUFFER_BIT)
+                self.renderScene(self.__simpleDepthShader, self.staticCasters)
+            # dynamic casters on top of the static ones
+            self.depthCopy.copy(self.staticDepthCubeMap, self.pointShadows.texture, shadowSize, shadowSize, GL_TEXTURE_CUBE_MAP)
+            glBindFramebuffer(GL_FRAMEBUFFER, self.pointShadows.fbo)
+            self.renderScene(self.__simpleDepthShader, self.dynamicCasters)
+            glBindFramebuffer(GL_FRAMEBUFFER, 0)
 
         # 2. render scene as normal
         glViewport(0, 0, self.width(), self.height())
@@ -170,136 +165,34 @@ class GLWindow(QGLWidget):
         glUniform3fv(glGetUniformLocation(self.__shader, 'viewPos'), 1, self.camera.position)
         # Enable/Disable shadows by pressing 'SPACE'
         glUniform1i(glGetUniformLocation(self.__shader, 'shadows'), self.shadows)
-        glUniform1f(glGetUniformLocation(self.__shader, 'far_plane'), far_plane)
+        glUniform1f(glGetUniformLocation(self.__shader, 'far_plane'), self.pointShadows.far)
         glActiveTexture(GL_TEXTURE0)
         glBindTexture(GL_TEXTURE_2D, self.woodTexture)
         glActiveTexture(GL_TEXTURE1)
-        glBindTexture(GL_TEXTURE_CUBE_MAP, self.depthCubeMap)
+        glBindTexture(GL_TEXTURE_CUBE_MAP, self.pointShadows.texture)
         self.renderScene(self.__shader)
 
         glUseProgram(0)
 
-    def renderScene(self, shader):
+    def renderScene(self, shader, casters=None):
+        if casters is None:
+            casters = self.staticCasters + self.dynamicCasters
+        for caster in casters:
+            glUniformMatrix4fv(glGetUniformLocation(shader, 'model'), 1, GL_FALSE, caster.model)
+            caster.draw(shader)
+
+    def renderRoom(self, shader):
         # Room cube
-        model = np.identity(4, np.float32)
-        model = glm.scale(model, 10.0, 10.0, 10.0)
-        glUniformMatrix4fv(glGetUniformLocation(shader, 'model'), 1, GL_FALSE, model)
         glDisable(GL_CULL_FACE) # Note that we disable culling here since we render 'inside' the cube instead of the usual 'outside' which throws off the normal culling methods.
         glUniform1i(glGetUniformLocation(shader, 'reverse_normals'), 1) #A small little hack to invert normals when drawing cube from the inside so lighting still works.
         self.renderCube()
         glEnable(GL_CULL_FACE)
-        # Cubes
-        model = np.identity(4, np.float32)
-        model = glm.translate(model, 4.0, -3.5, 0.0)
-        glUniformMatrix4fv(glGetUniformLocation(shader, 'model'), 1, GL_FALSE, model)
-        self.renderCube()
-        model = glm.translate(np.identity(4, np.float32), 2.0, 3.0, 1.0)
-        glUniformMatrix4fv(glGetUniformLocation(shader, 'model'), 1, GL_FALSE, model)
-        self.renderCube()
-        model = glm.translate(np.identity(4, np.float32), -3.0, -1.0, 0.0)
-        glUniformMatrix4fv(glGetUniformLocation(shader, 'model'), 1, GL_FALSE, model)
-        self.renderCube()
-        model = glm.translate(np.identity(4, np.float32), -1.5, 1.0, 1.5)
-        glUniformMatrix4fv(glGetUniformLocation(shader, 'model'), 1, GL_FALSE, model)
-        self.renderCube()
-        model = glm.rotate(np.identity(4, np.float32), 60.0, 1.0, 0.0, 1.0)
-        model = glm.scale(model, 1.5, 1.5, 1.5)
-        model = glm.translate(model, -1.5, 2.0, -3.0)
-        glUniformMatrix4fv(glGetUniformLocation(shader, 'model'), 1, GL_FALSE, model)
-        self.renderCube()
 
     def renderQuad(self):
-        if self.quadVAO == 0:
-            quadVertices = np.array([
-                # positions       # texture coords
-                -1.0,  1.0, 0.0,  0.0, 1.0,
-                -1.0, -1.0, 0.0,  0.0, 0.0,
-                 1.0,  1.0, 0.0,  1.0, 1.0,
-                 1.0, -1.0, 0.0,  1.0, 0.0,
-            ], np.float32)
-
-            # setup plane VAO
-            self.quadVAO = glGenVertexArrays(1)
-            quadVBO = glGenBuffers(1)
-            glBindVertexArray(self.quadVAO)
-            glBindBuffer(GL_ARRAY_BUFFER, quadVBO)
-            glBufferData(GL_ARRAY_BUFFER, quadVertices.nbytes, quadVertices, GL_STATIC_DRAW)
-            glEnableVertexAttribArray(0)
-            glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE, 5 * quadVertices.itemsize, None)
-            glEnableVertexAttribArray(1)
-            glVertexAttribPointer(1, 2, GL_FLOAT, GL_FALSE, 5 * quadVertices.itemsize, ctypes.c_void_p(3 * quadVertices.itemsize))
-
-        glBindVertexArray(self.quadVAO)
-        glDrawArrays(GL_TRIANGLE_STRIP, 0, 4)
-        glBindVertexArray(0)
+        primitives.mesh('quad').draw()
 
     def renderCube(self):
-        # initilize (if necessary)
-        if self.cubeVAO == 0:
-            vertices = np.array([
-                # Back face
-                -0.5, -0.5, -0.5, 0.0, 0.0, -1.0, 0.0, 0.0, # Bottom-left
-                0.5, 0.5, -0.5, 0.0, 0.0, -1.0, 1.0, 1.0, # top-right
-                0.5, -0.5, -0.5, 0.0, 0.0, -1.0, 1.0, 0.0, # bottom-right
-                0.5, 0.5, -0.5, 0.0, 0.0, -1.0, 1.0, 1.0,  # top-right
-                -0.5, -0.5, -0.5, 0.0, 0.0, -1.0, 0.0, 0.0,  # bottom-left
-                -0.5, 0.5, -0.5, 0.0, 0.0, -1.0, 0.0, 1.0,# top-left
-                # Front face
-                -0.5, -0.5, 0.5, 0.0, 0.0, 1.0, 0.0, 0.0, # bottom-left
-                0.5, -0.5, 0.5, 0.0, 0.0, 1.0, 1.0, 0.0,  # bottom-right
-                0.5, 0.5, 0.5, 0.0, 0.0, 1.0, 1.0, 1.0,  # top-right
-                0.5, 0.5, 0.5, 0.0, 0.0, 1.0, 1.0, 1.0, # top-right
-                -0.5, 0.5, 0.5, 0.0, 0.0, 1.0, 0.0, 1.0,  # top-left
-                -0.5, -0.5, 0.5, 0.0, 0.0, 1.0, 0.0, 0.0,  # bottom-left
-                # Left face
-                -0.5, 0.5, 0.5, -1.0, 0.0, 0.0, 1.0, 0.0, # top-right
-                -0.5, 0.5, -0.5, -1.0, 0.0, 0.0, 1.0, 1.0, # top-left
-                -0.5, -0.5, -0.5, -1.0, 0.0, 0.0, 0.0, 1.0,  # bottom-left
-                -0.5, -0.5, -0.5, -1.0, 0.0, 0.0, 0.0, 1.0, # bottom-left
-                -0.5, -0.5, 0.5, -1.0, 0.0, 0.0, 0.0, 0.0,  # bottom-right
-                -0.5, 0.5, 0.5, -1.0, 0.0, 0.0, 1.0, 0.0, # top-right
-                # Right face
-                0.5, 0.5, 0.5, 1.0, 0.0, 0.0, 1.0, 0.0, # top-left
-                0.5, -0.5, -0.5, 1.0, 0.0, 0.0, 0.0, 1.0, # bottom-right
-                0.5, 0.5, -0.5, 1.0, 0.0, 0.0, 1.0, 1.0, # top-right
-                0.5, -0.5, -0.5, 1.0, 0.0, 0.0, 0.0, 1.0,  # bottom-right
-                0.5, 0.5, 0.5, 1.0, 0.0, 0.0, 1.0, 0.0,  # top-left
-                0.5, -0.5, 0.5, 1.0, 0.0, 0.0, 0.0, 0.0, # bottom-left
-                # Bottom face
-                -0.5, -0.5, -0.5, 0.0, -1.0, 0.0, 0.0, 1.0, # top-right
-                0.5, -0.5, -0.5, 0.0, -1.0, 0.0, 1.0, 1.0, # top-left
-                0.5, -0.5, 0.5, 0.0, -1.0, 0.0, 1.0, 0.0,# bottom-left
-                0.5, -0.5, 0.5, 0.0, -1.0, 0.0, 1.0, 0.0, # bottom-left
-                -0.5, -0.5, 0.5, 0.0, -1.0, 0.0, 0.0, 0.0, # bottom-right
-                -0.5, -0.5, -0.5, 0.0, -1.0, 0.0, 0.0, 1.0, # top-right
-                # Top face
-                -0.5, 0.5, -0.5, 0.0, 1.0, 0.0, 0.0, 1.0,# top-left
-                0.5, 0.5, 0.5, 0.0, 1.0, 0.0, 1.0, 0.0, # bottom-right
-                0.5, 0.5, -0.5, 0.0, 1.0, 0.0, 1.0, 1.0, # top-right
-                0.5, 0.5, 0.5, 0.0, 1.0, 0.0, 1.0, 0.0, # bottom-right
-                -0.5, 0.5, -0.5, 0.0, 1.0, 0.0, 0.0, 1.0,# top-left
-                -0.5, 0.5, 0.5, 0.0, 1.0, 0.0, 0.0, 0.0, # bottom-left
-            ], np.float32)
-
-            self.cubeVAO = glGenVertexArrays(1)
-            cubeVBO = glGenBuffers(1)
-            glBindVertexArray(self.cubeVAO)
-            # fill buffer
-            glBindBuffer(GL_ARRAY_BUFFER, cubeVBO)
-            glBufferData(GL_ARRAY_BUFFER, vertices.nbytes, vertices, GL_STATIC_DRAW)
-            # link vertex attributes
-            glEnableVertexAttribArray(0)
-            glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE, 8 * vertices.itemsize, None)
-            glEnableVertexAttribArray(1)
-            glVertexAttribPointer(1, 3, GL_FLOAT, GL_FALSE, 8 * vertices.itemsize, ctypes.c_void_p(3 * vertices.itemsize))
-            glEnableVertexAttribArray(2)
-            glVertexAttribPointer(2, 2, GL_FLOAT, GL_FALSE, 8 * vertices.itemsize, ctypes.c_void_p(6 * vertices.itemsize))
-            glBindBuffer(GL_ARRAY_BUFFER, 0)
-            glBindVertexArray(0)
-        # render cube
-        glBindVertexArray(self.cubeVAO)
-        glDrawArrays(GL_TRIANGLES, 0, 36)
-        glBindVertexArray(0)
+        primitives.mesh('cube').draw()
 
     def keyPressEvent(self, event):
         if event.key() == Qt.Key_Escape:
@@ -314,6 +207,10 @@ class GLWindow(QGLWidget):
             self.camera.processKeyboard(camera.Camera_Movement.RIGHT, self.__deltaTime)
         if event.key() == Qt.Key_Space:
             self.shadows = not self.shadows
+        if event.key() == Qt.Key_P:
+            self.moveLight = not self.moveLight
+        if event.key() == Qt.Key_R:
+            self.spinCube = not self.spinCube
 
         self.updateGL()
         return super(GLWindow, self).keyPressEvent(event)
@@ -340,7 +237,17 @@ class GLWindow(QGLWidget):
         self.camera.processMouseScroll(event.delta())
         self.updateGL()
 
+def spinningCubeModel(angle):
+    model = glm.rotate(np.identity(4, np.float32), angle, 1.0, 0.0, 1.0)
+    model = glm.scale(model, 1.5, 1.5, 1.5)
+    model = glm.translate(model, -1.5, 2.0, -3.0)
+    return model
+
 def loadTexture(texPath, gammaCorrection=False):
+    textureID = texture.loadMipmappedTexture(texPath, gammaCorrection, clampAlpha=True)
+    if textureID is not None:
+        return textureID
+
     textureID = glGenTextures(1)
     im = Image.open(texPath)
     alpha = im.mode == 'RGBA'
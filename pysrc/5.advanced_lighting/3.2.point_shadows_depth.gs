@@ -3,6 +3,7 @@ layout (triangles) in;
 layout (triangle_strip, max_vertices=18) out;
 
 uniform mat4 shadowTransforms[6];
+uniform int layerBase; // first layer of this light's faces in a cubemap array
 
 out vec4 FragPos; // FragPos from GS (output per emitvertex)
 
@@ -10,7 +11,7 @@ void main()
 {
     for(int face = 0; face < 6; ++face)
     {
-        gl_Layer = face; // built-in variable that specifies to which face we render.
+        gl_Layer = layerBase + face; // built-in variable that specifies to which face we render.
         for(int i = 0; i < 3; ++i) // for each triangle's vertices
         {
             FragPos = gl_in[i].gl_Position;
@@ -1,16 +1,94 @@
 #version 330 core
-out vec4 color;
+out vec4 FragColor;
 
-float LinearizeDepth(float depth) // Note that this ranges from [0,1] instead of up to 'far plane distance' since we divide by 'far'
+in VS_OUT {
+    vec3 FragPos;
+    vec3 Normal;
+    vec2 TexCoords;
+    float ViewDepth;
+} fs_in;
+
+#define MAX_CASCADES 8
+
+uniform sampler2D diffuseTexture;
+uniform sampler2DArray shadowMap;
+
+uniform mat4 lightSpaceMatrices[MAX_CASCADES];
+uniform float cascadePlaneDistances[MAX_CASCADES]; // view depth where each cascade ends
+uniform float cascadeTexelSizes[MAX_CASCADES]; // world size of a shadow map texel in each cascade
+uniform int cascadeCount;
+
+uniform vec3 lightDir;
+uniform vec3 viewPos;
+
+uniform bool shadows;
+uniform bool showCascades;
+
+const vec3 cascadeColors[4] = vec3[](
+    vec3(1.0, 0.4, 0.4), vec3(0.4, 1.0, 0.4), vec3(0.4, 0.4, 1.0), vec3(1.0, 1.0, 0.4)
+);
+
+int CascadeIndex(float depth)
 {
-    float near = 0.1; 
-    float far = 100.0; 
-    float z = depth * 2.0 - 1.0; // Back to NDC 
-    return (2.0 * near) / (far + near - z * (far - near));	
+    // the first cascade that reaches this far, cascadeCount beyond the last one
+    for(int i = 0; i < cascadeCount; ++i)
+    {
+        if(depth < cascadePlaneDistances[i])
+            return i;
+    }
+    return cascadeCount;
+}
+
+float ShadowCalculation(int cascade, vec3 normal, vec3 lightDirection)
+{
+    if(cascade >= cascadeCount)
+        return 0.0;
+    // Move the lookup about a texel of this cascade off the surface (normal offset), more at grazing angles
+    float cosTheta = max(dot(normal, lightDirection), 0.0);
+    vec3 offsetPos = fs_in.FragPos + normal * cascadeTexelSizes[cascade] * (1.0 + 2.0 * (1.0 - cosTheta));
+    // Orthographic, w is 1; transform to [0,1] range
+    vec3 projCoords = (lightSpaceMatrices[cascade] * vec4(offsetPos, 1.0)).xyz * 0.5 + 0.5;
+    // Keep the shadow at 0.0 when outside the far_plane region of the light's frustum.
+    if(projCoords.z > 1.0)
+        return 0.0;
+    float currentDepth = projCoords.z;
+    float bias = 0.0005;
+    // PCF
+    float shadow = 0.0;
+    vec2 texelSize = 1.0 / vec2(textureSize(shadowMap, 0).xy);
+    for(int x = -1; x <= 1; ++x)
+    {
+        for(int y = -1; y <= 1; ++y)
+        {
+            float pcfDepth = texture(shadowMap, vec3(projCoords.xy + vec2(x, y) * texelSize, cascade)).r;
+            shadow += currentDepth - bias > pcfDepth ? 1.0 : 0.0;
+        }
+    }
+    return shadow / 9.0;
 }
 
 void main()
-{             
-    float depth = LinearizeDepth(gl_FragCoord.z);
-    color = vec4(vec3(depth), 1.0f);
-}
\ No newline at end of file
+{
+    vec3 color = texture(diffuseTexture, fs_in.TexCoords).rgb;
+    vec3 normal = normalize(fs_in.Normal);
+    vec3 lightColor = vec3(0.6);
+    // Ambient
+    vec3 ambient = 0.3 * color;
+    // Diffuse
+    vec3 lightDirection = normalize(-lightDir);
+    float diff = max(dot(lightDirection, normal), 0.0);
+    vec3 diffuse = diff * lightColor;
+    // Specular
+    vec3 viewDir = normalize(viewPos - fs_in.FragPos);
+    vec3 halfwayDir = normalize(lightDirection + viewDir);
+    float spec = pow(max(dot(normal, halfwayDir), 0.0), 64.0);
+    vec3 specular = spec * lightColor;
+    // Calculate shadow in the cascade this fragment's depth falls into
+    int cascade = CascadeIndex(fs_in.ViewDepth);
+    float shadow = shadows ? ShadowCalculation(cascade, normal, lightDirection) : 0.0;
+    vec3 lighting = (ambient + (1.0 - shadow) * (diffuse + specular)) * color;
+    if(showCascades && cascade < cascadeCount)
+        lighting *= cascadeColors[cascade % 4];
+
+    FragColor = vec4(lighting, 1.0f);
+}
@@ -9,6 +9,7 @@ import inspect
 from PySide.QtGui import *
 from PySide.QtCore import *
 from PySide.QtOpenGL import *
+import glconfig # PyOpenGL flags, must come before the OpenGL import
 from OpenGL.GL import *
 from OpenGL.GL import shaders
 from PIL import Image
@@ -16,6 +17,11 @@ import numpy as np
 
 import glm
 import camera
+import texture
+import primitives
+import cascades
+import shadowcache
+from glstate import state as gl
 
 currentFile = inspect.getframeinfo(inspect.currentframe()).filename
 abPath = os.path.dirname(os.path.abspath(currentFile))
@@ -41,6 +47,9 @@ class GLWindow(QGLWidget):
         self.__deltaTime = 0.0
         self.__lastTime = 0.0
 
+        self.shadows = True
+        self.showCascades = False
+
         # if you want press mouse button to active camera rotation set it to false
         self.setMouseTracking(True)
 
@@ -70,90 +79,52 @@ class GLWindow(QGLWidget):
         glEnable(GL_DEPTH_TEST)
         # glDepthFunc(GL_ALWAYS) # Set to always pass the depth test (same effect as glDisable(GL_DEPTH_TEST))
 
-        vertexShader, fragmentShader = self.loadShaders('3.3.csm.vs', '3.3.csm.frag')
-        self.__shader = shaders.compileProgram(vertexShader, fragmentShader)
-
-        cubeVertices = np.array([
-            # position         # texture coords
-            -0.5, -0.5, -0.5,  0.0, 0.0,
-             0.5, -0.5, -0.5,  1.0, 0.0,
-             0.5,  0.5, -0.5,  1.0, 1.0,
-             0.5,  0.5, -0.5,  1.0, 1.0,
-            -0.5,  0.5, -0.5,  0.0, 1.0,
-            -0.5, -0.5, -0.5,  0.0, 0.0,
-
-            -0.5, -0.5,  0.5,  0.0, 0.0,
-             0.5, -0.5,  0.5,  1.0, 0.0,
-             0.5,  0.5,  0.5,  1.0, 1.0,
-             0.5,  0.5,  0.5,  1.0, 1.0,
-            -0.5,  0.5,  0.5,  0.0, 1.0,
-            -0.5, -0.5,  0.5,  0.0, 0.0,
-
-            -0.5,  0.5,  0.5,  1.0, 0.0,
-            -0.5,  0.5, -0.5,  1.0, 1.0,
-            -0.5, -0.5, -0.5,  0.0, 1.0,
-            -0.5, -0.5, -0.5,  0.0, 1.0,
-            -0.5, -0.5,  0.5,  0.0, 0.0,
-            -0.5,  0.5,  0.5,  1.0, 0.0,
-
-             0.5,  0.5,  0.5,  1.0, 0.0,
-             0.5,  0.5, -0.5,  1.0, 1.0,
-             0.5, -0.5, -0.5,  0.0, 1.0,
-             0.5, -0.5, -0.5,  0.0, 1.0,
-             0.5, -0.5,  0.5,  0.0, 0.0,
-             0.5,  0.5,  0.5,  1.0, 0.0,
-
-            -0.5, -0.5, -0.5,  0.0, 1.0,
-             0.5, -0.5, -0.5,  1.0, 1.0,
-             0.5, -0.5,  0.5,  1.0, 0.0,
-             0.5, -0.5,  0.5,  1.0, 0.0,
-            -0.5, -0.5,  0.5,  0.0, 0.0,
-            -0.5, -0.5, -0.5,  0.0, 1.0,
-
-            -0.5,  0.5, -0.5,  0.0, 1.0,
-             0.5,  0.5, -0.5,  1.0, 1.0,
-             0.5,  0.5,  0.5,  1.0, 0.0,
-             0.5,  0.5,  0.5,  1.0, 0.0,
-            -0.5,  0.5,  0.5,  0.0, 0.0,
-            -0.5,  0.5, -0.5,  0.0, 1.0,
-        ], np.float32)
-        planeVertices = np.array([
-            # Positions          # Texture Coords (note we set these higher than 1 that together with GL_REPEAT as texture wrapping mode will cause the floor texture to repeat)
-            5.0,  -0.5,  5.0,  2.0, 0.0,
-            -5.0, -0.5,  5.0,  0.0, 0.0,
-            -5.0, -0.5, -5.0,  0.0, 2.0,
-
-            5.0,  -0.5,  5.0,  2.0, 0.0,
-            -5.0, -0.5, -5.0,  0.0, 2.0,
-            5.0,  -0.5, -5.0,  2.0, 2.0,
-        ], np.float32)
-        # setup cube vao
-        self.cubeVAO = glGenVertexArrays(1)
-        cubeVBO = glGenBuffers(1)
-        glBindVertexArray(self.cubeVAO)
-        glBindBuffer(GL_ARRAY_BUFFER, cubeVBO)
-        glBufferData(GL_ARRAY_BUFFER, cubeVertices.nbytes, cubeVertices, GL_STATIC_DRAW)
-        glEnableVertexAttribArray(0)
-        glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE, 5 * cubeVertices.itemsize, None)
-        glEnableVertexAttribArray(1)
-        glVertexAttribPointer(1, 2, GL_FLOAT, GL_FALSE, 5 * cubeVertices.itemsize, ctypes.c_void_p(3 * cubeVertices.itemsize))
-        glBindVertexArray(0)
-        # setup plane vao
-        self.planeVAO = glGenVertexArrays(1)
-        planeVBO = glGenBuffers(1)
-        glBindVertexArray(self.planeVAO)
-        glBindBuffer(GL_ARRAY_BUFFER, planeVBO)
-        glBufferData(GL_ARRAY_BUFFER, planeVertices.nbytes, planeVertices, GL_STATIC_DRAW)
-        glEnableVertexAttribArray(0)
-        glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE, 5 * planeVertices.itemsize, None)
-        glEnableVertexAttribArray(1)
-        glVertexAttribPointer(1, 2, GL_FLOAT, GL_FALSE, 5 * planeVertices.itemsize, ctypes.c_void_p(3 * planeVertices.itemsize))
-        glBindVertexArray(0)
+        _shaders = self.loadShaders('3.3.csm.vs', '3.3.csm.frag')
+        self.__shader = glCreateProgram()
+        [glAttachShader(self.__shader, s) for s in _shaders]
+        self.__shader = shaders.ShaderProgram(self.__shader)
+        glLinkProgram(self.__shader)
+        glUseProgram(self.__shader)
+        glUniform1i(glGetUniformLocation(self.__shader, 'diffuseTexture'), 0)
+        glUniform1i(glGetUniformLocation(self.__shader, 'shadowMap'), 1)
+        self.__shader.check_validate()
+        self.__shader.check_linked()
+        [glDeleteShader(s) for s in _shaders]
+        vertexShader, fragmentShader = self.loadShaders('3.3.csm_depth.vs', '3.3.csm_depth.frag')
+        self.__depthShader = shaders.compileProgram(vertexShader, fragmentShader)
+        # looked up once, renderScene sets the model matrix of some 220 casters per pass
+        self.__locations = dict((name, glGetUniformLocation(self.__shader, name))
+                                for name in ('model', 'view', 'projection', 'lightDir', 'viewPos', 'shadows', 'showCascades'))
+        self.__depthLocations = dict((name, glGetUniformLocation(self.__depthShader, name))
+                                     for name in ('model', 'lightSpaceMatrix'))
 
         # load texture
         self.cubeTexture = loadTexture(os.path.join(abPath, '..', '..', 'resources', 'textures', 'marble.jpg'))
         self.floorTexture = loadTexture(os.path.join(abPath, '..', '..', 'resources', 'textures', 'metal.png'))
 
+        # the scene: the floor, the two cubes and a field of pillars out to 35 units
+        cubeBounds = [[-0.5, -0.5, -0.5], [0.5, 0.5, 0.5]]
+        self.floor = shadowcache.Caster(np.identity(4, np.float32), [[-40.0, -0.5, -40.0], [40.0, -0.5, 40.0]], lambda shader: self.renderPlane())
+        self.cubes = [shadowcache.Caster(glm.translate(np.identity(4, np.float32), -1.0, 0.0, -1.0), cubeBounds, lambda shader: self.renderCube()),
+                      shadowcache.Caster(glm.translate(np.identity(4, np.float32), 2.0, 0.0, 0.0), cubeBounds, lambda shader: self.renderCube())]
+        rng = np.random.RandomState(3)
+        for x in np.arange(-35.0, 36.0, 5.0):
+            for z in np.arange(-35.0, 36.0, 5.0):
+                if abs(x) < 5.0 and abs(z) < 5.0:
+                    continue
+                height = rng.uniform(1.0, 6.0)
+                model = glm.scale(np.identity(4, np.float32), 1.0, height, 1.0)
+                model = glm.translate(model, x + rng.uniform(-1.5, 1.5), 0.5 * height - 0.5, z + rng.uniform(-1.5, 1.5))
+                self.cubes.append(shadowcache.Caster(model, cubeBounds, lambda shader: self.renderCube()))
+        self.casters = [self.floor] + self.cubes
+        # nothing moves, so the bounds are computed once
+        self.casterBounds = cascades.worldBounds(self.casters)
+        self.sceneBounds = np.array([[self.casterBounds[:, 0].min(axis=0), self.casterBounds[:, 1].max(axis=0)]], np.float32)
+
+        # a low sun and four cascades of 2048 x 2048 up to the far plane
+        self.lightDir = glm.normalize(np.array([-1.0, -1.5, -2.0], np.float32))
+        self.csm = cascades.CascadedShadowMap(4, 2048)
+
     def resizeGL(self, w, h):
         glViewport(0, 0, w, h)
 
@@ -162,34 +133,57 @@ class GLWindow(QGLWidget):
         self.__deltaTime = currentTime - self.__lastTime
         self.__lastTime = currentTime
 
-        # clear the colorbuffer
+        view = self.camera.viewMatrix
+        aspect = float(self.width())/self.height()
+        projection = glm.perspective(self.camera.zoom, aspect, 0.1, 100.0)
+
+        # initializeGL and Qt bind things behind the state cache's back
+        gl.invalidate()
+
+        # 1. fit the cascades to the view and render each one's casters into its layer
+        self.csm.update(view, self.camera.zoom, aspect, 0.1, 100.0, self.lightDir, self.sceneBounds)
+        visible = self.csm.cull(self.casterBounds)
+        gl.useProgram(self.__depthShader)
+        for cascade in range(self.csm.count):
+            self.csm.begin(cascade)
+            glconfig.uniformMatrix4fv(self.__depthLocations['lightSpaceMatrix'], self.csm.matrices[cascade])
+            self.renderScene(self.__depthLocations['model'], [caster for caster, drawn in zip(self.casters, visible[cascade]) if drawn])
+        glBindFramebuffer(GL_FRAMEBUFFER, 0)
+
+        # 2. render scene as normal, each fragment shadowed by the cascade its depth falls into
+        glViewport(0, 0, self.width(), self.height())
         glClearColor(0.1, 0.1, 0.1, 1.0)
         glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
-
-        # draw objects
-        glUseProgram(self.__shader)
-        view = self.camera.viewMatrix
-        projection = glm.perspective(self.camera.zoom, float(self.width())/self.height(), 0.1, 100.0)
-        glUniformMatrix4fv(glGetUniformLocation(self.__shader, 'view'), 1, GL_FALSE, view)
-        glUniformMatrix4fv(glGetUniformLocation(self.__shader, 'projection'), 1, GL_FALSE, projection)
-        # cubes
-        glBindVertexArray(self.cubeVAO)
-        glBindTexture(GL_TEXTURE_2D, self.cubeTexture)
-        model = glm.translate(np.identity(4, np.float32), -1.0, 0.0, -1.0)
-        glUniformMatrix4fv(glGetUniformLocation(self.__shader, 'model'), 1, GL_FALSE, model)
-        glDrawArrays(GL_TRIANGLES, 0, 36)
-        model = glm.translate(np.identity(4, np.float32), 2.0, 0.0, 0.0)
-        glUniformMatrix4fv(glGetUniformLocation(self.__shader, 'model'), 1, GL_FALSE, model)
-        glDrawArrays(GL_TRIANGLES, 0, 36)
-        # floor
-        glBindVertexArray(self.planeVAO)
-        glBindTexture(GL_TEXTURE_2D, self.floorTexture)
-        model = np.identity(4, np.float32)
-        glUniformMatrix4fv(glGetUniformLocation(self.__shader, 'model'), 1, GL_FALSE, model)
-        glDrawArrays(GL_TRIANGLES, 0, 6)
-        glBindVertexArray(0)
-
-        glUseProgram(0)
+        gl.useProgram(self.__shader)
+        locations = self.__locations
+        glconfig.uniformMatrix4fv(locations['view'], view)
+        glconfig.uniformMatrix4fv(locations['projection'], projection)
+        glUniform3fv(locations['lightDir'], 1, self.lightDir)
+        glUniform3fv(locations['viewPos'], 1, self.camera.position)
+        # Enable/Disable shadows by pressing 'SPACE', show the cascades with 'C'
+        glUniform1i(locations['shadows'], self.shadows)
+        glUniform1i(locations['showCascades'], self.showCascades)
+        self.csm.bind(self.__shader, 1)
+        # csm.bind() went around the state cache
+        gl.invalidate()
+        gl.activeTexture(GL_TEXTURE0)
+        gl.bindTexture(GL_TEXTURE_2D, self.floorTexture)
+        self.renderScene(locations['model'], [self.floor])
+        gl.bindTexture(GL_TEXTURE_2D, self.cubeTexture)
+        self.renderScene(locations['model'], self.cubes)
+
+        gl.useProgram(0)
+
+    def renderScene(self, modelLocation, casters):
+        for caster in casters:
+            glconfig.uniformMatrix4fv(modelLocation, caster.model)
+            caster.draw(None)
+
+    def renderCube(self):
+        primitives.mesh('cube').draw(gl)
+
+    def renderPlane(self):
+        primitives.mesh('plane', 40.0, -0.5, 20.0).draw(gl)
 
     def keyPressEvent(self, event):
         if event.key() == Qt.Key_Escape:
@@ -202,6 +196,10 @@ class GLWindow(QGLWidget):
             self.camera.processKeyboard(camera.Camera_Movement.LEFT, self.__deltaTime)
         if event.key() == Qt.Key_D:
             self.camera.processKeyboard(camera.Camera_Movement.RIGHT, self.__deltaTime)
+        if event.key() == Qt.Key_Space:
+            self.shadows = not self.shadows
+        if event.key() == Qt.Key_C:
+            self.showCascades = not self.showCascades
 
         self.updateGL()
         return super(GLWindow, self).keyPressEvent(event)
@@ -229,6 +227,10 @@ class GLWindow(QGLWidget):
         self.updateGL()
 
 def loadTexture(texPath, gammaCorrection=False):
+    textureID = texture.loadMipmappedTexture(texPath, gammaCorrection, clampAlpha=True)
+    if textureID is not None:
+        return textureID
+
     textureID = glGenTextures(1)
     im = Image.open(texPath)
     alpha = im.mode == 'RGBA'
@@ -1,8 +1,14 @@
 #version 330 core
 layout (location = 0) in vec3 position;
-layout (location = 1) in vec2 texCoords;
+layout (location = 1) in vec3 normal;
+layout (location = 2) in vec2 texCoords;
 
-out vec2 TexCoords;
+out VS_OUT {
+    vec3 FragPos;
+    vec3 Normal;
+    vec2 TexCoords;
+    float ViewDepth;
+} vs_out;
 
 uniform mat4 model;
 uniform mat4 view;
@@ -10,6 +16,10 @@ uniform mat4 projection;
 
 void main()
 {
-    gl_Position = projection * view * model * vec4(position, 1.0f);
-    TexCoords = texCoords;
-}
\ No newline at end of file
+    vec4 viewPos = view * model * vec4(position, 1.0f);
+    gl_Position = projection * viewPos;
+    vs_out.FragPos = vec3(model * vec4(position, 1.0));
+    vs_out.Normal = transpose(inverse(mat3(model))) * normal;
+    vs_out.TexCoords = texCoords;
+    vs_out.ViewDepth = -viewPos.z; // picks the cascade
+}
@@ -25,10 +25,10 @@ void main()
 {           
     vec3 normal = fs_in.Normal;
     mat3 tbn;
-    // Obtain normal from normal map in range [0,1]
-    normal = texture(normalMap, fs_in.TexCoords).rgb;
-    // Transform normal vector to range [-1,1]
-    normal = normalize(normal * 2.0 - 1.0);   
+    // Obtain normal from normal map in range [0,1] and transform it to range [-1,1].
+    // z is rebuilt from x and y so two channel (BC5) normal maps work too
+    normal.xy = texture(normalMap, fs_in.TexCoords).rg * 2.0 - 1.0;
+    normal.z = sqrt(max(1.0 - dot(normal.xy, normal.xy), 0.0));
     // Then transform normal in tangent space to world-space via TBN matrix
     // tbn = mat3(fs_in.Tangent, fs_in.Bitangent, fs_in.Normal); // TBN calculated in fragment shader
     // normal = normalize(tbn * normal); // This works!
@@ -74,9 +74,10 @@ void main()
     if(texCoords.x > 1.0 || texCoords.y > 1.0 || texCoords.x < 0.0 || texCoords.y < 0.0)
         discard;
 
-    // Obtain normal from normal map
-    vec3 normal = texture(normalMap, texCoords).rgb;
-    normal = normalize(normal * 2.0 - 1.0);   
+    // Obtain normal from normal map, z is rebuilt from x and y so two channel (BC5) normal maps work too
+    vec3 normal;
+    normal.xy = texture(normalMap, texCoords).rg * 2.0 - 1.0;
+    normal.z = sqrt(max(1.0 - dot(normal.xy, normal.xy), 0.0));
    
     // Get diffuse color
     vec3 color = texture(diffuseMap, texCoords).rgb;
@@ -9,6 +9,7 @@ import inspect
 from PySide.QtGui import *
 from PySide.QtCore import *
 from PySide.QtOpenGL import *
+import glconfig # PyOpenGL flags, must come before the OpenGL import
 from OpenGL.GL import *
 from OpenGL.GL import shaders
 from PIL import Image
@@ -16,6 +17,13 @@ import numpy as np
 
 import glm
 import camera
+import texture
+import primitives
+import exposure
+import profiler
+import rendergraph
+import rendertarget
+from glstate import state as gl
 
 currentFile = inspect.getframeinfo(inspect.currentframe()).filename
 abPath = os.path.dirname(os.path.abspath(currentFile))
@@ -41,10 +49,10 @@ class GLWindow(QGLWidget):
         self.__deltaTime = 0.0
         self.__lastTime = 0.0
 
-        self.quadVAO = 0
-        self.cubeVAO = 0
         self.hdr = True
         self.exposure = 1.0
+        # adapt exposure to the scene's average luminance (see exposure.py), or set it with Q and E
+        self.autoExposure = True
 
         # if you want press mouse button to active camera rotation set it to false
         self.setMouseTracking(True)
@@ -72,6 +80,8 @@ class GLWindow(QGLWidget):
         self.__shader = shaders.compileProgram(vertexShader, fragmentShader)
         vertexShader, fragmentShader = self.loadShaders('6.hdr.vs', '6.hdr.frag')
         self.__hdrShader = shaders.compileProgram(vertexShader, fragmentShader)
+        vertexShader, fragmentShader = self.loadShaders('6.hdr.vs', '6.luminance.frag')
+        self.__luminanceShader = shaders.compileProgram(vertexShader, fragmentShader)
 
         # light source
         self.lightPos = [np.array([0.0, 0.0, 49.5], np.float32),
@@ -87,25 +97,15 @@ class GLWindow(QGLWidget):
         # load texture
         self.woodTexture = loadTexture(os.path.join(abPath, '..', '..', 'resources', 'textures', 'wood.png'))
 
-        # Set up floating point framebuffer to render scene to
-        self.hdrFBO = glGenFramebuffers(1)
-        # Create floating point color buffer
-        self.colorBuffer = glGenTextures(1)
-        glBindTexture(GL_TEXTURE_2D, self.colorBuffer)
-        glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA16F, self.width(), self.height(), 0, GL_RGBA, GL_FLOAT, None)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
-        # create depth buffer (renderbuffer)
-        self.rboDepth = glGenRenderbuffers(1)
-        glBindRenderbuffer(GL_RENDERBUFFER, self.rboDepth)
-        glRenderbufferStorage(GL_RENDERBUFFER, GL_DEPTH_COMPONENT, self.width(), self.height())
-        # Attach buffer
-        glBindFramebuffer(GL_FRAMEBUFFER, self.hdrFBO)
-        glFramebufferTexture2D(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, GL_TEXTURE_2D, self.colorBuffer, 0)
-        glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_DEPTH_ATTACHMENT, GL_RENDERBUFFER, self.rboDepth)
-        if glCheckFramebufferStatus(GL_FRAMEBUFFER) != GL_FRAMEBUFFER_COMPLETE:
-            print 'Framebuffer not complete!'
-        glBindFramebuffer(GL_FRAMEBUFFER, 0)
+        # average scene luminance, read back a few frames later
+        self.exposureControl = exposure.AutoExposure(self.__luminanceShader)
+
+        # the passes and their targets, reallocated when the window's size changes
+        self.targets = rendertarget.Pool()
+        self.graph = rendergraph.RenderGraph(self.setupGraph, self.targets)
+
+        # per pass CPU/GPU timings, see profiler.py for how to turn them on
+        self.profiler = profiler.Profiler()
 
         glClearColor(0.1, 0.1, 0.1, 1.0)
 
@@ -116,17 +116,38 @@ class GLWindow(QGLWidget):
         currentTime = self.__timer.elapsed() / 1000.0
         self.__deltaTime = currentTime - self.__lastTime
         self.__lastTime = currentTime
+        # Qt binds things behind the state cache's back
+        gl.invalidate()
+
+        self.profiler.beginFrame()
+        # set up again when a toggle changes what it declares
+        self.graph.execute(self.width(), self.height(), self.profiler, (self.autoExposure,))
+        self.targets.endFrame()
+        self.profiler.endFrame(self.__deltaTime)
 
+        gl.useProgram(0)
+
+        print('exposure: {}'.format(self.exposure))
+
+    def setupGraph(self, graph, width, height):
         # 1. Render scene into floating point framebuffer
-        glBindFramebuffer(GL_FRAMEBUFFER, self.hdrFBO)
-        glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+        graph.addPass('scene', self.drawScene, outputs=[('hdr', rendergraph.Target(GL_RGBA16F)),
+                                                        ('depth', rendergraph.Target(GL_DEPTH_COMPONENT24, filter=GL_NEAREST))],
+                      clear=GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+        # adapt the exposure to what the scene looked like a few frames ago
+        if self.autoExposure:
+            graph.addPass('exposure', self.measureExposure, inputs=['hdr'], keep=True)
+        # 2. Now render floating point color buffer to 2D quad and tonemap HDR colors to default framebuffer's (clamped) color range
+        graph.addPass('tonemap', self.drawTonemap, inputs=['hdr'], clear=GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+
+    def drawScene(self):
         projection = glm.perspective(self.camera.zoom, float(self.width())/self.height(), 0.1, 100.0)
         view = self.camera.viewMatrix
-        glUseProgram(self.__shader)
+        gl.useProgram(self.__shader)
         glUniformMatrix4fv(glGetUniformLocation(self.__shader, 'projection'), 1, GL_FALSE, projection)
         glUniformMatrix4fv(glGetUniformLocation(self.__shader, 'view'), 1, GL_FALSE, view)
-        glActiveTexture(GL_TEXTURE0)
-        glBindTexture(GL_TEXTURE_2D, self.woodTexture)
+        gl.activeTexture(GL_TEXTURE0)
+        gl.bindTexture(GL_TEXTURE_2D, self.woodTexture)
         # set lighting uniforms
         for i in range(len(self.lightPos)):
             glUniform3fv(glGetUniformLocation(self.__shader, 'lights[{}].Position'.format(i)), 1, self.lightPos[i])
@@ -138,21 +159,19 @@ class GLWindow(QGLWidget):
         glUniformMatrix4fv(glGetUniformLocation(self.__shader, 'model'), 1, GL_FALSE, model)
         glUniform1i(glGetUniformLocation(self.__shader, 'inverse_normals'), GL_TRUE)
         self.renderCube()
-        glBindFramebuffer(GL_FRAMEBUFFER, 0)
 
-        # 2. Now render floating point color buffer to 2D quad and tonemap HDR colors to default framebuffer's (clamped) color range
-        glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
-        glUseProgram(self.__hdrShader)
-        glActiveTexture(GL_TEXTURE0)
-        glBindTexture(GL_TEXTURE_2D, self.colorBuffer)
+    def measureExposure(self):
+        self.exposureControl.measure(self.graph.texture('hdr'), self.width(), self.height())
+        self.exposure = self.exposureControl.update(self.exposure, self.__deltaTime)
+
+    def drawTonemap(self):
+        gl.useProgram(self.__hdrShader)
+        gl.activeTexture(GL_TEXTURE0)
+        gl.bindTexture(GL_TEXTURE_2D, self.graph.texture('hdr'))
         glUniform1i(glGetUniformLocation(self.__hdrShader, 'hdr'), self.hdr)
         glUniform1f(glGetUniformLocation(self.__hdrShader, 'exposure'), self.exposure)
         self.renderQuad()
 
-        glUseProgram(0)
-
-        print 'exposure: {}'.format(self.exposure)
-
     def renderScene(self, shader):
         # Room cube
         model = np.identity(4, np.float32)
@@ -183,97 +202,10 @@ class GLWindow(QGLWidget):
         self.renderCube()
 
     def renderQuad(self):
-        if self.quadVAO == 0:
-            quadVertices = np.array([
-                # positions       # texture coords
-                -1.0,  1.0, 0.0,  0.0, 1.0,
-                -1.0, -1.0, 0.0,  0.0, 0.0,
-                 1.0,  1.0, 0.0,  1.0, 1.0,
-                 1.0, -1.0, 0.0,  1.0, 0.0,
-            ], np.float32)
-
-            # setup plane VAO
-            self.quadVAO = glGenVertexArrays(1)
-            quadVBO = glGenBuffers(1)
-            glBindVertexArray(self.quadVAO)
-            glBindBuffer(GL_ARRAY_BUFFER, quadVBO)
-            glBufferData(GL_ARRAY_BUFFER, quadVertices.nbytes, quadVertices, GL_STATIC_DRAW)
-            glEnableVertexAttribArray(0)
-            glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE, 5 * quadVertices.itemsize, None)
-            glEnableVertexAttribArray(1)
-            glVertexAttribPointer(1, 2, GL_FLOAT, GL_FALSE, 5 * quadVertices.itemsize, ctypes.c_void_p(3 * quadVertices.itemsize))
-
-        glBindVertexArray(self.quadVAO)
-        glDrawArrays(GL_TRIANGLE_STRIP, 0, 4)
-        glBindVertexArray(0)
+        primitives.mesh('quad').draw()
 
     def renderCube(self):
-        # initilize (if necessary)
-        if self.cubeVAO == 0:
-            vertices = np.array([
-                # Back face
-                -0.5, -0.5, -0.5, 0.0, 0.0, -1.0, 0.0, 0.0, # Bottom-left
-                0.5, 0.5, -0.5, 0.0, 0.0, -1.0, 1.0, 1.0, # top-right
-                0.5, -0.5, -0.5, 0.0, 0.0, -1.0, 1.0, 0.0, # bottom-right
-                0.5, 0.5, -0.5, 0.0, 0.0, -1.0, 1.0, 1.0,  # top-right
-                -0.5, -0.5, -0.5, 0.0, 0.0, -1.0, 0.0, 0.0,  # bottom-left
-                -0.5, 0.5, -0.5, 0.0, 0.0, -1.0, 0.0, 1.0,# top-left
-                # Front face
-                -0.5, -0.5, 0.5, 0.0, 0.0, 1.0, 0.0, 0.0, # bottom-left
-                0.5, -0.5, 0.5, 0.0, 0.0, 1.0, 1.0, 0.0,  # bottom-right
-                0.5, 0.5, 0.5, 0.0, 0.0, 1.0, 1.0, 1.0,  # top-right
-                0.5, 0.5, 0.5, 0.0, 0.0, 1.0, 1.0, 1.0, # top-right
-                -0.5, 0.5, 0.5, 0.0, 0.0, 1.0, 0.0, 1.0,  # top-left
-                -0.5, -0.5, 0.5, 0.0, 0.0, 1.0, 0.0, 0.0,  # bottom-left
-                # Left face
-                -0.5, 0.5, 0.5, -1.0, 0.0, 0.0, 1.0, 0.0, # top-right
-                -0.5, 0.5, -0.5, -1.0, 0.0, 0.0, 1.0, 1.0, # top-left
-                -0.5, -0.5, -0.5, -1.0, 0.0, 0.0, 0.0, 1.0,  # bottom-left
-                -0.5, -0.5, -0.5, -1.0, 0.0, 0.0, 0.0, 1.0, # bottom-left
-                -0.5, -0.5, 0.5, -1.0, 0.0, 0.0, 0.0, 0.0,  # bottom-right
-                -0.5, 0.5, 0.5, -1.0, 0.0, 0.0, 1.0, 0.0, # top-right
-                # Right face
-                0.5, 0.5, 0.5, 1.0, 0.0, 0.0, 1.0, 0.0, # top-left
-                0.5, -0.5, -0.5, 1.0, 0.0, 0.0, 0.0, 1.0, # bottom-right
-                0.5, 0.5, -0.5, 1.0, 0.0, 0.0, 1.0, 1.0, # top-right
-                0.5, -0.5, -0.5, 1.0, 0.0, 0.0, 0.0, 1.0,  # bottom-right
-                0.5, 0.5, 0.5, 1.0, 0.0, 0.0, 1.0, 0.0,  # top-left
-                0.5, -0.5, 0.5, 1.0, 0.0, 0.0, 0.0, 0.0, # bottom-left
-                # Bottom face
-                -0.5, -0.5, -0.5, 0.0, -1.0, 0.0, 0.0, 1.0, # top-right
-                0.5, -0.5, -0.5, 0.0, -1.0, 0.0, 1.0, 1.0, # top-left
-                0.5, -0.5, 0.5, 0.0, -1.0, 0.0, 1.0, 0.0,# bottom-left
-                0.5, -0.5, 0.5, 0.0, -1.0, 0.0, 1.0, 0.0, # bottom-left
-                -0.5, -0.5, 0.5, 0.0, -1.0, 0.0, 0.0, 0.0, # bottom-right
-                -0.5, -0.5, -0.5, 0.0, -1.0, 0.0, 0.0, 1.0, # top-right
-                # Top face
-                -0.5, 0.5, -0.5, 0.0, 1.0, 0.0, 0.0, 1.0,# top-left
-                0.5, 0.5, 0.5, 0.0, 1.0, 0.0, 1.0, 0.0, # bottom-right
-                0.5, 0.5, -0.5, 0.0, 1.0, 0.0, 1.0, 1.0, # top-right
-                0.5, 0.5, 0.5, 0.0, 1.0, 0.0, 1.0, 0.0, # bottom-right
-                -0.5, 0.5, -0.5, 0.0, 1.0, 0.0, 0.0, 1.0,# top-left
-                -0.5, 0.5, 0.5, 0.0, 1.0, 0.0, 0.0, 0.0, # bottom-left
-            ], np.float32)
-
-            self.cubeVAO = glGenVertexArrays(1)
-            cubeVBO = glGenBuffers(1)
-            glBindVertexArray(self.cubeVAO)
-            # fill buffer
-            glBindBuffer(GL_ARRAY_BUFFER, cubeVBO)
-            glBufferData(GL_ARRAY_BUFFER, vertices.nbytes, vertices, GL_STATIC_DRAW)
-            # link vertex attributes
-            glEnableVertexAttribArray(0)
-            glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE, 8 * vertices.itemsize, None)
-            glEnableVertexAttribArray(1)
-            glVertexAttribPointer(1, 3, GL_FLOAT, GL_FALSE, 8 * vertices.itemsize, ctypes.c_void_p(3 * vertices.itemsize))
-            glEnableVertexAttribArray(2)
-            glVertexAttribPointer(2, 2, GL_FLOAT, GL_FALSE, 8 * vertices.itemsize, ctypes.c_void_p(6 * vertices.itemsize))
-            glBindBuffer(GL_ARRAY_BUFFER, 0)
-            glBindVertexArray(0)
-        # render cube
-        glBindVertexArray(self.cubeVAO)
-        glDrawArrays(GL_TRIANGLES, 0, 36)
-        glBindVertexArray(0)
+        primitives.mesh('cube').draw()
 
     def keyPressEvent(self, event):
         if event.key() == Qt.Key_Escape:
@@ -288,10 +220,19 @@ class GLWindow(QGLWidget):
             self.camera.processKeyboard(camera.Camera_Movement.RIGHT, self.__deltaTime)
         if event.key() == Qt.Key_Space:
             self.hdr = not self.hdr
+        if event.key() == Qt.Key_X:
+            self.autoExposure = not self.autoExposure
+        # with auto exposure, aim brighter or darker
         if event.key() == Qt.Key_Q:
-            self.exposure -= 0.5 * self.__deltaTime
+            if self.autoExposure:
+                self.exposureControl.key *= 2.0 ** -self.__deltaTime
+            else:
+                self.exposure -= 0.5 * self.__deltaTime
         if event.key() == Qt.Key_E:
-            self.exposure += 0.5 * self.__deltaTime
+            if self.autoExposure:
+                self.exposureControl.key *= 2.0 ** self.__deltaTime
+            else:
+                self.exposure += 0.5 * self.__deltaTime
 
         self.updateGL()
         return super(GLWindow, self).keyPressEvent(event)
@@ -319,6 +260,10 @@ class GLWindow(QGLWidget):
         self.updateGL()
 
 def loadTexture(texPath, gammaCorrection=False):
+    textureID = texture.loadMipmappedTexture(texPath, gammaCorrection, clampAlpha=True)
+    if textureID is not None:
+        return textureID
+
     textureID = glGenTextures(1)
     im = Image.open(texPath)
     alpha = im.mode == 'RGBA'
@@ -0,0 +1,13 @@
+#version 330 core
+out float logLuminance;
+in vec2 TexCoords;
+
+uniform sampler2D hdrBuffer;
+
+void main()
+{
+    vec3 hdrColor = texture(hdrBuffer, TexCoords).rgb;
+    // Rec. 709 luminance, its log averaged by the mipmaps (see exposure.py)
+    float luminance = dot(hdrColor, vec3(0.2126, 0.7152, 0.0722));
+    logLuminance = log(max(luminance, 1e-4));
+}
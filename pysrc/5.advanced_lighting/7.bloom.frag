@@ -11,11 +11,23 @@ in VS_OUT {
 struct Light {
     vec3 Position;
     vec3 Color;
+    // unused here, the block is laid out like the deferred shading one
+    float Linear;
+    float Quadratic;
+    float Radius;
 };
 
-uniform Light lights[4];
+layout (std140) uniform Lights
+{
+    Light lights[4];
+};
+layout (std140) uniform Camera
+{
+    mat4 projection;
+    mat4 view;
+    vec3 viewPos;
+};
 uniform sampler2D diffuseTexture;
-uniform vec3 viewPos;
 
 void main()
 {           
@@ -9,6 +9,7 @@ import inspect
 from PySide.QtGui import *
 from PySide.QtCore import *
 from PySide.QtOpenGL import *
+import glconfig # PyOpenGL flags, must come before the OpenGL import
 from OpenGL.GL import *
 from OpenGL.GL import shaders
 from PIL import Image
@@ -16,6 +17,15 @@ import numpy as np
 
 import glm
 import camera
+import texture
+import primitives
+import bloom
+import rendergraph
+import rendertarget
+import profiler
+import exposure
+import uniformbuffer
+from glstate import state as gl
 
 currentFile = inspect.getframeinfo(inspect.currentframe()).filename
 abPath = os.path.dirname(os.path.abspath(currentFile))
@@ -41,10 +51,12 @@ class GLWindow(QGLWidget):
         self.__deltaTime = 0.0
         self.__lastTime = 0.0
 
-        self.quadVAO = 0
-        self.cubeVAO = 0
         self.bloom = True
+        # blur down and up a chain of smaller targets, or ping-pong at full resolution
+        self.mipBloom = True
         self.exposure = 1.0
+        # adapt exposure to the scene's average luminance (see exposure.py), or set it with Q and E
+        self.autoExposure = True
 
         # if you want press mouse button to active camera rotation set it to false
         self.setMouseTracking(True)
@@ -74,6 +86,13 @@ class GLWindow(QGLWidget):
         self.__lightShader = shaders.compileProgram(vertexShader, fragmentShader)
         vertexShader, fragmentShader = self.loadShaders('7.blur.vs', '7.blur.frag')
         self.__blurShader = shaders.compileProgram(vertexShader, fragmentShader)
+        self.__horizontalLocation = glGetUniformLocation(self.__blurShader, 'horizontal')
+        vertexShader, fragmentShader = self.loadShaders('7.blur.vs', '7.bloom_downsample.frag')
+        self.__downsampleShader = shaders.compileProgram(vertexShader, fragmentShader)
+        vertexShader, fragmentShader = self.loadShaders('7.blur.vs', '7.bloom_upsample.frag')
+        self.__upsampleShader = shaders.compileProgram(vertexShader, fragmentShader)
+        vertexShader, fragmentShader = self.loadShaders('7.bloom_final.vs', '6.luminance.frag')
+        self.__luminanceShader = shaders.compileProgram(vertexShader, fragmentShader)
         _shaders = self.loadShaders('7.bloom_final.vs', '7.bloom_final.frag')
         self.__bloomFinalShader = glCreateProgram()
         [glAttachShader(self.__bloomFinalShader, s) for s in _shaders if s]
@@ -97,52 +116,33 @@ class GLWindow(QGLWidget):
                             np.array([0.0, 0.0, 15.0], np.float32),
                             np.array([0.0, 1.5, 0.0], np.float32),]
 
+        # camera matrices and lights reach the shaders through uniform blocks
+        self.cameraBlock = uniformbuffer.UniformBuffer('Camera', uniformbuffer.CAMERA, uniformbuffer.CAMERA_BINDING)
+        self.cameraBlock.attach(self.__shader, self.__lightShader)
+        self.lightsBlock = uniformbuffer.UniformBuffer('Lights', uniformbuffer.lightsBlock(len(self.lightPos)),
+                                                       uniformbuffer.LIGHTS_BINDING, GL_STATIC_DRAW)
+        self.lightsBlock.attach(self.__shader)
+        lights = self.lightsBlock['lights']
+        lights['Position'] = self.lightPos
+        lights['Color'] = self.lightColors
+        self.lightsBlock.upload()
+
         # load texture
         self.woodTexture = loadTexture(os.path.join(abPath, '..', '..', 'resources', 'textures', 'wood.png'))
         self.containerTexture = loadTexture(os.path.join(abPath, '..', '..', 'resources', 'textures', 'container2.png'))
 
-        # Set up floating point framebuffer to render scene to
-        self.bloomFBO = glGenFramebuffers(1)
-        glBindFramebuffer(GL_FRAMEBUFFER, self.bloomFBO)
-        # Create floating point color buffer
-        self.colorBuffers = glGenTextures(2)
-        for i in range(len(self.colorBuffers)):
-            glBindTexture(GL_TEXTURE_2D, self.colorBuffers[i])
-            glTexImage2D(GL_TEXTURE_2D, 0, GL_RGB16F, self.width(), self.height(), 0, GL_RGB, GL_FLOAT, None)
-            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
-            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
-            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_EDGE)
-            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_EDGE)
-            # attach texture to framebuffer
-            glFramebufferTexture2D(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0 + i, GL_TEXTURE_2D, self.colorBuffers[i], 0)
-        # create depth buffer (renderbuffer)
-        self.rboDepth = glGenRenderbuffers(1)
-        glBindRenderbuffer(GL_RENDERBUFFER, self.rboDepth)
-        glRenderbufferStorage(GL_RENDERBUFFER, GL_DEPTH_COMPONENT, self.width(), self.height())
-        glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_DEPTH_ATTACHMENT, GL_RENDERBUFFER, self.rboDepth)
-        # Tell OpenGL which color attachments we'll use (of this framebuffer) for rendering
-        attachments = [GL_COLOR_ATTACHMENT0, GL_COLOR_ATTACHMENT1]
-        glDrawBuffers(2, attachments)
-        if glCheckFramebufferStatus(GL_FRAMEBUFFER) != GL_FRAMEBUFFER_COMPLETE:
-            print 'Framebuffer not complete!'
-        glBindFramebuffer(GL_FRAMEBUFFER, 0)
-
-        # Ping pong framebuffer for blurring
-        self.pingpongFBO = glGenFramebuffers(2)
-        self.pingpongColorbuffers = glGenTextures(2)
-        for i in range(len(self.pingpongFBO)):
-            glBindFramebuffer(GL_FRAMEBUFFER, self.pingpongFBO[i])
-            glBindTexture(GL_TEXTURE_2D, self.pingpongColorbuffers[i])
-            glTexImage2D(GL_TEXTURE_2D, 0, GL_RGB16F, self.width(), self.height(), 0, GL_RGB, GL_FLOAT, None)
-            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
-            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
-            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_EDGE)
-            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_EDGE)
-            glFramebufferTexture2D(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, GL_TEXTURE_2D, self.pingpongColorbuffers[i], 0)
-            # also check if framebuffer are complete (no need for depth buffer)
-            if glCheckFramebufferStatus(GL_FRAMEBUFFER) != GL_FRAMEBUFFER_COMPLETE:
-                print 'Framebuffer not complete!'
-        glBindFramebuffer(GL_FRAMEBUFFER, 0)
+        # blurs down and up a chain of half, quarter, ... size targets
+        self.bloomChain = bloom.BloomChain(self.__downsampleShader, self.__upsampleShader)
+
+        # average scene luminance, read back a few frames later
+        self.exposureControl = exposure.AutoExposure(self.__luminanceShader)
+
+        # the passes and their targets, reallocated when the window's size changes
+        self.targets = rendertarget.Pool()
+        self.graph = rendergraph.RenderGraph(self.setupGraph, self.targets)
+
+        # per pass CPU/GPU timings, see profiler.py for how to turn them on
+        self.profiler = profiler.Profiler()
 
         glClearColor(0.1, 0.1, 0.1, 1.0)
 
@@ -153,29 +153,61 @@ class GLWindow(QGLWidget):
         currentTime = self.__timer.elapsed() / 1000.0
         self.__deltaTime = currentTime - self.__lastTime
         self.__lastTime = currentTime
-
-        # 1. Render scene into floating point framebuffer
-        glBindFramebuffer(GL_FRAMEBUFFER, self.bloomFBO)
-        glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
-        projection = glm.perspective(self.camera.zoom, float(self.width())/self.height(), 0.1, 100.0)
-        view = self.camera.viewMatrix
-        glUseProgram(self.__shader)
-        glUniformMatrix4fv(glGetUniformLocation(self.__shader, 'projection'), 1, GL_FALSE, projection)
-        glUniformMatrix4fv(glGetUniformLocation(self.__shader, 'view'), 1, GL_FALSE, view)
-        glActiveTexture(GL_TEXTURE0)
-        glBindTexture(GL_TEXTURE_2D, self.woodTexture)
-        # set lighting uniforms
-        for i in range(len(self.lightPos)):
-            glUniform3fv(glGetUniformLocation(self.__shader, 'lights[{}].Position'.format(i)), 1, self.lightPos[i])
-            glUniform3fv(glGetUniformLocation(self.__shader, 'lights[{}].Color'.format(i)), 1, self.lightColors[i])
-        glUniform3fv(glGetUniformLocation(self.__shader, 'viewPos'), 1, self.camera.position)
+        self.profiler.beginFrame()
+        # initializeGL and Qt bind things behind the state cache's back
+        gl.invalidate()
+
+        # set up again when a toggle changes what it declares
+        self.graph.execute(self.width(), self.height(), self.profiler, (self.bloom, self.mipBloom, self.autoExposure))
+
+        gl.useProgram(0)
+        self.targets.endFrame()
+        self.profiler.endFrame(self.__deltaTime)
+
+        print('exposure: {}'.format(self.exposure))
+
+    def setupGraph(self, graph, width, height):
+        # 1. Render scene into floating point framebuffer, bright fragments into the second color buffer
+        graph.addPass('scene', self.drawScene, outputs=[('hdr', rendergraph.Target(GL_RGB16F)),
+                                                        ('bright', rendergraph.Target(GL_RGB16F)),
+                                                        ('depth', rendergraph.Target(GL_DEPTH_COMPONENT24, filter=GL_NEAREST))],
+                      clear=GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+        # 2. Blur bright fragments: down and up the bloom chain, or w/ two-pass Gaussian Blur
+        if self.mipBloom:
+            self.bloomTexture = self.bloomChain.addPasses(graph, 'bright', width, height)
+            self.bloomScale = self.bloomChain.scale
+        else:
+            amount = 10
+            for i in range(amount):
+                source = 'bright' if i == 0 else 'blur {}'.format(i - 1)
+                graph.addPass('blur {}'.format(i), self.blurPass(graph, source, i % 2 == 0), inputs=[source],
+                              outputs=[('blur {}'.format(i), rendergraph.Target(GL_RGB16F))], section='blur')
+            self.bloomTexture = 'blur {}'.format(amount - 1)
+            self.bloomScale = 1.0
+        # adapt the exposure to what the scene looked like a few frames ago
+        if self.autoExposure:
+            graph.addPass('exposure', self.measureExposure, inputs=['hdr'], keep=True)
+        # 3. Now render floating point color buffer to 2D quad and tonemap HDR colors to default framebuffer's (clamped) color range;
+        # with bloom off nothing reads the blur, which is culled
+        graph.addPass('composite', self.drawComposite, inputs=['hdr'] + ([self.bloomTexture] if self.bloom else []),
+                      clear=GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+
+    def drawScene(self):
+        # one upload serves both programs
+        self.cameraBlock['projection'] = glm.perspective(self.camera.zoom, float(self.width())/self.height(), 0.1, 100.0)
+        self.cameraBlock['view'] = self.camera.viewMatrix
+        self.cameraBlock['viewPos'] = self.camera.position
+        self.cameraBlock.upload()
+        gl.useProgram(self.__shader)
+        gl.activeTexture(GL_TEXTURE0)
+        gl.bindTexture(GL_TEXTURE_2D, self.woodTexture)
         # create one large cube that acts as the floor
         model = glm.scale(np.identity(4, np.float32), 25.0, 1.0, 25.0)
         model = glm.translate(model, 0.0, -1.0, 0.0)
         glUniformMatrix4fv(glGetUniformLocation(self.__shader, 'model'), 1, GL_FALSE, model)
         self.renderCube()
         # then create multiple cubes as the scenery
-        glBindTexture(GL_TEXTURE_2D, self.containerTexture)
+        gl.bindTexture(GL_TEXTURE_2D, self.containerTexture)
         model = glm.translate(np.identity(4, np.float32), 0.0, 1.5, 0.0)
         glUniformMatrix4fv(glGetUniformLocation(self.__shader, 'model'), 1, GL_FALSE, model)
         self.renderCube()
@@ -202,56 +234,48 @@ class GLWindow(QGLWidget):
         glUniformMatrix4fv(glGetUniformLocation(self.__shader, 'model'), 1, GL_FALSE, model)
         self.renderCube()
         # finally show all the light sources as bright cubes
-        glUseProgram(self.__lightShader)
-        glUniformMatrix4fv(glGetUniformLocation(self.__lightShader, 'projection'), 1, GL_FALSE, projection)
-        glUniformMatrix4fv(glGetUniformLocation(self.__lightShader, 'view'), 1, GL_FALSE, view)
+        gl.useProgram(self.__lightShader)
         for i in range(len(self.lightPos)):
             model = glm.scale(np.identity(4, np.float32), 0.5, 0.5, 0.5)
             model = glm.translate(model, self.lightPos[i][0], self.lightPos[i][1], self.lightPos[i][2])
             glUniformMatrix4fv(glGetUniformLocation(self.__lightShader, 'model'), 1, GL_FALSE, self.lightPos[i])
             glUniform3fv(glGetUniformLocation(self.__lightShader, 'lightColor'), 1, self.lightColors[i])
             self.renderCube()
-        glBindFramebuffer(GL_FRAMEBUFFER, 0)
-
-        # 2. Blur bright fragments w/ two-pass Gaussian Blur
-        horizontal = True
-        first_iteration = True
-        amount = 10
-        glUseProgram(self.__blurShader)
-        for i in range(amount):
-            glBindFramebuffer(GL_FRAMEBUFFER, self.pingpongFBO[int(horizontal)])
-            glUniform1i(glGetUniformLocation(self.__blurShader, 'horizontal'), horizontal)
-            glBindTexture(GL_TEXTURE_2D, self.colorBuffers[1] if first_iteration else self.pingpongColorbuffers[int(not horizontal)])
-            self.renderQuad()
-            horizontal = not horizontal
-            if first_iteration: first_iteration = False
-        glBindFramebuffer(GL_FRAMEBUFFER, 0)
 
-        # 2. Now render floating point color buffer to 2D quad and tonemap HDR colors to default framebuffer's (clamped) color range
-        glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
-        glUseProgram(self.__bloomFinalShader)
-        glActiveTexture(GL_TEXTURE0)
-        glBindTexture(GL_TEXTURE_2D, self.colorBuffers[0])
-        # glBindTexture(GL_TEXTURE_2D, self.pingpongColorbuffers[int(not horizontal)])
-        glActiveTexture(GL_TEXTURE1)
-        glBindTexture(GL_TEXTURE_2D, self.pingpongColorbuffers[int(not horizontal)])
+    def blurPass(self, graph, source, horizontal):
+        def draw():
+            gl.useProgram(self.__blurShader)
+            gl.activeTexture(GL_TEXTURE0)
+            glUniform1i(self.__horizontalLocation, horizontal)
+            gl.bindTexture(GL_TEXTURE_2D, graph.texture(source))
+            self.renderQuad()
+        return draw
+
+    def measureExposure(self):
+        self.exposureControl.measure(self.graph.texture('hdr'), self.width(), self.height())
+        self.exposure = self.exposureControl.update(self.exposure, self.__deltaTime)
+
+    def drawComposite(self):
+        gl.useProgram(self.__bloomFinalShader)
+        gl.activeTexture(GL_TEXTURE0)
+        gl.bindTexture(GL_TEXTURE_2D, self.graph.texture('hdr'))
+        if self.bloom:
+            gl.activeTexture(GL_TEXTURE1)
+            gl.bindTexture(GL_TEXTURE_2D, self.graph.texture(self.bloomTexture))
         glUniform1i(glGetUniformLocation(self.__bloomFinalShader, 'bloom'), self.bloom)
+        glUniform1f(glGetUniformLocation(self.__bloomFinalShader, 'bloomScale'), self.bloomScale)
         glUniform1f(glGetUniformLocation(self.__bloomFinalShader, 'exposure'), self.exposure)
         self.renderQuad()
 
-        glUseProgram(0)
-
-        print 'exposure: {}'.format(self.exposure)
-
     def renderScene(self, shader):
         # Room cube
         model = np.identity(4, np.float32)
         model = glm.scale(model, 10.0, 10.0, 10.0)
         glUniformMatrix4fv(glGetUniformLocation(shader, 'model'), 1, GL_FALSE, model)
-        glDisable(GL_CULL_FACE) # Note that we disable culling here since we render 'inside' the cube instead of the usual 'outside' which throws off the normal culling methods.
+        gl.disable(GL_CULL_FACE) # Note that we disable culling here since we render 'inside' the cube instead of the usual 'outside' which throws off the normal culling methods.
         glUniform1i(glGetUniformLocation(shader, 'reverse_normals'), 1) #A small little hack to invert normals when drawing cube from the inside so lighting still works.
         self.renderCube()
-        glEnable(GL_CULL_FACE)
+        gl.enable(GL_CULL_FACE)
         # Cubes
         model = np.identity(4, np.float32)
         model = glm.translate(model, 4.0, -3.5, 0.0)
@@ -273,97 +297,10 @@ class GLWindow(QGLWidget):
         self.renderCube()
 
     def renderQuad(self):
-        if self.quadVAO == 0:
-            quadVertices = np.array([
-                # positions       # texture coords
-                -1.0,  1.0, 0.0,  0.0, 1.0,
-                -1.0, -1.0, 0.0,  0.0, 0.0,
-                 1.0,  1.0, 0.0,  1.0, 1.0,
-                 1.0, -1.0, 0.0,  1.0, 0.0,
-            ], np.float32)
-
-            # setup plane VAO
-            self.quadVAO = glGenVertexArrays(1)
-            quadVBO = glGenBuffers(1)
-            glBindVertexArray(self.quadVAO)
-            glBindBuffer(GL_ARRAY_BUFFER, quadVBO)
-            glBufferData(GL_ARRAY_BUFFER, quadVertices.nbytes, quadVertices, GL_STATIC_DRAW)
-            glEnableVertexAttribArray(0)
-            glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE, 5 * quadVertices.itemsize, None)
-            glEnableVertexAttribArray(1)
-            glVertexAttribPointer(1, 2, GL_FLOAT, GL_FALSE, 5 * quadVertices.itemsize, ctypes.c_void_p(3 * quadVertices.itemsize))
-
-        glBindVertexArray(self.quadVAO)
-        glDrawArrays(GL_TRIANGLE_STRIP, 0, 4)
-        glBindVertexArray(0)
+        primitives.mesh('quad').draw(gl)
 
     def renderCube(self):
-        # initilize (if necessary)
-        if self.cubeVAO == 0:
-            vertices = np.array([
-                # Back face
-                -0.5, -0.5, -0.5, 0.0, 0.0, -1.0, 0.0, 0.0, # Bottom-left
-                0.5, 0.5, -0.5, 0.0, 0.0, -1.0, 1.0, 1.0, # top-right
-                0.5, -0.5, -0.5, 0.0, 0.0, -1.0, 1.0, 0.0, # bottom-right
-                0.5, 0.5, -0.5, 0.0, 0.0, -1.0, 1.0, 1.0,  # top-right
-                -0.5, -0.5, -0.5, 0.0, 0.0, -1.0, 0.0, 0.0,  # bottom-left
-                -0.5, 0.5, -0.5, 0.0, 0.0, -1.0, 0.0, 1.0,# top-left
-                # Front face
-                -0.5, -0.5, 0.5, 0.0, 0.0, 1.0, 0.0, 0.0, # bottom-left
-                0.5, -0.5, 0.5, 0.0, 0.0, 1.0, 1.0, 0.0,  # bottom-right
-                0.5, 0.5, 0.5, 0.0, 0.0, 1.0, 1.0, 1.0,  # top-right
-                0.5, 0.5, 0.5, 0.0, 0.0, 1.0, 1.0, 1.0, # top-right
-                -0.5, 0.5, 0.5, 0.0, 0.0, 1.0, 0.0, 1.0,  # top-left
-                -0.5, -0.5, 0.5, 0.0, 0.0, 1.0, 0.0, 0.0,  # bottom-left
-                # Left face
-                -0.5, 0.5, 0.5, -1.0, 0.0, 0.0, 1.0, 0.0, # top-right
-                -0.5, 0.5, -0.5, -1.0, 0.0, 0.0, 1.0, 1.0, # top-left
-                -0.5, -0.5, -0.5, -1.0, 0.0, 0.0, 0.0, 1.0,  # bottom-left
-                -0.5, -0.5, -0.5, -1.0, 0.0, 0.0, 0.0, 1.0, # bottom-left
-                -0.5, -0.5, 0.5, -1.0, 0.0, 0.0, 0.0, 0.0,  # bottom-right
-                -0.5, 0.5, 0.5, -1.0, 0.0, 0.0, 1.0, 0.0, # top-right
-                # Right face
-                0.5, 0.5, 0.5, 1.0, 0.0, 0.0, 1.0, 0.0, # top-left
-                0.5, -0.5, -0.5, 1.0, 0.0, 0.0, 0.0, 1.0, # bottom-right
-                0.5, 0.5, -0.5, 1.0, 0.0, 0.0, 1.0, 1.0, # top-right
-                0.5, -0.5, -0.5, 1.0, 0.0, 0.0, 0.0, 1.0,  # bottom-right
-                0.5, 0.5, 0.5, 1.0, 0.0, 0.0, 1.0, 0.0,  # top-left
-                0.5, -0.5, 0.5, 1.0, 0.0, 0.0, 0.0, 0.0, # bottom-left
-                # Bottom face
-                -0.5, -0.5, -0.5, 0.0, -1.0, 0.0, 0.0, 1.0, # top-right
-                0.5, -0.5, -0.5, 0.0, -1.0, 0.0, 1.0, 1.0, # top-left
-                0.5, -0.5, 0.5, 0.0, -1.0, 0.0, 1.0, 0.0,# bottom-left
-                0.5, -0.5, 0.5, 0.0, -1.0, 0.0, 1.0, 0.0, # bottom-left
-                -0.5, -0.5, 0.5, 0.0, -1.0, 0.0, 0.0, 0.0, # bottom-right
-                -0.5, -0.5, -0.5, 0.0, -1.0, 0.0, 0.0, 1.0, # top-right
-                # Top face
-                -0.5, 0.5, -0.5, 0.0, 1.0, 0.0, 0.0, 1.0,# top-left
-                0.5, 0.5, 0.5, 0.0, 1.0, 0.0, 1.0, 0.0, # bottom-right
-                0.5, 0.5, -0.5, 0.0, 1.0, 0.0, 1.0, 1.0, # top-right
-                0.5, 0.5, 0.5, 0.0, 1.0, 0.0, 1.0, 0.0, # bottom-right
-                -0.5, 0.5, -0.5, 0.0, 1.0, 0.0, 0.0, 1.0,# top-left
-                -0.5, 0.5, 0.5, 0.0, 1.0, 0.0, 0.0, 0.0, # bottom-left
-            ], np.float32)
-
-            self.cubeVAO = glGenVertexArrays(1)
-            cubeVBO = glGenBuffers(1)
-            glBindVertexArray(self.cubeVAO)
-            # fill buffer
-            glBindBuffer(GL_ARRAY_BUFFER, cubeVBO)
-            glBufferData(GL_ARRAY_BUFFER, vertices.nbytes, vertices, GL_STATIC_DRAW)
-            # link vertex attributes
-            glEnableVertexAttribArray(0)
-            glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE, 8 * vertices.itemsize, None)
-            glEnableVertexAttribArray(1)
-            glVertexAttribPointer(1, 3, GL_FLOAT, GL_FALSE, 8 * vertices.itemsize, ctypes.c_void_p(3 * vertices.itemsize))
-            glEnableVertexAttribArray(2)
-            glVertexAttribPointer(2, 2, GL_FLOAT, GL_FALSE, 8 * vertices.itemsize, ctypes.c_void_p(6 * vertices.itemsize))
-            glBindBuffer(GL_ARRAY_BUFFER, 0)
-            glBindVertexArray(0)
-        # render cube
-        glBindVertexArray(self.cubeVAO)
-        glDrawArrays(GL_TRIANGLES, 0, 36)
-        glBindVertexArray(0)
+        primitives.mesh('cube').draw(gl)
 
     def keyPressEvent(self, event):
         if event.key() == Qt.Key_Escape:
@@ -378,10 +315,21 @@ class GLWindow(QGLWidget):
             self.camera.processKeyboard(camera.Camera_Movement.RIGHT, self.__deltaTime)
         if event.key() == Qt.Key_Space:
             self.bloom = not self.bloom
+        if event.key() == Qt.Key_B:
+            self.mipBloom = not self.mipBloom
+        if event.key() == Qt.Key_X:
+            self.autoExposure = not self.autoExposure
+        # with auto exposure, aim brighter or darker
         if event.key() == Qt.Key_Q:
-            self.exposure -= 0.5 * self.__deltaTime
+            if self.autoExposure:
+                self.exposureControl.key *= 2.0 ** -self.__deltaTime
+            else:
+                self.exposure -= 0.5 * self.__deltaTime
         if event.key() == Qt.Key_E:
-            self.exposure += 0.5 * self.__deltaTime
+            if self.autoExposure:
+                self.exposureControl.key *= 2.0 ** self.__deltaTime
+            else:
+                self.exposure += 0.5 * self.__deltaTime
 
         self.updateGL()
         return super(GLWindow, self).keyPressEvent(event)
@@ -409,6 +357,10 @@ class GLWindow(QGLWidget):
         self.updateGL()
 
 def loadTexture(texPath, gammaCorrection=False):
+    textureID = texture.loadMipmappedTexture(texPath, gammaCorrection, clampAlpha=True)
+    if textureID is not None:
+        return textureID
+
     textureID = glGenTextures(1)
     im = Image.open(texPath)
     alpha = im.mode == 'RGBA'
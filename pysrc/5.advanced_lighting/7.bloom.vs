@@ -9,8 +9,12 @@ out VS_OUT {
     vec2 TexCoords;
 } vs_out;
 
-uniform mat4 projection;
-uniform mat4 view;
+layout (std140) uniform Camera
+{
+    mat4 projection;
+    mat4 view;
+    vec3 viewPos;
+};
 uniform mat4 model;
 
 void main()
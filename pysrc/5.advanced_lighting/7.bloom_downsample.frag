@@ -0,0 +1,39 @@
+#version 330 core
+out vec4 FragColor;
+in vec2 TexCoords;
+
+uniform sampler2D srcTexture;
+
+void main()
+{
+    // 13 taps around the center of the 2x2 source texels under this pixel:
+    // a . b . c
+    // . j . k .
+    // d . e . f
+    // . l . m .
+    // g . h . i
+    vec2 texel = 1.0 / textureSize(srcTexture, 0);
+    float x = texel.x;
+    float y = texel.y;
+
+    vec3 a = texture(srcTexture, TexCoords + vec2(-2.0 * x, 2.0 * y)).rgb;
+    vec3 b = texture(srcTexture, TexCoords + vec2(0.0, 2.0 * y)).rgb;
+    vec3 c = texture(srcTexture, TexCoords + vec2(2.0 * x, 2.0 * y)).rgb;
+    vec3 d = texture(srcTexture, TexCoords + vec2(-2.0 * x, 0.0)).rgb;
+    vec3 e = texture(srcTexture, TexCoords).rgb;
+    vec3 f = texture(srcTexture, TexCoords + vec2(2.0 * x, 0.0)).rgb;
+    vec3 g = texture(srcTexture, TexCoords + vec2(-2.0 * x, -2.0 * y)).rgb;
+    vec3 h = texture(srcTexture, TexCoords + vec2(0.0, -2.0 * y)).rgb;
+    vec3 i = texture(srcTexture, TexCoords + vec2(2.0 * x, -2.0 * y)).rgb;
+    vec3 j = texture(srcTexture, TexCoords + vec2(-x, y)).rgb;
+    vec3 k = texture(srcTexture, TexCoords + vec2(x, y)).rgb;
+    vec3 l = texture(srcTexture, TexCoords + vec2(-x, -y)).rgb;
+    vec3 m = texture(srcTexture, TexCoords + vec2(x, -y)).rgb;
+
+    // five 2x2 boxes: j k l m weighted 0.5, the four corner ones 0.125 each
+    vec3 result = e * 0.125;
+    result += (a + c + g + i) * 0.03125;
+    result += (b + d + f + h) * 0.0625;
+    result += (j + k + l + m) * 0.125;
+    FragColor = vec4(result, 1.0);
+}
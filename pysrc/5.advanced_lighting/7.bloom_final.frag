@@ -5,6 +5,7 @@ in vec2 TexCoords;
 uniform sampler2D scene;
 uniform sampler2D bloomBlur;
 uniform bool bloom;
+uniform float bloomScale;
 uniform float exposure;
 
 void main()
@@ -13,7 +14,7 @@ void main()
     vec3 hdrColor = texture(scene, TexCoords).rgb;      
     vec3 bloomColor = texture(bloomBlur, TexCoords).rgb;
     if(bloom)
-        hdrColor += bloomColor; // additive blending
+        hdrColor += bloomColor * bloomScale; // additive blending
     // tone mapping
     vec3 result = vec3(1.0) - exp(-hdrColor * exposure);
     // also gamma correct while we're at it       
@@ -0,0 +1,27 @@
+#version 330 core
+out vec4 FragColor;
+in vec2 TexCoords;
+
+uniform sampler2D srcTexture;
+
+void main()
+{
+    // 3x3 tent over the smaller level, one of its texels apart:
+    // 1 2 1
+    // 2 4 2 / 16
+    // 1 2 1
+    vec2 texel = 1.0 / textureSize(srcTexture, 0);
+    float x = texel.x;
+    float y = texel.y;
+
+    vec3 result = texture(srcTexture, TexCoords).rgb * 4.0;
+    result += (texture(srcTexture, TexCoords + vec2(0.0, y)).rgb +
+               texture(srcTexture, TexCoords + vec2(-x, 0.0)).rgb +
+               texture(srcTexture, TexCoords + vec2(x, 0.0)).rgb +
+               texture(srcTexture, TexCoords + vec2(0.0, -y)).rgb) * 2.0;
+    result += texture(srcTexture, TexCoords + vec2(-x, y)).rgb +
+              texture(srcTexture, TexCoords + vec2(x, y)).rgb +
+              texture(srcTexture, TexCoords + vec2(-x, -y)).rgb +
+              texture(srcTexture, TexCoords + vec2(x, -y)).rgb;
+    FragColor = vec4(result / 16.0, 1.0);
+}
@@ -1,7 +1,7 @@
 #version 330 core
 layout (location = 0) out vec4 FragColor;
 
-uniform vec3 lightColor;
+flat in vec3 lightColor;
 
 void main()
 {           
@@ -3,11 +3,20 @@ layout (location = 0) in vec3 position;
 layout (location = 1) in vec3 normal;
 layout (location = 2) in vec2 texCoords;
 
-uniform mat4 projection;
-uniform mat4 view;
-uniform mat4 model;
+flat out vec3 lightColor;
+
+layout (std140) uniform Camera
+{
+    mat4 projection;
+    mat4 view;
+    vec3 viewPos;
+};
+// one instance per light, see lightset.py for the record layout
+uniform samplerBuffer lightData;
 
 void main()
 {
-    gl_Position = projection * view * model * vec4(position, 1.0f);
-}
\ No newline at end of file
+    vec3 lightPosition = texelFetch(lightData, 3 * gl_InstanceID).xyz;
+    lightColor = texelFetch(lightData, 3 * gl_InstanceID + 1).rgb;
+    gl_Position = projection * view * vec4(position * 0.25f + lightPosition, 1.0f);
+}
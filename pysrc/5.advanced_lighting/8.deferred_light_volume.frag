@@ -0,0 +1,80 @@
+#version 330 core
+out vec4 FragColor;
+
+flat in vec3 LightPosition;
+flat in vec3 LightColor;
+flat in float LightLinear;
+flat in float LightQuadratic;
+flat in float LightRadius;
+
+uniform sampler2D gPosition;
+uniform sampler2D gNormal;
+uniform sampler2D gAlbedoSpec;
+uniform sampler2D gDepth;
+// no gPosition: rebuild it from gDepth, gNormal is octahedral (see gbuffer.py)
+uniform bool compact;
+uniform mat4 inverseViewProjection;
+
+layout (std140) uniform Camera
+{
+    mat4 projection;
+    mat4 view;
+    vec3 viewPos;
+};
+
+vec3 octDecode(vec2 e)
+{
+    e = e * 2.0 - 1.0;
+    vec3 n = vec3(e, 1.0 - abs(e.x) - abs(e.y));
+    vec2 signs = vec2(e.x >= 0.0 ? 1.0 : -1.0, e.y >= 0.0 ? 1.0 : -1.0);
+    if(n.z < 0.0)
+        n.xy = (1.0 - abs(e.yx)) * signs;
+    return normalize(n);
+}
+
+// world space position of a G-buffer texel
+vec3 worldPosition(ivec2 texel)
+{
+    float depth = texelFetch(gDepth, texel, 0).r;
+    vec2 ndc = (vec2(texel) + 0.5) / vec2(textureSize(gDepth, 0)) * 2.0 - 1.0;
+    vec4 position = inverseViewProjection * vec4(ndc, depth * 2.0 - 1.0, 1.0);
+    return position.xyz / position.w;
+}
+
+void main()
+{
+    // Retrieve data from gbuffer, the volume covers only part of the screen
+    ivec2 pixel = ivec2(gl_FragCoord.xy);
+    vec3 FragPos;
+    vec3 Normal;
+    if(compact)
+    {
+        FragPos = worldPosition(pixel);
+        Normal = octDecode(texelFetch(gNormal, pixel, 0).rg);
+    }
+    else
+    {
+        FragPos = texelFetch(gPosition, pixel, 0).rgb;
+        Normal = texelFetch(gNormal, pixel, 0).rgb;
+    }
+    vec3 Diffuse = texelFetch(gAlbedoSpec, pixel, 0).rgb;
+    float Specular = texelFetch(gAlbedoSpec, pixel, 0).a;
+
+    // The same light as in 8.deferred_shading.frag, blended on top of the ambient pass
+    float distance = length(LightPosition - FragPos);
+    if(distance >= LightRadius)
+        discard;
+    vec3 viewDir  = normalize(viewPos - FragPos);
+    // Diffuse
+    vec3 lightDir = normalize(LightPosition - FragPos);
+    vec3 diffuse = max(dot(Normal, lightDir), 0.0) * Diffuse * LightColor;
+    // Specular
+    vec3 halfwayDir = normalize(lightDir + viewDir);
+    float spec = pow(max(dot(Normal, halfwayDir), 0.0), 16.0);
+    vec3 specular = LightColor * spec * Specular;
+    // Attenuation
+    float attenuation = 1.0 / (1.0 + LightLinear * distance + LightQuadratic * distance * distance);
+    diffuse *= attenuation;
+    specular *= attenuation;
+    FragColor = vec4(diffuse + specular, 1.0);
+}
@@ -0,0 +1,32 @@
+#version 330 core
+layout (location = 0) in vec3 position;
+// per instance: one uniformbuffer.LIGHT record
+layout (location = 1) in vec3 lightPosition;
+layout (location = 2) in vec3 lightColor;
+layout (location = 3) in float lightLinear;
+layout (location = 4) in float lightQuadratic;
+layout (location = 5) in float lightRadius;
+
+flat out vec3 LightPosition;
+flat out vec3 LightColor;
+flat out float LightLinear;
+flat out float LightQuadratic;
+flat out float LightRadius;
+
+layout (std140) uniform Camera
+{
+    mat4 projection;
+    mat4 view;
+    vec3 viewPos;
+};
+
+void main()
+{
+    // the unit sphere mesh scaled to the light's radius
+    gl_Position = projection * view * vec4(lightPosition + position * lightRadius, 1.0f);
+    LightPosition = lightPosition;
+    LightColor = lightColor;
+    LightLinear = lightLinear;
+    LightQuadratic = lightQuadratic;
+    LightRadius = lightRadius;
+}
@@ -0,0 +1,6 @@
+#version 330 core
+
+// stencil marking only, no color is written
+void main()
+{
+}
@@ -5,6 +5,10 @@ in vec2 TexCoords;
 uniform sampler2D gPosition;
 uniform sampler2D gNormal;
 uniform sampler2D gAlbedoSpec;
+uniform sampler2D gDepth;
+// no gPosition: rebuild it from gDepth, gNormal is octahedral (see gbuffer.py)
+uniform bool compact;
+uniform mat4 inverseViewProjection;
 
 struct Light {
     vec3 Position;
@@ -14,38 +18,103 @@ struct Light {
     float Quadratic;
     float Radius;
 };
-const int NR_LIGHTS = 32;
-uniform Light lights[NR_LIGHTS];
-uniform vec3 viewPos;
+// the lights as uniformbuffer.LIGHT records, 3 texels each (see clustered.py)
+uniform samplerBuffer lightData;
+uniform int lightCount;
+// per cluster (first index, count) into lightIndices
+uniform usamplerBuffer clusters;
+uniform usamplerBuffer lightIndices;
+uniform int tileSize;
+uniform ivec3 clusterCount;
+uniform vec2 sliceScaleBias;
+// false: every light for every pixel
+uniform bool clustered;
+layout (std140) uniform Camera
+{
+    mat4 projection;
+    mat4 view;
+    vec3 viewPos;
+};
 
 uniform int draw_mode;
 
+Light fetchLight(int i)
+{
+    vec4 a = texelFetch(lightData, 3 * i);
+    vec4 b = texelFetch(lightData, 3 * i + 1);
+    vec4 c = texelFetch(lightData, 3 * i + 2);
+    return Light(a.xyz, b.rgb, b.a, c.x, c.y);
+}
+
+vec3 octDecode(vec2 e)
+{
+    e = e * 2.0 - 1.0;
+    vec3 n = vec3(e, 1.0 - abs(e.x) - abs(e.y));
+    vec2 signs = vec2(e.x >= 0.0 ? 1.0 : -1.0, e.y >= 0.0 ? 1.0 : -1.0);
+    if(n.z < 0.0)
+        n.xy = (1.0 - abs(e.yx)) * signs;
+    return normalize(n);
+}
+
+// world space position of a G-buffer texel
+vec3 worldPosition(ivec2 texel)
+{
+    float depth = texelFetch(gDepth, texel, 0).r;
+    vec2 ndc = (vec2(texel) + 0.5) / vec2(textureSize(gDepth, 0)) * 2.0 - 1.0;
+    vec4 position = inverseViewProjection * vec4(ndc, depth * 2.0 - 1.0, 1.0);
+    return position.xyz / position.w;
+}
+
 void main()
 {             
     // Retrieve data from gbuffer
-    vec3 FragPos = texture(gPosition, TexCoords).rgb;
-    vec3 Normal = texture(gNormal, TexCoords).rgb;
+    vec3 FragPos;
+    vec3 Normal;
+    if(compact)
+    {
+        ivec2 pixel = ivec2(gl_FragCoord.xy);
+        FragPos = worldPosition(pixel);
+        Normal = octDecode(texelFetch(gNormal, pixel, 0).rg);
+    }
+    else
+    {
+        FragPos = texture(gPosition, TexCoords).rgb;
+        Normal = texture(gNormal, TexCoords).rgb;
+    }
     vec3 Diffuse = texture(gAlbedoSpec, TexCoords).rgb;
     float Specular = texture(gAlbedoSpec, TexCoords).a;
     
     // Then calculate lighting as usual
     vec3 lighting  = Diffuse * 0.1; // hard-coded ambient component
     vec3 viewDir  = normalize(viewPos - FragPos);
-    for(int i = 0; i < NR_LIGHTS; ++i)
+    // This pixel's light list
+    int first = 0;
+    int count = lightCount;
+    if(clustered)
+    {
+        float depth = -(view * vec4(FragPos, 1.0)).z;
+        int slice = clamp(int(log(max(depth, 1e-4)) * sliceScaleBias.x - sliceScaleBias.y), 0, clusterCount.z - 1);
+        ivec2 tile = min(ivec2(gl_FragCoord.xy) / tileSize, clusterCount.xy - 1);
+        uvec2 cluster = texelFetch(clusters, (slice * clusterCount.y + tile.y) * clusterCount.x + tile.x).rg;
+        first = int(cluster.x);
+        count = int(cluster.y);
+    }
+    for(int j = 0; j < count; ++j)
     {
+        Light light = fetchLight(clustered ? int(texelFetch(lightIndices, first + j).r) : j);
         // Calculate distance between light source and current fragment
-        float distance = length(lights[i].Position - FragPos);
-        if(distance < lights[i].Radius)
+        float distance = length(light.Position - FragPos);
+        if(distance < light.Radius)
         {
             // Diffuse
-            vec3 lightDir = normalize(lights[i].Position - FragPos);
-            vec3 diffuse = max(dot(Normal, lightDir), 0.0) * Diffuse * lights[i].Color;
+            vec3 lightDir = normalize(light.Position - FragPos);
+            vec3 diffuse = max(dot(Normal, lightDir), 0.0) * Diffuse * light.Color;
             // Specular
             vec3 halfwayDir = normalize(lightDir + viewDir);  
             float spec = pow(max(dot(Normal, halfwayDir), 0.0), 16.0);
-            vec3 specular = lights[i].Color * spec * Specular;
+            vec3 specular = light.Color * spec * Specular;
             // Attenuation
-            float attenuation = 1.0 / (1.0 + lights[i].Linear * distance + lights[i].Quadratic * distance * distance);
+            float attenuation = 1.0 / (1.0 + light.Linear * distance + light.Quadratic * distance * distance);
             diffuse *= attenuation;
             specular *= attenuation;
             lighting += diffuse + specular;
@@ -63,4 +132,6 @@ void main()
         FragColor = vec4(Diffuse, 1.0);
     else if(draw_mode == 5)
         FragColor = vec4(vec3(Specular), 1.0);
+    else if(draw_mode == 6)
+        FragColor = vec4(vec3(float(count) / 32.0), 1.0); // lights looked at per pixel
 }
@@ -10,6 +10,7 @@ import inspect
 from PySide.QtGui import *
 from PySide.QtCore import *
 from PySide.QtOpenGL import *
+import glconfig # PyOpenGL flags, must come before the OpenGL import
 from OpenGL.GL import *
 from OpenGL.GL import shaders
 from PIL import Image
@@ -17,11 +18,23 @@ import numpy as np
 
 import glm
 import camera
+import texture
+import primitives
+import profiler
+import gbuffer
+import rendergraph
+import rendertarget
+import lightset
+import clustered
+import uniformbuffer
+from glstate import state as gl
 from model import Model
 
 currentFile = inspect.getframeinfo(inspect.currentframe()).filename
 abPath = os.path.dirname(os.path.abspath(currentFile))
 
+NR_LIGHTS = 32
+
 class GLWindow(QGLWidget):
 
     def __init__(self, gl_format=None):
@@ -43,10 +56,18 @@ class GLWindow(QGLWidget):
         self.__deltaTime = 0.0
         self.__lastTime = 0.0
 
-        self.quadVAO = 0
-        self.cubeVAO = 0
         self.draw_mode = 1
         self.wireframe = False
+        # cull lights per cluster, or shade every pixel with every light
+        self.clustered = True
+        # draw each light's sphere instead of the screen filled quad
+        self.lightVolumes = False
+        self.lightVolumeVAO = 0
+        self.lights = None
+        # move the lights every frame
+        self.animateLights = False
+        # G-buffer without positions, rebuilt from depth (see gbuffer.py)
+        self.compactGBuffer = True
 
         # if you want press mouse button to active camera rotation set it to false
         self.setMouseTracking(True)
@@ -74,6 +95,17 @@ class GLWindow(QGLWidget):
         self.__geometyPassShader = shaders.compileProgram(vertexShader, fragmentShader)
         vertexShader, fragmentShader = self.loadShaders('8.deferred_light_box.vs', '8.deferred_light_box.frag')
         self.__lightBoxShader = shaders.compileProgram(vertexShader, fragmentShader)
+        vertexShader, fragmentShader = self.loadShaders('8.deferred_light_volume.vs', '8.deferred_light_volume_stencil.frag')
+        self.__lightStencilShader = shaders.compileProgram(vertexShader, fragmentShader)
+        vertexShader, fragmentShader = self.loadShaders('8.deferred_light_volume.vs', '8.deferred_light_volume.frag')
+        self.__lightVolumeShader = shaders.compileProgram(vertexShader, fragmentShader)
+        glUseProgram(self.__lightVolumeShader)
+        glUniform1i(glGetUniformLocation(self.__lightVolumeShader, 'gPosition'), 0)
+        glUniform1i(glGetUniformLocation(self.__lightVolumeShader, 'gNormal'), 1)
+        glUniform1i(glGetUniformLocation(self.__lightVolumeShader, 'gAlbedoSpec'), 2)
+        glUniform1i(glGetUniformLocation(self.__lightVolumeShader, 'gDepth'), 6)
+        glUseProgram(self.__lightBoxShader)
+        glUniform1i(glGetUniformLocation(self.__lightBoxShader, 'lightData'), 3)
         _shaders = self.loadShaders('8.deferred_shading.vs', '8.deferred_shading.frag')
         self.__lightingPassShader = glCreateProgram()
         [glAttachShader(self.__lightingPassShader, s) for s in _shaders if s]
@@ -83,6 +115,10 @@ class GLWindow(QGLWidget):
         glUniform1i(glGetUniformLocation(self.__lightingPassShader, 'gPosition'), 0)
         glUniform1i(glGetUniformLocation(self.__lightingPassShader, 'gNormal'), 1)
         glUniform1i(glGetUniformLocation(self.__lightingPassShader, 'gAlbedoSpec'), 2)
+        glUniform1i(glGetUniformLocation(self.__lightingPassShader, 'gDepth'), 6)
+        # the lights and their cluster lists, see clustered.py
+        self.lightGrid = clustered.LightGrid(near=0.1, far=100.0)
+        self.lightGrid.attach(self.__lightingPassShader, 3)
         self.__lightingPassShader.check_validate()
         self.__lightingPassShader.check_linked()
         [glDeleteShader(s) for s in _shaders if s]
@@ -102,61 +138,52 @@ class GLWindow(QGLWidget):
             np.array([ 3.0, -3.0,  3.0], np.float32),
         ]
 
+        # camera matrices reach the shaders through a uniform block, the lights
+        # through a buffer texture (see lightset.py), which holds thousands
+        self.cameraBlock = uniformbuffer.UniformBuffer('Camera', uniformbuffer.CAMERA, uniformbuffer.CAMERA_BINDING)
+        self.cameraBlock.attach(self.__geometyPassShader, self.__lightingPassShader, self.__lightBoxShader,
+                                self.__lightStencilShader, self.__lightVolumeShader)
+        self.createLights(NR_LIGHTS)
+
+        # the G-buffer is the geometry pass' outputs in the render graph, see setupGraph
+        self.targets = rendertarget.Pool()
+        self.graph = rendergraph.RenderGraph(self.setupGraph, self.targets)
+
+        # per pass CPU/GPU timings, see profiler.py for how to turn them on
+        self.profiler = profiler.Profiler()
+
+        glClearColor(0.1, 0.1, 0.1, 1.0)
+
+    def createLights(self, count, linear=0.7, quadratic=1.8, lightThreshold=5.0):
         # light position
-        self.lightPos = []
-        self.lightColors = []
+        lightPos = []
+        lightColors = []
         random.seed(13)
-        for i in range(32):
+        for i in range(count):
             # calculate slightly random offsets
             xpos = (random.randint(0, 99) / 100.0) * 6.0 - 3.0
             ypos = (random.randint(0, 99) / 100.0) * 6.0 - 4.0
             zpos = (random.randint(0, 99) / 100.0) * 6.0 - 3.0
-            self.lightPos.append(np.array([xpos, ypos, zpos], np.float32))
+            lightPos.append((xpos, ypos, zpos))
             # also calculate random color
             rcolor = (random.randint(0, 99) / 200.0) + 0.5 # Between 0.5 and 1.0
             gcolor = (random.randint(0, 99) / 200.0) + 0.5 # Between 0.5 and 1.0
             bcolor = (random.randint(0, 99) / 200.0) + 0.5 # Between 0.5 and 1.0
-            self.lightColors.append(np.array([rcolor, gcolor, bcolor], np.float32))
-
-        # set up G-Buffer
-        # 3 textures:
-        # 1. Position (RGB)
-        # 2. Color (RGB) + Specular (A)
-        # 3. Normals (RGB)
-        self.gbuffer = glGenFramebuffers(1)
-        glBindFramebuffer(GL_FRAMEBUFFER, self.gbuffer)
-        self.gPosition, self.gNormal, self.gAlbedoSpec = glGenTextures(3)
-        # position color buffer
-        glBindTexture(GL_TEXTURE_2D, self.gPosition)
-        glTexImage2D(GL_TEXTURE_2D, 0, GL_RGB16F, self.width(), self.height(), 0, GL_RGB, GL_FLOAT, None)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
-        glFramebufferTexture2D(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, GL_TEXTURE_2D, self.gPosition, 0)
-        # normal color buffer
-        glBindTexture(GL_TEXTURE_2D, self.gNormal)
-        glTexImage2D(GL_TEXTURE_2D, 0, GL_RGB16F, self.width(), self.height(), 0, GL_RGB, GL_FLOAT, None)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
-        glFramebufferTexture2D(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT1, GL_TEXTURE_2D, self.gNormal, 0)
-        # color + specular buffer
-        glBindTexture(GL_TEXTURE_2D, self.gAlbedoSpec)
-        glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, self.width(), self.height(), 0, GL_RGBA, GL_UNSIGNED_BYTE, None)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
-        glFramebufferTexture2D(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT2, GL_TEXTURE_2D, self.gAlbedoSpec, 0)
-        # tell OpenGL which color attachments we'll use (of this framebuffer)
-        attachments = [GL_COLOR_ATTACHMENT0, GL_COLOR_ATTACHMENT1, GL_COLOR_ATTACHMENT2]
-        glDrawBuffers(3, attachments)
-        # create depth buffer (renderbuffer)
-        self.rboDepth = glGenRenderbuffers(1)
-        glBindRenderbuffer(GL_RENDERBUFFER, self.rboDepth)
-        glRenderbufferStorage(GL_RENDERBUFFER, GL_DEPTH_COMPONENT, self.width(), self.height())
-        glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_DEPTH_ATTACHMENT, GL_RENDERBUFFER, self.rboDepth)
-        if glCheckFramebufferStatus(GL_FRAMEBUFFER) != GL_FRAMEBUFFER_COMPLETE:
-            print 'Framebuffer not complete!'
-        glBindFramebuffer(GL_FRAMEBUFFER, 0)
-
-        glClearColor(0.1, 0.1, 0.1, 1.0)
+            lightColors.append((rcolor, gcolor, bcolor))
+
+        if self.lights is not None:
+            self.lights.delete()
+        self.lights = lightset.LightSet(count)
+        self.lights.position[:] = lightPos
+        self.lights.color[:] = lightColors
+        # Update attenuation parameters (the constant term is always 1.0, we don't send it to the shader)
+        self.lights.setAttenuation(linear, quadratic)
+        # Then calculate radius of light volume/sphere, lightThreshold out of 256 is where a light counts as off
+        self.lights.updateRadii(lightThreshold)
+        self.lights.upload()
+        # where animateLights moves them from
+        self.lightOrigins = self.lights.position.copy()
+        self.lightPhases = np.arange(count) * 0.7
 
     def resizeGL(self, w, h):
         glViewport(0, 0, w, h)
@@ -165,82 +192,181 @@ class GLWindow(QGLWidget):
         currentTime = self.__timer.elapsed() / 1000.0
         self.__deltaTime = currentTime - self.__lastTime
         self.__lastTime = currentTime
-
-        glPolygonMode(GL_FRONT_AND_BACK, GL_LINE if self.wireframe else GL_FILL)
-
+        self.profiler.beginFrame()
+        # initializeGL and Qt bind things behind the state cache's back
+        gl.invalidate()
+
+        if self.animateLights:
+            with self.profiler.section('light update'):
+                # every light bobs on its own phase, moved and uploaded all at once
+                self.lights.position[:, 1] = self.lightOrigins[:, 1] + 0.5 * np.sin(2.0 * currentTime + self.lightPhases)
+                self.lights.upload()
+
+        self.projection = glm.perspective(self.camera.zoom, float(self.width()) / self.height(), 0.1, 100.0)
+        # set up again when resized, or when a toggle changes what it declares
+        self.graph.execute(self.width(), self.height(), self.profiler,
+                           (self.compactGBuffer, self.clustered, self.lightVolumes))
+
+        gl.useProgram(0)
+        self.targets.endFrame()
+        self.profiler.endFrame(self.__deltaTime)
+
+    def setupGraph(self, graph, width, height):
         # 1. Geometry Pass: render scene's geometry/color data into gbuffer
-        glBindFramebuffer(GL_FRAMEBUFFER, self.gbuffer)
-        glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
-        projection = glm.perspective(self.camera.zoom, float(self.width()) / self.height(), 0.1, 100.0)
-        view = self.camera.viewMatrix
-        glUseProgram(self.__geometyPassShader)
-        glUniformMatrix4fv(glGetUniformLocation(self.__geometyPassShader, 'projection'), 1, GL_FALSE, projection)
-        glUniformMatrix4fv(glGetUniformLocation(self.__geometyPassShader, 'view'), 1, GL_FALSE, view)
+        # 3 textures:
+        # 1. Position (RGB), none in the compact layout
+        # 2. Color (RGB) + Specular (A)
+        # 3. Normals (RGB), or octahedral (RG)
+        # and a depth texture in the default framebuffer's format, so that it can be blitted there
+        self.gbuffer = gbuffer.GBuffer(gbuffer.DEFERRED, self.compactGBuffer)
+        graph.addPass('geometry', self.drawGeometry, outputs=self.gbuffer.outputs(),
+                      clear=GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+        # 2. Lighting Pass: calculate lighting by iterating over a screen filled quad pixel-by-pixel using the gbuffer's content.
+        # Or with light volumes: ambient from the quad, then each light's sphere adds that light where it reaches the scene.
+        if self.clustered and not self.lightVolumes:
+            graph.addPass('light culling', self.cullLights)
+        # the volumes are depth tested against the scene, which they blit in first
+        graph.addPass('lighting', self.drawLighting, inputs=self.gbuffer.names,
+                      clear=None if self.lightVolumes else GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+        # 2.5. Copy content of geometry's depth buffer to default framebuffer's depth buffer
+        if not self.lightVolumes:
+            graph.addPass('depth blit', self.blitDepth, inputs=[gbuffer.DEPTH])
+        # 3. Render lights on top of scene, by blitting
+        graph.addPass('light boxes', self.drawLightBoxes)
+
+    def drawGeometry(self):
+        gl.polygonMode(GL_FRONT_AND_BACK, GL_LINE if self.wireframe else GL_FILL)
+        # one upload serves all three programs
+        self.cameraBlock['projection'] = self.projection
+        self.cameraBlock['view'] = self.camera.viewMatrix
+        self.cameraBlock['viewPos'] = self.camera.position
+        self.cameraBlock.upload()
+        gl.useProgram(self.__geometyPassShader)
+        glUniform1i(glGetUniformLocation(self.__geometyPassShader, 'compact'), self.gbuffer.compact)
         for pos in self.objectPosition:
             model = glm.scale(np.identity(4, np.float32), 0.25, 0.25, 0.25)
             model = glm.translate(model, pos[0], pos[1], pos[2])
-            glUniformMatrix4fv(glGetUniformLocation(self.__geometyPassShader, 'model'), 1, GL_FALSE, model)
+            glconfig.uniformMatrix4fv(glGetUniformLocation(self.__geometyPassShader, 'model'), model)
             self.cyborg.draw(self.__geometyPassShader)
-        glBindFramebuffer(GL_FRAMEBUFFER, 0)
-
-        glPolygonMode(GL_FRONT_AND_BACK, GL_FILL)
-
-        # 2. Lighting Pass: calculate lighting by iterating over a screen filled quad pixel-by-pixel using the gbuffer's content.
-        glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
-        glUseProgram(self.__lightingPassShader)
-        glActiveTexture(GL_TEXTURE0)
-        glBindTexture(GL_TEXTURE_2D, self.gPosition)
-        glActiveTexture(GL_TEXTURE1)
-        glBindTexture(GL_TEXTURE_2D, self.gNormal)
-        glActiveTexture(GL_TEXTURE2)
-        glBindTexture(GL_TEXTURE_2D, self.gAlbedoSpec)
-        # also send light relevent uniforms
-        for i in range(len(self.lightPos)):
-            glUniform3fv(glGetUniformLocation(self.__lightingPassShader, 'lights[{}].Position'.format(i)), 1, self.lightPos[i])
-            glUniform3fv(glGetUniformLocation(self.__lightingPassShader, 'lights[{}].Color'.format(i)), 1, self.lightColors[i])
-            # Update attenuation parameters and calculate radius
-            _constant = 1.0 # Note that we don't send this to the shader, we assume it is always 1.0 (in our case)
-            linear = 0.7
-            quadratic = 1.8
-            glUniform1f(glGetUniformLocation(self.__lightingPassShader, 'lights[{}].Linear'.format(i)), linear)
-            glUniform1f(glGetUniformLocation(self.__lightingPassShader, 'lights[{}].Quadratic'.format(i)), quadratic)
-            # Then calculate radius of light volume/sphere
-            lightThreshold = 5.0 # 5 # 256
-            maxBrightness = max(max(self.lightColors[i][0], self.lightColors[i][1]), self.lightColors[i][2])
-            radius = (-linear + math.sqrt(linear * linear - 4 * quadratic * (_constant - (256.0 / lightThreshold) * maxBrightness))) / (2 * quadratic)
-            glUniform1f(glGetUniformLocation(self.__lightingPassShader, 'lights[{}].Radius'.format(i)), radius)
-        glUniform3fv(glGetUniformLocation(self.__lightingPassShader, 'viewPos'), 1, self.camera.position)
+        gl.polygonMode(GL_FRONT_AND_BACK, GL_FILL)
+
+    def cullLights(self):
+        self.lightGrid.update(self.lights, self.cameraBlock['view'], self.projection, self.width(), self.height())
+
+    def drawLighting(self):
+        clustered = self.clustered and not self.lightVolumes
+        if self.lightVolumes:
+            self.blitDepth()
+            glClear(GL_COLOR_BUFFER_BIT | GL_STENCIL_BUFFER_BIT)
+            gl.disable(GL_DEPTH_TEST)
+        gl.useProgram(self.__lightingPassShader)
+        self.bindGBuffer(self.__lightingPassShader)
+        # lights and their cluster lists on units 3-5, viewPos from the camera block
+        self.lightGrid.bind(self.__lightingPassShader, self.lights)
+        glUniform1i(glGetUniformLocation(self.__lightingPassShader, 'clustered'), clustered)
+        if self.lightVolumes:
+            # ambient (and the g-buffer views) only
+            glUniform1i(glGetUniformLocation(self.__lightingPassShader, 'lightCount'), 0)
         glUniform1i(glGetUniformLocation(self.__lightingPassShader, 'draw_mode'), self.draw_mode)
         self.renderQuad()
-
-        # 2.5. Copy content of geometry's depth buffer to default framebuffer's depth buffer
-        glBindFramebuffer(GL_READ_FRAMEBUFFER, self.gbuffer)
-        glBindFramebuffer(GL_DRAW_FRAMEBUFFER, 0) # write to default framebuffer
+        if self.lightVolumes:
+            if self.draw_mode == 1:
+                self.renderLightVolumes()
+            gl.enable(GL_DEPTH_TEST)
+
+    def drawLightBoxes(self):
+        gl.useProgram(self.__lightBoxShader)
+        # one instance per light, placed and colored from the light set
+        gl.bindTextureUnit(3, GL_TEXTURE_BUFFER, self.lights.texture)
+        self.renderCube(len(self.lights))
+
+    def bindGBuffer(self, shader):
+        # the G-buffer on units 0-2, its depth on 6; the compact one needs the depth and the inverse view projection
+        if not self.gbuffer.compact:
+            gl.activeTexture(GL_TEXTURE0)
+            gl.bindTexture(GL_TEXTURE_2D, self.graph.texture('gPosition'))
+        gl.activeTexture(GL_TEXTURE1)
+        gl.bindTexture(GL_TEXTURE_2D, self.graph.texture('gNormal'))
+        gl.activeTexture(GL_TEXTURE2)
+        gl.bindTexture(GL_TEXTURE_2D, self.graph.texture('gAlbedoSpec'))
+        gl.activeTexture(GL_TEXTURE6)
+        gl.bindTexture(GL_TEXTURE_2D, self.graph.texture(gbuffer.DEPTH))
+        glUniform1i(glGetUniformLocation(shader, 'compact'), self.gbuffer.compact)
+        if self.gbuffer.compact:
+            inverseViewProjection = np.linalg.inv(self.cameraBlock['view'].dot(self.projection)).astype(np.float32)
+            glUniformMatrix4fv(glGetUniformLocation(shader, 'inverseViewProjection'), 1, GL_FALSE, inverseViewProjection)
+
+    def blitDepth(self):
+        gl.bindFramebuffer(GL_READ_FRAMEBUFFER, self.graph.framebuffer('geometry'))
+        gl.bindFramebuffer(GL_DRAW_FRAMEBUFFER, 0) # write to default framebuffer
         glBlitFramebuffer(0, 0, self.width(), self.height(), 0, 0, self.width(), self.height(), GL_DEPTH_BUFFER_BIT, GL_NEAREST)
-        glBindFramebuffer(GL_FRAMEBUFFER, 0)
+        gl.bindFramebuffer(GL_FRAMEBUFFER, 0)
 
-        # 3. Render lights on top of scene, by blitting
-        glUseProgram(self.__lightBoxShader)
-        glUniformMatrix4fv(glGetUniformLocation(self.__lightBoxShader, 'projection'), 1, GL_FALSE, projection)
-        glUniformMatrix4fv(glGetUniformLocation(self.__lightBoxShader, 'view'), 1, GL_FALSE, view)
-        for i in range(len(self.lightPos)):
-            model = glm.scale(np.identity(4, np.float32), 0.25, 0.25, 0.25)
-            model = glm.translate(model, self.lightPos[i][0], self.lightPos[i][1], self.lightPos[i][2])
-            glUniformMatrix4fv(glGetUniformLocation(self.__lightBoxShader, 'model'), 1, GL_FALSE, model)
-            glUniform3fv(glGetUniformLocation(self.__lightBoxShader, 'lightColor'), 1, self.lightColors[i])
-            self.renderCube()
-
-        glUseProgram(0)
+    def renderLightVolumes(self):
+        # initilize (if necessary)
+        if self.lightVolumeVAO == 0:
+            sphere = primitives.mesh('icosphere', 1, True)
+            self.lightVolumeVAO = glGenVertexArrays(1)
+            gl.bindVertexArray(self.lightVolumeVAO)
+            # the shared sphere's positions and indices, the per light attributes go next to them
+            sphere.setupAttributes(['position'])
+            self.lightVolumeIndexCount = sphere.count
+            self.lightVolumeLights = None
+        gl.bindVertexArray(self.lightVolumeVAO)
+        if self.lightVolumeLights is not self.lights:
+            # one LIGHT record per instance, read straight from the light set's buffer
+            glBindBuffer(GL_ARRAY_BUFFER, self.lights.buffer)
+            stride = uniformbuffer.LIGHT.itemsize
+            fields = [('Position', 3), ('Color', 3), ('Linear', 1), ('Quadratic', 1), ('Radius', 1)]
+            for location, (field, size) in enumerate(fields, 1):
+                glEnableVertexAttribArray(location)
+                glVertexAttribPointer(location, size, GL_FLOAT, GL_FALSE, stride, ctypes.c_void_p(uniformbuffer.LIGHT.fields[field][1]))
+                glVertexAttribDivisor(location, 1)
+            glBindBuffer(GL_ARRAY_BUFFER, 0)
+            self.lightVolumeLights = self.lights
+
+        # 1. stencil: count back faces behind the scene up and front faces behind it down, which
+        # leaves non-zero where the surface lies inside a volume (also with the camera inside one)
+        gl.useProgram(self.__lightStencilShader)
+        glColorMask(GL_FALSE, GL_FALSE, GL_FALSE, GL_FALSE)
+        gl.depthMask(GL_FALSE)
+        gl.enable(GL_DEPTH_TEST)
+        gl.disable(GL_CULL_FACE)
+        gl.enable(GL_STENCIL_TEST)
+        glStencilFunc(GL_ALWAYS, 0, 0xFF)
+        glStencilOpSeparate(GL_BACK, GL_KEEP, GL_INCR_WRAP, GL_KEEP)
+        glStencilOpSeparate(GL_FRONT, GL_KEEP, GL_DECR_WRAP, GL_KEEP)
+        glDrawElementsInstanced(GL_TRIANGLES, self.lightVolumeIndexCount, GL_UNSIGNED_INT, None, len(self.lights))
+
+        # 2. shade the marked pixels each volume covers, added on top; back faces, so that
+        # a volume the camera is inside still covers the screen
+        gl.useProgram(self.__lightVolumeShader)
+        self.bindGBuffer(self.__lightVolumeShader)
+        glColorMask(GL_TRUE, GL_TRUE, GL_TRUE, GL_TRUE)
+        glStencilFunc(GL_NOTEQUAL, 0, 0xFF)
+        glStencilOp(GL_KEEP, GL_KEEP, GL_KEEP)
+        gl.disable(GL_DEPTH_TEST)
+        gl.enable(GL_CULL_FACE)
+        gl.cullFace(GL_FRONT)
+        gl.enable(GL_BLEND)
+        gl.blendFunc(GL_ONE, GL_ONE)
+        glDrawElementsInstanced(GL_TRIANGLES, self.lightVolumeIndexCount, GL_UNSIGNED_INT, None, len(self.lights))
+
+        gl.disable(GL_BLEND)
+        gl.cullFace(GL_BACK)
+        gl.disable(GL_CULL_FACE)
+        gl.disable(GL_STENCIL_TEST)
+        gl.depthMask(GL_TRUE)
 
     def renderScene(self, shader):
         # Room cube
         model = np.identity(4, np.float32)
         model = glm.scale(model, 10.0, 10.0, 10.0)
         glUniformMatrix4fv(glGetUniformLocation(shader, 'model'), 1, GL_FALSE, model)
-        glDisable(GL_CULL_FACE) # Note that we disable culling here since we render 'inside' the cube instead of the usual 'outside' which throws off the normal culling methods.
+        gl.disable(GL_CULL_FACE) # Note that we disable culling here since we render 'inside' the cube instead of the usual 'outside' which throws off the normal culling methods.
         glUniform1i(glGetUniformLocation(shader, 'reverse_normals'), 1) #A small little hack to invert normals when drawing cube from the inside so lighting still works.
         self.renderCube()
-        glEnable(GL_CULL_FACE)
+        gl.enable(GL_CULL_FACE)
         # Cubes
         model = np.identity(4, np.float32)
         model = glm.translate(model, 4.0, -3.5, 0.0)
@@ -262,97 +388,10 @@ class GLWindow(QGLWidget):
         self.renderCube()
 
     def renderQuad(self):
-        if self.quadVAO == 0:
-            quadVertices = np.array([
-                # positions       # texture coords
-                -1.0,  1.0, 0.0,  0.0, 1.0,
-                -1.0, -1.0, 0.0,  0.0, 0.0,
-                 1.0,  1.0, 0.0,  1.0, 1.0,
-                 1.0, -1.0, 0.0,  1.0, 0.0,
-            ], np.float32)
-
-            # setup plane VAO
-            self.quadVAO = glGenVertexArrays(1)
-            quadVBO = glGenBuffers(1)
-            glBindVertexArray(self.quadVAO)
-            glBindBuffer(GL_ARRAY_BUFFER, quadVBO)
-            glBufferData(GL_ARRAY_BUFFER, quadVertices.nbytes, quadVertices, GL_STATIC_DRAW)
-            glEnableVertexAttribArray(0)
-            glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE, 5 * quadVertices.itemsize, None)
-            glEnableVertexAttribArray(1)
-            glVertexAttribPointer(1, 2, GL_FLOAT, GL_FALSE, 5 * quadVertices.itemsize, ctypes.c_void_p(3 * quadVertices.itemsize))
-
-        glBindVertexArray(self.quadVAO)
-        glDrawArrays(GL_TRIANGLE_STRIP, 0, 4)
-        glBindVertexArray(0)
-
-    def renderCube(self):
-        # initilize (if necessary)
-        if self.cubeVAO == 0:
-            vertices = np.array([
-                # Back face
-                -0.5, -0.5, -0.5, 0.0, 0.0, -1.0, 0.0, 0.0, # Bottom-left
-                0.5, 0.5, -0.5, 0.0, 0.0, -1.0, 1.0, 1.0, # top-right
-                0.5, -0.5, -0.5, 0.0, 0.0, -1.0, 1.0, 0.0, # bottom-right
-                0.5, 0.5, -0.5, 0.0, 0.0, -1.0, 1.0, 1.0,  # top-right
-                -0.5, -0.5, -0.5, 0.0, 0.0, -1.0, 0.0, 0.0,  # bottom-left
-                -0.5, 0.5, -0.5, 0.0, 0.0, -1.0, 0.0, 1.0,# top-left
-                # Front face
-                -0.5, -0.5, 0.5, 0.0, 0.0, 1.0, 0.0, 0.0, # bottom-left
-                0.5, -0.5, 0.5, 0.0, 0.0, 1.0, 1.0, 0.0,  # bottom-right
-                0.5, 0.5, 0.5, 0.0, 0.0, 1.0, 1.0, 1.0,  # top-right
-                0.5, 0.5, 0.5, 0.0, 0.0, 1.0, 1.0, 1.0, # top-right
-                -0.5, 0.5, 0.5, 0.0, 0.0, 1.0, 0.0, 1.0,  # top-left
-                -0.5, -0.5, 0.5, 0.0, 0.0, 1.0, 0.0, 0.0,  # bottom-left
-                # Left face
-                -0.5, 0.5, 0.5, -1.0, 0.0, 0.0, 1.0, 0.0, # top-right
-                -0.5, 0.5, -0.5, -1.0, 0.0, 0.0, 1.0, 1.0, # top-left
-                -0.5, -0.5, -0.5, -1.0, 0.0, 0.0, 0.0, 1.0,  # bottom-left
-                -0.5, -0.5, -0.5, -1.0, 0.0, 0.0, 0.0, 1.0, # bottom-left
-                -0.5, -0.5, 0.5, -1.0, 0.0, 0.0, 0.0, 0.0,  # bottom-right
-                -0.5, 0.5, 0.5, -1.0, 0.0, 0.0, 1.0, 0.0, # top-right
-                # Right face
-                0.5, 0.5, 0.5, 1.0, 0.0, 0.0, 1.0, 0.0, # top-left
-                0.5, -0.5, -0.5, 1.0, 0.0, 0.0, 0.0, 1.0, # bottom-right
-                0.5, 0.5, -0.5, 1.0, 0.0, 0.0, 1.0, 1.0, # top-right
-                0.5, -0.5, -0.5, 1.0, 0.0, 0.0, 0.0, 1.0,  # bottom-right
-                0.5, 0.5, 0.5, 1.0, 0.0, 0.0, 1.0, 0.0,  # top-left
-                0.5, -0.5, 0.5, 1.0, 0.0, 0.0, 0.0, 0.0, # bottom-left
-                # Bottom face
-                -0.5, -0.5, -0.5, 0.0, -1.0, 0.0, 0.0, 1.0, # top-right
-                0.5, -0.5, -0.5, 0.0, -1.0, 0.0, 1.0, 1.0, # top-left
-                0.5, -0.5, 0.5, 0.0, -1.0, 0.0, 1.0, 0.0,# bottom-left
-                0.5, -0.5, 0.5, 0.0, -1.0, 0.0, 1.0, 0.0, # bottom-left
-                -0.5, -0.5, 0.5, 0.0, -1.0, 0.0, 0.0, 0.0, # bottom-right
-                -0.5, -0.5, -0.5, 0.0, -1.0, 0.0, 0.0, 1.0, # top-right
-                # Top face
-                -0.5, 0.5, -0.5, 0.0, 1.0, 0.0, 0.0, 1.0,# top-left
-                0.5, 0.5, 0.5, 0.0, 1.0, 0.0, 1.0, 0.0, # bottom-right
-                0.5, 0.5, -0.5, 0.0, 1.0, 0.0, 1.0, 1.0, # top-right
-                0.5, 0.5, 0.5, 0.0, 1.0, 0.0, 1.0, 0.0, # bottom-right
-                -0.5, 0.5, -0.5, 0.0, 1.0, 0.0, 0.0, 1.0,# top-left
-                -0.5, 0.5, 0.5, 0.0, 1.0, 0.0, 0.0, 0.0, # bottom-left
-            ], np.float32)
-
-            self.cubeVAO = glGenVertexArrays(1)
-            cubeVBO = glGenBuffers(1)
-            glBindVertexArray(self.cubeVAO)
-            # fill buffer
-            glBindBuffer(GL_ARRAY_BUFFER, cubeVBO)
-            glBufferData(GL_ARRAY_BUFFER, vertices.nbytes, vertices, GL_STATIC_DRAW)
-            # link vertex attributes
-            glEnableVertexAttribArray(0)
-            glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE, 8 * vertices.itemsize, None)
-            glEnableVertexAttribArray(1)
-            glVertexAttribPointer(1, 3, GL_FLOAT, GL_FALSE, 8 * vertices.itemsize, ctypes.c_void_p(3 * vertices.itemsize))
-            glEnableVertexAttribArray(2)
-            glVertexAttribPointer(2, 2, GL_FLOAT, GL_FALSE, 8 * vertices.itemsize, ctypes.c_void_p(6 * vertices.itemsize))
-            glBindBuffer(GL_ARRAY_BUFFER, 0)
-            glBindVertexArray(0)
-        # render cube
-        glBindVertexArray(self.cubeVAO)
-        glDrawArrays(GL_TRIANGLES, 0, 36)
-        glBindVertexArray(0)
+        primitives.mesh('quad').draw(gl)
+
+    def renderCube(self, instances=1):
+        primitives.mesh('cube').draw(gl, instances)
 
     def keyPressEvent(self, event):
         if event.key() == Qt.Key_Escape:
@@ -377,6 +416,16 @@ class GLWindow(QGLWidget):
             self.draw_mode = 4
         if event.key() == Qt.Key_5:
             self.draw_mode = 5
+        if event.key() == Qt.Key_6:
+            self.draw_mode = 6
+        if event.key() == Qt.Key_C:
+            self.clustered = not self.clustered
+        if event.key() == Qt.Key_V:
+            self.lightVolumes = not self.lightVolumes
+        if event.key() == Qt.Key_L:
+            self.animateLights = not self.animateLights
+        if event.key() == Qt.Key_G:
+            self.compactGBuffer = not self.compactGBuffer
 
         self.updateGL()
         return super(GLWindow, self).keyPressEvent(event)
@@ -404,6 +453,10 @@ class GLWindow(QGLWidget):
         self.updateGL()
 
 def loadTexture(texPath, gammaCorrection=False):
+    textureID = texture.loadMipmappedTexture(texPath, gammaCorrection, clampAlpha=True)
+    if textureID is not None:
+        return textureID
+
     textureID = glGenTextures(1)
     im = Image.open(texPath)
     alpha = im.mode == 'RGBA'
@@ -9,13 +9,23 @@ in vec3 Normal;
 
 uniform sampler2D texture_diffuse1;
 uniform sampler2D texture_specular1;
+// no position attachment, normals octahedral in two unorm channels (see gbuffer.py)
+uniform bool compact;
+
+vec2 octEncode(vec3 n)
+{
+    n /= abs(n.x) + abs(n.y) + abs(n.z);
+    vec2 signs = vec2(n.x >= 0.0 ? 1.0 : -1.0, n.y >= 0.0 ? 1.0 : -1.0);
+    vec2 e = n.z >= 0.0 ? n.xy : (1.0 - abs(n.yx)) * signs;
+    return e * 0.5 + 0.5;
+}
 
 void main()
 {    
     // Store the fragment position vector in the first gbuffer texture
     gPosition = FragPos;
     // Also store the per-fragment normals into the gbuffer
-    gNormal = normalize(Normal);
+    gNormal = compact ? vec3(octEncode(normalize(Normal)), 0.0) : normalize(Normal);
     // And the diffuse per-fragment color
     gAlbedoSpec.rgb = texture(texture_diffuse1, TexCoords).rgb;
     // Store specular intensity in gAlbedoSpec's alpha component
@@ -7,9 +7,13 @@ out vec3 FragPos;
 out vec2 TexCoords;
 out vec3 Normal;
 
+layout (std140) uniform Camera
+{
+    mat4 projection;
+    mat4 view;
+    vec3 viewPos;
+};
 uniform mat4 model;
-uniform mat4 view;
-uniform mat4 projection;
 
 void main()
 {
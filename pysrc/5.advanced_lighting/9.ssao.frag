@@ -5,23 +5,73 @@ in vec2 TexCoords;
 uniform sampler2D gPositionDepth;
 uniform sampler2D gNormal;
 uniform sampler2D texNoise;
+uniform sampler2D gDepth;
+// no gPositionDepth: rebuild it from gDepth, gNormal is octahedral (see gbuffer.py)
+uniform bool compact;
+uniform mat4 inverseProjection;
 
 uniform vec3 samples[64];
 
 // parameters (you'd probably want to use them as uniforms to more easily tweak the effect)
-int kernelSize = 64;
+uniform int kernelSize = 64;
 float radius = 1.0;
 
-// tile noise texture over screen based on screen dimensions divided by noise size
-const vec2 noiseScale = vec2(800.0f/4.0f, 600.0f/4.0f); 
+// tile noise texture over the SSAO target: its size divided by noise size
+uniform vec2 noiseScale;
 
 uniform mat4 projection;
 
+vec3 octDecode(vec2 e)
+{
+    e = e * 2.0 - 1.0;
+    vec3 n = vec3(e, 1.0 - abs(e.x) - abs(e.y));
+    vec2 signs = vec2(e.x >= 0.0 ? 1.0 : -1.0, e.y >= 0.0 ? 1.0 : -1.0);
+    if(n.z < 0.0)
+        n.xy = (1.0 - abs(e.yx)) * signs;
+    return normalize(n);
+}
+
+// view space position of the G-buffer texel at uv, (0, 0, 0) where nothing was drawn as in the cleared gPositionDepth
+vec3 viewPosition(vec2 uv)
+{
+    float depth = texture(gDepth, uv).r;
+    if(depth == 1.0)
+        return vec3(0.0);
+    vec2 size = vec2(textureSize(gDepth, 0));
+    vec2 ndc = (floor(clamp(uv, 0.0, 1.0) * size) + 0.5) / size * 2.0 - 1.0;
+    vec4 position = inverseProjection * vec4(ndc, depth * 2.0 - 1.0, 1.0);
+    return position.xyz / position.w;
+}
+
+// gPositionDepth's alpha: the distance in front of the camera, 0.0 where nothing was drawn
+float linearDepth(vec2 uv)
+{
+    if(!compact)
+        return texture(gPositionDepth, uv).a;
+    float depth = texture(gDepth, uv).r;
+    if(depth == 1.0)
+        return 0.0;
+    // a perspective projection's view space z only depends on the depth
+    vec2 zw = inverseProjection[2].zw * (depth * 2.0 - 1.0) + inverseProjection[3].zw;
+    return -zw.x / zw.y;
+}
+
 void main()
 {
     // Get input for SSAO algorithm
-    vec3 fragPos = texture(gPositionDepth, TexCoords).xyz;
-    vec3 normal = texture(gNormal, TexCoords).rgb;
+    vec3 fragPos;
+    vec3 normal;
+    if(compact)
+    {
+        fragPos = viewPosition(TexCoords);
+        // nothing drawn there: no normal either, as in the cleared gNormal
+        normal = fragPos.z == 0.0 ? vec3(0.0) : octDecode(texture(gNormal, TexCoords).rg);
+    }
+    else
+    {
+        fragPos = texture(gPositionDepth, TexCoords).xyz;
+        normal = texture(gNormal, TexCoords).rgb;
+    }
     vec3 randomVec = texture(texNoise, TexCoords * noiseScale).xyz;
     // Create TBN change-of-basis matrix: from tangent-space to view-space
     vec3 tangent = normalize(randomVec - normal * dot(randomVec, normal));
@@ -42,7 +92,7 @@ void main()
         offset.xyz = offset.xyz * 0.5 + 0.5; // transform to range 0.0 - 1.0
         
         // get sample depth
-        float sampleDepth = -texture(gPositionDepth, offset.xy).w; // Get depth value of kernel sample
+        float sampleDepth = -linearDepth(offset.xy); // Get depth value of kernel sample
         
         // range check & accumulate
         float rangeCheck = smoothstep(0.0, 1.0, radius / abs(fragPos.z - sampleDepth ));
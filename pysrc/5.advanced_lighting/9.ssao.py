@@ -4,12 +4,12 @@
 import os
 import math
 import ctypes
-import random
 import inspect
 
 from PySide.QtGui import *
 from PySide.QtCore import *
 from PySide.QtOpenGL import *
+import glconfig # PyOpenGL flags, must come before the OpenGL import
 from OpenGL.GL import *
 from OpenGL.GL import shaders
 from PIL import Image
@@ -17,15 +17,19 @@ import numpy as np
 
 import glm
 import camera
+import texture
+import primitives
+import profiler
+import ssao
+import gbuffer
+import rendergraph
+import rendertarget
+from glstate import state as gl
 from model import Model
 
 currentFile = inspect.getframeinfo(inspect.currentframe()).filename
 abPath = os.path.dirname(os.path.abspath(currentFile))
 
-def lerp(a, b, f):
-    return a + f * (b - a)
-
-
 class GLWindow(QGLWidget):
 
     def __init__(self, gl_format=None):
@@ -47,9 +51,12 @@ class GLWindow(QGLWidget):
         self.__deltaTime = 0.0
         self.__lastTime = 0.0
 
-        self.quadVAO = 0
-        self.cubeVAO = 0
         self.draw_mode = 1
+        # AO at 1 / aoScale of the resolution, with kernelSize samples per pixel
+        self.aoScale = 2
+        self.kernelSize = 32
+        # G-buffer without positions, rebuilt from depth (see gbuffer.py)
+        self.compactGBuffer = True
 
         # if you want press mouse button to active camera rotation set it to false
         self.setMouseTracking(True)
@@ -77,6 +84,18 @@ class GLWindow(QGLWidget):
         self.__geometyPassShader = shaders.compileProgram(vertexShader, fragmentShader)
         vertexShader, fragmentShader = self.loadShaders('9.ssao.vs', '9.ssao_blur.frag')
         self.__ssaoBlurShader = shaders.compileProgram(vertexShader, fragmentShader)
+        _shaders = self.loadShaders('9.ssao.vs', '9.ssao_upsample.frag')
+        self.__ssaoUpsampleShader = glCreateProgram()
+        [glAttachShader(self.__ssaoUpsampleShader, s) for s in _shaders if s]
+        self.__ssaoUpsampleShader = shaders.ShaderProgram(self.__ssaoUpsampleShader)
+        glLinkProgram(self.__ssaoUpsampleShader)
+        glUseProgram(self.__ssaoUpsampleShader)
+        glUniform1i(glGetUniformLocation(self.__ssaoUpsampleShader, 'ssaoInput'), 0)
+        glUniform1i(glGetUniformLocation(self.__ssaoUpsampleShader, 'gPositionDepth'), 1)
+        glUniform1i(glGetUniformLocation(self.__ssaoUpsampleShader, 'gDepth'), 4)
+        self.__ssaoUpsampleShader.check_validate()
+        self.__ssaoUpsampleShader.check_linked()
+        [glDeleteShader(s) for s in _shaders if s]
         _shaders = self.loadShaders('9.ssao.vs', '9.ssao_lighting.frag')
         self.__lightingPassShader = glCreateProgram()
         [glAttachShader(self.__lightingPassShader, s) for s in _shaders if s]
@@ -87,6 +106,7 @@ class GLWindow(QGLWidget):
         glUniform1i(glGetUniformLocation(self.__lightingPassShader, 'gNormal'), 1)
         glUniform1i(glGetUniformLocation(self.__lightingPassShader, 'gAlbedo'), 2)
         glUniform1i(glGetUniformLocation(self.__lightingPassShader, 'ssao'), 3)
+        glUniform1i(glGetUniformLocation(self.__lightingPassShader, 'gDepth'), 4)
         self.__lightingPassShader.check_validate()
         self.__lightingPassShader.check_linked()
         [glDeleteShader(s) for s in _shaders if s]
@@ -99,9 +119,12 @@ class GLWindow(QGLWidget):
         glUniform1i(glGetUniformLocation(self.__ssaoShader, 'gPositionDepth'), 0)
         glUniform1i(glGetUniformLocation(self.__ssaoShader, 'gNormal'), 1)
         glUniform1i(glGetUniformLocation(self.__ssaoShader, 'texNoise'), 2)
+        glUniform1i(glGetUniformLocation(self.__ssaoShader, 'gDepth'), 4)
         self.__ssaoShader.check_validate()
         self.__ssaoShader.check_linked()
         [glDeleteShader(s) for s in _shaders if s]
+        self.__ssaoLocations = dict((name, glGetUniformLocation(self.__ssaoShader, name))
+                                    for name in ('samples', 'kernelSize', 'noiseScale', 'projection'))
 
         # models
         modelPath = os.path.join(abPath, '..', '..', 'resources', 'objects', 'nanosuit', 'nanosuit.obj')
@@ -111,88 +134,16 @@ class GLWindow(QGLWidget):
         self.lightPos = np.array([2.0, 4.0, -2.0], np.float32)
         self.lightColor = np.array([0.2, 0.2, 0.7], np.float32)
 
-        # set up G-Buffer
-        # 3 textures:
-        # 1. Position (RGB)
-        # 2. Color (RGB) + Specular (A)
-        # 3. Normals (RGB)
-        self.gbuffer = glGenFramebuffers(1)
-        glBindFramebuffer(GL_FRAMEBUFFER, self.gbuffer)
-        self.gPositionDepth, self.gNormal, self.gAlbedo = glGenTextures(3)
-        # position color buffer
-        glBindTexture(GL_TEXTURE_2D, self.gPositionDepth)
-        glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA16F, self.width(), self.height(), 0, GL_RGBA, GL_FLOAT, None)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_EDGE)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_EDGE)
-        glFramebufferTexture2D(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, GL_TEXTURE_2D, self.gPositionDepth, 0)
-        # normal color buffer
-        glBindTexture(GL_TEXTURE_2D, self.gNormal)
-        glTexImage2D(GL_TEXTURE_2D, 0, GL_RGB, self.width(), self.height(), 0, GL_RGB, GL_FLOAT, None)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
-        glFramebufferTexture2D(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT1, GL_TEXTURE_2D, self.gNormal, 0)
-        # color + specular buffer
-        glBindTexture(GL_TEXTURE_2D, self.gAlbedo)
-        glTexImage2D(GL_TEXTURE_2D, 0, GL_RGB, self.width(), self.height(), 0, GL_RGB, GL_FLOAT, None)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
-        glFramebufferTexture2D(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT2, GL_TEXTURE_2D, self.gAlbedo, 0)
-        # tell OpenGL which color attachments we'll use (of this framebuffer)
-        attachments = [GL_COLOR_ATTACHMENT0, GL_COLOR_ATTACHMENT1, GL_COLOR_ATTACHMENT2]
-        glDrawBuffers(3, attachments)
-        # create depth buffer (renderbuffer)
-        self.rboDepth = glGenRenderbuffers(1)
-        glBindRenderbuffer(GL_RENDERBUFFER, self.rboDepth)
-        glRenderbufferStorage(GL_RENDERBUFFER, GL_DEPTH_COMPONENT, self.width(), self.height())
-        glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_DEPTH_ATTACHMENT, GL_RENDERBUFFER, self.rboDepth)
-        if glCheckFramebufferStatus(GL_FRAMEBUFFER) != GL_FRAMEBUFFER_COMPLETE:
-            print 'GBuffer Framebuffer not complete!'
-        glBindFramebuffer(GL_FRAMEBUFFER, 0)
-
-        # Also create framebuffer to hold SSAO processing stage
-        self.ssaoFBO, self.ssaoBlurFBO = glGenFramebuffers(2)
-        glBindFramebuffer(GL_FRAMEBUFFER, self.ssaoFBO)
-        self.ssaoColorBuffer, self.ssaoColorBufferBlur = glGenTextures(2)
-        # SSAO Color buffer
-        glBindTexture(GL_TEXTURE_2D, self.ssaoColorBuffer)
-        glTexImage2D(GL_TEXTURE_2D, 0, GL_RED, self.width(), self.height(), 0, GL_RGB, GL_FLOAT, None)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
-        glFramebufferTexture2D(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, GL_TEXTURE_2D, self.ssaoColorBuffer, 0)
-        if glCheckFramebufferStatus(GL_FRAMEBUFFER) != GL_FRAMEBUFFER_COMPLETE:
-            print 'SSAO Framebuffer not complete!'
-        # and blur stage
-        glBindFramebuffer(GL_FRAMEBUFFER, self.ssaoBlurFBO)
-        glBindTexture(GL_TEXTURE_2D, self.ssaoColorBufferBlur)
-        glTexImage2D(GL_TEXTURE_2D, 0, GL_RED, self.width(), self.height(), 0, GL_RGB, GL_FLOAT, None)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
-        glFramebufferTexture2D(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, GL_TEXTURE_2D, self.ssaoColorBufferBlur, 0)
-        if glCheckFramebufferStatus(GL_FRAMEBUFFER) != GL_FRAMEBUFFER_COMPLETE:
-            print 'SSAO Blur Framebuffer not complete!'
-        glBindFramebuffer(GL_FRAMEBUFFER, 0)
-
-        # Sample kernel
-        self.ssaoKernel = []
-        for i in range(64):
-            sample = np.array([random.random() * 2.0 - 1.0,
-                               random.random() * 2.0 - 1.0,
-                               random.random()], np.float32)
-            sample = glm.normalize(sample)
-            sample *= random.random()
-            scale = i / 64.0
-            # scale samples s.t. they're more aligned to center of kernel
-            scale = lerp(0.1, 1.0, scale * scale)
-            sample *= scale
-            self.ssaoKernel.append(sample)
+        # the G-buffer and the SSAO processing stages are render graph passes, see setupGraph;
+        # their targets come from a pool that keeps the other scales' and layouts' for a while
+        self.targets = rendertarget.Pool()
+        self.graph = rendergraph.RenderGraph(self.setupGraph, self.targets)
+
+        # Sample kernel, uploaded whenever kernelSize changes
+        self.uploadedKernelSize = None
 
         # Noise texture
-        self.ssaoNoise = [np.array([random.random() * 2.0 - 1.0, random.random() * 2.0 - 1.0, 0.0], np.float32) for i in range(16)]
-        self.ssaoNoise = np.array(self.ssaoNoise, np.float32)
-        # for i in range(16):
-        #     noise = np.array([random.random() * 2.0 - 1.0, random.random() * 2.0 - 1.0, 0.0], np.float32)
+        self.ssaoNoise = ssao.rotationNoise()
         self.noiseTexture = glGenTextures(1)
         glBindTexture(GL_TEXTURE_2D, self.noiseTexture)
         glTexImage2D(GL_TEXTURE_2D, 0, GL_RGB16F, 4, 4, 0, GL_RGB, GL_FLOAT, self.ssaoNoise)
@@ -201,6 +152,9 @@ class GLWindow(QGLWidget):
         glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_REPEAT)
         glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_REPEAT)
 
+        # per pass CPU/GPU timings, see profiler.py for how to turn them on
+        self.profiler = profiler.Profiler()
+
         glClearColor(0.0, 0.0, 0.0, 1.0)
 
     def resizeGL(self, w, h):
@@ -210,64 +164,95 @@ class GLWindow(QGLWidget):
         currentTime = self.__timer.elapsed() / 1000.0
         self.__deltaTime = currentTime - self.__lastTime
         self.__lastTime = currentTime
+        self.profiler.beginFrame()
+        # initializeGL and Qt bind things behind the state cache's back
+        gl.invalidate()
 
+        self.projection = glm.perspective(self.camera.zoom, float(self.width()) / self.height(), 0.1, 50.0)
+        # set up again when resized, or when the layout or the AO scale changes
+        self.graph.execute(self.width(), self.height(), self.profiler, (self.compactGBuffer, self.aoScale))
+
+        gl.useProgram(0)
+        self.targets.endFrame()
+        self.profiler.endFrame(self.__deltaTime)
+
+    def setupGraph(self, graph, width, height):
         # 1. Geometry Pass: render scene's geometry/color data into gbuffer
-        glBindFramebuffer(GL_FRAMEBUFFER, self.gbuffer)
-        glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
-        projection = glm.perspective(self.camera.zoom, float(self.width()) / self.height(), 0.1, 50.0)
-        view = self.camera.viewMatrix
-        glUseProgram(self.__geometyPassShader)
-        glUniformMatrix4fv(glGetUniformLocation(self.__geometyPassShader, 'projection'), 1, GL_FALSE, projection)
-        glUniformMatrix4fv(glGetUniformLocation(self.__geometyPassShader, 'view'), 1, GL_FALSE, view)
+        # 3 textures:
+        # 1. Position (RGB) + linear depth (A), none in the compact layout
+        # 2. Color (RGB)
+        # 3. Normals (RGB), or octahedral (RG)
+        # and a depth texture
+        self.gbuffer = gbuffer.GBuffer(gbuffer.SSAO, self.compactGBuffer)
+        graph.addPass('geometry', self.drawGeometry, outputs=self.gbuffer.outputs(),
+                      clear=GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+        # 2. Create SSAO texture, at 1 / aoScale of the resolution
+        graph.addPass('ssao', self.drawSSAO, inputs=self.gbuffer.names,
+                      outputs=[('ssao', ssao.target(self.aoScale))], clear=GL_COLOR_BUFFER_BIT)
+        # 3. Blur SSAO texture to remove noise
+        graph.addPass('ssao blur', self.drawSSAOBlur, inputs=['ssao'],
+                      outputs=[('ssao blurred', ssao.target(self.aoScale))], clear=GL_COLOR_BUFFER_BIT)
+        self.aoResult = 'ssao blurred'
+        # and bring it back to full resolution, keeping edges where the depth jumps
+        if self.aoScale > 1:
+            graph.addPass('ssao upsample', self.drawSSAOUpsample, inputs=['ssao blurred'] + self.gbuffer.names,
+                          outputs=[('ssao upsampled', ssao.target(1))])
+            self.aoResult = 'ssao upsampled'
+        # 4. Lighting Pass: calculate lighting by iterating over a screen filled quad pixel-by-pixel using the gbuffer's content.
+        graph.addPass('lighting', self.drawLighting, inputs=self.gbuffer.names + [self.aoResult],
+                      clear=GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+
+    def drawGeometry(self):
+        gl.useProgram(self.__geometyPassShader)
+        glUniformMatrix4fv(glGetUniformLocation(self.__geometyPassShader, 'projection'), 1, GL_FALSE, self.projection)
+        glUniformMatrix4fv(glGetUniformLocation(self.__geometyPassShader, 'view'), 1, GL_FALSE, self.camera.viewMatrix)
+        glUniform1i(glGetUniformLocation(self.__geometyPassShader, 'compact'), self.gbuffer.compact)
         # Floor cube
         model = glm.scale(np.identity(4, np.float32), 20.0, 1.0, 28.0)
         model = glm.translate(model, 0.0, -1.0, 0.0)
-        glUniformMatrix4fv(glGetUniformLocation(self.__geometyPassShader, 'model'), 1, GL_FALSE, model)
+        glconfig.uniformMatrix4fv(glGetUniformLocation(self.__geometyPassShader, 'model'), model)
         self.renderCube()
         # Nanosuit model on the floor
         model = glm.scale(np.identity(4, np.float32), 0.5, 0.5, 0.5)
         model = glm.rotate(model, -90.0, 1.0, 0.0, 0.0)
         model = glm.translate(model, 0.0, 0.0, 5.0)
-        glUniformMatrix4fv(glGetUniformLocation(self.__geometyPassShader, 'model'), 1, GL_FALSE, model)
+        glconfig.uniformMatrix4fv(glGetUniformLocation(self.__geometyPassShader, 'model'), model)
         self.cyborg.draw(self.__geometyPassShader)
-        glBindFramebuffer(GL_FRAMEBUFFER, 0)
-        
-        # 2. Create SSAO texture
-        glBindFramebuffer(GL_FRAMEBUFFER, self.ssaoFBO)
-        glClear(GL_COLOR_BUFFER_BIT)
-        glUseProgram(self.__ssaoShader)
-        glActiveTexture(GL_TEXTURE0)
-        glBindTexture(GL_TEXTURE_2D, self.gPositionDepth)
-        glActiveTexture(GL_TEXTURE1)
-        glBindTexture(GL_TEXTURE_2D, self.gNormal)
-        glActiveTexture(GL_TEXTURE2)
-        glBindTexture(GL_TEXTURE_2D, self.noiseTexture)
-        # send kernel + rotation
-        [glUniform3fv(glGetUniformLocation(self.__ssaoShader, 'samples[{}]'.format(i)), 1, self.ssaoKernel[i]) for i in range(64)]
-        glUniformMatrix4fv(glGetUniformLocation(self.__ssaoShader, 'projection'), 1, GL_FALSE, projection)
+
+    def drawSSAO(self):
+        gl.useProgram(self.__ssaoShader)
+        self.bindGBuffer(self.__ssaoShader, [('gPositionDepth', 0), ('gNormal', 1)])
+        gl.activeTexture(GL_TEXTURE2)
+        gl.bindTexture(GL_TEXTURE_2D, self.noiseTexture)
+        # send kernel (once per size, the program keeps it) + rotation
+        locations = self.__ssaoLocations
+        if self.uploadedKernelSize != self.kernelSize:
+            kernel = ssao.hemisphereKernel(self.kernelSize)
+            glUniform3fv(locations['samples'], len(kernel), kernel)
+            glUniform1i(locations['kernelSize'], len(kernel))
+            self.uploadedKernelSize = self.kernelSize
+        glUniform2fv(locations['noiseScale'], 1, ssao.noiseScale(self.width(), self.height(), self.aoScale))
+        glUniformMatrix4fv(locations['projection'], 1, GL_FALSE, self.projection)
         self.renderQuad()
-        glBindFramebuffer(GL_FRAMEBUFFER, 0)
-        
-        # 3. Blur SSAO texture to remove noise
-        glBindFramebuffer(GL_FRAMEBUFFER, self.ssaoBlurFBO)
-        glClear(GL_COLOR_BUFFER_BIT)
-        glUseProgram(self.__ssaoBlurShader)
-        glActiveTexture(GL_TEXTURE0)
-        glBindTexture(GL_TEXTURE_2D, self.ssaoColorBuffer)
+
+    def drawSSAOBlur(self):
+        gl.useProgram(self.__ssaoBlurShader)
+        gl.activeTexture(GL_TEXTURE0)
+        gl.bindTexture(GL_TEXTURE_2D, self.graph.texture('ssao'))
         self.renderQuad()
-        glBindFramebuffer(GL_FRAMEBUFFER, 0)
 
-        # 4. Lighting Pass: calculate lighting by iterating over a screen filled quad pixel-by-pixel using the gbuffer's content.
-        glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
-        glUseProgram(self.__lightingPassShader)
-        glActiveTexture(GL_TEXTURE0)
-        glBindTexture(GL_TEXTURE_2D, self.gPositionDepth)
-        glActiveTexture(GL_TEXTURE1)
-        glBindTexture(GL_TEXTURE_2D, self.gNormal)
-        glActiveTexture(GL_TEXTURE2)
-        glBindTexture(GL_TEXTURE_2D, self.gAlbedo)
-        glActiveTexture(GL_TEXTURE3) # add extra SSAO texture to lighting pass
-        glBindTexture(GL_TEXTURE_2D, self.ssaoColorBufferBlur)
+    def drawSSAOUpsample(self):
+        gl.useProgram(self.__ssaoUpsampleShader)
+        gl.activeTexture(GL_TEXTURE0)
+        gl.bindTexture(GL_TEXTURE_2D, self.graph.texture('ssao blurred'))
+        self.bindGBuffer(self.__ssaoUpsampleShader, [('gPositionDepth', 1)])
+        self.renderQuad()
+
+    def drawLighting(self):
+        gl.useProgram(self.__lightingPassShader)
+        self.bindGBuffer(self.__lightingPassShader, [('gPositionDepth', 0), ('gNormal', 1), ('gAlbedo', 2)])
+        gl.activeTexture(GL_TEXTURE3) # add extra SSAO texture to lighting pass
+        gl.bindTexture(GL_TEXTURE_2D, self.graph.texture(self.aoResult))
         # also send light relevent uniforms
         lightPosView = (self.camera.viewMatrix * np.array([self.lightPos[0], self.lightPos[1], self.lightPos[2], 1.0], np.float32))[3, :4]
         glUniform3fv(glGetUniformLocation(self.__lightingPassShader, 'light.Position'), 1, lightPosView)
@@ -281,100 +266,25 @@ class GLWindow(QGLWidget):
         glUniform1i(glGetUniformLocation(self.__lightingPassShader, 'draw_mode'), self.draw_mode)
         self.renderQuad()
 
-        glUseProgram(0)
+    def bindGBuffer(self, shader, units):
+        # (name, unit) textures and the depth on unit 4; the compact G-buffer
+        # has no gPositionDepth, it needs the depth and the inverse projection
+        for name, unit in units:
+            if name in self.gbuffer.names:
+                gl.activeTexture(GL_TEXTURE0 + unit)
+                gl.bindTexture(GL_TEXTURE_2D, self.graph.texture(name))
+        gl.activeTexture(GL_TEXTURE4)
+        gl.bindTexture(GL_TEXTURE_2D, self.graph.texture(gbuffer.DEPTH))
+        glUniform1i(glGetUniformLocation(shader, 'compact'), self.gbuffer.compact)
+        if self.gbuffer.compact:
+            inverseProjection = np.linalg.inv(self.projection).astype(np.float32)
+            glUniformMatrix4fv(glGetUniformLocation(shader, 'inverseProjection'), 1, GL_FALSE, inverseProjection)
 
     def renderQuad(self):
-        if self.quadVAO == 0:
-            quadVertices = np.array([
-                # positions       # texture coords
-                -1.0,  1.0, 0.0,  0.0, 1.0,
-                -1.0, -1.0, 0.0,  0.0, 0.0,
-                 1.0,  1.0, 0.0,  1.0, 1.0,
-                 1.0, -1.0, 0.0,  1.0, 0.0,
-            ], np.float32)
-
-            # setup plane VAO
-            self.quadVAO = glGenVertexArrays(1)
-            quadVBO = glGenBuffers(1)
-            glBindVertexArray(self.quadVAO)
-            glBindBuffer(GL_ARRAY_BUFFER, quadVBO)
-            glBufferData(GL_ARRAY_BUFFER, quadVertices.nbytes, quadVertices, GL_STATIC_DRAW)
-            glEnableVertexAttribArray(0)
-            glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE, 5 * quadVertices.itemsize, None)
-            glEnableVertexAttribArray(1)
-            glVertexAttribPointer(1, 2, GL_FLOAT, GL_FALSE, 5 * quadVertices.itemsize, ctypes.c_void_p(3 * quadVertices.itemsize))
-
-        glBindVertexArray(self.quadVAO)
-        glDrawArrays(GL_TRIANGLE_STRIP, 0, 4)
-        glBindVertexArray(0)
+        primitives.mesh('quad').draw(gl)
 
     def renderCube(self):
-        # initilize (if necessary)
-        if self.cubeVAO == 0:
-            vertices = np.array([
-                # Back face
-                -0.5, -0.5, -0.5, 0.0, 0.0, -1.0, 0.0, 0.0, # Bottom-left
-                0.5, 0.5, -0.5, 0.0, 0.0, -1.0, 1.0, 1.0, # top-right
-                0.5, -0.5, -0.5, 0.0, 0.0, -1.0, 1.0, 0.0, # bottom-right
-                0.5, 0.5, -0.5, 0.0, 0.0, -1.0, 1.0, 1.0,  # top-right
-                -0.5, -0.5, -0.5, 0.0, 0.0, -1.0, 0.0, 0.0,  # bottom-left
-                -0.5, 0.5, -0.5, 0.0, 0.0, -1.0, 0.0, 1.0,# top-left
-                # Front face
-                -0.5, -0.5, 0.5, 0.0, 0.0, 1.0, 0.0, 0.0, # bottom-left
-                0.5, -0.5, 0.5, 0.0, 0.0, 1.0, 1.0, 0.0,  # bottom-right
-                0.5, 0.5, 0.5, 0.0, 0.0, 1.0, 1.0, 1.0,  # top-right
-                0.5, 0.5, 0.5, 0.0, 0.0, 1.0, 1.0, 1.0, # top-right
-                -0.5, 0.5, 0.5, 0.0, 0.0, 1.0, 0.0, 1.0,  # top-left
-                -0.5, -0.5, 0.5, 0.0, 0.0, 1.0, 0.0, 0.0,  # bottom-left
-                # Left face
-                -0.5, 0.5, 0.5, -1.0, 0.0, 0.0, 1.0, 0.0, # top-right
-                -0.5, 0.5, -0.5, -1.0, 0.0, 0.0, 1.0, 1.0, # top-left
-                -0.5, -0.5, -0.5, -1.0, 0.0, 0.0, 0.0, 1.0,  # bottom-left
-                -0.5, -0.5, -0.5, -1.0, 0.0, 0.0, 0.0, 1.0, # bottom-left
-                -0.5, -0.5, 0.5, -1.0, 0.0, 0.0, 0.0, 0.0,  # bottom-right
-                -0.5, 0.5, 0.5, -1.0, 0.0, 0.0, 1.0, 0.0, # top-right
-                # Right face
-                0.5, 0.5, 0.5, 1.0, 0.0, 0.0, 1.0, 0.0, # top-left
-                0.5, -0.5, -0.5, 1.0, 0.0, 0.0, 0.0, 1.0, # bottom-right
-                0.5, 0.5, -0.5, 1.0, 0.0, 0.0, 1.0, 1.0, # top-right
-                0.5, -0.5, -0.5, 1.0, 0.0, 0.0, 0.0, 1.0,  # bottom-right
-                0.5, 0.5, 0.5, 1.0, 0.0, 0.0, 1.0, 0.0,  # top-left
-                0.5, -0.5, 0.5, 1.0, 0.0, 0.0, 0.0, 0.0, # bottom-left
-                # Bottom face
-                -0.5, -0.5, -0.5, 0.0, -1.0, 0.0, 0.0, 1.0, # top-right
-                0.5, -0.5, -0.5, 0.0, -1.0, 0.0, 1.0, 1.0, # top-left
-                0.5, -0.5, 0.5, 0.0, -1.0, 0.0, 1.0, 0.0,# bottom-left
-                0.5, -0.5, 0.5, 0.0, -1.0, 0.0, 1.0, 0.0, # bottom-left
-                -0.5, -0.5, 0.5, 0.0, -1.0, 0.0, 0.0, 0.0, # bottom-right
-                -0.5, -0.5, -0.5, 0.0, -1.0, 0.0, 0.0, 1.0, # top-right
-                # Top face
-                -0.5, 0.5, -0.5, 0.0, 1.0, 0.0, 0.0, 1.0,# top-left
-                0.5, 0.5, 0.5, 0.0, 1.0, 0.0, 1.0, 0.0, # bottom-right
-                0.5, 0.5, -0.5, 0.0, 1.0, 0.0, 1.0, 1.0, # top-right
-                0.5, 0.5, 0.5, 0.0, 1.0, 0.0, 1.0, 0.0, # bottom-right
-                -0.5, 0.5, -0.5, 0.0, 1.0, 0.0, 0.0, 1.0,# top-left
-                -0.5, 0.5, 0.5, 0.0, 1.0, 0.0, 0.0, 0.0, # bottom-left
-            ], np.float32)
-
-            self.cubeVAO = glGenVertexArrays(1)
-            cubeVBO = glGenBuffers(1)
-            glBindVertexArray(self.cubeVAO)
-            # fill buffer
-            glBindBuffer(GL_ARRAY_BUFFER, cubeVBO)
-            glBufferData(GL_ARRAY_BUFFER, vertices.nbytes, vertices, GL_STATIC_DRAW)
-            # link vertex attributes
-            glEnableVertexAttribArray(0)
-            glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE, 8 * vertices.itemsize, None)
-            glEnableVertexAttribArray(1)
-            glVertexAttribPointer(1, 3, GL_FLOAT, GL_FALSE, 8 * vertices.itemsize, ctypes.c_void_p(3 * vertices.itemsize))
-            glEnableVertexAttribArray(2)
-            glVertexAttribPointer(2, 2, GL_FLOAT, GL_FALSE, 8 * vertices.itemsize, ctypes.c_void_p(6 * vertices.itemsize))
-            glBindBuffer(GL_ARRAY_BUFFER, 0)
-            glBindVertexArray(0)
-        # render cube
-        glBindVertexArray(self.cubeVAO)
-        glDrawArrays(GL_TRIANGLES, 0, 36)
-        glBindVertexArray(0)
+        primitives.mesh('cube').draw(gl)
 
     def keyPressEvent(self, event):
         if event.key() == Qt.Key_Escape:
@@ -398,6 +308,12 @@ class GLWindow(QGLWidget):
             self.draw_mode = 4
         if event.key() == Qt.Key_5:
             self.draw_mode = 5
+        if event.key() == Qt.Key_R:
+            self.aoScale = ssao.SCALES[(ssao.SCALES.index(self.aoScale) + 1) % len(ssao.SCALES)]
+        if event.key() == Qt.Key_K:
+            self.kernelSize = ssao.KERNEL_SIZES[(ssao.KERNEL_SIZES.index(self.kernelSize) + 1) % len(ssao.KERNEL_SIZES)]
+        if event.key() == Qt.Key_G:
+            self.compactGBuffer = not self.compactGBuffer
 
         self.updateGL()
         return super(GLWindow, self).keyPressEvent(event)
@@ -425,6 +341,10 @@ class GLWindow(QGLWidget):
         self.updateGL()
 
 def loadTexture(texPath, gammaCorrection=False):
+    textureID = texture.loadMipmappedTexture(texPath, gammaCorrection, clampAlpha=True)
+    if textureID is not None:
+        return textureID
+
     textureID = glGenTextures(1)
     im = Image.open(texPath)
     alpha = im.mode == 'RGBA'
@@ -7,6 +7,9 @@ in vec2 TexCoords;
 in vec3 FragPos;
 in vec3 Normal;
 
+// no position attachment, normals octahedral in two unorm channels (see gbuffer.py)
+uniform bool compact;
+
 const float NEAR = 0.1;
 const float FAR = 50.0f;
 float LinearizeDepth(float depth)
@@ -15,6 +18,14 @@ float LinearizeDepth(float depth)
     return (2.0 * NEAR * FAR) / (FAR + NEAR - z * (FAR - NEAR));	
 }
 
+vec2 octEncode(vec3 n)
+{
+    n /= abs(n.x) + abs(n.y) + abs(n.z);
+    vec2 signs = vec2(n.x >= 0.0 ? 1.0 : -1.0, n.y >= 0.0 ? 1.0 : -1.0);
+    vec2 e = n.z >= 0.0 ? n.xy : (1.0 - abs(n.yx)) * signs;
+    return e * 0.5 + 0.5;
+}
+
 void main()
 {    
     // Store the fragment position vector in the first gbuffer texture
@@ -22,7 +33,7 @@ void main()
     // And store linear depth into gPositionDepth's alpha component
     gPositionDepth.a = LinearizeDepth(gl_FragCoord.z); // Divide by far to store depth in range 0.0 - 1.0
     // Also store the per-fragment normals into the gbuffer
-    gNormal = normalize(Normal);
+    gNormal = compact ? vec3(octEncode(normalize(Normal)), 0.0) : normalize(Normal);
     // And the diffuse per-fragment color
     gAlbedoSpec.rgb = vec3(0.95);
 }
\ No newline at end of file
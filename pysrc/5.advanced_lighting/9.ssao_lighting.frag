@@ -6,6 +6,10 @@ uniform sampler2D gPositionDepth;
 uniform sampler2D gNormal;
 uniform sampler2D gAlbedo;
 uniform sampler2D ssao;
+uniform sampler2D gDepth;
+// no gPositionDepth: rebuild it from gDepth, gNormal is octahedral (see gbuffer.py)
+uniform bool compact;
+uniform mat4 inverseProjection;
 
 struct Light {
     vec3 Position;
@@ -18,13 +22,48 @@ struct Light {
 uniform Light light;
 uniform int draw_mode;
 
+vec3 octDecode(vec2 e)
+{
+    e = e * 2.0 - 1.0;
+    vec3 n = vec3(e, 1.0 - abs(e.x) - abs(e.y));
+    vec2 signs = vec2(e.x >= 0.0 ? 1.0 : -1.0, e.y >= 0.0 ? 1.0 : -1.0);
+    if(n.z < 0.0)
+        n.xy = (1.0 - abs(e.yx)) * signs;
+    return normalize(n);
+}
+
+// view space position of the G-buffer texel at uv, (0, 0, 0) where nothing was drawn as in the cleared gPositionDepth
+vec3 viewPosition(vec2 uv)
+{
+    float depth = texture(gDepth, uv).r;
+    if(depth == 1.0)
+        return vec3(0.0);
+    vec2 size = vec2(textureSize(gDepth, 0));
+    vec2 ndc = (floor(clamp(uv, 0.0, 1.0) * size) + 0.5) / size * 2.0 - 1.0;
+    vec4 position = inverseProjection * vec4(ndc, depth * 2.0 - 1.0, 1.0);
+    return position.xyz / position.w;
+}
+
 void main()
 {             
     // Retrieve data from gbuffer
-    vec3 FragPos = texture(gPositionDepth, TexCoords).rgb;
-    vec3 Normal = texture(gNormal, TexCoords).rgb;
+    vec3 FragPos;
+    vec3 Normal;
+    float Depth;
+    if(compact)
+    {
+        FragPos = viewPosition(TexCoords);
+        // nothing drawn there: no normal either, as in the cleared gNormal
+        Normal = FragPos.z == 0.0 ? vec3(0.0) : octDecode(texture(gNormal, TexCoords).rg);
+        Depth = -FragPos.z;
+    }
+    else
+    {
+        FragPos = texture(gPositionDepth, TexCoords).rgb;
+        Normal = texture(gNormal, TexCoords).rgb;
+        Depth = texture(gPositionDepth, TexCoords).a;
+    }
     vec3 Diffuse = texture(gAlbedo, TexCoords).rgb;
-    float Depth = texture(gPositionDepth, TexCoords).a;
     float AmbientOcclusion = texture(ssao, TexCoords).r;
     
     // Then calculate lighting as usual
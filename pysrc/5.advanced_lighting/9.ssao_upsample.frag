@@ -0,0 +1,55 @@
+#version 330 core
+in vec2 TexCoords;
+out float fragColor;
+
+uniform sampler2D ssaoInput;
+uniform sampler2D gPositionDepth;
+uniform sampler2D gDepth;
+// no gPositionDepth: rebuild the depth from gDepth (see gbuffer.py)
+uniform bool compact;
+uniform mat4 inverseProjection;
+
+// how fast a low resolution texel's weight falls off with its relative depth difference
+const float depthFalloff = 32.0;
+
+// gPositionDepth's alpha: the distance in front of the camera, 0.0 where nothing was drawn
+float linearDepth(vec2 uv)
+{
+    if(!compact)
+        return texture(gPositionDepth, uv).a;
+    float depth = texture(gDepth, uv).r;
+    if(depth == 1.0)
+        return 0.0;
+    // a perspective projection's view space z only depends on the depth
+    vec2 zw = inverseProjection[2].zw * (depth * 2.0 - 1.0) + inverseProjection[3].zw;
+    return -zw.x / zw.y;
+}
+
+void main() {
+    // the 2x2 low resolution texels around this pixel and its bilinear position among them
+    ivec2 lowSize = textureSize(ssaoInput, 0);
+    vec2 position = TexCoords * vec2(lowSize) - 0.5;
+    vec2 base = floor(position);
+    vec2 f = position - base;
+    float depth = linearDepth(TexCoords);
+
+    float result = 0.0;
+    float totalWeight = 0.0;
+    for (int i = 0; i < 4; ++i)
+    {
+        vec2 offset = vec2(i & 1, i >> 1);
+        ivec2 texel = clamp(ivec2(base + offset), ivec2(0), lowSize - 1);
+        // the G-buffer depth the SSAO pass saw at that texel's centre
+        float texelDepth = linearDepth((vec2(texel) + 0.5) / vec2(lowSize));
+        float weight = mix(1.0 - f.x, f.x, offset.x) * mix(1.0 - f.y, f.y, offset.y);
+        weight *= exp(-depthFalloff * abs(texelDepth - depth) / max(depth, 1e-4));
+        result += texelFetch(ssaoInput, texel, 0).r * weight;
+        totalWeight += weight;
+    }
+    // no texel at a similar depth: take the nearest
+    if (totalWeight < 1e-4)
+        result = texelFetch(ssaoInput, clamp(ivec2(position + 0.5), ivec2(0), lowSize - 1), 0).r;
+    else
+        result /= totalWeight;
+    fragColor = result;
+}
@@ -0,0 +1,328 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Offline asset compiler and memory-mapped reader for packed runtime assets.
+
+Compile everything under resources/ once:
+
+    python pysrc/assetpack.py resources
+
+which writes resources/assets.pak. Model and the texture loaders pick the
+pack up automatically (it is searched for in the parent directories of the
+requested asset) and fall back to assimp/PIL for anything that is missing
+or older than its source file.
+
+Layout: a fixed header, the raw arrays (each aligned to ALIGNMENT bytes so
+they can be viewed straight out of the mmap), and a JSON table of contents
+at the end that maps entry names to offsets.
+"""
+
+import os
+import sys
+import json
+import mmap
+import struct
+
+import numpy as np
+
+import bcn
+import mipmap
+
+PACK_NAME = 'assets.pak'
+MAGIC = b'LPYOGLPK'
+# 2: sRGB filtered mip chains next to the plain ones
+VERSION = 2
+ALIGNMENT = 64
+HEADER = struct.Struct('<8sIIQQ') # magic, version, flags, toc offset, toc size
+
+TEXTURE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.tga', '.bmp')
+MODEL_EXTENSIONS = ('.obj',)
+# golden.py's reference frames are PNGs that no script ever loads
+SKIPPED_DIRECTORIES = ('golden',)
+
+# same semantics as mesh.TextureType, duplicated to keep this module free of GL
+MATERIAL_TEXTURES = {'texture_diffuse' : 1,
+                     'texture_specular' : 2,
+                     'texture_normal' : 5,
+                     'texture_height' : 3}
+
+
+class AssetPackWriter(object):
+
+    def __init__(self, path, kernel='box', compress=False):
+        self.path = path
+        self.kernel = kernel
+        self.compress = compress
+        self.entries = {}
+        self.models = {}
+        self.textures = {}
+        self.__file = open(path, 'wb')
+        self.__file.write(b'\0' * HEADER.size)
+
+    def addArray(self, name, array):
+        array = np.ascontiguousarray(array)
+        offset = self.__file.tell()
+        pad = -offset % ALIGNMENT
+        self.__file.write(b'\0' * pad)
+        offset += pad
+        self.__file.write(array.tobytes())
+        self.entries[name] = {'offset': offset,
+                              'nbytes': array.nbytes,
+                              'dtype': array.dtype.str,
+                              'shape': list(array.shape)}
+        return name
+
+    def addTexture(self, key, path):
+        pixels = mipmap.loadImage(path)
+        chain = mipmap.generateMipChain(pixels, kernel=self.kernel)
+        # textures loaded with gamma correction are filtered in linear light, as the mip cache does;
+        # both chains start from the same image, so they share level 0
+        srgbChain = mipmap.generateMipChain(pixels, srgb=True, kernel=self.kernel)
+        levels = []
+        for i, level in enumerate(chain):
+            levels.append(self.addArray('texture/{}/{}'.format(key, i), level))
+        srgbLevels = levels[:1]
+        for i, level in enumerate(srgbChain[1:], 1):
+            srgbLevels.append(self.addArray('texture/{}/srgb/{}'.format(key, i), level))
+        self.textures[key] = {'mtime': os.path.getmtime(path),
+                              'width': pixels.shape[1],
+                              'height': pixels.shape[0],
+                              'channels': pixels.shape[2],
+                              'levels': levels,
+                              'srgbLevels': srgbLevels}
+        if self.compress:
+            return self.addCompressedChain(key, chain, srgbChain)
+
+    def addCompressedChain(self, key, chain, srgbChain):
+        # the uncompressed chain stays in the pack for drivers without the extension
+        fmt = bcn.chooseFormat(chain[0].shape[2], key)
+        levels, quality = self.__addBlocks(key, fmt, chain)
+        self.textures[key]['compressed'] = {'format': fmt, 'levels': levels}
+        rawBytes = sum(level.nbytes for level in chain)
+        compressedBytes = sum(self.entries[name]['nbytes'] for name in levels)
+        # BC5 has no sRGB format, normal maps are never loaded with gamma correction
+        if fmt != 'bc5':
+            srgbLevels = levels[:1] + self.__addBlocks(key + '/srgb', fmt, srgbChain[1:], first=1)[0]
+            self.textures[key]['compressed']['srgbLevels'] = srgbLevels
+            # both sides count the sRGB chain past the shared level 0
+            rawBytes += sum(level.nbytes for level in srgbChain[1:])
+            compressedBytes += sum(self.entries[name]['nbytes'] for name in srgbLevels[1:])
+        return fmt, rawBytes, compressedBytes, quality
+
+    def __addBlocks(self, key, fmt, chain, first=0):
+        # block data entries of chain's levels, and the PSNR of level 0 if it is among them
+        channels = {'bc1': 3, 'bc3': 4, 'bc5': 2}[fmt]
+        levels = []
+        quality = None
+        for i, level in enumerate(chain, first):
+            if fmt == 'bc3' and level.shape[2] == 3:
+                level = np.dstack([level, np.full(level.shape[:2], 255, np.uint8)])
+            data = bcn.encode(level[..., :channels], fmt)
+            if i == 0:
+                decoded = bcn.decode(data, fmt, level.shape[0], level.shape[1])
+                quality = bcn.psnr(level[..., :channels], decoded)
+            levels.append(self.addArray('texture/{}/{}/{}'.format(key, fmt, i), data))
+        return levels, quality
+
+    def addModel(self, key, path, root):
+        import pyassimp as assimp
+        scene = assimp.load(path, processing=(assimp.postprocess.aiProcess_Triangulate |
+                                              assimp.postprocess.aiProcess_FlipUVs |
+                                              assimp.postprocess.aiProcess_CalcTangentSpace))
+        if not scene:
+            raise Exception("ASSIMP can't load model")
+
+        directory = os.path.dirname(path)
+        meshes = []
+        for i, mesh in enumerate(scene.meshes):
+            prefix = 'model/{}/{}/'.format(key, i)
+            vertices = mesh.vertices.astype(np.float32)
+            arrays = {
+                'vertices': self.addArray(prefix + 'vertices', vertices),
+                'normals': self.addArray(prefix + 'normals', mesh.normals.astype(np.float32)),
+                'texcoords': self.addArray(prefix + 'texcoords', mesh.texturecoords[0][:, :2].astype(np.float32)),
+                'tangents': self.addArray(prefix + 'tangents', mesh.tangents.astype(np.float32)),
+                'bitangents': self.addArray(prefix + 'bitangents', mesh.bitangents.astype(np.float32)),
+                'faces': self.addArray(prefix + 'faces', mesh.faces.astype(np.uint32)),
+            }
+            textures = {}
+            for name, semantic in MATERIAL_TEXTURES.items():
+                fileKey = ('file', semantic)
+                if fileKey not in mesh.material.properties:
+                    continue
+                texturePath = os.path.join(directory, mesh.material.properties[fileKey])
+                textures[name] = relativeKey(texturePath, root)
+            meshes.append({'arrays': arrays,
+                           'bounds': [vertices.min(axis=0).tolist(), vertices.max(axis=0).tolist()],
+                           'textures': textures})
+
+        assimp.release(scene)
+        self.models[key] = {'mtime': os.path.getmtime(path), 'meshes': meshes}
+
+    def close(self):
+        toc = json.dumps({'entries': self.entries,
+                          'models': self.models,
+                          'textures': self.textures}, sort_keys=True).encode('utf-8')
+        tocOffset = self.__file.tell()
+        self.__file.write(toc)
+        self.__file.seek(0)
+        self.__file.write(HEADER.pack(MAGIC, VERSION, 0, tocOffset, len(toc)))
+        self.__file.close()
+
+
+class PackedMaterial(object):
+    __slots__ = ['properties']
+
+    def __init__(self, properties):
+        self.properties = properties
+
+
+class PackedMesh(object):
+    """Mirrors the parts of a pyassimp mesh that mesh.Mesh reads."""
+
+    def __init__(self, pack, desc, root):
+        arrays = desc['arrays']
+        self.vertices = pack.array(arrays['vertices'])
+        self.normals = pack.array(arrays['normals'])
+        self.texturecoords = [pack.array(arrays['texcoords'])]
+        self.tangents = pack.array(arrays['tangents'])
+        self.bitangents = pack.array(arrays['bitangents'])
+        self.faces = pack.array(arrays['faces'])
+        self.bounds = np.array(desc['bounds'], np.float32)
+        # texture paths are stored relative to the pack, hand them back absolute
+        properties = {}
+        for name, key in desc['textures'].items():
+            properties[('file', MATERIAL_TEXTURES[name])] = os.path.join(root, *key.split('/'))
+        self.material = PackedMaterial(properties)
+
+
+class AssetPack(object):
+
+    def __init__(self, path):
+        self.path = path
+        self.root = os.path.dirname(os.path.abspath(path))
+        self.__file = open(path, 'rb')
+        self.__mmap = mmap.mmap(self.__file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _flags, tocOffset, tocSize = HEADER.unpack_from(self.__mmap, 0)
+        if magic != MAGIC:
+            raise Exception('{} is not an asset pack'.format(path))
+        if version != VERSION:
+            raise Exception('{} is a version {} asset pack, not {}; compile it again with python pysrc/assetpack.py'.format(
+                path, version, VERSION))
+        toc = json.loads(self.__mmap[tocOffset:tocOffset + tocSize].decode('utf-8'))
+        self.entries = toc['entries']
+        self.models = toc['models']
+        self.textures = toc['textures']
+
+    def array(self, name):
+        entry = self.entries[name]
+        dtype = np.dtype(entry['dtype'])
+        count = entry['nbytes'] // dtype.itemsize
+        return np.frombuffer(self.__mmap, dtype, count, entry['offset']).reshape(entry['shape'])
+
+    def textureLevels(self, key, srgb=False):
+        return [self.array(name) for name in self.textures[key]['srgbLevels' if srgb else 'levels']]
+
+    def compressedLevels(self, key, srgb=False):
+        # (format, block data per level) or (None, None) for uncompressed packs and BC5's missing sRGB chain
+        compressed = self.textures[key].get('compressed')
+        if compressed is None:
+            return None, None
+        names = compressed.get('srgbLevels' if srgb else 'levels')
+        if names is None:
+            return None, None
+        return compressed['format'], [self.array(name) for name in names]
+
+    def meshes(self, key):
+        return [PackedMesh(self, desc, self.root) for desc in self.models[key]['meshes']]
+
+    def close(self):
+        self.__mmap.close()
+        self.__file.close()
+
+
+def relativeKey(path, root):
+    return os.path.relpath(os.path.abspath(path), os.path.abspath(root)).replace(os.sep, '/')
+
+
+_packs = {}
+
+def findPack(path):
+    # returns the pack covering path and path's key inside it, or (None, None)
+    directory = os.path.dirname(os.path.abspath(path))
+    while True:
+        packPath = os.path.join(directory, PACK_NAME)
+        if packPath in _packs or os.path.exists(packPath):
+            if packPath not in _packs:
+                _packs[packPath] = AssetPack(packPath)
+            return _packs[packPath], relativeKey(path, directory)
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            return None, None
+        directory = parent
+
+
+def _isFresh(path, entry):
+    # a source file edited after compiling wins over the pack
+    return not os.path.exists(path) or os.path.getmtime(path) <= entry['mtime']
+
+def lookupTexture(path):
+    pack, key = findPack(path)
+    if pack is None or key not in pack.textures or not _isFresh(path, pack.textures[key]):
+        return None, None
+    return pack, key
+
+def lookupModel(path):
+    pack, key = findPack(path)
+    if pack is None or key not in pack.models or not _isFresh(path, pack.models[key]):
+        return None, None
+    return pack, key
+
+def exists(path):
+    return os.path.exists(path) or lookupTexture(path)[0] is not None
+
+
+def compileResources(root, output, kernel='box', compress=False):
+    writer = AssetPackWriter(output, kernel, compress)
+    rawTotal = compressedTotal = 0
+    for directory, dirs, files in os.walk(root):
+        if directory == root:
+            dirs[:] = [name for name in dirs if name not in SKIPPED_DIRECTORIES]
+        for name in sorted(files):
+            path = os.path.join(directory, name)
+            key = relativeKey(path, root)
+            ext = os.path.splitext(name)[1].lower()
+            if ext in TEXTURE_EXTENSIONS:
+                report = writer.addTexture(key, path)
+                if report is None:
+                    print('texture  {}'.format(key))
+                    continue
+                fmt, rawBytes, compressedBytes, quality = report
+                rawTotal += rawBytes
+                compressedTotal += compressedBytes
+                print('texture  {} {} {:.1f}MB -> {:.1f}MB, PSNR {:.2f}dB'.format(
+                    key, fmt, rawBytes / 1048576.0, compressedBytes / 1048576.0, quality))
+            elif ext in MODEL_EXTENSIONS:
+                try:
+                    writer.addModel(key, path, root)
+                    print('model    {}'.format(key))
+                except Exception as e:
+                    print('skipped  {} ({})'.format(key, e))
+    writer.close()
+    print('wrote {} ({} entries)'.format(output, len(writer.entries)))
+    if compress:
+        print('texture memory {:.1f}MB -> {:.1f}MB ({:.1f}MB saved)'.format(
+            rawTotal / 1048576.0, compressedTotal / 1048576.0, (rawTotal - compressedTotal) / 1048576.0))
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Compile resources into a memory-mappable asset pack.')
+    parser.add_argument('resources', help='resource directory to compile')
+    parser.add_argument('-o', '--output', help='output pack (default: <resources>/{})'.format(PACK_NAME))
+    parser.add_argument('--kernel', choices=sorted(mipmap.KERNELS), default='box', help='mip downsampling kernel')
+    parser.add_argument('--compress', action='store_true', help='also store BC1/BC3/BC5 block compressed textures')
+    args = parser.parse_args()
+    compileResources(args.resources, args.output or os.path.join(args.resources, PACK_NAME), args.kernel, args.compress)
+    sys.exit(0)
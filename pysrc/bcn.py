@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Block compression (BC1/BC3/BC5, a.k.a. DXT1/DXT5/RGTC2) in numpy.
+
+The encoders are simple but fully vectorized over all 4x4 blocks of an
+image: BC1 colors use the block's principal axis to pick endpoints, alpha
+and the two BC5 channels use min/max endpoints with the 8-value palette.
+Decoders are included so the quality can be measured (see psnr).
+"""
+
+import numpy as np
+
+# bytes per 4x4 block
+BLOCK_BYTES = {'bc1': 8, 'bc3': 16, 'bc5': 16}
+
+_BC1_BLOCK = np.dtype([('c0', '<u2'), ('c1', '<u2'), ('indices', '<u4')])
+
+
+def toBlocks(pixels):
+    # (h, w, c) -> (blocks, 16, c), edges repeated up to a multiple of 4
+    h, w, c = pixels.shape
+    ph, pw = -h % 4, -w % 4
+    if ph or pw:
+        pixels = np.pad(pixels, [(0, ph), (0, pw), (0, 0)], mode='edge')
+    bh, bw = pixels.shape[0] // 4, pixels.shape[1] // 4
+    return pixels.reshape(bh, 4, bw, 4, c).transpose(0, 2, 1, 3, 4).reshape(bh * bw, 16, c)
+
+
+def fromBlocks(blocks, height, width):
+    bh, bw = (height + 3) // 4, (width + 3) // 4
+    c = blocks.shape[2]
+    pixels = blocks.reshape(bh, bw, 4, 4, c).transpose(0, 2, 1, 3, 4).reshape(bh * 4, bw * 4, c)
+    return pixels[:height, :width]
+
+
+def _pack565(colors):
+    c = np.rint(colors * np.array([31.0, 63.0, 31.0]) / 255.0).astype(np.uint16)
+    return (c[:, 0] << 11) | (c[:, 1] << 5) | c[:, 2]
+
+
+def _unpack565(c):
+    r = (c >> 11) & 31
+    g = (c >> 5) & 63
+    b = c & 31
+    return np.stack([(r << 3) | (r >> 2), (g << 2) | (g >> 4), (b << 3) | (b >> 2)], axis=-1).astype(np.float32)
+
+
+def _bc1Palette(c0, c1):
+    p0 = _unpack565(c0)
+    p1 = _unpack565(c1)
+    return np.stack([p0, p1, (2.0 * p0 + p1) / 3.0, (p0 + 2.0 * p1) / 3.0], axis=1)
+
+
+def encodeBC1Blocks(blocks):
+    """Encode (n, 16, 3) color blocks into (n,) BC1 records (4-color mode)."""
+    blocks = blocks.astype(np.float32)
+    centered = blocks - blocks.mean(axis=1, keepdims=True)
+    cov = np.einsum('nki,nkj->nij', centered, centered)
+    # principal axis by a few power iterations
+    axis = np.ones((len(blocks), 3), np.float32)
+    for i in range(4):
+        axis = np.einsum('nij,nj->ni', cov, axis)
+        norm = np.sqrt((axis * axis).sum(axis=1, keepdims=True))
+        axis = np.where(norm > 1e-6, axis / np.maximum(norm, 1e-6), 0.57735)
+    proj = np.einsum('nki,ni->nk', centered, axis)
+    rows = np.arange(len(blocks))
+    c0 = _pack565(blocks[rows, proj.argmax(axis=1)])
+    c1 = _pack565(blocks[rows, proj.argmin(axis=1)])
+    # c0 > c1 selects the 4-color mode
+    swap = c0 < c1
+    c0, c1 = np.where(swap, c1, c0), np.where(swap, c0, c1)
+
+    palette = _bc1Palette(c0, c1)
+    dist = ((blocks[:, :, None, :] - palette[:, None, :, :]) ** 2).sum(axis=3)
+    indices = dist.argmin(axis=2).astype(np.uint32)
+    # identical endpoints decode in 3-color mode, index 0 is still exact there
+    indices[c0 == c1] = 0
+
+    out = np.zeros(len(blocks), _BC1_BLOCK)
+    out['c0'] = c0
+    out['c1'] = c1
+    out['indices'] = (indices << (2 * np.arange(16, dtype=np.uint32))).sum(axis=1, dtype=np.uint32)
+    return out.view(np.uint8).reshape(-1, 8)
+
+
+def decodeBC1Blocks(data):
+    records = np.ascontiguousarray(data).view(_BC1_BLOCK).reshape(-1)
+    c0 = records['c0']
+    c1 = records['c1']
+    palette = _bc1Palette(c0, c1)
+    # 3-color mode: third entry is the midpoint, fourth is black
+    three = c0 <= c1
+    p0, p1 = palette[three, 0], palette[three, 1]
+    palette[three, 2] = (p0 + p1) / 2.0
+    palette[three, 3] = 0.0
+    indices = (records['indices'][:, None] >> (2 * np.arange(16, dtype=np.uint32))) & 3
+    return np.take_along_axis(palette, indices[:, :, None].astype(np.intp), axis=1)
+
+
+def _bc4Palette(a0, a1):
+    a0 = a0.astype(np.float32)[:, None]
+    a1 = a1.astype(np.float32)[:, None]
+    w = np.arange(1, 7, dtype=np.float32)[None, :]
+    return np.concatenate([a0, a1, ((7.0 - w) * a0 + w * a1) / 7.0], axis=1)
+
+
+def encodeBC4Blocks(values):
+    """Encode (n, 16) single channel blocks into (n, 8) BC4 bytes."""
+    values = values.astype(np.float32)
+    a0 = values.max(axis=1).astype(np.uint8)
+    a1 = values.min(axis=1).astype(np.uint8)
+    palette = _bc4Palette(a0, a1)
+    indices = np.abs(values[:, :, None] - palette[:, None, :]).argmin(axis=2).astype(np.uint64)
+    indices[a0 == a1] = 0
+    bits = (indices << (3 * np.arange(16, dtype=np.uint64))).sum(axis=1, dtype=np.uint64)
+
+    out = np.zeros((len(values), 8), np.uint8)
+    out[:, 0] = a0
+    out[:, 1] = a1
+    out[:, 2:] = bits.astype('<u8').view(np.uint8).reshape(-1, 8)[:, :6]
+    return out
+
+
+def decodeBC4Blocks(data):
+    a0 = data[:, 0]
+    a1 = data[:, 1]
+    palette = _bc4Palette(a0, a1)
+    # a0 <= a1 is the 6-value mode with explicit 0 and 255
+    six = a0 <= a1
+    w = np.arange(1, 5, dtype=np.float32)[None, :]
+    f0, f1 = a0[six].astype(np.float32)[:, None], a1[six].astype(np.float32)[:, None]
+    palette[six, 2:6] = ((5.0 - w) * f0 + w * f1) / 5.0
+    palette[six, 6] = 0.0
+    palette[six, 7] = 255.0
+    raw = np.zeros((len(data), 8), np.uint8)
+    raw[:, :6] = data[:, 2:8]
+    bits = raw.view('<u8').reshape(-1)
+    indices = (bits[:, None] >> (3 * np.arange(16, dtype=np.uint64))) & np.uint64(7)
+    return np.take_along_axis(palette, indices.astype(np.intp), axis=1)
+
+
+def encode(pixels, fmt):
+    """Compress an (h, w, c) uint8 image, returns the raw block data."""
+    blocks = toBlocks(pixels)
+    if fmt == 'bc1':
+        data = encodeBC1Blocks(blocks[:, :, :3])
+    elif fmt == 'bc3':
+        data = np.concatenate([encodeBC4Blocks(blocks[:, :, 3]), encodeBC1Blocks(blocks[:, :, :3])], axis=1)
+    elif fmt == 'bc5':
+        data = np.concatenate([encodeBC4Blocks(blocks[:, :, 0]), encodeBC4Blocks(blocks[:, :, 1])], axis=1)
+    else:
+        raise ValueError('unknown block format {}'.format(fmt))
+    return data.reshape(-1)
+
+
+def decode(data, fmt, height, width):
+    """Decompress to uint8, (h, w, 3) for bc1, (h, w, 4) for bc3, (h, w, 2) for bc5."""
+    data = data.reshape(-1, BLOCK_BYTES[fmt])
+    if fmt == 'bc1':
+        blocks = decodeBC1Blocks(data)
+    elif fmt == 'bc3':
+        blocks = np.concatenate([decodeBC1Blocks(data[:, 8:]), decodeBC4Blocks(data[:, :8])[:, :, None]], axis=2)
+    elif fmt == 'bc5':
+        blocks = np.stack([decodeBC4Blocks(data[:, :8]), decodeBC4Blocks(data[:, 8:])], axis=2)
+    else:
+        raise ValueError('unknown block format {}'.format(fmt))
+    return np.clip(np.rint(fromBlocks(blocks, height, width)), 0, 255).astype(np.uint8)
+
+
+def chooseFormat(channels, name=''):
+    # tangent-space normal maps only need x and y, z is rebuilt in the shader
+    lowered = name.lower()
+    if 'normal' in lowered or '_ddn' in lowered:
+        return 'bc5'
+    return 'bc3' if channels == 4 else 'bc1'
+
+
+def psnr(reference, approximation):
+    mse = np.mean((reference.astype(np.float64) - approximation.astype(np.float64)) ** 2)
+    if mse == 0:
+        return float('inf')
+    return 10.0 * np.log10(255.0 * 255.0 / mse)
+
+
+def compressedSize(fmt, height, width):
+    return ((height + 3) // 4) * ((width + 3) // 4) * BLOCK_BYTES[fmt]
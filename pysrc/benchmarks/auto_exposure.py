@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+The bloom example's automatic exposure: what the measurement costs, how
+close it is to the numpy reference and how fast the exposure settles.
+
+    EGL_PLATFORM=surfaceless PYTHONPATH=pysrc python pysrc/benchmarks/auto_exposure.py
+    EGL_PLATFORM=surfaceless PYTHONPATH=pysrc python pysrc/benchmarks/auto_exposure.py --sizes 1280x720
+
+7.bloom.py runs offscreen through headless.HeadlessRunner once per size,
+with GLWindow.autoExposure off and then on, frames back to back without a
+glFinish between them so a readback that waited for the GPU would show up
+in the CPU time. Recorded per size: the GPU time of the exposure pass, the
+CPU time of the whole frame without and with it (medians), the frame the
+first reading came back in and how many were dropped, and the difference
+between the GPU's log average luminance and
+exposure.logAverageLuminance() of the full resolution HDR color buffer, in
+EVs. Then, from the reference alone, how many 60 fps frames exposure.adapt()
+takes to get within 0.1 EV of the scene's target from 4 EVs darker and 4
+EVs brighter.
+
+On llvmpipe, rendering is binned and only rasterized once something needs
+the result; the first pass that samples the scene's color buffer waits for
+it. That is the exposure pass when it runs and the composite pass when it
+doesn't, so compare the frame's CPU time rather than the pass'.
+"""
+
+import argparse
+import math
+import os
+
+# picks the EGL platform, so it has to come before the first OpenGL import
+import headless
+import numpy as np
+from OpenGL.GL import *
+
+import exposure
+import profiler
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT = os.path.join(ROOT, '5.advanced_lighting/7.bloom.py')
+SIZES = ['1280x720', '1920x1080', '3840x2160']
+
+
+def readColor(texture, width, height):
+    glBindTexture(GL_TEXTURE_2D, texture)
+    pixels = np.frombuffer(glGetTexImage(GL_TEXTURE_2D, 0, GL_RGB, GL_FLOAT), np.float32)
+    glBindTexture(GL_TEXTURE_2D, 0)
+    return pixels.reshape(height, width, 3)
+
+
+def settleFrames(start, target, control, fps=60.0):
+    """Frames adapt() takes from start to within 0.1 EV of target."""
+    value, frames = start, 0
+    while abs(math.log(value / target, 2)) > 0.1:
+        value = exposure.adapt(value, target, 1.0 / fps, control.speedUp, control.speedDown)
+        frames += 1
+    return frames
+
+
+def frameCpuMs(runner, autoExposure, frames):
+    window = runner.window
+    window.autoExposure = autoExposure
+    window.profiler = profiler.Profiler(enabled=True)
+    firstReading = None
+    for i in range(frames):
+        runner.renderFrame()
+        if firstReading is None and window.exposureControl.logAverage is not None:
+            firstReading = i + 1
+    window.profiler.finish()
+    return window.profiler.summary(), firstReading
+
+
+def measure(runner, frames):
+    window = runner.window
+    control = window.exposureControl
+    without, _ = frameCpuMs(runner, False, frames)
+    summary, firstReading = frameCpuMs(runner, True, frames)
+    reference = exposure.logAverageLuminance(readColor(window.graph.texture('hdr'), runner.width, runner.height))
+    target = exposure.targetExposure(reference, control.key)
+    return {'gpuMs': summary['passes']['exposure']['gpu']['p50'],
+            'withoutMs': without['frame']['p50'],
+            'withMs': summary['frame']['p50'],
+            'firstReading': firstReading,
+            'dropped': control.dropped,
+            'errorEv': abs(control.logAverage - reference) / math.log(2.0),
+            'target': target,
+            'fromDark': settleFrames(target / 16.0, target, control),
+            'fromBright': settleFrames(target * 16.0, target, control)}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', nargs='+', default=SIZES, help='WIDTHxHEIGHT')
+    parser.add_argument('--frames', type=int, default=20)
+    args = parser.parse_args()
+
+    header = '{:>9} {:>7} {:>12} {:>8} {:>6} {:>7} {:>8} {:>8} {:>9} {:>11}'.format(
+        'size', 'gpu ms', 'frame off ms', 'on ms', 'first', 'dropped', 'err EV', 'target', 'from dark', 'from bright')
+    for size in args.sizes:
+        width, height = [int(n) for n in size.split('x')]
+        runner = headless.HeadlessRunner(SCRIPT, width, height)
+        if header:
+            print('renderer: {}'.format(glGetString(GL_RENDERER).decode('utf-8')))
+            print(header)
+            header = None
+        window = runner.window
+        window.camera.position = np.array([0.0, 3.0, 9.0], np.float32)
+        window.camera.processMouseMovement(0, -20.0 / window.camera.mouseSensitivity)
+        result = measure(runner, args.frames)
+        print('{size:>9} {gpuMs:7.2f} {withoutMs:12.2f} {withMs:8.2f} {firstReading:6d} {dropped:7d} {errorEv:8.4f} '
+              '{target:8.3f} {fromDark:9d} {fromBright:11d}'.format(size=size, **result))
+        runner.close()
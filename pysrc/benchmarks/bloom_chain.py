@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Bloom blurred down and up the bloom.BloomChain ('mip') against the full
+resolution Gaussian ping-pong ('pingpong', 10 passes), at 1080p and 4K.
+
+    EGL_PLATFORM=surfaceless PYTHONPATH=pysrc python pysrc/benchmarks/bloom_chain.py
+    EGL_PLATFORM=surfaceless PYTHONPATH=pysrc python pysrc/benchmarks/bloom_chain.py --sizes 1280x720
+
+7.bloom.py runs offscreen through headless.HeadlessRunner at each size, once
+per mode (GLWindow.mipBloom). Recorded: the blur pass's passes, its CPU and
+GPU time and the whole frame up to glFinish (medians), the memory of its
+render targets and an estimate of the texture bytes it reads and writes per
+frame, every texel of every pass counted once (GL_RGB16F taken as 8 bytes a
+texel, as drivers pad it).
+"""
+
+import argparse
+import collections
+import os
+import timeit
+
+# picks the EGL platform, so it has to come before the first OpenGL import
+import headless
+import numpy as np
+from OpenGL.GL import glFinish, glGetString, GL_RENDERER
+
+import profiler
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT = os.path.join(ROOT, '5.advanced_lighting/7.bloom.py')
+SIZES = ['1920x1080', '3840x2160']
+MODES = collections.OrderedDict([('pingpong', False), ('mip', True)])
+# 7.bloom.py's ping-pong blur
+PINGPONG_PASSES = 10
+RGB16F_BYTES = 8
+
+timer = timeit.default_timer
+
+
+def measure(size, mode, frames):
+    width, height = [int(x) for x in size.split('x')]
+    runner = headless.HeadlessRunner(SCRIPT, width, height)
+    window = runner.window
+    window.mipBloom = MODES[mode]
+    runner.renderFrame()
+    glFinish()
+    window.profiler = profiler.Profiler(enabled=True)
+    total = []
+    for i in range(frames):
+        start = timer()
+        runner.renderFrame()
+        glFinish()
+        total.append((timer() - start) * 1000.0)
+    window.profiler.finish()
+    blur = window.profiler.summary()['passes']['blur']
+    chain = window.bloomChain
+    renderer = glGetString(GL_RENDERER).decode('utf-8')
+    if MODES[mode]:
+        passes, memory, moved = chain.passes, chain.bytes, chain.bytesMoved(RGB16F_BYTES)
+    else:
+        texels = width * height
+        passes = PINGPONG_PASSES
+        memory = 2 * texels * RGB16F_BYTES
+        moved = PINGPONG_PASSES * 2 * texels * RGB16F_BYTES
+    runner.close()
+    return {'renderer': renderer,
+            'size': size,
+            'mode': mode,
+            'passes': passes,
+            'cpuMs': blur['cpu']['p50'],
+            'gpuMs': blur['gpu']['p50'] if blur['gpu'] else float('nan'),
+            'frameMs': float(np.median(total)),
+            'memoryMB': memory / float(1 << 20),
+            'movedMB': moved / float(1 << 20)}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', nargs='+', default=SIZES, help='WIDTHxHEIGHT')
+    parser.add_argument('--modes', nargs='+', choices=list(MODES), default=list(MODES))
+    parser.add_argument('--frames', type=int, default=5)
+    args = parser.parse_args()
+
+    first = True
+    for size in args.sizes:
+        for mode in args.modes:
+            result = measure(size, mode, args.frames)
+            if first:
+                print('renderer: {}'.format(result['renderer']))
+                print('{:>10} {:<9} {:>6} {:>7} {:>7} {:>9} {:>10} {:>9}'.format('size', 'mode', 'passes', 'cpu ms',
+                                                                                 'gpu ms', 'frame ms', 'targets MB',
+                                                                                 'moved MB'))
+                first = False
+            print('{size:>10} {mode:<9} {passes:6d} {cpuMs:7.2f} {gpuMs:7.2f} {frameMs:9.2f} {memoryMB:10.1f} '
+                  '{movedMB:9.1f}'.format(**result))
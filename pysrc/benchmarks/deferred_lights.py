@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Deferred shading from 32 to 4096 lights, with clustered light culling, with
+every light shaded at every pixel of a screen filled quad, and with a light
+volume (an instanced sphere) drawn per light.
+
+    EGL_PLATFORM=surfaceless PYTHONPATH=pysrc python pysrc/benchmarks/deferred_lights.py
+
+8.deferred_shading.py runs offscreen through headless.HeadlessRunner and its
+lights are regenerated for each count with GLWindow.createLights, in the same
+6 x 6 x 6 volume, so more lights means denser lights. Recorded per count and
+mode: the CPU time of the cluster assignment and upload ('light culling'),
+the GPU time of the lighting pass, the whole frame up to glFinish, and for
+clustered culling the mean and largest number of lights in a non-empty
+cluster.
+
+With --animate every light moves every frame: 'light update' is the CPU
+time of moving all of them in numpy and uploading the light set.
+
+--threshold is the brightness, out of 256, at which a light's radius ends.
+The example's 5 gives every light a radius of about 5 units, most of the
+scene, so nothing can be culled; the default 64 gives about 1 unit.
+"""
+
+import argparse
+import collections
+import os
+import timeit
+
+# picks the EGL platform, so it has to come before the first OpenGL import
+import headless
+import numpy as np
+from OpenGL.GL import glFinish, glGetString, GL_RENDERER
+
+import profiler
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT = os.path.join(ROOT, '5.advanced_lighting/8.deferred_shading.py')
+COUNTS = [32, 128, 512, 1024, 2048, 4096]
+# mode: (GLWindow.clustered, GLWindow.lightVolumes)
+MODES = collections.OrderedDict([('clustered', (True, False)),
+                                 ('all', (False, False)),
+                                 ('volumes', (False, True))])
+
+timer = timeit.default_timer
+
+
+def measure(runner, count, mode, threshold, frames, animate):
+    window = runner.window
+    window.createLights(count, lightThreshold=threshold)
+    window.animateLights = animate
+    window.clustered, window.lightVolumes = MODES[mode]
+    # the first frame reallocates the light buffers
+    runner.renderFrame()
+    glFinish()
+    window.profiler = profiler.Profiler(enabled=True)
+    total = []
+    for i in range(frames):
+        start = timer()
+        runner.renderFrame()
+        glFinish()
+        total.append((timer() - start) * 1000.0)
+    window.profiler.finish()
+    passes = window.profiler.summary()['passes']
+    grid = window.lightGrid
+    return {'lights': count,
+            'mode': mode,
+            'updateMs': passes['light update']['cpu']['p50'] if animate else 0.0,
+            # the render graph only declares the culling pass in clustered mode
+            'cullMs': passes['light culling']['cpu']['p50'] if 'light culling' in passes else 0.0,
+            'lightingGpuMs': passes['lighting']['gpu']['p50'] if passes['lighting']['gpu'] else float('nan'),
+            'frameMs': float(np.median(total)),
+            'meanLights': '{:.1f}'.format(grid.meanLights) if mode == 'clustered' else '-',
+            'maxLights': grid.maxLights if mode == 'clustered' else '-'}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--counts', type=int, nargs='+', default=COUNTS)
+    parser.add_argument('--modes', nargs='+', choices=list(MODES), default=list(MODES))
+    parser.add_argument('--threshold', type=float, default=64.0)
+    parser.add_argument('--animate', action='store_true', help='move every light every frame')
+    parser.add_argument('--frames', type=int, default=5)
+    parser.add_argument('--width', type=int, default=400)
+    parser.add_argument('--height', type=int, default=300)
+    args = parser.parse_args()
+
+    runner = headless.HeadlessRunner(SCRIPT, args.width, args.height)
+    print('renderer: {}, {}x{}'.format(glGetString(GL_RENDERER).decode('utf-8'), args.width, args.height))
+    print('{:>6} {:<10} {:>9} {:>8} {:>12} {:>9} {:>12} {:>11}'.format('lights', 'mode', 'update ms', 'cull ms',
+                                                                        'lighting ms', 'frame ms', 'mean lights',
+                                                                        'max lights'))
+    for count in args.counts:
+        for mode in args.modes:
+            result = measure(runner, count, mode, args.threshold, args.frames, args.animate)
+            print('{lights:6d} {mode:<10} {updateMs:9.2f} {cullMs:8.2f} {lightingGpuMs:12.2f} {frameMs:9.2f} '
+                  '{meanLights:>12} {maxLights:>11}'.format(**result))
+    runner.close()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+What capturing a frame costs the render loop: glReadPixels and encoding
+on the render thread against capture.py's pixel buffer ring and workers.
+
+    EGL_PLATFORM=surfaceless PYTHONPATH=pysrc python pysrc/benchmarks/frame_capture.py
+    EGL_PLATFORM=surfaceless PYTHONPATH=pysrc python pysrc/benchmarks/frame_capture.py --size 3840x2160 --frames 30
+
+The script runs offscreen through headless.HeadlessRunner once per mode and
+every frame is finished with glFinish before it is captured, so the time
+recorded is the capture's own and not the rest of the frame's rasterization,
+which llvmpipe only does once something reads the result. Modes:
+'sync' reads with glReadPixels and writes the PNG on the render thread (what
+headless.py did before), 'read' is only the glReadPixels into a pixel pack
+buffer that any asynchronous capture starts with, 'png' and 'raw' go through
+capture.FrameCapture. Recorded per mode: median and p95 time of the capture
+call, whether the median is within --budget, the wall time of the whole run
+per frame, and the fence waits.
+"""
+
+import os
+import shutil
+import timeit
+import argparse
+import tempfile
+
+# picks the EGL platform, so it has to come before the first OpenGL import
+import headless
+import numpy as np
+from PIL import Image
+from OpenGL.GL import *
+from OpenGL.raw.GL.VERSION.GL_1_0 import glReadPixels as _glReadPixels
+
+SCRIPT = '2.lighting/6.multiple_lights.py'
+MODES = ('sync', 'read', 'png', 'raw')
+# milliseconds per frame capture may add to the render loop
+BUDGET = 1.0
+
+timer = timeit.default_timer
+
+
+def measure(script, mode, frames, width, height):
+    output = tempfile.mkdtemp()
+    runner = headless.HeadlessRunner(script, width, height)
+    # imported once the context and the glBindFramebuffer redirect exist
+    import capture
+    frameCapture = capture.FrameCapture(output, width, height, mode) if mode in capture.FORMATS else None
+    if mode == 'read':
+        buffer = glGenBuffers(1)
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, buffer)
+        glBufferData(GL_PIXEL_PACK_BUFFER, width * height * 4, None, GL_STREAM_READ)
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+    times = []
+    start = timer()
+    for i in range(frames):
+        runner.renderFrame()
+        glFinish()
+        captureStart = timer()
+        if mode == 'read':
+            glBindFramebuffer(GL_READ_FRAMEBUFFER, 0)
+            glBindBuffer(GL_PIXEL_PACK_BUFFER, buffer)
+            _glReadPixels(0, 0, width, height, GL_RGBA, GL_UNSIGNED_BYTE, None)
+            glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+        elif frameCapture is None:
+            pixels = runner.readFrame()[:, :, :3]
+            Image.fromarray(np.ascontiguousarray(pixels)).save(
+                os.path.join(output, 'frame_{:04d}.png'.format(i)), compress_level=1)
+        else:
+            frameCapture.capture()
+        times.append((timer() - captureStart) * 1000.0)
+    stalls = 0
+    if frameCapture is not None:
+        frameCapture.delete()
+        stalls = frameCapture.stalls
+    if mode == 'read':
+        glDeleteBuffers(1, np.array([buffer], np.uint32))
+    wallMs = (timer() - start) * 1000.0 / frames
+    result = {'renderer': glGetString(GL_RENDERER).decode('utf-8'),
+              'medianMs': float(np.median(times)),
+              'p95Ms': float(np.percentile(times, 95)),
+              'wallMs': wallMs,
+              'stalls': stalls}
+    runner.close()
+    shutil.rmtree(output)
+    return result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--script', default=SCRIPT, help='example script, relative to pysrc')
+    parser.add_argument('--frames', type=int, default=60)
+    parser.add_argument('--size', default='1920x1080')
+    parser.add_argument('--budget', type=float, default=BUDGET, help='ms per frame (default: %(default)s)')
+    args = parser.parse_args()
+    width, height = [int(v) for v in args.size.split('x')]
+    script = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), args.script)
+
+    header = '{:>6} {:>10} {:>8} {:>7} {:>13} {:>7}'.format('mode', 'median ms', 'p95 ms', 'budget', 'wall ms/frame',
+                                                           'stalls')
+    for mode in MODES:
+        result = measure(script, mode, args.frames, width, height)
+        if header:
+            print('renderer: {}, {} at {}x{}'.format(result['renderer'], args.script, width, height))
+            print(header)
+            header = None
+        budget = 'ok' if result['medianMs'] <= args.budget else 'over'
+        print('{mode:>6} {medianMs:10.2f} {p95Ms:8.2f} {budget:>7} {wallMs:13.1f} {stalls:7d}'.format(
+            mode=mode, budget=budget, **result))
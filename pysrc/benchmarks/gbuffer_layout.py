@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+The deferred shading and SSAO examples with their usual G-buffer and the
+compact one, which drops the position attachment and rebuilds positions
+from the depth buffer (see gbuffer.py).
+
+    EGL_PLATFORM=surfaceless PYTHONPATH=pysrc python pysrc/benchmarks/gbuffer_layout.py
+    EGL_PLATFORM=surfaceless PYTHONPATH=pysrc python pysrc/benchmarks/gbuffer_layout.py --sizes 1280x720
+
+Each script runs offscreen through headless.HeadlessRunner, once per size,
+looking down at the scene from (0, 3, 9), with GLWindow.compactGBuffer off
+and on. Recorded per script, size and layout: the G-buffer's bytes per pixel
+and its total size, the GPU time of the geometry pass and of every pass
+after it (lighting, for 9.ssao.py the SSAO passes too) and of the whole
+frame up to glFinish (medians), and how far the compact layout's final
+image is from the usual one's: mean and largest difference out of 255.
+"""
+
+import argparse
+import collections
+import os
+import timeit
+
+# picks the EGL platform, so it has to come before the first OpenGL import
+import headless
+import numpy as np
+from OpenGL.GL import glFinish, glGetString, GL_RENDERER
+
+import profiler
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPTS = collections.OrderedDict([('deferred', os.path.join(ROOT, '5.advanced_lighting/8.deferred_shading.py')),
+                                   ('ssao', os.path.join(ROOT, '5.advanced_lighting/9.ssao.py'))])
+SIZES = ['1920x1080', '3840x2160']
+
+timer = timeit.default_timer
+
+
+def measure(runner, compact, frames):
+    window = runner.window
+    window.compactGBuffer = compact
+    # the first frame sets the graph up again with the layout's targets
+    runner.renderFrame()
+    glFinish()
+    window.profiler = profiler.Profiler(enabled=True)
+    total = []
+    for i in range(frames):
+        start = timer()
+        runner.renderFrame()
+        glFinish()
+        total.append((timer() - start) * 1000.0)
+    window.profiler.finish()
+    passes = window.profiler.summary()['passes']
+    gpu = dict((name, p['gpu']['p50']) for name, p in passes.items() if p['gpu'])
+    return {'layout': 'compact' if compact else 'full',
+            'bytesPerPixel': window.gbuffer.bytesPerPixel,
+            'megabytes': window.gbuffer.bytesPerPixel * runner.width * runner.height / float(1 << 20),
+            'geometryGpuMs': gpu['geometry'],
+            'shadingGpuMs': sum(ms for name, ms in gpu.items() if name != 'geometry'),
+            'frameMs': float(np.median(total))}, runner.readFrame()[..., :3].astype(np.int32)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scripts', nargs='+', choices=list(SCRIPTS), default=list(SCRIPTS))
+    parser.add_argument('--sizes', nargs='+', default=SIZES, help='WIDTHxHEIGHT')
+    parser.add_argument('--frames', type=int, default=5)
+    args = parser.parse_args()
+
+    header = '{:<9} {:>9} {:<8} {:>5} {:>8} {:>12} {:>11} {:>9} {:>9} {:>8}'.format(
+        'script', 'size', 'layout', 'bytes', 'MB', 'geometry ms', 'shading ms', 'frame ms', 'mean diff', 'max diff')
+    for script in args.scripts:
+        for size in args.sizes:
+            width, height = [int(n) for n in size.split('x')]
+            runner = headless.HeadlessRunner(SCRIPTS[script], width, height)
+            if header:
+                print('renderer: {}'.format(glGetString(GL_RENDERER).decode('utf-8')))
+                print(header)
+                header = None
+            window = runner.window
+            window.camera.position = np.array([0.0, 3.0, 9.0], np.float32)
+            window.camera.processMouseMovement(0, -20.0 / window.camera.mouseSensitivity)
+            full, reference = measure(runner, False, args.frames)
+            compact, image = measure(runner, True, args.frames)
+            difference = np.abs(image - reference)
+            full['meanDiff'], full['maxDiff'] = '-', '-'
+            compact['meanDiff'], compact['maxDiff'] = '{:.3f}'.format(difference.mean()), difference.max()
+            for result in (full, compact):
+                print('{script:<9} {size:>9} {layout:<8} {bytesPerPixel:5d} {megabytes:8.1f} {geometryGpuMs:12.2f} '
+                      '{shadingGpuMs:11.2f} {frameMs:9.2f} {meanDiff:>9} {maxDiff:>8}'.format(script=script, size=size,
+                                                                                             **result))
+            runner.close()
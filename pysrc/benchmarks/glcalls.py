@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Per-call overhead of the hot GL calls, in glconfig's debug mode (PyOpenGL's
+full checking) and performance mode, through OpenGL.GL and through
+glconfig's raw entry points.
+
+    EGL_PLATFORM=surfaceless PYTHONPATH=pysrc python pysrc/benchmarks/glcalls.py
+
+The calls go to a tiny program, texture and element buffer so the driver does
+next to no work and what is measured is the Python and ctypes overhead. PyOpenGL
+reads its flags at import, so each mode runs in a process of its own. Each
+value is the best of --repeat runs of --number calls.
+"""
+
+import os
+import sys
+import json
+import timeit
+import argparse
+import subprocess
+
+# picks the EGL platform and the PyOpenGL flags, before the first OpenGL import
+import headless
+import numpy as np
+from OpenGL.GL import *
+from OpenGL.GL import shaders
+
+import glconfig
+
+VERTEX_SHADER = '''#version 330 core
+uniform mat4 model;
+void main() { gl_Position = model * vec4(1.0); }
+'''
+FRAGMENT_SHADER = '''#version 330 core
+out vec4 color;
+void main() { color = vec4(1.0); }
+'''
+
+
+def measure(number, repeat):
+    context = headless.createContext()
+    program = shaders.compileProgram(shaders.compileShader(VERTEX_SHADER, GL_VERTEX_SHADER),
+                                     shaders.compileShader(FRAGMENT_SHADER, GL_FRAGMENT_SHADER))
+    glUseProgram(program)
+    location = glGetUniformLocation(program, 'model')
+    matrix = np.identity(4, np.float32)
+    textureID = glGenTextures(1)
+    vao = glGenVertexArrays(1)
+    glBindVertexArray(vao)
+    indices = np.zeros(3, np.uint32)
+    ebo = glGenBuffers(1)
+    glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, ebo)
+    glBufferData(GL_ELEMENT_ARRAY_BUFFER, indices.nbytes, indices, GL_STATIC_DRAW)
+
+    # zero index draws, so only the call itself is timed
+    calls = [('glUniformMatrix4fv', lambda: glUniformMatrix4fv(location, 1, GL_FALSE, matrix)),
+             ('glconfig.uniformMatrix4fv', lambda: glconfig.uniformMatrix4fv(location, matrix)),
+             ('glDrawElements', lambda: glDrawElements(GL_TRIANGLES, 0, GL_UNSIGNED_INT, None)),
+             ('glconfig.drawElements', lambda: glconfig.drawElements(GL_TRIANGLES, 0, GL_UNSIGNED_INT)),
+             ('glBindTexture', lambda: glBindTexture(GL_TEXTURE_2D, textureID)),
+             ('glconfig.bindTexture', lambda: glconfig.bindTexture(GL_TEXTURE_2D, textureID))]
+    results = []
+    for name, call in calls:
+        call() # resolves the raw entry points
+        seconds = min(timeit.repeat(call, number=number, repeat=repeat))
+        results.append((name, seconds / number * 1e6))
+    glFinish()
+    renderer = glGetString(GL_RENDERER).decode('utf-8')
+    context.destroy()
+    return renderer, results
+
+
+def runMode(debug, number, repeat):
+    environment = dict(os.environ)
+    environment.pop('LEARNOPENGL_GL_DEBUG', None)
+    if debug:
+        environment['LEARNOPENGL_GL_DEBUG'] = '1'
+    command = [sys.executable, os.path.abspath(__file__), '--child', '--number', str(number), '--repeat', str(repeat)]
+    output = subprocess.check_output(command, env=environment)
+    return json.loads(output.decode('utf-8'))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--number', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        renderer, results = measure(args.number, args.repeat)
+        print(json.dumps({'renderer': renderer, 'results': results}))
+        sys.exit(0)
+
+    debug = runMode(True, args.number, args.repeat)
+    performance = runMode(False, args.number, args.repeat)
+    print('renderer: {}'.format(performance['renderer']))
+    # speedup of the performance mode call over the checked OpenGL.GL call it replaces
+    print('{:<28} {:>12} {:>12} {:>8}'.format('call (us)', 'debug', 'performance', 'speedup'))
+    for i, ((name, before), (_name, after)) in enumerate(zip(debug['results'], performance['results'])):
+        checked = debug['results'][i - i % 2][1]
+        print('{:<28} {:>12.2f} {:>12.2f} {:>7.1f}x'.format(name, before, after, checked / after))
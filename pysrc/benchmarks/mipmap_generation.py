@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+glGenerateMipmap against the numpy mip chains in mipmap.py.
+
+Meant to run on a software rasterizer, e.g.
+
+    EGL_PLATFORM=surfaceless PYTHONPATH=pysrc python pysrc/benchmarks/mipmap_generation.py
+
+Each row is the best of --repeat runs, upload included, synchronised with glFinish.
+"""
+
+import os
+import time
+import tempfile
+import argparse
+
+# picks the EGL platform, so it has to come before the first OpenGL import
+import headless
+import numpy as np
+from PIL import Image
+from OpenGL.GL import *
+
+import mipmap
+import texture
+
+
+def driverMipmaps(pixels):
+    textureID = glGenTextures(1)
+    glBindTexture(GL_TEXTURE_2D, textureID)
+    glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
+    glTexImage2D(GL_TEXTURE_2D, 0, GL_SRGB_ALPHA, pixels.shape[1], pixels.shape[0], 0, GL_RGBA, GL_UNSIGNED_BYTE, pixels)
+    glGenerateMipmap(GL_TEXTURE_2D)
+    return textureID
+
+
+def numpyMipmaps(pixels, kernel):
+    return texture.uploadMipChain(mipmap.generateMipChain(pixels, True, kernel), GL_SRGB_ALPHA, GL_RGBA)
+
+
+def cachedMipmaps(path):
+    return texture.uploadMipChain(mipmap.cachedMipChain(path, True, 'box'), GL_SRGB_ALPHA, GL_RGBA)
+
+
+def best(fn, repeat):
+    times = []
+    for i in range(repeat):
+        start = time.time()
+        textureID = fn()
+        glFinish()
+        times.append(time.time() - start)
+        glDeleteTextures(np.array([textureID], np.uint32))
+    return min(times) * 1000.0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[512, 1024, 2048])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    headless.createContext()
+    print('renderer: {}'.format(glGetString(GL_RENDERER).decode()))
+    print('{:>6} {:>18} {:>12} {:>12} {:>12}'.format('size', 'glGenerateMipmap', 'numpy box', 'numpy kaiser', 'disk cache'))
+    os.environ['LEARNOPENGL_CACHE'] = tempfile.mkdtemp()
+    rng = np.random.RandomState(0)
+    for size in args.sizes:
+        pixels = rng.randint(0, 256, (size, size, 4)).astype(np.uint8)
+        path = os.path.join(os.environ['LEARNOPENGL_CACHE'], '{}.png'.format(size))
+        Image.fromarray(pixels).save(path)
+        mipmap.cachedMipChain(path, True, 'box') # warm the cache
+        print('{:>6} {:>16.1f}ms {:>10.1f}ms {:>10.1f}ms {:>10.1f}ms'.format(
+            size,
+            best(lambda: driverMipmaps(pixels), args.repeat),
+            best(lambda: numpyMipmaps(pixels, 'box'), args.repeat),
+            best(lambda: numpyMipmaps(pixels, 'kaiser'), args.repeat),
+            best(lambda: cachedMipmaps(path), args.repeat)))
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+What the rendertarget.Pool allocates while effects are toggled and the
+window is resized, against allocating afresh every time.
+
+    EGL_PLATFORM=surfaceless PYTHONPATH=pysrc python pysrc/benchmarks/render_targets.py
+    EGL_PLATFORM=surfaceless PYTHONPATH=pysrc python pysrc/benchmarks/render_targets.py --cycles 10
+
+Each script runs offscreen through headless.HeadlessRunner at 1080p and
+goes through its toggles, a frame each, cycles times over: bloom and the mip
+chain for 7.bloom.py, AO at full, half and quarter resolution for 9.ssao.py.
+Then the window is resized to 720p and back, cycles times, and left at 720p
+for rendertarget.IDLE_FRAMES frames more. Recorded: the targets and
+textures allocated and reused, the allocations there would have been
+without the pool (every acquire), the most the pool held and what it holds
+at the end.
+"""
+
+import argparse
+import collections
+import os
+
+# picks the EGL platform, so it has to come before the first OpenGL import
+import headless
+from OpenGL.GL import glGetString, GL_RENDERER
+
+import rendertarget
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# script, relative to pysrc: the states its toggles go through, as window attributes
+SCRIPTS = collections.OrderedDict([
+    ('4.advanced_opengl/5.framebuffers.py', [{}]),
+    ('5.advanced_lighting/7.bloom.py', [{'bloom': True, 'mipBloom': True},
+                                        {'bloom': True, 'mipBloom': False},
+                                        {'bloom': False, 'mipBloom': False}]),
+    ('5.advanced_lighting/9.ssao.py', [{'aoScale': 1}, {'aoScale': 2}, {'aoScale': 4}])])
+SIZE = (1920, 1080)
+SMALL = (1280, 720)
+
+
+def measure(script, states, cycles):
+    runner = headless.HeadlessRunner(os.path.join(ROOT, script), *SIZE)
+    window = runner.window
+    for i in range(cycles):
+        for state in states:
+            for name, value in state.items():
+                setattr(window, name, value)
+            runner.renderFrame()
+    for name, value in states[0].items():
+        setattr(window, name, value)
+    for i in range(cycles):
+        runner.resize(*SMALL)
+        runner.renderFrame()
+        runner.resize(*SIZE)
+        runner.renderFrame()
+    runner.resize(*SMALL)
+    for i in range(rendertarget.IDLE_FRAMES + 2):
+        runner.renderFrame()
+    pool = window.targets
+    result = {'renderer': glGetString(GL_RENDERER).decode('utf-8'),
+              'allocations': pool.allocations,
+              'reuses': pool.reuses,
+              'unpooled': pool.allocations + pool.reuses,
+              'peakMb': pool.peakBytes / 1e6,
+              'endMb': pool.bytes / 1e6}
+    runner.close()
+    return result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cycles', type=int, default=5)
+    args = parser.parse_args()
+
+    header = '{:>36} {:>7} {:>7} {:>9} {:>8} {:>7}'.format(
+        'script', 'allocs', 'reuses', 'unpooled', 'peak MB', 'end MB')
+    for script, states in SCRIPTS.items():
+        result = measure(script, states, args.cycles)
+        if header:
+            print('renderer: {}'.format(result['renderer']))
+            print(header)
+            header = None
+        print('{script:>36} {allocations:7d} {reuses:7d} {unpooled:9d} {peakMb:8.1f} {endMb:7.1f}'.format(
+            script=script, **result))
@@ -0,0 +1,242 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Every chapter script rendered offscreen along a scripted camera path, with
+the results compared against a stored baseline.
+
+    EGL_PLATFORM=surfaceless PYTHONPATH=pysrc python pysrc/benchmarks/rendering.py --save baseline.json
+    EGL_PLATFORM=surfaceless PYTHONPATH=pysrc python pysrc/benchmarks/rendering.py --baseline baseline.json
+
+Each script runs in its own process through headless.HeadlessRunner, at a
+fixed size and with the fixed frame clock, so the work per frame is the same
+from run to run. Recorded per script: load time (import and initializeGL),
+CPU time of paintGL, frame time up to glFinish, GL, draw and redundant (see
+gltrace.py) calls per frame, and the calls per frame glstate.py's state cache
+dropped before they reached GL. Scripts with a shadowcache.ShadowCache also
+report the shadow passes it skipped. The exit status is 1 when a metric regresses
+past its threshold. With --capture DIR every frame is also recorded through
+capture.py, after its timings are taken, into DIR/<chapter>/<script>/.
+"""
+
+import os
+import sys
+import glob
+import json
+import math
+import timeit
+import tempfile
+import argparse
+import subprocess
+
+# picks the EGL platform, so it has to come before the first OpenGL import
+import headless
+import numpy as np
+from OpenGL.GL import glFinish, glGetString, GL_RENDERER
+
+import gltrace
+import glstate
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CHAPTERS = ['1.getting_started', '2.lighting', '3.model_loading', '4.advanced_opengl', '5.advanced_lighting']
+
+# allowed relative increase before a metric counts as a regression
+THRESHOLDS = {'loadMs': 0.25,
+              'cpuMs': 0.10,
+              'frameMs': 0.10,
+              'glCalls': 0.0,
+              'drawCalls': 0.0,
+              'redundantCalls': 0.0}
+# and the absolute change (ms) below which timings are treated as noise
+NOISE_FLOOR = {'loadMs': 20.0,
+               'cpuMs': 0.5,
+               'frameMs': 0.5}
+
+timer = timeit.default_timer
+
+
+def cameraPath(window, frame, frames, start):
+    # a slow look around and a step forward and back, the same on every run
+    camera = getattr(window, 'camera', None)
+    if camera is None:
+        return
+    position, yaw, pitch = start
+    t = 2.0 * math.pi * frame / max(frames, 1)
+    targetYaw = yaw + 20.0 * math.sin(t)
+    targetPitch = pitch + 5.0 * math.sin(2.0 * t)
+    camera.processMouseMovement((targetYaw - camera.yaw) / camera.mouseSensitivity,
+                                (targetPitch - camera.pitch) / camera.mouseSensitivity)
+    camera.position = position + camera.front * (0.5 * math.sin(t))
+
+
+def runScript(script, frames, width, height, captureDir=None):
+    # counts only, call sites are too slow to leave on while timing
+    tracer = gltrace.Tracer(callSites=False, history=frames)
+    tracer.install()
+
+    start = timer()
+    runner = headless.HeadlessRunner(script, width, height)
+    glFinish()
+    loadMs = (timer() - start) * 1000.0
+
+    frameCapture = None
+    if captureDir is not None:
+        import capture
+        output = os.path.join(captureDir, os.path.splitext(scriptKey(script))[0])
+        frameCapture = capture.FrameCapture(output, width, height)
+
+    camera = getattr(runner.window, 'camera', None)
+    cameraStart = (camera.position.copy(), camera.yaw, camera.pitch) if camera is not None else None
+    cpu, total, elided = [], [], []
+    for i in range(frames):
+        cameraPath(runner.window, i, frames, cameraStart)
+        tracer.beginFrame()
+        elidedBefore = glstate.state.elidedTotal
+        start = timer()
+        runner.renderFrame()
+        end = timer()
+        tracer.endFrame()
+        elided.append(glstate.state.elidedTotal - elidedBefore)
+        glFinish()
+        cpu.append((end - start) * 1000.0)
+        total.append((timer() - start) * 1000.0)
+        if frameCapture is not None:
+            frameCapture.capture()
+    if frameCapture is not None:
+        frameCapture.delete()
+
+    result = {'renderer': glGetString(GL_RENDERER).decode('utf-8'),
+              'loadMs': loadMs,
+              'cpuMs': float(np.median(cpu)),
+              'cpuP95Ms': float(np.percentile(cpu, 95)),
+              'frameMs': float(np.median(total)),
+              'frameP95Ms': float(np.percentile(total, 95)),
+              'glCalls': int(np.median([frame.total for frame in tracer.frames])),
+              'drawCalls': int(np.median([frame.draws for frame in tracer.frames])),
+              'redundantCalls': int(np.median([frame.redundantTotal for frame in tracer.frames])),
+              'elidedCalls': int(np.median(elided)),
+              'frames': frames}
+    shadowCache = getattr(runner.window, 'shadowCache', None)
+    if shadowCache is not None:
+        result['shadowPassesSkipped'] = shadowCache.skipped
+    runner.close()
+    return result
+
+
+def findScripts(patterns=None):
+    if not patterns:
+        patterns = [os.path.join(ROOT, chapter, '*.py') for chapter in CHAPTERS]
+    scripts = []
+    for pattern in patterns:
+        scripts.extend(sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern])
+    return scripts
+
+
+def scriptKey(script):
+    return os.path.relpath(os.path.abspath(script), ROOT).replace(os.sep, '/')
+
+
+def benchmark(scripts, frames, width, height, captureDir=None):
+    results = {}
+    for script in scripts:
+        key = scriptKey(script)
+        handle, resultPath = tempfile.mkstemp(suffix='.json')
+        os.close(handle)
+        # a process per script: no GL state or module caches carry over
+        command = [sys.executable, os.path.abspath(__file__), '--child', resultPath,
+                   '--frames', str(frames), '--width', str(width), '--height', str(height), script]
+        if captureDir is not None:
+            command[-1:-1] = ['--capture', os.path.abspath(captureDir)]
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        _out, err = process.communicate()
+        if process.returncode == 0:
+            with open(resultPath) as f:
+                results[key] = json.load(f)
+        else:
+            lines = err.decode('utf-8', 'replace').strip().splitlines()
+            results[key] = {'error': lines[-1] if lines else 'exit status {}'.format(process.returncode)}
+        os.remove(resultPath)
+        print(formatRow(key, results[key]))
+    return results
+
+
+def formatRow(key, result):
+    if 'error' in result:
+        return '{:<48} failed: {}'.format(key, result['error'])
+    return '{:<48} {:9.1f} {:9.2f} {:9.2f} {:8d} {:6d} {:9d} {:7d}'.format(
+        key, result['loadMs'], result['cpuMs'], result['frameMs'], result['glCalls'], result['drawCalls'],
+        result['redundantCalls'], result.get('elidedCalls', 0))
+
+
+def compare(results, baseline, thresholds):
+    """Returns a list of (script, metric, baseline value, value) regressions."""
+    regressions = []
+    for key, base in sorted(baseline['scripts'].items()):
+        current = results.get(key)
+        if current is None or 'error' in base:
+            continue
+        if 'error' in current:
+            regressions.append((key, 'error', None, current['error']))
+            continue
+        for metric, threshold in sorted(thresholds.items()):
+            if metric not in base:
+                continue
+            if (current[metric] > base[metric] * (1.0 + threshold) and
+                    current[metric] - base[metric] > NOISE_FLOOR.get(metric, 0.0)):
+                regressions.append((key, metric, base[metric], current[metric]))
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the chapter scripts offscreen.')
+    parser.add_argument('scripts', nargs='*', help='scripts or globs (default: every chapter script)')
+    parser.add_argument('--frames', type=int, default=60)
+    parser.add_argument('--width', type=int, default=800)
+    parser.add_argument('--height', type=int, default=600)
+    parser.add_argument('--baseline', help='baseline JSON to compare against')
+    parser.add_argument('--save', help='write the results as a new baseline')
+    parser.add_argument('--threshold', action='append', default=[], metavar='METRIC=FRACTION',
+                        help='override a regression threshold, e.g. frameMs=0.2')
+    parser.add_argument('--capture', metavar='DIR', help='also write every frame as PNG under DIR')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        result = runScript(args.scripts[0], args.frames, args.width, args.height, args.capture)
+        with open(args.child, 'w') as f:
+            json.dump(result, f)
+        sys.exit(0)
+
+    thresholds = dict(THRESHOLDS)
+    for override in args.threshold:
+        metric, value = override.split('=')
+        if metric not in thresholds:
+            parser.error('unknown metric {}, one of {}'.format(metric, ', '.join(sorted(thresholds))))
+        thresholds[metric] = float(value)
+
+    print('{:<48} {:>9} {:>9} {:>9} {:>8} {:>6} {:>9} {:>7}'.format('script', 'load ms', 'cpu ms', 'frame ms', 'calls',
+                                                                     'draws', 'redundant', 'elided'))
+    results = benchmark(findScripts(args.scripts), args.frames, args.width, args.height, args.capture)
+    report = {'frames': args.frames, 'width': args.width, 'height': args.height, 'scripts': results}
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if (baseline['frames'], baseline['width'], baseline['height']) != (args.frames, args.width, args.height):
+            print('warning: baseline was recorded with {frames} frames at {width}x{height}'.format(**baseline))
+        regressions = compare(results, baseline, thresholds)
+        for key, metric, before, after in regressions:
+            if metric == 'error':
+                print('REGRESSION {}: now fails ({})'.format(key, after))
+            else:
+                print('REGRESSION {} {}: {:.2f} -> {:.2f} ({:+.1f}%, threshold {:.0f}%)'.format(
+                    key, metric, before, after, 100.0 * (after - before) / before if before else float('inf'),
+                    100.0 * thresholds[metric]))
+        if regressions:
+            sys.exit(1)
+        print('no regressions against {}'.format(args.baseline))
+    sys.exit(0)
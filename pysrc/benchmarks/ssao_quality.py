@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+SSAO at every resolution scale and kernel size, timed and compared with
+full resolution AO from the full 64 sample kernel.
+
+    EGL_PLATFORM=surfaceless PYTHONPATH=pysrc python pysrc/benchmarks/ssao_quality.py
+    EGL_PLATFORM=surfaceless PYTHONPATH=pysrc python pysrc/benchmarks/ssao_quality.py --width 1920 --height 1080
+
+9.ssao.py runs offscreen through headless.HeadlessRunner with its
+GLWindow.aoScale and kernelSize set to each level. Recorded per level: the
+GPU time of the SSAO, blur and upsample passes together and of the whole
+frame up to glFinish (medians), and the error of the full size AO texture
+the lighting pass samples against the reference's, over the pixels the
+G-buffer covers: mean and 99th percentile absolute difference, and the
+share of pixels more than 0.1 off.
+"""
+
+import argparse
+import itertools
+import os
+import timeit
+
+# picks the EGL platform, so it has to come before the first OpenGL import
+import headless
+import numpy as np
+from OpenGL.GL import *
+
+import gbuffer
+import profiler
+import ssao
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT = os.path.join(ROOT, '5.advanced_lighting/9.ssao.py')
+PASSES = ('ssao', 'ssao blur', 'ssao upsample')
+
+timer = timeit.default_timer
+
+
+def readTexture(texture, width, height, format=GL_RED, components=1):
+    glBindTexture(GL_TEXTURE_2D, texture)
+    pixels = np.frombuffer(glGetTexImage(GL_TEXTURE_2D, 0, format, GL_FLOAT), np.float32)
+    glBindTexture(GL_TEXTURE_2D, 0)
+    return pixels.reshape(height, width, components)
+
+
+def measure(runner, scale, kernelSize, frames):
+    window = runner.window
+    window.aoScale = scale
+    window.kernelSize = kernelSize
+    # the first frame sets the graph up again with the AO targets and uploads the kernel
+    runner.renderFrame()
+    glFinish()
+    window.profiler = profiler.Profiler(enabled=True)
+    total = []
+    for i in range(frames):
+        start = timer()
+        runner.renderFrame()
+        glFinish()
+        total.append((timer() - start) * 1000.0)
+    window.profiler.finish()
+    passes = window.profiler.summary()['passes']
+    gpu = sum(passes[name]['gpu']['p50'] for name in PASSES if name in passes and passes[name]['gpu'])
+    ao = readTexture(window.graph.texture(window.aoResult), runner.width, runner.height)[..., 0]
+    return {'scale': '1/{}'.format(scale),
+            'kernel': kernelSize,
+            'aoGpuMs': gpu,
+            'frameMs': float(np.median(total))}, ao
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', type=int, nargs='+', default=list(ssao.SCALES))
+    parser.add_argument('--kernels', type=int, nargs='+', default=list(ssao.KERNEL_SIZES))
+    parser.add_argument('--frames', type=int, default=5)
+    parser.add_argument('--width', type=int, default=800)
+    parser.add_argument('--height', type=int, default=600)
+    args = parser.parse_args()
+
+    runner = headless.HeadlessRunner(SCRIPT, args.width, args.height)
+    _, reference = measure(runner, 1, ssao.MAX_KERNEL_SIZE, args.frames)
+    covered = readTexture(runner.window.graph.texture(gbuffer.DEPTH), args.width, args.height, GL_DEPTH_COMPONENT)[..., 0] < 1.0
+    print('renderer: {}, {}x{}'.format(glGetString(GL_RENDERER).decode('utf-8'), args.width, args.height))
+    print('{:>5} {:>6} {:>9} {:>9} {:>10} {:>10} {:>9}'.format('scale', 'kernel', 'ao ms', 'frame ms',
+                                                                'mean err', 'p99 err', '> 0.1 %'))
+    for scale, kernelSize in itertools.product(args.scales, args.kernels):
+        result, ao = measure(runner, scale, kernelSize, args.frames)
+        error = np.abs(ao - reference)[covered]
+        result['meanError'] = float(error.mean())
+        result['p99Error'] = float(np.percentile(error, 99))
+        result['over'] = 100.0 * float((error > 0.1).mean())
+        print('{scale:>5} {kernel:6d} {aoGpuMs:9.2f} {frameMs:9.2f} {meanError:10.4f} {p99Error:10.4f} '
+              '{over:9.2f}'.format(**result))
+    runner.close()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Bloom blurred down and back up a chain of ever smaller render targets.
+
+    self.bloomChain = bloom.BloomChain(downsampleProgram, upsampleProgram)   # in initializeGL
+
+    blurred = self.bloomChain.addPasses(graph, 'bright', width, height)     # in the render graph's setup
+    ... add graph.texture(blurred) * self.bloomChain.scale to the scene ...
+
+The bright texture is downsampled into level 0, at half its size, then each
+level into the next half as large, with a 13 tap filter: four overlapping
+2x2 box averages around the centre and one on it, so it doesn't alias and
+bright pixels don't flicker as they move across texels. Then back up, each
+level drawn onto the next larger one with a 3x3 tent filter and additive
+blending, so level 0 ends up with the sum of every level's blur, narrow to
+wide. scale (1 / levels) turns that sum back into an average.
+
+The number of levels follows from the source size, halving until the
+smaller side is around SMALLEST texels: 6 levels at 800x600, 7 at 1080p and
+8 at 4K, levels downsample passes and levels - 1 upsample passes in all. A
+full resolution Gaussian ping-pong touches every pixel on each of its
+passes; here all levels together are a third of the source's pixels. They
+are GL_R11F_G11F_B10F, 4 bytes a texel against 8 for the usual padded
+GL_RGB16F, which halves the bandwidth again.
+
+The levels are rendergraph targets, one pass each way per level, all in
+one profiler section. Everything is bound through glstate, so the caller's
+state cache stays right. The downsample program samples srcTexture on unit
+0 and the upsample program too, both drawn with primitives' screen quad.
+"""
+
+import math
+
+from OpenGL.GL import *
+
+import primitives
+import rendergraph
+from glstate import state as gl
+
+# the smallest level's smaller side is at least this
+SMALLEST = 8
+# bytes per texel of the levels, GL_R11F_G11F_B10F
+TEXEL_BYTES = 4
+
+
+def levelCount(width, height):
+    """Levels below a width x height source, halving until the smaller side nears SMALLEST."""
+    return max(1, int(math.log(min(width, height) / float(SMALLEST), 2)))
+
+
+def levelSizes(width, height, count=None):
+    """(width, height) of each level, the first half of width x height."""
+    if count is None:
+        count = levelCount(width, height)
+    sizes = []
+    for i in range(count):
+        width, height = max(1, width // 2), max(1, height // 2)
+        sizes.append((width, height))
+    return sizes
+
+
+class BloomChain(object):
+
+    def __init__(self, downsampleProgram, upsampleProgram):
+        self.downsampleProgram = downsampleProgram
+        self.upsampleProgram = upsampleProgram
+        self.width = self.height = 0
+        self.sizes = []
+        self.levels = 0
+        self.scale = 1.0
+
+    def addPasses(self, graph, source, width, height, section='blur'):
+        """Declare the passes blurring graph's width x height source; returns the name of level 0."""
+        self.width = width
+        self.height = height
+        self.sizes = levelSizes(width, height)
+        self.levels = len(self.sizes)
+        self.scale = 1.0 / self.levels
+        names = ['bloom {}'.format(i) for i in range(self.levels)]
+        for i, name in enumerate(names):
+            previous = source if i == 0 else names[i - 1]
+            graph.addPass('bloom down {}'.format(i), self.__draw(graph, self.downsampleProgram, previous, False),
+                          inputs=[previous], outputs=[(name, rendergraph.Target(GL_R11F_G11F_B10F, 2 ** (i + 1)))],
+                          section=section)
+        for i in range(self.levels - 1, 0, -1):
+            graph.addPass('bloom up {}'.format(i), self.__draw(graph, self.upsampleProgram, names[i], True),
+                          inputs=[names[i]], outputs=[names[i - 1]], section=section)
+        return names[0]
+
+    def __draw(self, graph, program, source, blend):
+        def draw():
+            gl.useProgram(program)
+            gl.activeTexture(GL_TEXTURE0)
+            gl.bindTexture(GL_TEXTURE_2D, graph.texture(source))
+            if blend:
+                gl.enable(GL_BLEND)
+                gl.blendFunc(GL_ONE, GL_ONE)
+            primitives.mesh('quad').draw(gl)
+            if blend:
+                gl.disable(GL_BLEND)
+        return draw
+
+    @property
+    def passes(self):
+        return 2 * self.levels - 1
+
+    @property
+    def bytes(self):
+        return sum(w * h for w, h in self.sizes) * TEXEL_BYTES
+
+    def bytesMoved(self, sourceTexelBytes=8):
+        """Estimated texture bytes read and written per frame, each texel of a pass counted once."""
+        texels = [w * h for w, h in self.sizes]
+        # downsample: read the larger level, write the smaller; the first reads the source
+        moved = self.width * self.height * sourceTexelBytes + sum(texels[:-1]) * TEXEL_BYTES + sum(texels) * TEXEL_BYTES
+        # upsample: read the smaller level, read and write the larger one to blend
+        moved += sum(texels[1:]) * TEXEL_BYTES + 2 * sum(texels[:-1]) * TEXEL_BYTES
+        return moved
@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Frame capture to a PNG sequence or a raw video stream, without stalling on
+glReadPixels.
+
+    self.capture = capture.FrameCapture('frames', width, height)   # needs the context
+
+    self.capture.capture()      # after a frame is drawn, reads the default framebuffer
+    self.capture.finish()       # writes out what is still in flight
+
+capture() starts an asynchronous glReadPixels of the frame into one of
+BUFFERS pixel pack buffers, with a fence after it. The buffer written
+BUFFERS - 1 frames earlier (frame N - 2 with the default of three) is then
+mapped; by then the GPU has long finished that copy, so the map doesn't
+wait. Unlike profiler.py and exposure.py no frame is dropped: if a fence
+has not signaled when its buffer comes round again the capture waits for
+it, and counts the wait in stalls.
+
+The render thread never copies the pixels itself. A worker thread flips
+the rows straight out of the mapped buffer into an RGB array and then
+encodes that; the buffer is unmapped when its turn for glReadPixels comes
+round again, after waiting for the flip if it isn't done yet. 'png' writes
+frame_0000.png ... as headless.py does, 'raw' writes every frame at its own
+offset of one frames.rgb file of packed RGB rows, top row first, which
+ffmpeg reads with
+
+    ffmpeg -f rawvideo -pix_fmt rgb24 -s WIDTHxHEIGHT -r 60 -i frames.rgb out.mp4
+
+At most MAX_PENDING frames per worker wait for encoding; past that
+capture() blocks on the oldest, so a slow encoder bounds the memory held
+instead of queueing every frame.
+
+The render thread pays for the glReadPixels call and little else. With a GPU
+driver that call only queues a transfer. llvmpipe copies the frame on the
+CPU inside it, about 1 ms at 1080p, so benchmarks/frame_capture.py reports
+the bare read next to the capture modes.
+"""
+
+import os
+import ctypes
+import threading
+import collections
+from multiprocessing.pool import ThreadPool
+
+import numpy as np
+from PIL import Image
+from OpenGL.GL import *
+# the wrapped glReadPixels allocates and returns an array instead of writing into the bound pack buffer
+from OpenGL.raw.GL.VERSION.GL_1_0 import glReadPixels as _glReadPixels
+from OpenGL.raw.GL.VERSION.GL_3_0 import glMapBufferRange as _glMapBufferRange
+
+from glstate import state as gl
+
+BUFFERS = 3
+WORKERS = 4
+MAX_PENDING = 2
+FORMATS = ('png', 'raw')
+# nanoseconds glClientWaitSync waits per try for a buffer that isn't ready
+WAIT_TIMEOUT = 1000000
+
+
+def flip(pixels):
+    """(height, width, 4) bottom-up RGBA as read from GL, to top-down RGB."""
+    return np.ascontiguousarray(pixels[::-1, :, :3])
+
+
+def _writePNG(mapped, copied, path):
+    try:
+        pixels = flip(mapped)
+    finally:
+        copied.set()
+    Image.fromarray(pixels).save(path, compress_level=1)
+
+
+def _writeRaw(mapped, copied, path, offset):
+    try:
+        pixels = flip(mapped)
+    finally:
+        copied.set()
+    with open(path, 'r+b') as f:
+        f.seek(offset)
+        f.write(pixels.tobytes())
+
+
+class FrameCapture(object):
+
+    def __init__(self, output, width, height, format='png', buffers=BUFFERS, workers=WORKERS):
+        if format not in FORMATS:
+            raise ValueError('unknown capture format {}, one of {}'.format(format, ', '.join(FORMATS)))
+        if not os.path.isdir(output):
+            os.makedirs(output)
+        self.output = output
+        self.width = width
+        self.height = height
+        self.format = format
+        self.frame = 0
+        # frames written, and times capture() had to wait on a fence
+        self.written = 0
+        self.stalls = 0
+
+        self.size = width * height * 4
+        self.buffers = list(np.atleast_1d(glGenBuffers(buffers)))
+        for buffer in self.buffers:
+            glBindBuffer(GL_PIXEL_PACK_BUFFER, buffer)
+            glBufferData(GL_PIXEL_PACK_BUFFER, self.size, None, GL_STREAM_READ)
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+        self.fences = [None] * buffers
+        # frame number each buffer holds, and the event its worker sets once done with the mapping
+        self.frames = [None] * buffers
+        self.copied = [None] * buffers
+
+        if format == 'raw':
+            self.path = os.path.join(output, 'frames.rgb')
+            open(self.path, 'wb').close()
+        self.pool = ThreadPool(workers)
+        self.pending = collections.deque()
+        self.maxPending = MAX_PENDING * workers
+
+    def capture(self, framebuffer=0):
+        """Queue the color attachment 0 of framebuffer for writing; binds framebuffer for reading."""
+        slot = self.frame % len(self.buffers)
+        # already collected a frame ago, unless there is only one buffer
+        self.__collect(slot)
+        self.__unmap(slot)
+
+        gl.bindFramebuffer(GL_READ_FRAMEBUFFER, framebuffer)
+        if framebuffer:
+            glReadBuffer(GL_COLOR_ATTACHMENT0)
+        glPixelStorei(GL_PACK_ALIGNMENT, 1)
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, self.buffers[slot])
+        _glReadPixels(0, 0, self.width, self.height, GL_RGBA, GL_UNSIGNED_BYTE, None)
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+        self.fences[slot] = glFenceSync(GL_SYNC_GPU_COMMANDS_COMPLETE, 0)
+        self.frames[slot] = self.frame
+        self.frame += 1
+        # the oldest one left, frame N - 2 of three, is done by now
+        self.__collect((slot + 1) % len(self.buffers))
+
+    def __collect(self, slot):
+        # copy slot's frame out of its pack buffer and hand it to a worker
+        fence = self.fences[slot]
+        if fence is None:
+            return
+        if glClientWaitSync(fence, 0, 0) not in (GL_ALREADY_SIGNALED, GL_CONDITION_SATISFIED):
+            self.stalls += 1
+            while glClientWaitSync(fence, GL_SYNC_FLUSH_COMMANDS_BIT, WAIT_TIMEOUT) == GL_TIMEOUT_EXPIRED:
+                pass
+        glDeleteSync(fence)
+        self.fences[slot] = None
+
+        while len(self.pending) >= self.maxPending:
+            self.__retire()
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, self.buffers[slot])
+        pointer = _glMapBufferRange(GL_PIXEL_PACK_BUFFER, 0, self.size, GL_MAP_READ_BIT)
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+        mapped = np.frombuffer((ctypes.c_ubyte * self.size).from_address(pointer), np.uint8)
+        mapped = mapped.reshape(self.height, self.width, 4)
+
+        frame = self.frames[slot]
+        copied = self.copied[slot] = threading.Event()
+        if self.format == 'png':
+            path = os.path.join(self.output, 'frame_{:04d}.png'.format(frame))
+            result = self.pool.apply_async(_writePNG, (mapped, copied, path))
+        else:
+            offset = frame * self.width * self.height * 3
+            result = self.pool.apply_async(_writeRaw, (mapped, copied, self.path, offset))
+        self.pending.append(result)
+
+    def __unmap(self, slot):
+        copied = self.copied[slot]
+        if copied is None:
+            return
+        copied.wait()
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, self.buffers[slot])
+        glUnmapBuffer(GL_PIXEL_PACK_BUFFER)
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+        self.copied[slot] = None
+
+    def __retire(self):
+        result = self.pending.popleft()
+        # raises whatever the worker raised
+        result.get()
+        self.written += 1
+
+    def finish(self):
+        """Write out every frame still in flight, oldest first."""
+        for i in range(len(self.buffers)):
+            self.__collect((self.frame + i) % len(self.buffers))
+        while self.pending:
+            self.__retire()
+        for slot in range(len(self.buffers)):
+            self.__unmap(slot)
+
+    def delete(self):
+        self.finish()
+        self.pool.close()
+        self.pool.join()
+        glDeleteBuffers(len(self.buffers), np.array(self.buffers, np.uint32))
@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Cascaded shadow maps for a directional light.
+
+    csm = cascades.CascadedShadowMap(4, 2048)          # in initializeGL
+
+    bounds = cascades.worldBounds(casters)  # (n, 2, 3), shadowcache.Caster list
+    csm.update(view, fovy, aspect, near, far, lightDir, bounds)
+    visible = csm.cull(bounds)              # (cascades, n) bool
+    for cascade in range(csm.count):
+        csm.begin(cascade)                  # layer's FBO, viewport, cleared
+        ... draw the casters visible[cascade] with csm.matrices[cascade] ...
+    csm.bind(program, unit)                 # shadowMap, lightSpaceMatrices, cascadePlaneDistances, ...
+
+The camera frustum is cut at splitDistances(): the practical split scheme,
+weight * logarithmic + (1 - weight) * uniform, so near cascades are short
+and far ones long. Each cascade is the glm.perspective sub-frustum between
+two splits; its corners' bounding sphere is fitted with a glm.ortho box in
+a light view that only depends on the light's direction. The box has the
+same size whatever way the camera turns and its centre is snapped to whole
+texels, so shadow edges don't shimmer as the camera moves. Depth covers the
+scene bounds towards the light, casters outside a cascade still shadow it.
+
+All cascades are layers of one GL_TEXTURE_2D_ARRAY depth texture. cull()
+tests every caster's world bounds against every cascade's box in one numpy
+step, so each layer only draws what it can see. The lighting shader picks
+its cascade by view space depth and samples the array at (uv, cascade).
+"""
+
+import numpy as np
+from OpenGL.GL import *
+
+import glm
+import glconfig
+
+# shaders declare their arrays with this many cascades
+MAX_CASCADES = 8
+
+# the corners of the NDC cube
+_NDC_CORNERS = np.array([[x, y, z, 1.0] for x in (-1.0, 1.0) for y in (-1.0, 1.0) for z in (-1.0, 1.0)], np.float32)
+
+
+def splitDistances(near, far, count, weight=0.75):
+    """count + 1 view depths from near to far: weight 1 is logarithmic, 0 uniform."""
+    i = np.arange(count + 1, dtype=np.float64) / count
+    logarithmic = near * (far / near) ** i
+    uniform = near + (far - near) * i
+    return (weight * logarithmic + (1.0 - weight) * uniform).astype(np.float32)
+
+
+def frustumCorners(view, projections):
+    """(n, 8, 3) world space corners of the frusta of view with each of projections (n, 4, 4)."""
+    inverse = np.linalg.inv(np.einsum('ij,njk->nik', view, projections))
+    corners = np.einsum('ck,nkj->ncj', _NDC_CORNERS, inverse)
+    return corners[:, :, :3] / corners[:, :, 3:]
+
+
+def boxCorners(bounds):
+    """(n, 8, 3) corners of (n, 2, 3) (min, max) boxes."""
+    bounds = np.asarray(bounds, np.float32)
+    select = np.array([[x, y, z] for x in (0, 1) for y in (0, 1) for z in (0, 1)])
+    return bounds[:, select, [0, 1, 2]]
+
+
+def worldBounds(casters):
+    """(n, 2, 3) world space (min, max) of shadowcache.Casters' local bounds."""
+    models = np.array([caster.model for caster in casters], np.float32)
+    corners = boxCorners(np.array([caster.bounds for caster in casters], np.float32))
+    world = np.einsum('nck,nkj->ncj', corners, models[:, :3, :3]) + models[:, np.newaxis, 3, :3]
+    return np.stack([world.min(axis=1), world.max(axis=1)], axis=1)
+
+
+def lightView(lightDir):
+    """Rotation looking along lightDir, the same for every cascade and frame."""
+    lightDir = glm.normalize(np.asarray(lightDir, np.float32))
+    up = np.array([0.0, 1.0, 0.0], np.float32)
+    if abs(lightDir[1]) > 0.99:
+        up = np.array([0.0, 0.0, 1.0], np.float32)
+    return glm.lookAt(np.zeros(3, np.float32), lightDir, up)
+
+
+def fitCascades(view, fovy, aspect, splits, lightDir, size, sceneBounds):
+    """Light space matrices (n, 4, 4) of the cascades between splits, and their texel sizes in world units."""
+    projections = np.array([glm.perspective(fovy, aspect, splits[i], splits[i + 1]) for i in range(len(splits) - 1)])
+    corners = frustumCorners(view, projections)
+    # bounding spheres, rounded up so their size doesn't flicker with rounding errors
+    centers = corners.mean(axis=1)
+    radii = np.ceil(np.sqrt(((corners - centers[:, np.newaxis]) ** 2).sum(axis=2)).max(axis=1) * 16.0) / 16.0
+    texels = 2.0 * radii / size
+
+    rotation = lightView(lightDir)
+    lightCenters = centers.dot(rotation[:3, :3])
+    lightCenters[:, :2] = np.floor(lightCenters[:, :2] / texels[:, np.newaxis]) * texels[:, np.newaxis]
+    # the light looks along -z: depth from the nearest caster to the back of each sphere
+    sceneZ = boxCorners(sceneBounds).reshape(-1, 3).dot(rotation[:3, 2])
+    matrices = []
+    for (x, y, z), radius in zip(lightCenters, radii):
+        near = -max(sceneZ.max(), z + radius)
+        far = -min(sceneZ.min(), z - radius)
+        matrices.append(rotation.dot(glm.ortho(x - radius, x + radius, y - radius, y + radius, near, far)))
+    return np.array(matrices, np.float32), texels.astype(np.float32)
+
+
+def cullBoxes(bounds, matrices):
+    """(cascades, n) bool, True where a (min, max) box reaches into a cascade's box."""
+    corners = boxCorners(bounds)
+    clip = np.einsum('nck,mkj->mncj', corners, matrices[:, :3]) + matrices[:, np.newaxis, np.newaxis, 3]
+    low = clip[..., :3].min(axis=2)
+    high = clip[..., :3].max(axis=2)
+    return np.all((high >= -1.0) & (low <= 1.0), axis=2)
+
+
+class CascadedShadowMap(object):
+
+    def __init__(self, count=4, size=2048, weight=0.75):
+        assert count <= MAX_CASCADES
+        self.count = count
+        self.size = size
+        self.weight = weight
+        self.splits = np.zeros(count + 1, np.float32)
+        self.matrices = np.zeros((count, 4, 4), np.float32)
+        self.texels = np.zeros(count, np.float32)
+        # casters drawn into each cascade by the last frame's cull()
+        self.drawn = np.zeros(count, np.int64)
+
+        self.texture = glGenTextures(1)
+        glBindTexture(GL_TEXTURE_2D_ARRAY, self.texture)
+        glTexImage3D(GL_TEXTURE_2D_ARRAY, 0, GL_DEPTH_COMPONENT32F, size, size, count, 0, GL_DEPTH_COMPONENT, GL_FLOAT, None)
+        glTexParameteri(GL_TEXTURE_2D_ARRAY, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
+        glTexParameteri(GL_TEXTURE_2D_ARRAY, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
+        glTexParameteri(GL_TEXTURE_2D_ARRAY, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_BORDER)
+        glTexParameteri(GL_TEXTURE_2D_ARRAY, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_BORDER)
+        glTexParameterfv(GL_TEXTURE_2D_ARRAY, GL_TEXTURE_BORDER_COLOR, np.ones(4, np.float32))
+        glBindTexture(GL_TEXTURE_2D_ARRAY, 0)
+
+        self.fbo = glGenFramebuffers(1)
+        glBindFramebuffer(GL_FRAMEBUFFER, self.fbo)
+        glFramebufferTextureLayer(GL_FRAMEBUFFER, GL_DEPTH_ATTACHMENT, self.texture, 0, 0)
+        glDrawBuffer(GL_NONE)
+        glReadBuffer(GL_NONE)
+        glBindFramebuffer(GL_FRAMEBUFFER, 0)
+
+    @property
+    def bytes(self):
+        return self.size * self.size * self.count * 4
+
+    def update(self, view, fovy, aspect, near, far, lightDir, sceneBounds):
+        """Split the camera frustum and fit every cascade's light space matrix."""
+        self.splits = splitDistances(near, far, self.count, self.weight)
+        self.matrices, self.texels = fitCascades(view, fovy, aspect, self.splits, lightDir, self.size, sceneBounds)
+
+    def cull(self, bounds):
+        """(cascades, n) bool: the (min, max) world bounds each cascade has to draw."""
+        visible = cullBoxes(bounds, self.matrices)
+        self.drawn = visible.sum(axis=1)
+        return visible
+
+    def begin(self, cascade):
+        """Bind cascade's layer as the depth target, cleared, with a size x size viewport."""
+        glBindFramebuffer(GL_FRAMEBUFFER, self.fbo)
+        glFramebufferTextureLayer(GL_FRAMEBUFFER, GL_DEPTH_ATTACHMENT, self.texture, 0, cascade)
+        glViewport(0, 0, self.size, self.size)
+        glClear(GL_DEPTH_BUFFER_BIT)
+
+    def bind(self, program, unit):
+        """Bind the array to unit and set program's cascade uniforms; program must be in use."""
+        glActiveTexture(GL_TEXTURE0 + unit)
+        glBindTexture(GL_TEXTURE_2D_ARRAY, self.texture)
+        glUniform1i(glGetUniformLocation(program, 'shadowMap'), unit)
+        glUniform1i(glGetUniformLocation(program, 'cascadeCount'), self.count)
+        glconfig.uniformMatrix4fv(glGetUniformLocation(program, 'lightSpaceMatrices'), self.matrices)
+        glUniform1fv(glGetUniformLocation(program, 'cascadePlaneDistances'), self.count, self.splits[1:])
+        glUniform1fv(glGetUniformLocation(program, 'cascadeTexelSizes'), self.count, self.texels)
+
+    def delete(self):
+        glDeleteFramebuffers(1, np.array([self.fbo], np.uint32))
+        glDeleteTextures(np.array([self.texture], np.uint32))
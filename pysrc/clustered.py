@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Clustered light culling for deferred shading.
+
+    grid = clustered.LightGrid(near=0.1, far=100.0)     # in initializeGL
+    grid.attach(program, 3)                 # samplers on units 3, 4 and 5, program in use
+
+    grid.update(lights, view, projection, width, height)  # per frame, lights a lightset.LightSet
+    grid.bind(program, lights)              # the buffer textures and the grid uniforms
+
+The view frustum is cut into screen tiles of tileSize pixels and slices
+depth slices, spaced exponentially between near and far. assignLights()
+finds the clusters each light's sphere can reach (the screen rectangle and
+depth range of its bounding box, so conservative) for all lights at once in
+numpy and sorts the (cluster, light) pairs into one index list, lights
+ascending within each cluster. The lighting shader looks up its pixel's
+cluster and loops over that cluster's lights only, so the work per pixel
+follows the number of lights around it rather than the total.
+
+Everything lives in buffer textures (GL 3.3 has no storage buffers, and a
+uniform block is too small for thousands of lights):
+
+    lightData     samplerBuffer  RGBA32F  the LightSet's records, 3 texels each
+    clusters      usamplerBuffer RG32UI   (first index, light count) per cluster
+    lightIndices  usamplerBuffer R32UI    light numbers, grouped by cluster
+
+Clusters are numbered (slice * tilesY + tileY) * tilesX + tileX, with tile
+(0, 0) at the bottom left like gl_FragCoord.
+"""
+
+import math
+
+import numpy as np
+from OpenGL.GL import *
+
+from glstate import state as gl
+from lightset import BufferTexture
+
+TILE_SIZE = 64
+SLICES = 16
+
+
+def gridSize(width, height, tileSize=TILE_SIZE, slices=SLICES):
+    """(tilesX, tilesY, slices) covering a width x height target."""
+    return -(-width // tileSize), -(-height // tileSize), slices
+
+
+def depthSlice(depth, near, far, slices=SLICES):
+    """Slice of view space depths (positive, in front of the camera)."""
+    scale = slices / math.log(far / near)
+    s = np.floor(np.log(np.maximum(depth, near) / near) * scale)
+    return np.clip(s, 0, slices - 1).astype(np.int64)
+
+
+def assignLights(centers, radii, projection, width, height, tileSize=TILE_SIZE, slices=SLICES, near=0.1, far=100.0):
+    """Cluster light lists for lights at view space centers with radii.
+
+    projection is a glm perspective matrix. Returns clusters, an (n, 2)
+    uint32 array of (first index, count) per cluster, and the uint32 light
+    index list they point into.
+    """
+    tilesX, tilesY, slices = gridSize(width, height, tileSize, slices)
+    depth = -centers[:, 2]
+    nearest = depth - radii
+    farthest = depth + radii
+
+    # NDC rectangle of the sphere's bounding box: x / depth is extreme at its
+    # corners, as long as the whole box is in front of the near plane
+    inFront = nearest > near
+    safeNear = np.where(inFront, nearest, 1.0)
+    safeFar = np.where(inFront, farthest, 1.0)
+    bounds = []
+    for axis in (0, 1):
+        low = centers[:, axis] - radii
+        high = centers[:, axis] + radii
+        scale, offset = projection[axis, axis], projection[2, axis]
+        ndcLow = np.minimum(low / safeNear, low / safeFar) * scale - offset
+        ndcHigh = np.maximum(high / safeNear, high / safeFar) * scale - offset
+        # boxes that reach behind the near plane can cover any pixel
+        ndcLow = np.where(inFront, ndcLow, -1.0)
+        ndcHigh = np.where(inFront, ndcHigh, 1.0)
+        bounds.append((ndcLow, ndcHigh))
+    (xLow, xHigh), (yLow, yHigh) = bounds
+    visible = ((farthest > near) & (nearest < far) &
+               (xHigh >= -1.0) & (xLow <= 1.0) & (yHigh >= -1.0) & (yLow <= 1.0))
+
+    lights = np.flatnonzero(visible)
+    tiles = []
+    for (low, high), size, count in (((xLow, xHigh), width, tilesX), ((yLow, yHigh), height, tilesY)):
+        first = np.floor((low[lights] * 0.5 + 0.5) * size / tileSize)
+        last = np.floor((high[lights] * 0.5 + 0.5) * size / tileSize)
+        tiles.append((np.clip(first, 0, count - 1).astype(np.int64), np.clip(last, 0, count - 1).astype(np.int64)))
+    (x0, x1), (y0, y1) = tiles
+    z0 = depthSlice(nearest[lights], near, far, slices)
+    z1 = depthSlice(np.minimum(farthest[lights], far), near, far, slices)
+
+    # one (cluster, light) pair per cluster in each light's box: light i's
+    # pairs are numbered 0 .. nx * ny * nz - 1 and unravelled x fastest
+    nx, ny, nz = x1 - x0 + 1, y1 - y0 + 1, z1 - z0 + 1
+    perLight = nx * ny * nz
+    total = int(perLight.sum())
+    owner = np.repeat(np.arange(len(lights)), perLight)
+    local = np.arange(total) - np.repeat(np.cumsum(perLight) - perLight, perLight)
+    nxOwner, nyOwner = nx[owner], ny[owner]
+    x = x0[owner] + local % nxOwner
+    y = y0[owner] + (local // nxOwner) % nyOwner
+    z = z0[owner] + local // (nxOwner * nyOwner)
+    cluster = (z * tilesY + y) * tilesX + x
+
+    # stable, so each cluster keeps its lights in ascending order
+    order = np.argsort(cluster, kind='mergesort')
+    indices = lights[owner[order]].astype(np.uint32)
+    counts = np.bincount(cluster, minlength=tilesX * tilesY * slices)
+    clusters = np.empty((len(counts), 2), np.uint32)
+    clusters[:, 0] = np.cumsum(counts) - counts
+    clusters[:, 1] = counts
+    return clusters, indices
+
+
+class LightGrid(object):
+
+    def __init__(self, tileSize=TILE_SIZE, slices=SLICES, near=0.1, far=100.0):
+        self.tileSize = tileSize
+        self.unit = 0
+        self.slices = slices
+        self.near = near
+        self.far = far
+        self.size = (1, 1, slices)
+        # of the last update: (cluster, light) pairs, and lights per non-empty cluster
+        self.pairs = 0
+        self.meanLights = 0.0
+        self.maxLights = 0
+        self.__clusters = BufferTexture(GL_RG32UI, GL_STREAM_DRAW)
+        self.__lightIndices = BufferTexture(GL_R32UI, GL_STREAM_DRAW)
+
+    def update(self, lights, view, projection, width, height):
+        """Rebuild the cluster lists of a LightSet for the camera and target size."""
+        centers = lights.position.dot(view[:3]) + view[3]
+        clusters, indices = assignLights(centers, lights.radius, projection, width, height,
+                                         self.tileSize, self.slices, self.near, self.far)
+        self.size = gridSize(width, height, self.tileSize, self.slices)
+        self.pairs = len(indices)
+        used = np.count_nonzero(clusters[:, 1])
+        self.meanLights = float(self.pairs) / used if used else 0.0
+        self.maxLights = int(clusters[:, 1].max())
+        self.__clusters.upload(clusters)
+        # an empty buffer store would be an incomplete texture
+        self.__lightIndices.upload(indices if len(indices) else np.zeros(1, np.uint32))
+
+    def attach(self, program, unit):
+        """Point program's samplers at unit, unit + 1 and unit + 2; program must be in use."""
+        self.unit = unit
+        for offset, name in enumerate(('lightData', 'clusters', 'lightIndices')):
+            glUniform1i(glGetUniformLocation(program, name), unit + offset)
+
+    def bind(self, program, lights):
+        """Bind the LightSet and the cluster lists to the attached units and set program's grid uniforms."""
+        gl.bindTextureUnit(self.unit, GL_TEXTURE_BUFFER, lights.texture)
+        gl.bindTextureUnit(self.unit + 1, GL_TEXTURE_BUFFER, self.__clusters.texture)
+        gl.bindTextureUnit(self.unit + 2, GL_TEXTURE_BUFFER, self.__lightIndices.texture)
+        glUniform1i(glGetUniformLocation(program, 'lightCount'), len(lights))
+        glUniform1i(glGetUniformLocation(program, 'tileSize'), self.tileSize)
+        glUniform3i(glGetUniformLocation(program, 'clusterCount'), *self.size)
+        # slice = log(depth) * scale - bias, see depthSlice
+        scale = self.slices / math.log(self.far / self.near)
+        glUniform2f(glGetUniformLocation(program, 'sliceScaleBias'), scale, math.log(self.near) * scale)
+
+    def delete(self):
+        self.__clusters.delete()
+        self.__lightIndices.delete()
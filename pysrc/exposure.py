@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Automatic exposure from the HDR scene's average luminance, measured on the
+GPU and read back without ever waiting for it.
+
+    self.exposureControl = exposure.AutoExposure(luminanceProgram)     # in initializeGL
+
+    self.exposureControl.measure(hdrTexture, width, height)              # after the scene pass
+    self.exposure = self.exposureControl.update(self.exposure, deltaTime)  # the tone mapping's exposure
+
+measure() draws the log luminance of the HDR texture into a SIZE x SIZE
+GL_R16F texture and glGenerateMipmap averages that down to 1x1: the log of
+the scene's geometric mean luminance, which a few very bright pixels don't
+run away with the way they would with a plain mean. The 1x1 level is
+copied into one of BUFFERS pixel pack buffers with a fence after it. Like
+profiler.py's queries, a buffer's value is read when its turn comes round
+again, BUFFERS frames later, and only if its fence has signaled by then; a
+reading that is still pending is dropped rather than waited for. So the
+exposure follows the scene a few frames late, which the adaptation hides.
+
+update() moves an exposure towards key / the newest reading's average
+luminance, exponentially in EVs (log2 exposure): speedUp per second when
+the scene got darker, speedDown when it got brighter, the way eyes adapt to
+the dark more slowly than to light. Exposure stays between MIN_EXPOSURE and
+MAX_EXPOSURE. Before the first reading comes back it is left as it is.
+
+logAverageLuminance(), targetExposure() and adapt() are the numpy
+reference: the first computes from a full resolution HDR image what the
+GPU estimates from SIZE x SIZE bilinear samples, update() uses the other
+two as they are.
+"""
+
+import ctypes
+
+import numpy as np
+from OpenGL.GL import *
+# the wrapped versions allocate and return an array instead of writing into the bound pack buffer
+from OpenGL.raw.GL.VERSION.GL_1_0 import glGetTexImage as _glGetTexImage
+from OpenGL.raw.GL.VERSION.GL_1_5 import glGetBufferSubData as _glGetBufferSubData
+
+import primitives
+from glstate import state as gl
+
+# the luminance texture's size, the mip chain down from it has LEVELS levels
+SIZE = 256
+LEVELS = 9
+BUFFERS = 3
+# Rec. 709 luminance weights, as the luminance shader uses them
+LUMINANCE = np.array([0.2126, 0.7152, 0.0722], np.float32)
+# darkest luminance the log is taken of
+EPSILON = 1e-4
+MIN_EXPOSURE = 1.0 / 64.0
+MAX_EXPOSURE = 64.0
+
+
+def logAverageLuminance(pixels):
+    """Mean of the log luminance of (..., 3) linear HDR pixels."""
+    luminance = np.dot(pixels[..., :3], LUMINANCE)
+    return float(np.log(np.maximum(luminance, EPSILON)).mean())
+
+
+def targetExposure(logAverage, key):
+    """Exposure that brings the geometric mean luminance exp(logAverage) to key."""
+    return float(np.clip(key / np.exp(logAverage), MIN_EXPOSURE, MAX_EXPOSURE))
+
+
+def adapt(exposure, target, deltaTime, speedUp, speedDown):
+    """exposure moved towards target over deltaTime seconds, exponentially in EVs."""
+    speed = speedUp if target > exposure else speedDown
+    ev = np.log2(exposure)
+    ev += (np.log2(target) - ev) * (1.0 - np.exp(-speed * deltaTime))
+    return float(np.clip(2.0 ** ev, MIN_EXPOSURE, MAX_EXPOSURE))
+
+
+class AutoExposure(object):
+
+    def __init__(self, program, key=0.18, speedUp=1.0, speedDown=3.0):
+        self.program = program
+        self.key = key
+        self.speedUp = speedUp
+        self.speedDown = speedDown
+        # log average luminance read back last, and how many readings were dropped
+        self.logAverage = None
+        self.dropped = 0
+
+        self.texture = glGenTextures(1)
+        glBindTexture(GL_TEXTURE_2D, self.texture)
+        glTexImage2D(GL_TEXTURE_2D, 0, GL_R16F, SIZE, SIZE, 0, GL_RED, GL_FLOAT, None)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
+        # allocate the levels
+        glGenerateMipmap(GL_TEXTURE_2D)
+        self.fbo = glGenFramebuffers(1)
+        glBindFramebuffer(GL_FRAMEBUFFER, self.fbo)
+        glFramebufferTexture2D(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, GL_TEXTURE_2D, self.texture, 0)
+        if glCheckFramebufferStatus(GL_FRAMEBUFFER) != GL_FRAMEBUFFER_COMPLETE:
+            print('Framebuffer not complete!')
+        self.buffers = list(np.atleast_1d(glGenBuffers(BUFFERS)))
+        for buffer in self.buffers:
+            glBindBuffer(GL_PIXEL_PACK_BUFFER, buffer)
+            glBufferData(GL_PIXEL_PACK_BUFFER, 4, None, GL_STREAM_READ)
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+        glBindTexture(GL_TEXTURE_2D, 0)
+        glBindFramebuffer(GL_FRAMEBUFFER, 0)
+        # the above went around the state cache
+        gl.invalidate()
+        self.fences = [None] * BUFFERS
+        self.frame = 0
+        self.__reading = np.zeros(1, np.float32)
+
+    def measure(self, hdrTexture, width, height):
+        """Queue the log average luminance of hdrTexture for reading BUFFERS frames later; leaves a width x height viewport."""
+        slot = self.frame % BUFFERS
+        self.__collect(slot)
+
+        gl.bindFramebuffer(GL_FRAMEBUFFER, self.fbo)
+        glViewport(0, 0, SIZE, SIZE)
+        gl.useProgram(self.program)
+        gl.activeTexture(GL_TEXTURE0)
+        gl.bindTexture(GL_TEXTURE_2D, hdrTexture)
+        primitives.mesh('quad').draw(gl)
+        gl.bindFramebuffer(GL_FRAMEBUFFER, 0)
+        glViewport(0, 0, width, height)
+
+        gl.bindTexture(GL_TEXTURE_2D, self.texture)
+        glGenerateMipmap(GL_TEXTURE_2D)
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, self.buffers[slot])
+        _glGetTexImage(GL_TEXTURE_2D, LEVELS - 1, GL_RED, GL_FLOAT, None)
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+        self.fences[slot] = glFenceSync(GL_SYNC_GPU_COMMANDS_COMPLETE, 0)
+        self.frame += 1
+
+    def __collect(self, slot):
+        # read slot's value if its copy is done, drop it if not
+        fence = self.fences[slot]
+        if fence is None:
+            return
+        if glClientWaitSync(fence, 0, 0) in (GL_ALREADY_SIGNALED, GL_CONDITION_SATISFIED):
+            glBindBuffer(GL_PIXEL_PACK_BUFFER, self.buffers[slot])
+            _glGetBufferSubData(GL_PIXEL_PACK_BUFFER, 0, 4, self.__reading.ctypes.data_as(ctypes.c_void_p))
+            glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+            self.logAverage = float(self.__reading[0])
+        else:
+            self.dropped += 1
+        glDeleteSync(fence)
+        self.fences[slot] = None
+
+    def update(self, exposure, deltaTime):
+        """exposure adapted over deltaTime seconds towards the newest reading's target."""
+        if self.logAverage is None:
+            return exposure
+        return adapt(exposure, targetExposure(self.logAverage, self.key), deltaTime, self.speedUp, self.speedDown)
+
+    def delete(self):
+        for fence in self.fences:
+            if fence is not None:
+                glDeleteSync(fence)
+        glDeleteBuffers(BUFFERS, np.array(self.buffers, np.uint32))
+        glDeleteFramebuffers(1, np.array([self.fbo], np.uint32))
+        glDeleteTextures(np.array([self.texture], np.uint32))
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+PyOpenGL configuration and raw entry points for the hot calls.
+
+PyOpenGL reads its flags when OpenGL.GL is first imported, so this module
+has to be imported before that:
+
+    import glconfig
+    from OpenGL.GL import *
+
+By default it turns off ERROR_CHECKING (a glGetError after every call) and
+ERROR_LOGGING, and turns on ERROR_ON_COPY: an array argument that would have
+to be converted (a list, float64 data, a non-contiguous view) raises instead
+of being silently copied on every call. Set LEARNOPENGL_GL_DEBUG=1 to keep
+PyOpenGL's full checking while tracking down a GL error.
+
+uniformMatrix4fv, drawElements and bindTexture call the driver through
+plain ctypes prototypes, resolved on first use, without PyOpenGL's argument
+conversion. They take what the driver takes: float32 matrices and byte
+offsets into the bound element buffer. A matrix of another type, or a
+transposed or sliced view, is made contiguous float32 first; for one that
+already is, np.ascontiguousarray returns it as it is. In debug mode they go
+through the checked OpenGL.GL functions instead, and such a matrix raises,
+so a caller that pays for a copy on every upload shows up.
+
+benchmarks/glcalls.py measures the per-call overhead of each variant.
+"""
+
+import os
+import sys
+import ctypes
+import warnings
+
+import numpy as np
+import OpenGL
+
+DEBUG = bool(os.environ.get('LEARNOPENGL_GL_DEBUG'))
+
+if 'OpenGL.GL' in sys.modules:
+    warnings.warn('glconfig imported after OpenGL.GL, the PyOpenGL flags have no effect')
+if not DEBUG:
+    OpenGL.ERROR_CHECKING = False
+    OpenGL.ERROR_LOGGING = False
+    OpenGL.ERROR_ON_COPY = True
+
+if not OpenGL.ERROR_CHECKING and os.environ.get('PYOPENGL_PLATFORM') == 'egl':
+    # PyOpenGL's EGL bindings only define their error checker when checking is
+    # on; give them the None its GL bindings use instead
+    import OpenGL.raw.EGL._errors
+    if not hasattr(OpenGL.raw.EGL._errors, '_error_checker'):
+        OpenGL.raw.EGL._errors._error_checker = None
+
+from OpenGL import platform
+from OpenGL.GL import *
+
+
+class _EntryPoint(object):
+    # stands in for a raw function until its first call looks it up, which
+    # needs a current context on some platforms
+    def __init__(self, name, restype, *argtypes):
+        self.name = name
+        self.prototype = ctypes.CFUNCTYPE(restype, *argtypes)
+
+    def __call__(self, *args):
+        address = platform.PLATFORM.getExtensionProcedure(self.name.encode('ascii'))
+        if not address:
+            raise RuntimeError('no entry point for {}'.format(self.name))
+        function = self.prototype(address)
+        setattr(raw, self.name, function)
+        return function(*args)
+
+
+class _RawFunctions(object):
+    pass
+
+raw = _RawFunctions()
+raw.glUniformMatrix4fv = _EntryPoint('glUniformMatrix4fv', None, GLint, GLsizei, GLboolean, ctypes.c_void_p)
+raw.glDrawElements = _EntryPoint('glDrawElements', None, GLenum, GLsizei, GLenum, ctypes.c_void_p)
+raw.glBindTexture = _EntryPoint('glBindTexture', None, GLenum, GLuint)
+
+
+if DEBUG:
+    def uniformMatrix4fv(location, matrix):
+        """Upload one mat4, or an array of them, as stored (no transpose)."""
+        # what the raw call below would silently misread
+        if matrix.dtype != np.float32 or not matrix.flags.c_contiguous:
+            raise ValueError('uniformMatrix4fv needs contiguous float32 data, got {}'.format(matrix.dtype))
+        glUniformMatrix4fv(location, matrix.size // 16, GL_FALSE, matrix)
+
+    def drawElements(mode, count, type, offset=0):
+        glDrawElements(mode, count, type, ctypes.c_void_p(offset) if offset else None)
+
+    def bindTexture(target, texture):
+        glBindTexture(target, texture)
+else:
+    def uniformMatrix4fv(location, matrix):
+        """Upload one mat4, or an array of them, as stored (no transpose)."""
+        # float64 or a transposed view would be misread as float32 rows
+        matrix = np.ascontiguousarray(matrix, np.float32)
+        raw.glUniformMatrix4fv(location, matrix.size >> 4, 0, matrix.ctypes.data)
+
+    def drawElements(mode, count, type, offset=0):
+        raw.glDrawElements(mode, count, type, offset)
+
+    def bindTexture(target, texture):
+        raw.glBindTexture(target, texture)
+
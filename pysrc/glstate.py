@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Shadow copy of the GL bind points and fixed-function state that drops calls
+which would not change anything.
+
+    from glstate import state as gl
+
+    gl.invalidate()                         # at the top of paintGL
+    gl.useProgram(shader)
+    gl.bindFramebuffer(GL_FRAMEBUFFER, fbo)
+    gl.activeTexture(GL_TEXTURE0)
+    gl.bindTexture(GL_TEXTURE_2D, texture)
+    gl.bindVertexArray(vao)
+
+Tracked: the program, vertex array, draw and read framebuffers, active
+texture unit and the texture bound to each (unit, target), glEnable /
+glDisable capabilities, and the blend function, depth function and mask,
+cull face and polygon mode. Everything starts out unknown, so the first
+call of each kind always goes through.
+
+The cache only knows about calls made through it. Code that binds or sets
+any of the above directly (texture uploads, framebuffer setup in
+initializeGL, Qt between frames) leaves it stale; call invalidate() after
+such code, which is why the scripts invalidate once per frame.
+
+issued and elided count calls by GL function name; the difference in
+elided over a frame is the number of calls saved.
+"""
+
+import collections
+
+from OpenGL.GL import *
+
+import glconfig
+
+
+class StateCache(object):
+
+    def __init__(self):
+        self.issued = collections.Counter()
+        self.elided = collections.Counter()
+        self.invalidate()
+
+    def invalidate(self):
+        """Forget the shadowed state, e.g. after GL calls made around the cache."""
+        self.__state = {}
+        self.__activeTexture = None
+
+    def resetStats(self):
+        self.issued.clear()
+        self.elided.clear()
+
+    @property
+    def issuedTotal(self):
+        return sum(self.issued.values())
+
+    @property
+    def elidedTotal(self):
+        return sum(self.elided.values())
+
+    def report(self):
+        lines = ['{:<24} {:>8} {:>8}'.format('call', 'issued', 'elided')]
+        for name in sorted(set(self.issued) | set(self.elided)):
+            lines.append('{:<24} {:8d} {:8d}'.format(name, self.issued[name], self.elided[name]))
+        return '\n'.join(lines)
+
+    def __changes(self, name, key, value):
+        # records value for key, False (and counted as elided) when it was already set
+        if key in self.__state and self.__state[key] == value:
+            self.elided[name] += 1
+            return False
+        self.__state[key] = value
+        self.issued[name] += 1
+        return True
+
+    def useProgram(self, program):
+        if self.__changes('glUseProgram', 'program', program):
+            glUseProgram(program)
+
+    def bindVertexArray(self, vao):
+        if self.__changes('glBindVertexArray', 'vertex array', vao):
+            glBindVertexArray(vao)
+
+    def bindFramebuffer(self, target, framebuffer):
+        if target == GL_FRAMEBUFFER:
+            draw = self.__state.get(('framebuffer', GL_DRAW_FRAMEBUFFER))
+            read = self.__state.get(('framebuffer', GL_READ_FRAMEBUFFER))
+            if draw is not None and draw == framebuffer and read == framebuffer:
+                self.elided['glBindFramebuffer'] += 1
+                return
+            self.__state[('framebuffer', GL_DRAW_FRAMEBUFFER)] = framebuffer
+            self.__state[('framebuffer', GL_READ_FRAMEBUFFER)] = framebuffer
+            self.issued['glBindFramebuffer'] += 1
+            glBindFramebuffer(target, framebuffer)
+        elif self.__changes('glBindFramebuffer', ('framebuffer', target), framebuffer):
+            glBindFramebuffer(target, framebuffer)
+
+    def activeTexture(self, texture):
+        if self.__activeTexture == texture:
+            self.elided['glActiveTexture'] += 1
+            return
+        self.__activeTexture = texture
+        self.issued['glActiveTexture'] += 1
+        glActiveTexture(texture)
+
+    def bindTexture(self, target, texture):
+        if self.__activeTexture is None:
+            # unknown unit, nothing to compare against or record under
+            self.issued['glBindTexture'] += 1
+            glconfig.bindTexture(target, texture)
+        elif self.__changes('glBindTexture', ('texture', self.__activeTexture, target), texture):
+            glconfig.bindTexture(target, texture)
+
+    def bindTextureUnit(self, unit, target, texture):
+        """Bind texture to unit, switching the active unit only if the binding changes."""
+        key = ('texture', GL_TEXTURE0 + unit, target)
+        if key in self.__state and self.__state[key] == texture:
+            self.elided['glBindTexture'] += 1
+            return
+        self.activeTexture(GL_TEXTURE0 + unit)
+        self.bindTexture(target, texture)
+
+    def enable(self, capability):
+        if self.__changes('glEnable', ('capability', capability), True):
+            glEnable(capability)
+
+    def disable(self, capability):
+        if self.__changes('glDisable', ('capability', capability), False):
+            glDisable(capability)
+
+    def blendFunc(self, sfactor, dfactor):
+        if self.__changes('glBlendFunc', 'blend func', (sfactor, dfactor)):
+            glBlendFunc(sfactor, dfactor)
+
+    def depthFunc(self, func):
+        if self.__changes('glDepthFunc', 'depth func', func):
+            glDepthFunc(func)
+
+    def depthMask(self, flag):
+        if self.__changes('glDepthMask', 'depth mask', bool(flag)):
+            glDepthMask(flag)
+
+    def cullFace(self, mode):
+        if self.__changes('glCullFace', 'cull face', mode):
+            glCullFace(mode)
+
+    def polygonMode(self, face, mode):
+        if self.__changes('glPolygonMode', ('polygon mode', face), mode):
+            glPolygonMode(face, mode)
+
+
+# one per process, the examples only ever have the one context
+state = StateCache()
@@ -0,0 +1,246 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Opt-in tracing of OpenGL.GL calls with redundant state detection.
+
+    EGL_PLATFORM=surfaceless python pysrc/gltrace.py pysrc/5.advanced_lighting/7.bloom.py --frames 3
+
+Tracer.install() wraps every gl* function in OpenGL.GL and glconfig's raw
+entry points, so it has to run before the code to trace does
+`from OpenGL.GL import *`. Per frame it counts calls by function and by
+Python call site, and keeps a shadow copy of the bind points and
+fixed-function state to flag calls that change nothing:
+
+    same value          the bind/state call sets what is already set
+    unbind + rebind     a bind to 0 that is undone by the next bind on the
+                        same slot before anything was drawn
+
+The shadow state starts out unknown every frame, since whatever drives
+paintGL (Qt or headless.py) may have touched the context in between.
+"""
+
+import os
+import sys
+import json
+import collections
+
+if __name__ == '__main__':
+    # the command line renders offscreen, which fixes the platform before OpenGL is imported
+    import headless
+import glconfig
+import OpenGL.GL
+from OpenGL.GL import GL_TEXTURE0, GL_FRAMEBUFFER, GL_READ_FRAMEBUFFER, GL_DRAW_FRAMEBUFFER, GL_ELEMENT_ARRAY_BUFFER
+
+DRAW_PREFIXES = ('glDraw', 'glMultiDraw')
+# calls after which an unbound slot has been used for something
+USE_CALLS = ('glClear', 'glBlitFramebuffer')
+
+# glconfig's raw entry points bypass OpenGL.GL, they are counted as the GL call
+RAW_CALLS = {'uniformMatrix4fv': 'glUniformMatrix4fv',
+             'drawElements': 'glDrawElements',
+             'bindTexture': 'glBindTexture'}
+
+# state setters whose whole argument list is the new value
+STATE_CALLS = ('glBlendFunc', 'glBlendFuncSeparate', 'glBlendEquation', 'glDepthFunc', 'glDepthMask',
+               'glCullFace', 'glFrontFace', 'glPolygonMode', 'glClearColor', 'glViewport',
+               'glStencilFunc', 'glStencilOp', 'glStencilMask', 'glColorMask')
+
+
+def _value(arg):
+    # arguments as hashable plain values (ShaderProgram, numpy scalars, ...)
+    if isinstance(arg, (bool, int, float)):
+        return arg
+    try:
+        return int(arg)
+    except (TypeError, ValueError):
+        try:
+            return float(arg)
+        except (TypeError, ValueError):
+            return id(arg)
+
+
+class FrameTrace(object):
+
+    def __init__(self, index):
+        self.index = index
+        self.calls = collections.Counter()
+        self.sites = collections.Counter()
+        self.redundant = collections.Counter()
+
+    @property
+    def total(self):
+        return sum(self.calls.values())
+
+    @property
+    def draws(self):
+        return sum(n for name, n in self.calls.items() if name.startswith(DRAW_PREFIXES))
+
+    @property
+    def redundantTotal(self):
+        return sum(self.redundant.values())
+
+    def toDict(self):
+        return {'frame': self.index,
+                'calls': self.total,
+                'draws': self.draws,
+                'redundant': self.redundantTotal,
+                'byFunction': dict(self.calls),
+                'bySite': dict(('{}:{} {}'.format(*site), n) for site, n in self.sites.items()),
+                'redundantCalls': [{'function': name, 'reason': reason, 'site': '{}:{} {}'.format(*site), 'count': n}
+                                   for (name, reason, site), n in self.redundant.most_common()]}
+
+    def report(self, top=10):
+        lines = ['frame {}: {} GL calls, {} draws, {} redundant'.format(self.index, self.total, self.draws,
+                                                                       self.redundantTotal)]
+        lines.append('  calls by function')
+        for name, n in self.calls.most_common(top):
+            lines.append('    {:<32} {:6d}'.format(name, n))
+        if self.sites:
+            lines.append('  calls by site')
+            for site, n in self.sites.most_common(top):
+                lines.append('    {:<48} {:6d}'.format('{}:{} {}'.format(*site), n))
+        if self.redundant:
+            lines.append('  redundant')
+            for (name, reason, site), n in self.redundant.most_common(top):
+                lines.append('    {:<24} {:6d}  {:<16} {}'.format(name, n, reason, '{}:{} {}'.format(*site)))
+        return '\n'.join(lines)
+
+
+class Tracer(object):
+
+    def __init__(self, callSites=True, history=120):
+        self.callSites = callSites
+        self.frames = collections.deque(maxlen=history)
+        self.frameCount = 0
+        # calls made outside beginFrame/endFrame (loading) land in a frame of their own
+        self.current = FrameTrace(None)
+        self.__state = {}
+        self.__unbound = {}
+        self.__installed = {}
+        self.__installedRaw = {}
+
+    def install(self):
+        for name in dir(OpenGL.GL):
+            function = getattr(OpenGL.GL, name)
+            if name.startswith('gl') and callable(function) and name not in self.__installed:
+                self.__installed[name] = function
+                setattr(OpenGL.GL, name, self.__wrap(name, function))
+        for name, glName in RAW_CALLS.items():
+            if name not in self.__installedRaw:
+                function = getattr(glconfig, name)
+                self.__installedRaw[name] = function
+                setattr(glconfig, name, self.__wrap(glName, function))
+
+    def uninstall(self):
+        for name, function in self.__installed.items():
+            setattr(OpenGL.GL, name, function)
+        for name, function in self.__installedRaw.items():
+            setattr(glconfig, name, function)
+        self.__installed = {}
+        self.__installedRaw = {}
+
+    def beginFrame(self):
+        self.current = FrameTrace(self.frameCount)
+        self.__state = {}
+        self.__unbound = {}
+
+    def endFrame(self):
+        self.frames.append(self.current)
+        self.frameCount += 1
+        self.current = FrameTrace(None)
+
+    def __wrap(self, name, function):
+        def traced(*args, **kwargs):
+            self.__record(name, args)
+            return function(*args, **kwargs)
+        traced.__name__ = name
+        return traced
+
+    def __site(self):
+        # the caller of the traced function, above __record and traced
+        frame = sys._getframe(3)
+        return (os.path.basename(frame.f_code.co_filename), frame.f_lineno, frame.f_code.co_name)
+
+    def __record(self, name, args):
+        frame = self.current
+        frame.calls[name] += 1
+        site = self.__site() if self.callSites else ('', 0, '')
+        if self.callSites:
+            frame.sites[site] += 1
+
+        if name.startswith(DRAW_PREFIXES) or name in USE_CALLS:
+            self.__unbound = {}
+            return
+        for key, value, bind in self.__stateChanges(name, args):
+            if key in self.__state and self.__state[key] == value:
+                frame.redundant[(name, 'same value', site)] += 1
+                continue
+            self.__state[key] = value
+            if not bind:
+                continue
+            if value == 0:
+                self.__unbound[key] = (name, site)
+            elif key in self.__unbound:
+                unbindName, unbindSite = self.__unbound.pop(key)
+                frame.redundant[(unbindName, 'unbind + rebind', unbindSite)] += 1
+
+    def __stateChanges(self, name, args):
+        # (slot, value, is a bind point) for every piece of state the call sets
+        if name == 'glUseProgram':
+            return [(('program',), _value(args[0]), True)]
+        if name == 'glBindVertexArray':
+            return [(('vertex array',), _value(args[0]), True)]
+        if name == 'glActiveTexture':
+            return [(('active texture',), _value(args[0]), False)]
+        if name == 'glBindTexture':
+            unit = self.__state.get(('active texture',), GL_TEXTURE0)
+            return [(('texture', unit, _value(args[0])), _value(args[1]), True)]
+        if name == 'glBindBuffer':
+            target = _value(args[0])
+            if target == GL_ELEMENT_ARRAY_BUFFER:
+                # part of the vertex array object's state
+                return [(('buffer', target, self.__state.get(('vertex array',))), _value(args[1]), False)]
+            return [(('buffer', target), _value(args[1]), True)]
+        if name == 'glBindRenderbuffer':
+            return [(('renderbuffer',), _value(args[1]), True)]
+        if name == 'glBindFramebuffer':
+            # 0 is the window here, not an unbind
+            target, fbo = _value(args[0]), _value(args[1])
+            if target == GL_FRAMEBUFFER:
+                return [(('framebuffer', GL_DRAW_FRAMEBUFFER), fbo, False), (('framebuffer', GL_READ_FRAMEBUFFER), fbo, False)]
+            return [(('framebuffer', target), fbo, False)]
+        if name in ('glEnable', 'glDisable'):
+            return [(('capability', _value(args[0])), name == 'glEnable', False)]
+        if name in STATE_CALLS:
+            return [((name,), tuple(_value(a) for a in args), False)]
+        return []
+
+    def summary(self):
+        return [frame.toDict() for frame in self.frames]
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Trace the GL calls of an example script, rendered offscreen.')
+    parser.add_argument('script')
+    parser.add_argument('--frames', type=int, default=2)
+    parser.add_argument('--width', type=int, default=800)
+    parser.add_argument('--height', type=int, default=600)
+    parser.add_argument('--top', type=int, default=10, help='rows per table')
+    parser.add_argument('--json', help='also write every traced frame to this file')
+    args = parser.parse_args()
+
+    tracer = Tracer()
+    tracer.install()
+    runner = headless.HeadlessRunner(args.script, args.width, args.height)
+    for i in range(args.frames):
+        tracer.beginFrame()
+        runner.renderFrame()
+        tracer.endFrame()
+        print(tracer.frames[-1].report(args.top))
+    runner.close()
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(tracer.summary(), f, indent=2)
+    sys.exit(0)
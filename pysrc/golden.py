@@ -0,0 +1,251 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Golden image tests: every chapter script rendered offscreen at fixed camera
+poses and compared with stored reference frames.
+
+    EGL_PLATFORM=surfaceless python pysrc/golden.py --save
+    EGL_PLATFORM=surfaceless python pysrc/golden.py
+    EGL_PLATFORM=surfaceless python pysrc/golden.py pysrc/5.advanced_lighting/*.py --diffs diffs
+
+Each script runs in its own process through headless.HeadlessRunner on
+Mesa's llvmpipe (LIBGL_ALWAYS_SOFTWARE=1), at a fixed size and with the fixed
+frame clock. For each of POSES the camera is put back at its starting point,
+turned and moved by the pose's offsets, and WARMUP frames are rendered
+before the last is kept, so whatever settles over a few frames (automatic
+exposure, cached shadow maps) has settled. Every frame is finished before
+the next starts: readbacks that skip a reading whose fence hasn't signaled
+yet (exposure.py) would otherwise depend on how fast llvmpipe's threads
+were. Scripts without a camera are rendered at the first pose only.
+
+--save writes the frames into the reference directory as
+<chapter>/<script>/pose_N.png, with the renderer and size in
+references.json. A script that fails to render is recorded there as an
+expected failure along with its error. Without --save every frame is
+compared with its reference through imagediff.compare(); for each that
+fails the frame and a diff heatmap are written to the diffs directory, and
+the exit status is 1. A script without a reference fails too, and so does
+an expected failure that renders now, until its references are saved.
+"""
+
+import os
+import sys
+import glob
+import json
+import shutil
+import tempfile
+import argparse
+import subprocess
+
+import numpy as np
+from PIL import Image
+
+import imagediff
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+CHAPTERS = ['1.getting_started', '2.lighting', '3.model_loading', '4.advanced_opengl', '5.advanced_lighting']
+REFERENCES = os.path.join(os.path.dirname(ROOT), 'resources', 'golden')
+WIDTH = 400
+HEIGHT = 300
+WARMUP = 4
+# yaw and pitch in degrees, and steps forward along the camera's front
+POSES = [(0.0, 0.0, 0.0),
+         (25.0, -10.0, 0.5),
+         (-30.0, 8.0, -1.0)]
+
+
+def setPose(window, start, pose):
+    camera = getattr(window, 'camera', None)
+    if camera is None:
+        return
+    position, yaw, pitch = start
+    dYaw, dPitch, forward = pose
+    camera.processMouseMovement((yaw + dYaw - camera.yaw) / camera.mouseSensitivity,
+                                (pitch + dPitch - camera.pitch) / camera.mouseSensitivity)
+    camera.position = position + camera.front * forward
+
+
+def renderScript(script, output, width, height):
+    """Render script's poses into output/pose_N.png; returns the renderer."""
+    # picks the EGL platform, so only imported in the process that renders
+    import headless
+    from OpenGL.GL import glFinish, glGetString, GL_RENDERER
+
+    runner = headless.HeadlessRunner(script, width, height)
+    camera = getattr(runner.window, 'camera', None)
+    poses = POSES if camera is not None else POSES[:1]
+    start = (camera.position.copy(), camera.yaw, camera.pitch) if camera is not None else None
+    for i, pose in enumerate(poses):
+        setPose(runner.window, start, pose)
+        for frame in range(WARMUP):
+            runner.renderFrame()
+            glFinish()
+        pixels = runner.readFrame()[:, :, :3]
+        Image.fromarray(np.ascontiguousarray(pixels)).save(os.path.join(output, 'pose_{}.png'.format(i)))
+    renderer = glGetString(GL_RENDERER).decode('utf-8')
+    runner.close()
+    return renderer
+
+
+def findScripts(patterns=None):
+    if not patterns:
+        patterns = [os.path.join(ROOT, chapter, '*.py') for chapter in CHAPTERS]
+    scripts = []
+    for pattern in patterns:
+        scripts.extend(sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern])
+    return scripts
+
+
+def scriptKey(script):
+    return os.path.splitext(os.path.relpath(os.path.abspath(script), ROOT).replace(os.sep, '/'))[0]
+
+
+def render(script, output, width, height):
+    """Render script in a child process; returns (renderer, None) or (None, error)."""
+    if not os.path.isdir(output):
+        os.makedirs(output)
+    env = dict(os.environ, LIBGL_ALWAYS_SOFTWARE='1', GALLIUM_DRIVER='llvmpipe')
+    env.setdefault('EGL_PLATFORM', 'surfaceless')
+    command = [sys.executable, os.path.abspath(__file__), '--child', output,
+               '--width', str(width), '--height', str(height), script]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env)
+    out, err = process.communicate()
+    if process.returncode != 0:
+        lines = err.decode('utf-8', 'replace').strip().splitlines()
+        return None, lines[-1] if lines else 'exit status {}'.format(process.returncode)
+    return out.decode('utf-8').strip().splitlines()[-1], None
+
+
+def loadManifest(references):
+    path = os.path.join(references, 'references.json')
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        manifest = json.load(f)
+    manifest.setdefault('failures', {})
+    return manifest
+
+
+def save(scripts, references, width, height):
+    manifest = loadManifest(references) or {'scripts': {}, 'failures': {}}
+    manifest['width'] = width
+    manifest['height'] = height
+    failed = 0
+    for script in scripts:
+        key = scriptKey(script)
+        output = os.path.join(references, key)
+        if os.path.isdir(output):
+            shutil.rmtree(output)
+        renderer, error = render(script, output, width, height)
+        if error is not None:
+            print('{:<48} FAILED, recorded as an expected failure: {}'.format(key, error))
+            if os.path.isdir(output):
+                shutil.rmtree(output)
+            manifest['scripts'].pop(key, None)
+            manifest['failures'][key] = error
+            failed += 1
+            continue
+        manifest['failures'].pop(key, None)
+        manifest['scripts'][key] = renderer
+        print('{:<48} {} poses'.format(key, len(glob.glob(os.path.join(output, 'pose_*.png')))))
+    with open(os.path.join(references, 'references.json'), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return failed
+
+
+def check(scripts, references, diffs, width, height):
+    """Returns the number of frames (or scripts) that failed."""
+    manifest = loadManifest(references)
+    if (manifest['width'], manifest['height']) != (width, height):
+        print('warning: references were rendered at {width}x{height}'.format(**manifest))
+    failures = 0
+    scratch = tempfile.mkdtemp()
+    for script in scripts:
+        key = scriptKey(script)
+        expected = manifest['failures'].get(key)
+        if key not in manifest['scripts'] and expected is None:
+            print('{:<48} FAILED: no reference, record one with --save'.format(key))
+            failures += 1
+            continue
+        output = os.path.join(scratch, key)
+        renderer, error = render(script, output, width, height)
+        if expected is not None:
+            if error is None:
+                print('{:<48} FAILED: renders now, record its references with --save'.format(key))
+                failures += 1
+            else:
+                print('{:<48} expected failure: {}'.format(key, error))
+            continue
+        if error is not None:
+            print('{:<48} FAILED: {}'.format(key, error))
+            failures += 1
+            continue
+        if renderer != manifest['scripts'][key]:
+            print('warning: {} references come from {}, not {}'.format(key, manifest['scripts'][key], renderer))
+        poses = sorted(glob.glob(os.path.join(references, key, 'pose_*.png')))
+        if not poses:
+            print('{:<48} FAILED: no reference frames in {}'.format(key, os.path.join(references, key)))
+            failures += 1
+        for path in poses:
+            name = os.path.basename(path)
+            frame = os.path.join(output, name)
+            if not os.path.exists(frame):
+                print('{:<48} {:<10} FAILED: not rendered'.format(key, name))
+                failures += 1
+                continue
+            image = np.asarray(Image.open(frame).convert('RGB'))
+            reference = np.asarray(Image.open(path).convert('RGB'))
+            result = imagediff.compare(image, reference)
+            if 'error' in result:
+                print('{:<48} {:<10} FAILED: {}'.format(key, name, result['error']))
+            else:
+                print('{:<48} {:<10} {:<6} max {:3d} mean {:6.3f} differing {:7.4%} ssim {:.4f}'.format(
+                    key, name, 'ok' if result['passed'] else 'FAILED', result['maxDiff'], result['meanDiff'],
+                    result['differing'], result['ssim']))
+            if result['passed']:
+                continue
+            failures += 1
+            failed = os.path.join(diffs, key)
+            if not os.path.isdir(failed):
+                os.makedirs(failed)
+            stem = os.path.splitext(name)[0]
+            shutil.copyfile(frame, os.path.join(failed, stem + '.actual.png'))
+            shutil.copyfile(path, os.path.join(failed, stem + '.expected.png'))
+            if 'error' not in result:
+                imagediff.heatmap(image, reference).save(os.path.join(failed, stem + '.diff.png'))
+    shutil.rmtree(scratch)
+    return failures
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare the chapter scripts\' frames with reference images.')
+    parser.add_argument('scripts', nargs='*', help='scripts or globs (default: every chapter script)')
+    parser.add_argument('--width', type=int, default=WIDTH)
+    parser.add_argument('--height', type=int, default=HEIGHT)
+    parser.add_argument('--references', default=REFERENCES, help='reference directory (default: resources/golden)')
+    parser.add_argument('--save', action='store_true', help='render new references instead of comparing')
+    parser.add_argument('--diffs', default='golden-diffs', help='where failed frames and heatmaps go')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(renderScript(args.scripts[0], args.child, args.width, args.height))
+        sys.exit(0)
+
+    scripts = findScripts(args.scripts)
+    if args.save:
+        failed = save(scripts, args.references, args.width, args.height)
+        if failed:
+            print('{} failed to render, recorded as expected failures in {}'.format(
+                failed, os.path.join(args.references, 'references.json')))
+        sys.exit(0)
+    if loadManifest(args.references) is None:
+        print('no references.json in {}, record the references with --save first'.format(args.references))
+        sys.exit(1)
+    failures = check(scripts, args.references, args.diffs, args.width, args.height)
+    if failures:
+        print('{} failed, frames and diff heatmaps in {}'.format(failures, args.diffs))
+        sys.exit(1)
+    print('all frames match {}'.format(args.references))
+    sys.exit(0)
@@ -0,0 +1,481 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Offscreen rendering of the example scripts, without a window system.
+
+    EGL_PLATFORM=surfaceless python pysrc/headless.py pysrc/5.advanced_lighting/7.bloom.py --frames 4 -o frames
+
+The script's GLWindow is built on stand-ins for the few PySide classes the
+examples use (QGLWidget, QGLFormat, QElapsedTimer, ...) and its
+initializeGL/resizeGL/paintGL are driven for a fixed number of frames at a
+fixed resolution. What the script takes to be the default framebuffer is an
+FBO, captured after each frame through capture.py's pixel buffer ring when
+an output directory is given.
+
+The context comes from EGL (a pbuffer config, which llvmpipe provides with
+EGL_PLATFORM=surfaceless) or from OSMesa when PYOPENGL_PLATFORM=osmesa. The
+frame clock advances by exactly 1 / fps per frame so runs are repeatable.
+Timers a script starts with startTimer fire on that clock, before the frame
+they fall due in.
+"""
+
+import os
+os.environ.setdefault('PYOPENGL_PLATFORM', 'egl')
+import sys
+import types
+import ctypes
+
+import numpy as np
+# PyOpenGL flags, before the first OpenGL.GL import
+import glconfig
+import OpenGL.GL
+from OpenGL.GL import *
+
+PLATFORM = os.environ['PYOPENGL_PLATFORM']
+
+
+class EGLContext(object):
+
+    def __init__(self):
+        from OpenGL import EGL
+        self.__egl = EGL
+        self.display = EGL.eglGetDisplay(EGL.EGL_DEFAULT_DISPLAY)
+        if not EGL.eglInitialize(self.display, None, None):
+            raise Exception('eglInitialize failed, try EGL_PLATFORM=surfaceless')
+        attribs = (EGL.EGLint * 5)(EGL.EGL_SURFACE_TYPE, EGL.EGL_PBUFFER_BIT,
+                                   EGL.EGL_RENDERABLE_TYPE, EGL.EGL_OPENGL_BIT, EGL.EGL_NONE)
+        config = EGL.EGLConfig()
+        count = EGL.EGLint()
+        EGL.eglChooseConfig(self.display, attribs, ctypes.pointer(config), 1, ctypes.pointer(count))
+        if count.value == 0:
+            raise Exception('no EGL config with desktop OpenGL and pbuffer support')
+        # everything is drawn into FBOs, the surface only has to exist
+        self.surface = EGL.eglCreatePbufferSurface(self.display, config,
+                                                   (EGL.EGLint * 5)(EGL.EGL_WIDTH, 1, EGL.EGL_HEIGHT, 1, EGL.EGL_NONE))
+        EGL.eglBindAPI(EGL.EGL_OPENGL_API)
+        contextAttribs = (EGL.EGLint * 7)(EGL.EGL_CONTEXT_MAJOR_VERSION, 3,
+                                          EGL.EGL_CONTEXT_MINOR_VERSION, 3,
+                                          EGL.EGL_CONTEXT_OPENGL_PROFILE_MASK, EGL.EGL_CONTEXT_OPENGL_CORE_PROFILE_BIT,
+                                          EGL.EGL_NONE)
+        self.context = EGL.eglCreateContext(self.display, config, EGL.EGL_NO_CONTEXT, contextAttribs)
+        if self.context == EGL.EGL_NO_CONTEXT:
+            raise Exception('could not create an OpenGL 3.3 core context')
+        self.makeCurrent()
+
+    def makeCurrent(self):
+        self.__egl.eglMakeCurrent(self.display, self.surface, self.surface, self.context)
+
+    def destroy(self):
+        EGL = self.__egl
+        EGL.eglMakeCurrent(self.display, EGL.EGL_NO_SURFACE, EGL.EGL_NO_SURFACE, EGL.EGL_NO_CONTEXT)
+        EGL.eglDestroySurface(self.display, self.surface)
+        EGL.eglDestroyContext(self.display, self.context)
+        EGL.eglTerminate(self.display)
+
+
+class OSMesaContext(object):
+
+    def __init__(self):
+        from OpenGL import osmesa
+        from OpenGL import arrays
+        self.__osmesa = osmesa
+        attribs = arrays.GLintArray.asArray([osmesa.OSMESA_FORMAT, osmesa.OSMESA_RGBA,
+                                             osmesa.OSMESA_DEPTH_BITS, 24,
+                                             osmesa.OSMESA_STENCIL_BITS, 8,
+                                             osmesa.OSMESA_PROFILE, osmesa.OSMESA_CORE_PROFILE,
+                                             osmesa.OSMESA_CONTEXT_MAJOR_VERSION, 3,
+                                             osmesa.OSMESA_CONTEXT_MINOR_VERSION, 3,
+                                             0])
+        self.context = osmesa.OSMesaCreateContextAttribs(attribs, None)
+        if not self.context:
+            raise Exception('could not create an OSMesa 3.3 core context')
+        self.buffer = arrays.GLubyteArray.zeros((1, 1, 4))
+        self.makeCurrent()
+
+    def makeCurrent(self):
+        self.__osmesa.OSMesaMakeCurrent(self.context, self.buffer, GL_UNSIGNED_BYTE, 1, 1)
+
+    def destroy(self):
+        self.__osmesa.OSMesaDestroyContext(self.context)
+
+
+BACKENDS = {'egl': EGLContext, 'osmesa': OSMesaContext}
+
+def createContext():
+    # the backend has to match PYOPENGL_PLATFORM, which is fixed once OpenGL is imported
+    if PLATFORM not in BACKENDS:
+        raise Exception('PYOPENGL_PLATFORM={} has no headless backend, use egl or osmesa'.format(PLATFORM))
+    return BACKENDS[PLATFORM]()
+
+
+class OffscreenFramebuffer(object):
+
+    def __init__(self, width, height):
+        self.fbo = glGenFramebuffers(1)
+        self.colorBuffer, self.depthBuffer = glGenRenderbuffers(2)
+        self.resize(width, height)
+
+    def resize(self, width, height):
+        self.width = width
+        self.height = height
+        glBindRenderbuffer(GL_RENDERBUFFER, self.colorBuffer)
+        glRenderbufferStorage(GL_RENDERBUFFER, GL_RGBA8, width, height)
+        glBindRenderbuffer(GL_RENDERBUFFER, self.depthBuffer)
+        glRenderbufferStorage(GL_RENDERBUFFER, GL_DEPTH24_STENCIL8, width, height)
+        glBindRenderbuffer(GL_RENDERBUFFER, 0)
+        _glBindFramebuffer(GL_FRAMEBUFFER, self.fbo)
+        glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, GL_RENDERBUFFER, self.colorBuffer)
+        glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_DEPTH_STENCIL_ATTACHMENT, GL_RENDERBUFFER, self.depthBuffer)
+        if glCheckFramebufferStatus(GL_FRAMEBUFFER) != GL_FRAMEBUFFER_COMPLETE:
+            raise Exception('offscreen framebuffer not complete')
+
+    def bind(self):
+        _glBindFramebuffer(GL_FRAMEBUFFER, self.fbo)
+
+    def read(self):
+        # (height, width, 4) uint8, top row first
+        _glBindFramebuffer(GL_READ_FRAMEBUFFER, self.fbo)
+        glReadBuffer(GL_COLOR_ATTACHMENT0)
+        glPixelStorei(GL_PACK_ALIGNMENT, 1)
+        data = glReadPixels(0, 0, self.width, self.height, GL_RGBA, GL_UNSIGNED_BYTE)
+        return np.frombuffer(data, np.uint8).reshape(self.height, self.width, 4)[::-1]
+
+    def delete(self):
+        glDeleteRenderbuffers(2, np.array([self.colorBuffer, self.depthBuffer], np.uint32))
+        glDeleteFramebuffers(1, np.array([self.fbo], np.uint32))
+
+
+# the examples bind 0 for "the window", send that to the offscreen framebuffer instead
+_glBindFramebuffer = OpenGL.GL.glBindFramebuffer
+_defaultFramebuffer = [0]
+
+def glBindFramebuffer(target, framebuffer):
+    _glBindFramebuffer(target, framebuffer if framebuffer else _defaultFramebuffer[0])
+
+def setDefaultFramebuffer(framebuffer):
+    _defaultFramebuffer[0] = framebuffer.fbo if framebuffer is not None else 0
+
+# installed up front so anything wrapping OpenGL.GL later wraps the redirect too
+OpenGL.GL.glBindFramebuffer = glBindFramebuffer
+
+
+class FrameClock(object):
+    """Milliseconds of virtual time, shared by every QElapsedTimer stand-in."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def advance(self, ms):
+        self.now += ms
+
+clock = FrameClock()
+
+
+class QElapsedTimer(object):
+
+    def __init__(self):
+        self.__start = None
+
+    def start(self):
+        self.__start = clock.now
+
+    def restart(self):
+        elapsed = self.elapsed()
+        self.start()
+        return elapsed
+
+    def isValid(self):
+        return self.__start is not None
+
+    def elapsed(self):
+        return int(clock.now - self.__start)
+
+
+class QGLFormat(object):
+    NoProfile, CoreProfile, CompatibilityProfile = range(3)
+
+    def __init__(self):
+        self.version = (2, 0)
+        self.profile = QGLFormat.NoProfile
+        self.samples = 0
+
+    def setVersion(self, major, minor):
+        self.version = (major, minor)
+
+    def setProfile(self, profile):
+        self.profile = profile
+
+    def setSamples(self, samples):
+        self.samples = samples
+
+    def setSampleBuffers(self, enable):
+        pass
+
+
+class QPoint(object):
+
+    def __init__(self, x=0, y=0):
+        self.__x = x
+        self.__y = y
+
+    def x(self):
+        return self.__x
+
+    def y(self):
+        return self.__y
+
+
+class QRect(object):
+
+    def __init__(self, x, y, width, height):
+        self.__topLeft = QPoint(x, y)
+        self.__size = (width, height)
+
+    def center(self):
+        return QPoint(self.__topLeft.x() + self.__size[0] // 2, self.__topLeft.y() + self.__size[1] // 2)
+
+
+class QTimerEvent(object):
+
+    def __init__(self, timerId):
+        self.__timerId = timerId
+
+    def timerId(self):
+        return self.__timerId
+
+
+class QGLWidget(object):
+
+    def __init__(self, gl_format=None, parent=None):
+        self.__format = gl_format
+        self.__width = 800
+        self.__height = 600
+        # timer id: [interval ms, frame clock time it is next due]
+        self.__timers = {}
+
+    def format(self):
+        return self.__format
+
+    def width(self):
+        return self.__width
+
+    def height(self):
+        return self.__height
+
+    def resize(self, width, height):
+        self.__width = width
+        self.__height = height
+
+    def setFixedSize(self, width, height):
+        self.resize(width, height)
+
+    def geometry(self):
+        return QRect(0, 0, self.__width, self.__height)
+
+    def startTimer(self, interval):
+        timerId = len(self.__timers) + 1
+        self.__timers[timerId] = [interval, clock.now + interval]
+        return timerId
+
+    def killTimer(self, timerId):
+        self.__timers.pop(timerId, None)
+
+    def fireTimers(self):
+        """timerEvent for every timer due on the frame clock; missed ticks fire once, as in Qt."""
+        for timerId, timer in sorted(self.__timers.items()):
+            interval, due = timer
+            if clock.now >= due:
+                timer[1] = clock.now + interval
+                self.timerEvent(QTimerEvent(timerId))
+
+    def timerEvent(self, event):
+        pass
+
+    # frames are driven by HeadlessRunner, everything window related is a no-op
+    def updateGL(self):
+        pass
+
+    def makeCurrent(self):
+        pass
+
+    def setMouseTracking(self, enable):
+        pass
+
+    def setWindowTitle(self, title):
+        pass
+
+    def show(self):
+        pass
+
+    def keyPressEvent(self, event):
+        pass
+
+    def keyReleaseEvent(self, event):
+        pass
+
+    def mouseMoveEvent(self, event):
+        pass
+
+    def mousePressEvent(self, event):
+        pass
+
+    def mouseReleaseEvent(self, event):
+        pass
+
+    def wheelEvent(self, event):
+        pass
+
+
+class _Qt(object):
+    # Qt.Key_W etc. compare equal to the KeyEvent built from the same name
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return name
+
+Qt = _Qt()
+
+
+class KeyEvent(object):
+
+    def __init__(self, key):
+        self.__key = key
+
+    def key(self):
+        return self.__key
+
+
+class QApplication(object):
+
+    def __init__(self, argv=None):
+        pass
+
+    def quit(self):
+        pass
+
+    def exec_(self):
+        return 0
+
+qApp = QApplication()
+
+
+class QCursor(object):
+
+    @staticmethod
+    def setPos(*args):
+        pass
+
+
+def installQtStandIns():
+    # PySide (Qt 4) needs a display even for offscreen GL, the examples only need these names
+    names = {'QtCore': ['Qt', 'QElapsedTimer', 'QPoint', 'QRect', 'QTimerEvent'],
+             'QtGui': ['QApplication', 'QCursor', 'qApp'],
+             'QtOpenGL': ['QGLWidget', 'QGLFormat']}
+    package = types.ModuleType('PySide')
+    sys.modules['PySide'] = package
+    for moduleName, members in names.items():
+        module = types.ModuleType('PySide.' + moduleName)
+        for name in members:
+            setattr(module, name, globals()[name])
+        setattr(package, moduleName, module)
+        sys.modules[module.__name__] = module
+
+
+def loadScript(path):
+    """Import an example script as a module (its __main__ block does not run)."""
+    path = os.path.abspath(path)
+    installQtStandIns()
+    # scripts started from any directory find the shared modules next to this file
+    for directory in (os.path.dirname(os.path.abspath(__file__)), os.path.dirname(path)):
+        if directory not in sys.path:
+            sys.path.insert(0, directory)
+    module = types.ModuleType('example')
+    module.__file__ = path
+    with open(path) as f:
+        code = compile(f.read(), path, 'exec')
+    exec(code, module.__dict__)
+    return module
+
+
+class HeadlessRunner(object):
+    """Runs an example's GLWindow offscreen at a fixed size and frame rate."""
+
+    def __init__(self, script, width=800, height=600, fps=60.0):
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.frame = 0
+        self.context = createContext()
+        self.framebuffer = OffscreenFramebuffer(width, height)
+        setDefaultFramebuffer(self.framebuffer)
+        self.module = loadScript(script)
+        self.window = self.module.GLWindow()
+        self.window.resize(width, height)
+        # QGLWidget calls these with the default framebuffer bound
+        self.framebuffer.bind()
+        self.window.initializeGL()
+        self.framebuffer.bind()
+        self.window.resizeGL(width, height)
+
+    def resize(self, width, height):
+        self.width = width
+        self.height = height
+        self.framebuffer.resize(width, height)
+        self.window.resize(width, height)
+        self.framebuffer.bind()
+        self.window.resizeGL(width, height)
+
+    def renderFrame(self):
+        self.window.fireTimers()
+        self.framebuffer.bind()
+        self.window.paintGL()
+        self.frame += 1
+        clock.advance(1000.0 / self.fps)
+
+    def readFrame(self):
+        return self.framebuffer.read()
+
+    def run(self, frames, output=None, format='png'):
+        """Render frames, capturing them into output if given (see capture.py for the formats)."""
+        frameCapture = None
+        if output is not None:
+            # imported after the glBindFramebuffer redirect, so binding 0 reads the offscreen framebuffer
+            import capture
+            frameCapture = capture.FrameCapture(output, self.width, self.height, format)
+        for i in range(frames):
+            self.renderFrame()
+            if frameCapture is not None:
+                frameCapture.capture()
+        glFinish()
+        if frameCapture is not None:
+            frameCapture.delete()
+        return frameCapture
+
+    def close(self):
+        setDefaultFramebuffer(None)
+        self.framebuffer.delete()
+        self.context.destroy()
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Render an example script offscreen and save its frames.')
+    parser.add_argument('script', help='example script, e.g. pysrc/5.advanced_lighting/7.bloom.py')
+    parser.add_argument('--width', type=int, default=800)
+    parser.add_argument('--height', type=int, default=600)
+    parser.add_argument('--frames', type=int, default=1)
+    parser.add_argument('--fps', type=float, default=60.0, help='frame clock rate seen by the script')
+    parser.add_argument('-o', '--output', help='directory for the captured frames (default: none written)')
+    parser.add_argument('--format', choices=['png', 'raw'], default='png',
+                        help='frame_0000.png ... or one raw RGB video stream, frames.rgb')
+    args = parser.parse_args()
+    runner = HeadlessRunner(args.script, args.width, args.height, args.fps)
+    frameCapture = runner.run(args.frames, args.output, args.format)
+    runner.close()
+    if frameCapture is not None:
+        print('wrote {} frames to {}'.format(frameCapture.written, args.output))
+        if args.format == 'raw':
+            print('ffmpeg -f rawvideo -pix_fmt rgb24 -s {}x{} -r {:g} -i {} out.mp4'.format(
+                args.width, args.height, args.fps, os.path.join(args.output, 'frames.rgb')))
+    sys.exit(0)
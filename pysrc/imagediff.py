@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Rendered frame against reference frame, in numpy.
+
+    result = imagediff.compare(image, reference)
+    if not result['passed']:
+        imagediff.heatmap(image, reference).save('diff.png')
+
+Both are (height, width, 3) uint8 images. A pixel differs when any channel
+is more than TOLERANCE out of 255 off; a frame passes when no more than
+MAX_DIFFERING of its pixels differ and its SSIM is at least MIN_SSIM. The
+tolerance absorbs the last-bit rounding that reordered float math brings,
+the fraction a few pixels along an edge that land on the other side. SSIM
+catches changes to structure that stay under the tolerance, such as a
+slight blur or banding.
+
+ssim() is the usual structural similarity of the luminance, with an 11 tap
+Gaussian window of sigma 1.5, computed over the pixels the whole window
+covers. The window is applied as two 1D passes of shifted, weighted slices,
+so no per-pixel Python loop and nothing beyond numpy.
+"""
+
+import numpy as np
+from PIL import Image
+
+TOLERANCE = 2
+MAX_DIFFERING = 0.0005
+MIN_SSIM = 0.995
+# Rec. 601 luma, as SSIM is usually reported
+LUMA = np.array([0.299, 0.587, 0.114], np.float64)
+WINDOW = 11
+SIGMA = 1.5
+C1 = (0.01 * 255.0) ** 2
+C2 = (0.03 * 255.0) ** 2
+# black, red, yellow, white at 0, 1/3, 2/3 and 1 of the heatmap's scale
+HEAT = np.array([[0, 0, 0], [255, 0, 0], [255, 255, 0], [255, 255, 255]], np.float64)
+
+
+def gaussian(size=WINDOW, sigma=SIGMA):
+    x = np.arange(size, dtype=np.float64) - (size - 1) / 2.0
+    weights = np.exp(-0.5 * (x / sigma) ** 2)
+    return weights / weights.sum()
+
+
+def _filter(image, weights):
+    # separable 'valid' convolution: rows then columns, one slice per tap
+    n = len(weights)
+    height, width = image.shape
+    rows = sum(w * image[i:height - n + 1 + i] for i, w in enumerate(weights))
+    return sum(w * rows[:, i:width - n + 1 + i] for i, w in enumerate(weights))
+
+
+def luminance(image):
+    return np.dot(np.asarray(image, np.float64)[..., :3], LUMA)
+
+
+def ssimMap(image, reference):
+    """Per-window SSIM of the luminance, (height - 10, width - 10)."""
+    x = luminance(image)
+    y = luminance(reference)
+    weights = gaussian()
+    muX = _filter(x, weights)
+    muY = _filter(y, weights)
+    varX = _filter(x * x, weights) - muX * muX
+    varY = _filter(y * y, weights) - muY * muY
+    covariance = _filter(x * y, weights) - muX * muY
+    return (((2.0 * muX * muY + C1) * (2.0 * covariance + C2)) /
+            ((muX * muX + muY * muY + C1) * (varX + varY + C2)))
+
+
+def ssim(image, reference):
+    if min(image.shape[:2]) < WINDOW:
+        # too small for a window, only exactly equal counts as similar
+        return 1.0 if np.array_equal(image, reference) else 0.0
+    return float(ssimMap(image, reference).mean())
+
+
+def difference(image, reference):
+    """Largest channel difference per pixel, (height, width) int."""
+    return np.abs(image.astype(np.int16) - reference.astype(np.int16)).max(axis=-1)
+
+
+def compare(image, reference, tolerance=TOLERANCE, maxDiffering=MAX_DIFFERING, minSSIM=MIN_SSIM):
+    """Metrics of image against reference, and whether it passes."""
+    image = np.asarray(image)[..., :3]
+    reference = np.asarray(reference)[..., :3]
+    if image.shape != reference.shape:
+        return {'passed': False, 'error': 'size {}x{}, reference {}x{}'.format(
+            image.shape[1], image.shape[0], reference.shape[1], reference.shape[0])}
+    diff = difference(image, reference)
+    differing = float((diff > tolerance).mean())
+    similarity = ssim(image, reference)
+    return {'passed': differing <= maxDiffering and similarity >= minSSIM,
+            'maxDiff': int(diff.max()),
+            'meanDiff': float(diff.mean()),
+            'differing': differing,
+            'ssim': similarity}
+
+
+def heatmap(image, reference, tolerance=TOLERANCE):
+    """PIL image of where image and reference differ: black within tolerance,
+    then red through yellow to white at the largest difference."""
+    diff = difference(np.asarray(image)[..., :3], np.asarray(reference)[..., :3]).astype(np.float64)
+    scale = max(diff.max(), tolerance + 1.0)
+    t = np.where(diff > tolerance, 1.0 / 3.0 + (2.0 / 3.0) * (diff - tolerance) / (scale - tolerance), 0.0)
+    stops = np.linspace(0.0, 1.0, len(HEAT))
+    colors = np.stack([np.interp(t, stops, HEAT[:, c]) for c in range(3)], axis=-1)
+    return Image.fromarray(colors.astype(np.uint8))
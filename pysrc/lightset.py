@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Point lights as one numpy structured array and one GL buffer.
+
+    lights = lightset.LightSet(1024)
+    lights.position[:] = positions          # (n, 3) arrays, or one value for all
+    lights.color[:] = colors
+    lights.setAttenuation(0.7, 1.8)
+    lights.updateRadii(5.0)                 # every radius in one numpy step
+    lights.upload()                         # one glBufferData of all records
+
+The records are uniformbuffer.LIGHT, std140 and 48 bytes each, so the one
+buffer serves as per-instance vertex attributes (offsets from
+uniformbuffer.LIGHT.fields) and, through lights.texture, as a samplerBuffer
+of three RGBA32F texels per light:
+
+    (Position, -) (Color, Linear) (Quadratic, Radius, -, -)
+
+Moving thousands of lights a frame is a numpy expression on lights.position
+and an upload().
+"""
+
+import numpy as np
+from OpenGL.GL import *
+
+import uniformbuffer
+
+
+class BufferTexture(object):
+    """A buffer object viewed through a GL_TEXTURE_BUFFER texture."""
+
+    def __init__(self, internalFormat, usage):
+        self.usage = usage
+        self.buffer = glGenBuffers(1)
+        self.texture = glGenTextures(1)
+        self.upload(np.zeros(4, np.uint32))
+        glBindTexture(GL_TEXTURE_BUFFER, self.texture)
+        glTexBuffer(GL_TEXTURE_BUFFER, internalFormat, self.buffer)
+        glBindTexture(GL_TEXTURE_BUFFER, 0)
+
+    def upload(self, data):
+        # a new store every time, the driver can keep the old one for frames in flight
+        glBindBuffer(GL_TEXTURE_BUFFER, self.buffer)
+        glBufferData(GL_TEXTURE_BUFFER, data.nbytes, data, self.usage)
+        glBindBuffer(GL_TEXTURE_BUFFER, 0)
+
+    def delete(self):
+        glDeleteTextures(np.array([self.texture], np.uint32))
+        glDeleteBuffers(1, np.array([self.buffer], np.uint32))
+
+
+class LightSet(object):
+
+    def __init__(self, count, usage=GL_DYNAMIC_DRAW):
+        self.data = np.zeros(count, uniformbuffer.LIGHT)
+        self.__store = BufferTexture(GL_RGBA32F, usage)
+
+    def __len__(self):
+        return len(self.data)
+
+    # views into data, writing to them changes the records
+    @property
+    def position(self):
+        return self.data['Position']
+
+    @property
+    def color(self):
+        return self.data['Color']
+
+    @property
+    def linear(self):
+        return self.data['Linear']
+
+    @property
+    def quadratic(self):
+        return self.data['Quadratic']
+
+    @property
+    def radius(self):
+        return self.data['Radius']
+
+    @property
+    def brightness(self):
+        """Brightest color channel of every light."""
+        return self.data['Color'].max(axis=1)
+
+    @property
+    def buffer(self):
+        return self.__store.buffer
+
+    @property
+    def texture(self):
+        return self.__store.texture
+
+    def setAttenuation(self, linear, quadratic):
+        self.data['Linear'] = linear
+        self.data['Quadratic'] = quadratic
+
+    def updateRadii(self, threshold=5.0, constant=1.0):
+        """Radius at which each light's brightest channel falls to threshold / 256."""
+        linear = self.data['Linear']
+        quadratic = self.data['Quadratic']
+        self.data['Radius'] = (-linear + np.sqrt(linear * linear - 4 * quadratic * (constant - (256.0 / threshold) * self.brightness))) / (2 * quadratic)
+
+    def upload(self):
+        self.__store.upload(self.data)
+
+    def delete(self):
+        self.__store.delete()
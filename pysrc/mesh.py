@@ -7,12 +7,21 @@ import numpy as np
 from PIL import Image
 from OpenGL.GL import *
 
+import assetpack
+import glconfig
+from glstate import state as gl
+from texture import loadMipmappedTexture
+
 TextureType = {'texture_diffuse' : 1,
                'texture_specular' : 2,
                'texture_normal' : 5,
                'texture_height' : 3}
 
 def textureFromFile(path, gamma=False):
+    textureID = loadMipmappedTexture(path, gamma)
+    if textureID is not None:
+        return textureID
+
     textureID = glGenTextures(1)
     im = Image.open(path)
     iformat = GL_RGB
@@ -53,6 +62,11 @@ class Mesh(object):
         self.assetDir = assetDir
         self.textures = []
         self.vao = None
+        # packed meshes carry precomputed bounds
+        if hasattr(asset, 'bounds'):
+            self.bounds = asset.bounds
+        else:
+            self.bounds = np.array([asset.vertices.min(axis=0), asset.vertices.max(axis=0)], np.float32)
 
         self.__setupMesh()
         self.__loadTextures()
@@ -61,23 +75,17 @@ class Mesh(object):
         textureNr = {}.fromkeys(TextureType.keys(), 1)
         for texture in self.textures:
             index = self.textures.index(texture)
-            # Active proper texture unit before binding
-            glActiveTexture(GL_TEXTURE0 + index)
             name = texture.type
             if texture.type in TextureType:
                 name += str(textureNr[texture.type])
                 textureNr[texture.type] += 1
 
             glUniform1i(glGetUniformLocation(shader, name), index)
-            glBindTexture(GL_TEXTURE_2D, texture.id)
+            gl.bindTextureUnit(index, GL_TEXTURE_2D, texture.id)
 
-        glBindVertexArray(self.vao)
-        glDrawElements(GL_TRIANGLES, self.asset.faces.size, GL_UNSIGNED_INT, None)
-        glBindVertexArray(0)
-
-        for texture in self.textures:
-            glActiveTexture(GL_TEXTURE0 + self.textures.index(texture))
-            glBindTexture(GL_TEXTURE_2D, 0)
+        # bindings are left in place, the next mesh only changes what differs
+        gl.bindVertexArray(self.vao)
+        glconfig.drawElements(GL_TRIANGLES, self.asset.faces.size, GL_UNSIGNED_INT)
 
     def __setupMesh(self):
         self.vao = glGenVertexArrays(1)
@@ -99,7 +107,7 @@ class Mesh(object):
         glVertexAttribPointer(1, 3, GL_FLOAT, GL_FALSE, 0, None)
 
         # vertex texture coords
-        texCoords = np.compress([True, True, False], self.asset.texturecoords[0], axis=1)
+        texCoords = np.ascontiguousarray(self.asset.texturecoords[0][:, :2], np.float32)
         glBindBuffer(GL_ARRAY_BUFFER, tcbo)
         glBufferData(GL_ARRAY_BUFFER, texCoords.nbytes, texCoords, GL_STATIC_DRAW)
         # set texture coords attribute pointers
@@ -128,12 +136,12 @@ class Mesh(object):
     def __loadTextures(self):
         for i in TextureType:
             key = ('file', TextureType[i])
-            if not self.asset.material.properties.has_key(key):
+            if key not in self.asset.material.properties:
                 continue
 
             textureName = self.asset.material.properties[key]
             texturePath = os.path.join(self.assetDir, textureName)
-            if not os.path.exists(texturePath): continue
+            if not assetpack.exists(texturePath): continue
             textureId = textureFromFile(texturePath)
 
             texture = Texture(textureId, i, texturePath)
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+CPU-side mip chain generation.
+
+glGenerateMipmap is cheap on real GPUs but very slow on software
+rasterizers such as llvmpipe, and it filters sRGB data in gamma space. The
+chains built here are filtered in linear light (for sRGB textures), cached
+on disk (see cacheDir) and uploaded level by level by texture.py.
+"""
+
+import os
+import hashlib
+
+import numpy as np
+from PIL import Image
+
+CACHE_VERSION = 1
+
+# sRGB -> linear for every 8 bit value
+SRGB_TO_LINEAR = np.array([c / 12.92 if c <= 0.04045 else ((c + 0.055) / 1.055) ** 2.4
+                           for c in np.arange(256) / 255.0], np.float32)
+
+
+def kaiserWeights(taps=8, beta=4.0):
+    # Kaiser-windowed sinc for a 2:1 reduction, sample positions between the taps
+    x = np.arange(taps, dtype=np.float64) - (taps - 1) / 2.0
+    w = np.sinc(x / 2.0) * np.i0(beta * np.sqrt(1.0 - (x / (taps / 2.0)) ** 2)) / np.i0(beta)
+    return (w / w.sum()).astype(np.float32)
+
+KERNELS = {'box': np.array([0.5, 0.5], np.float32),
+           'kaiser': kaiserWeights()}
+
+
+def linearToSrgb(c):
+    return np.where(c <= 0.0031308, c * 12.92, 1.055 * np.power(c, 1.0 / 2.4) - 0.055)
+
+
+def hasAlpha(im):
+    return 'A' in im.mode or 'transparency' in im.info
+
+
+def loadImage(path):
+    # the loaders only ever upload RGB or RGBA
+    im = Image.open(path)
+    if im.mode not in ('RGB', 'RGBA'):
+        im = im.convert('RGBA' if hasAlpha(im) else 'RGB')
+    pixels = np.asarray(im)
+    im.close()
+    return pixels
+
+
+def downsampleAxis(a, axis, weights, wrap=False):
+    n = a.shape[axis]
+    if n == 1:
+        return a
+    a = np.moveaxis(a, axis, 0)
+    m = n // 2
+    # tap k of output i reads input 2i + k - (taps/2 - 1)
+    before = len(weights) // 2 - 1
+    after = len(weights) - 2 - before + (n % 2)
+    pad = [(before, after)] + [(0, 0)] * (a.ndim - 1)
+    padded = np.pad(a, pad, mode='wrap' if wrap else 'edge')
+    out = weights[0] * padded[0:2 * m:2]
+    for k in range(1, len(weights)):
+        out += weights[k] * padded[k:k + 2 * m:2]
+    return np.moveaxis(out, 0, axis)
+
+
+def generateMipChain(pixels, srgb=False, kernel='box', wrap=False):
+    """Build the full mip chain of an (height, width, channels) uint8 image.
+
+    With srgb the color channels are filtered in linear light, alpha is
+    always filtered as is. Returns a list of uint8 arrays, largest first.
+    """
+    weights = KERNELS[kernel]
+    color = pixels.shape[2] if pixels.shape[2] < 4 else 3
+    level = pixels.astype(np.float32) / 255.0
+    if srgb:
+        level[..., :color] = SRGB_TO_LINEAR[pixels[..., :color]]
+
+    levels = [pixels]
+    while level.shape[0] > 1 or level.shape[1] > 1:
+        level = downsampleAxis(level, 0, weights, wrap)
+        level = downsampleAxis(level, 1, weights, wrap)
+        # sharper kernels ring, keep the chain in range
+        np.clip(level, 0.0, 1.0, out=level)
+        encoded = level.copy()
+        if srgb:
+            encoded[..., :color] = linearToSrgb(encoded[..., :color])
+        levels.append((encoded * 255.0 + 0.5).astype(np.uint8))
+    return levels
+
+
+def cacheDir():
+    return os.environ.get('LEARNOPENGL_CACHE',
+                          os.path.join(os.path.expanduser('~'), '.cache', 'learnpyopengl', 'mipmaps'))
+
+
+def cachedMipChain(path, srgb=False, kernel='box', wrap=False):
+    # the cache key covers the source file's identity and every option that changes the result
+    stat = os.stat(path)
+    key = '{}|{}|{}|{}|{}|{}|{}'.format(os.path.abspath(path), stat.st_mtime, stat.st_size,
+                                        srgb, kernel, wrap, CACHE_VERSION)
+    cachePath = os.path.join(cacheDir(), hashlib.sha1(key.encode('utf-8')).hexdigest() + '.npz')
+    if os.path.exists(cachePath):
+        with np.load(cachePath) as data:
+            return [data['arr_{}'.format(i)] for i in range(len(data.files))]
+
+    levels = generateMipChain(loadImage(path), srgb, kernel, wrap)
+    if not os.path.isdir(cacheDir()):
+        os.makedirs(cacheDir())
+    # write then rename so a concurrent reader never sees a partial file
+    tmpPath = '{}.{}.tmp'.format(cachePath, os.getpid())
+    with open(tmpPath, 'wb') as f:
+        np.savez(f, *levels)
+    os.rename(tmpPath, cachePath)
+    return levels
@@ -5,6 +5,9 @@ import os.path
 
 from OpenGL.GL import *
 
+import numpy as np
+
+import assetpack
 import pyassimp as assimp
 from mesh import Mesh
 
@@ -18,20 +21,29 @@ class Model(object):
         self.directory = ''
 
         self.loadModel(path)
+        self.bounds = np.array([np.min([m.bounds[0] for m in self.meshes], axis=0),
+                                np.max([m.bounds[1] for m in self.meshes], axis=0)], np.float32)
 
     def draw(self, shader):
         for mesh in self.meshes:
             mesh.draw(shader)
 
     def loadModel(self, path):
+        self.directory = os.path.dirname(path)
+
+        # prefer the precompiled asset pack, its buffers are mapped straight from disk
+        pack, key = assetpack.lookupModel(path)
+        if pack is not None:
+            for mesh in pack.meshes(key):
+                self.meshes.append(Mesh(mesh, self.directory))
+            return
+
         scene = assimp.load(path, processing=(assimp.postprocess.aiProcess_Triangulate |
                                               assimp.postprocess.aiProcess_FlipUVs |
                                               assimp.postprocess.aiProcess_CalcTangentSpace))
         if not scene:
             raise Exception("ASSIMP can't load model")
 
-        self.directory = os.path.dirname(path)
-
         for mesh in scene.meshes:
             self.meshes.append(Mesh(mesh, self.directory))
 
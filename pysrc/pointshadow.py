@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Point light shadow cubemaps, all six faces rendered in one layered pass.
+
+    shadows = pointshadow.PointShadows(1, 1024, near=1.0, far=25.0)    # in initializeGL
+
+    shadows.update(lightPositions)          # per frame, (count, 3)
+    glBindFramebuffer(GL_FRAMEBUFFER, shadows.fbo)
+    shadows.bind(depthProgram, light)       # program in use
+    ... draw the casters, the geometry shader emits every triangle to all six faces ...
+
+faceMatrices() builds the view-projection matrices of the six cube faces of
+any number of lights in one numpy step: the faces look along the axes, so
+their rotations are constants and only the translation row depends on the
+light. They are glm's row-vector matrices, a vertex goes through
+v * view * projection, so a face's matrix is view.dot(projection);
+projection * view would be an elementwise product.
+
+update() recomputes the matrices of the lights that moved only, and bind()
+uploads a light's six as one mat4[6] (shadowTransforms), with its layerBase,
+lightPos and far_plane, and only if the program doesn't hold them already.
+
+One light's map is a GL_TEXTURE_CUBE_MAP. More lights are packed into one
+GL_TEXTURE_CUBE_MAP_ARRAY (GL 4.0 or ARB_texture_cube_map_array), light i's
+faces at layers 6 * i to 6 * i + 5, sampled with a samplerCubeArray at
+vec4(direction, i); the depth geometry shader writes gl_Layer = layerBase +
+face.
+"""
+
+import numpy as np
+from OpenGL.GL import *
+
+import glm
+import glconfig
+
+# (direction, up) of the faces in GL_TEXTURE_CUBE_MAP_POSITIVE_X + i order
+FACES = np.array([[[1.0, 0.0, 0.0], [0.0, -1.0, 0.0]],
+                  [[-1.0, 0.0, 0.0], [0.0, -1.0, 0.0]],
+                  [[0.0, 1.0, 0.0], [0.0, 0.0, 1.0]],
+                  [[0.0, -1.0, 0.0], [0.0, 0.0, -1.0]],
+                  [[0.0, 0.0, 1.0], [0.0, -1.0, 0.0]],
+                  [[0.0, 0.0, -1.0], [0.0, -1.0, 0.0]]], np.float32)
+
+# the faces' views from the origin, pure rotations
+_ROTATIONS = np.array([glm.lookAt(np.zeros(3, np.float32), direction, up) for direction, up in FACES], np.float32)
+
+
+def faceMatrices(positions, near, far):
+    """(n, 6, 4, 4) float32 view-projection matrices of the cube faces of lights at positions."""
+    positions = np.asarray(positions, np.float32).reshape(-1, 3)
+    views = np.repeat(_ROTATIONS[np.newaxis], len(positions), axis=0)
+    # translation row of lookAt(eye, ...): -eye rotated like everything else
+    views[:, :, 3, :3] = -np.einsum('nj,fjk->nfk', positions, _ROTATIONS[:, :3, :3])
+    projection = glm.perspective(90.0, 1.0, near, far)
+    return np.ascontiguousarray(views.dot(projection), np.float32)
+
+
+def depthCubeMap(count, size):
+    """Depth cubemap (one light) or cubemap array (count lights) and a layered framebuffer on it."""
+    target = GL_TEXTURE_CUBE_MAP if count == 1 else GL_TEXTURE_CUBE_MAP_ARRAY
+    texture = glGenTextures(1)
+    glBindTexture(target, texture)
+    if count == 1:
+        for i in range(6):
+            glTexImage2D(GL_TEXTURE_CUBE_MAP_POSITIVE_X + i, 0, GL_DEPTH_COMPONENT, size, size, 0, GL_DEPTH_COMPONENT, GL_FLOAT, None)
+    else:
+        glTexImage3D(GL_TEXTURE_CUBE_MAP_ARRAY, 0, GL_DEPTH_COMPONENT, size, size, 6 * count, 0, GL_DEPTH_COMPONENT, GL_FLOAT, None)
+    glTexParameteri(target, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
+    glTexParameteri(target, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
+    glTexParameteri(target, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_EDGE)
+    glTexParameteri(target, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_EDGE)
+    glTexParameteri(target, GL_TEXTURE_WRAP_R, GL_CLAMP_TO_EDGE)
+    glBindTexture(target, 0)
+
+    fbo = glGenFramebuffers(1)
+    glBindFramebuffer(GL_FRAMEBUFFER, fbo)
+    glFramebufferTexture(GL_FRAMEBUFFER, GL_DEPTH_ATTACHMENT, texture, 0)
+    glDrawBuffer(GL_NONE)
+    glReadBuffer(GL_NONE)
+    if glCheckFramebufferStatus(GL_FRAMEBUFFER) != GL_FRAMEBUFFER_COMPLETE:
+        print('Framebuffer not complete!')
+    glBindFramebuffer(GL_FRAMEBUFFER, 0)
+    return texture, fbo
+
+
+class PointShadows(object):
+
+    def __init__(self, count=1, size=1024, near=1.0, far=25.0):
+        self.count = count
+        self.size = size
+        self.near = near
+        self.far = far
+        self.target = GL_TEXTURE_CUBE_MAP if count == 1 else GL_TEXTURE_CUBE_MAP_ARRAY
+        self.texture, self.fbo = depthCubeMap(count, size)
+        self.positions = np.zeros((count, 3), np.float32)
+        self.matrices = faceMatrices(self.positions, near, far)
+        # bumped for a light whenever its matrices change
+        self.versions = np.zeros(count, np.int64)
+        # program: uniform locations, and the (light, version) it holds
+        self.__locations = {}
+        self.__uploaded = {}
+
+    def update(self, positions):
+        """Recompute the face matrices of the lights whose position changed; True if any did."""
+        positions = np.asarray(positions, np.float32).reshape(self.count, 3)
+        moved = np.flatnonzero(np.any(positions != self.positions, axis=1))
+        if len(moved):
+            self.positions[moved] = positions[moved]
+            self.matrices[moved] = faceMatrices(positions[moved], self.near, self.far)
+            self.versions[moved] += 1
+        return len(moved) > 0
+
+    def bind(self, program, light=0):
+        """Set program's shadowTransforms, layerBase, lightPos and far_plane to light's; program must be in use."""
+        key = (light, self.versions[light])
+        if self.__uploaded.get(program) == key:
+            return
+        locations = self.__locations.get(program)
+        if locations is None:
+            locations = [glGetUniformLocation(program, name) for name in ('shadowTransforms', 'layerBase', 'lightPos', 'far_plane')]
+            self.__locations[program] = locations
+        transforms, layerBase, lightPos, farPlane = locations
+        glconfig.uniformMatrix4fv(transforms, self.matrices[light])
+        glUniform1i(layerBase, 6 * light)
+        glUniform3f(lightPos, *self.positions[light])
+        glUniform1f(farPlane, self.far)
+        self.__uploaded[program] = key
+
+    def delete(self):
+        glDeleteFramebuffers(1, np.array([self.fbo], np.uint32))
+        glDeleteTextures(np.array([self.texture], np.uint32))
+        self.__uploaded.clear()
@@ -0,0 +1,231 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Quad, cube, plane and spheres generated with numpy, uploaded once per GL
+context.
+
+    primitives.mesh('cube').draw()          # binds the context's cube VAO and draws it
+    primitives.mesh('quad').draw(gl)        # through a glstate cache
+    primitives.mesh('plane', 25.0, -0.5, 25.0).draw()
+    primitives.mesh('cube').draw(instances=32)
+
+mesh() keeps one Mesh per shape and arguments in the current context's
+OpenGL.contextdata, so every pass and every window of a context shares the
+same vertex buffer and VAO. A VAO of its own (extra per-instance
+attributes, say) can still use a Mesh's buffers:
+
+    vao = glGenVertexArrays(1)
+    glBindVertexArray(vao)
+    primitives.mesh('icosphere', 1, True).setupAttributes(['position'])
+
+The generators return (vertices, indices), float32 rows of position,
+normal and texture coordinates (position and texture coordinates for the
+quad) and uint32 triangle indices or None. The cube and plane are, vertex
+for vertex, the data the examples used to carry inline.
+"""
+
+import math
+import ctypes
+
+import numpy as np
+from OpenGL import contextdata
+from OpenGL.GL import *
+
+import glconfig
+
+# (name, location, size): the examples' position, normal, texCoords inputs
+LAYOUT = [('position', 0, 3), ('normal', 1, 3), ('texCoords', 2, 2)]
+QUAD_LAYOUT = [('position', 0, 3), ('texCoords', 1, 2)]
+
+# (normal, texture u axis, texture v axis) of the cube faces: back, front, left, right, bottom, top
+_CUBE_FACES = np.array([[[0, 0, -1], [1, 0, 0], [0, 1, 0]],
+                        [[0, 0, 1], [1, 0, 0], [0, 1, 0]],
+                        [[-1, 0, 0], [0, 1, 0], [0, 0, -1]],
+                        [[1, 0, 0], [0, 1, 0], [0, 0, -1]],
+                        [[0, -1, 0], [1, 0, 0], [0, 0, -1]],
+                        [[0, 1, 0], [1, 0, 0], [0, 0, -1]]], np.float32)
+
+# the texture coordinates' corners of a face
+_CORNERS = np.array([[0, 0], [1, 0], [1, 1], [0, 1]], np.float32)
+# each face's two counter clockwise triangles, in the order the inline data had them
+_CUBE_TRIANGLES = np.array([[0, 2, 1, 2, 0, 3], [0, 1, 2, 2, 3, 0], [1, 2, 3, 3, 0, 1],
+                            [1, 3, 2, 3, 1, 0], [3, 2, 1, 1, 0, 3], [3, 1, 2, 1, 3, 0]])
+_PLANE_TRIANGLES = np.array([[1, 3, 0, 1, 2, 3]])
+
+
+def quad():
+    """Screen filling triangle strip in NDC."""
+    vertices = np.array([[-1.0, 1.0, 0.0, 0.0, 1.0],
+                         [-1.0, -1.0, 0.0, 0.0, 0.0],
+                         [1.0, 1.0, 0.0, 1.0, 1.0],
+                         [1.0, -1.0, 0.0, 1.0, 0.0]], np.float32)
+    return vertices, None
+
+
+def _faces(faces, triangles):
+    # (normal, u, v) faces 0.5 out along their normals, triangles indexing _CORNERS
+    normals, us, vs = faces[:, np.newaxis, 0], faces[:, np.newaxis, 1], faces[:, np.newaxis, 2]
+    uv = _CORNERS[triangles]
+    positions = 0.5 * normals + (uv[..., :1] - 0.5) * us + (uv[..., 1:] - 0.5) * vs
+    normals = np.repeat(normals, triangles.shape[1], axis=1)
+    return np.concatenate([positions, normals, uv], axis=2).reshape(-1, 8).astype(np.float32)
+
+
+def cube():
+    """Unit cube around the origin, 36 vertices."""
+    return _faces(_CUBE_FACES, _CUBE_TRIANGLES), None
+
+
+def plane(halfSize=25.0, height=-0.5, repeat=25.0):
+    """Square floor of 2 * halfSize at height, facing up, its texture repeated repeat times."""
+    vertices = _faces(_CUBE_FACES[5:], _PLANE_TRIANGLES)
+    vertices[:, [0, 2]] *= 2.0 * halfSize
+    vertices[:, 1] = height
+    vertices[:, 6:] *= repeat
+    return vertices, None
+
+
+def uvSphere(xSegments=64, ySegments=64):
+    """Unit sphere of latitude and longitude rings, indexed."""
+    u, v = np.meshgrid(np.linspace(0.0, 1.0, xSegments + 1), np.linspace(0.0, 1.0, ySegments + 1))
+    positions = np.stack([np.cos(2.0 * math.pi * u) * np.sin(math.pi * v), np.cos(math.pi * v),
+                          np.sin(2.0 * math.pi * u) * np.sin(math.pi * v)], axis=2).reshape(-1, 3)
+    vertices = np.concatenate([positions, positions, np.stack([u, v], axis=2).reshape(-1, 2)], axis=1)
+    # two triangles per grid cell, counter clockwise from outside
+    row, column = np.meshgrid(np.arange(ySegments), np.arange(xSegments), indexing='ij')
+    a = row * (xSegments + 1) + column
+    b = a + xSegments + 1
+    indices = np.stack([a, a + 1, b, b, a + 1, b + 1], axis=2).reshape(-1, 3)
+    return vertices.astype(np.float32), indices.astype(np.uint32)
+
+
+def icosphere(subdivisions=1, circumscribed=False):
+    """Subdivided icosahedron, indexed: on the unit sphere, or just containing it if circumscribed."""
+    t = (1.0 + math.sqrt(5.0)) / 2.0
+    vertices = np.array([[-1, t, 0], [1, t, 0], [-1, -t, 0], [1, -t, 0],
+                         [0, -1, t], [0, 1, t], [0, -1, -t], [0, 1, -t],
+                         [t, 0, -1], [t, 0, 1], [-t, 0, -1], [-t, 0, 1]], np.float64)
+    faces = np.array([[0, 11, 5], [0, 5, 1], [0, 1, 7], [0, 7, 10], [0, 10, 11],
+                      [1, 5, 9], [5, 11, 4], [11, 10, 2], [10, 7, 6], [7, 1, 8],
+                      [3, 9, 4], [3, 4, 2], [3, 2, 6], [3, 6, 8], [3, 8, 9],
+                      [4, 9, 5], [2, 4, 11], [6, 2, 10], [8, 6, 7], [9, 8, 1]])
+    vertices /= np.linalg.norm(vertices, axis=1)[:, np.newaxis]
+    for i in range(subdivisions):
+        # a vertex in the middle of every edge, shared by the faces on either side
+        edges = np.sort(np.concatenate([faces[:, [0, 1]], faces[:, [1, 2]], faces[:, [2, 0]]]), axis=1)
+        unique, inverse = np.unique(edges, axis=0, return_inverse=True)
+        middles = vertices[unique[:, 0]] + vertices[unique[:, 1]]
+        middles /= np.linalg.norm(middles, axis=1)[:, np.newaxis]
+        ab, bc, ca = inverse.reshape(3, -1) + len(vertices)
+        a, b, c = faces.T
+        faces = np.concatenate([np.stack([a, ab, ca], 1), np.stack([b, bc, ab], 1),
+                                np.stack([c, ca, bc], 1), np.stack([ab, bc, ca], 1)])
+        vertices = np.concatenate([vertices, middles])
+    normals = vertices.copy()
+    if circumscribed:
+        # the faces cut inside the unit sphere, push them out to its surface
+        v0, v1, v2 = vertices[faces[:, 0]], vertices[faces[:, 1]], vertices[faces[:, 2]]
+        faceNormals = np.cross(v1 - v0, v2 - v0)
+        faceNormals /= np.linalg.norm(faceNormals, axis=1)[:, np.newaxis]
+        vertices = vertices / np.abs((faceNormals * v0).sum(axis=1)).min()
+    texCoords = np.stack([np.arctan2(normals[:, 2], normals[:, 0]) / (2.0 * math.pi) + 0.5,
+                          np.arccos(np.clip(normals[:, 1], -1.0, 1.0)) / math.pi], axis=1)
+    vertices = np.concatenate([vertices, normals, texCoords], axis=1)
+    return vertices.astype(np.float32), faces.astype(np.uint32)
+
+
+# name: (generator, layout, primitive type)
+SHAPES = {'quad': (quad, QUAD_LAYOUT, GL_TRIANGLE_STRIP),
+          'cube': (cube, LAYOUT, GL_TRIANGLES),
+          'plane': (plane, LAYOUT, GL_TRIANGLES),
+          'uvSphere': (uvSphere, LAYOUT, GL_TRIANGLES),
+          'icosphere': (icosphere, LAYOUT, GL_TRIANGLES)}
+
+
+class Mesh(object):
+    """A generated shape in a vertex buffer (and element buffer) with a VAO over them."""
+
+    def __init__(self, vertices, indices, layout, mode):
+        self.layout = layout
+        self.mode = mode
+        self.stride = vertices.shape[1] * vertices.itemsize
+        self.indexed = indices is not None
+        self.count = indices.size if self.indexed else len(vertices)
+        self.nbytes = vertices.nbytes + (indices.nbytes if self.indexed else 0)
+
+        # leave whatever VAO is bound (and a glstate cache's idea of it) alone
+        previous = int(glGetIntegerv(GL_VERTEX_ARRAY_BINDING))
+        self.vao = glGenVertexArrays(1)
+        glBindVertexArray(self.vao)
+        self.vbo = glGenBuffers(1)
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glBufferData(GL_ARRAY_BUFFER, vertices.nbytes, vertices, GL_STATIC_DRAW)
+        self.ebo = 0
+        if self.indexed:
+            self.ebo = glGenBuffers(1)
+            glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.ebo)
+            glBufferData(GL_ELEMENT_ARRAY_BUFFER, indices.nbytes, indices, GL_STATIC_DRAW)
+        self.setupAttributes()
+        glBindVertexArray(previous)
+
+    def setupAttributes(self, names=None):
+        """Point the bound VAO's attributes (all, or the ones in names) and element buffer at this mesh."""
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        offset = 0
+        for name, location, size in self.layout:
+            if names is None or name in names:
+                glEnableVertexAttribArray(location)
+                glVertexAttribPointer(location, size, GL_FLOAT, GL_FALSE, self.stride, ctypes.c_void_p(offset) if offset else None)
+            offset += size * 4
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        if self.indexed:
+            glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.ebo)
+
+    def draw(self, state=None, instances=1):
+        """Bind the VAO, through a glstate cache if given, and draw instances copies."""
+        if state is not None:
+            state.bindVertexArray(self.vao)
+        else:
+            glBindVertexArray(self.vao)
+        if self.indexed:
+            if instances == 1:
+                glconfig.drawElements(self.mode, self.count, GL_UNSIGNED_INT)
+            else:
+                glDrawElementsInstanced(self.mode, self.count, GL_UNSIGNED_INT, None, instances)
+        elif instances == 1:
+            glDrawArrays(self.mode, 0, self.count)
+        else:
+            glDrawArraysInstanced(self.mode, 0, self.count, instances)
+
+    def delete(self):
+        glDeleteVertexArrays(1, np.array([self.vao], np.uint32))
+        glDeleteBuffers(1, np.array([self.vbo], np.uint32))
+        if self.indexed:
+            glDeleteBuffers(1, np.array([self.ebo], np.uint32))
+
+
+def meshes():
+    """The current context's {(name,) + args: Mesh}."""
+    cache = contextdata.getValue('primitives')
+    if cache is None:
+        cache = {}
+        contextdata.setValue('primitives', cache)
+    return cache
+
+
+def mesh(name, *args):
+    """The current context's Mesh of shape name, generated with args and uploaded on first use."""
+    cache = meshes()
+    key = (name,) + args
+    result = cache.get(key)
+    if result is None:
+        generator, layout, mode = SHAPES[name]
+        vertices, indices = generator(*args)
+        result = cache[key] = Mesh(vertices, indices, layout, mode)
+    return result
+
+
+def uploadedBytes():
+    """Vertex and index bytes the current context holds for primitives."""
+    return sum(m.nbytes for m in meshes().values())
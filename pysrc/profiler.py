@@ -0,0 +1,235 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+CPU and GPU timing of named render passes.
+
+    self.profiler = profiler.Profiler()     # in initializeGL, needs the context
+
+    self.profiler.beginFrame()
+    with self.profiler.section('geometry'):
+        ...
+    self.profiler.endFrame(self.__deltaTime)
+
+GPU times come from GL_TIME_ELAPSED queries. Every in-flight frame owns its
+own set of query objects and a frame's results are only fetched when its
+set comes round again, BUFFERS frames later, and only if
+GL_QUERY_RESULT_AVAILABLE says they are ready; a result that is still
+pending then is dropped rather than waited for. Time-elapsed queries can't
+nest, so sections inside another section are timed on the CPU only.
+
+Profiling is off unless LEARNOPENGL_PROFILE (percentile summary as JSON) or
+LEARNOPENGL_TRACE (Chrome trace, for chrome://tracing or Perfetto) names an
+output file; both are written when the program exits.
+"""
+
+import os
+import json
+import ctypes
+import atexit
+import timeit
+import collections
+
+import numpy as np
+from OpenGL.GL import *
+# PyOpenGL's wrapped version has no array type for its GLuint64 output
+from OpenGL.raw.GL.VERSION.GL_3_3 import glGetQueryObjectui64v as _glGetQueryObjectui64v
+
+PROFILE_PATH = os.environ.get('LEARNOPENGL_PROFILE')
+TRACE_PATH = os.environ.get('LEARNOPENGL_TRACE')
+BUFFERS = 2
+HISTORY = 300
+PERCENTILES = (50, 95, 99)
+
+timer = timeit.default_timer
+
+
+def statistics(samples):
+    """Summary of a sequence of millisecond samples."""
+    if not samples:
+        return None
+    a = np.asarray(samples, np.float64)
+    stats = {'samples': len(a), 'mean': float(a.mean()), 'max': float(a.max())}
+    for p, value in zip(PERCENTILES, np.percentile(a, PERCENTILES)):
+        stats['p{}'.format(p)] = float(value)
+    return stats
+
+
+class _Section(object):
+    __slots__ = ['profiler', 'name']
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.profiler.begin(self.name)
+
+    def __exit__(self, *exc):
+        self.profiler.end()
+
+
+class _NullSection(object):
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc):
+        pass
+
+_nullSection = _NullSection()
+
+
+class _FrameQueries(object):
+    # query objects of one in-flight frame and the events waiting on them
+    def __init__(self):
+        self.queries = []
+        self.used = 0
+        self.pending = []
+
+    def acquire(self):
+        if self.used == len(self.queries):
+            self.queries.append(int(glGenQueries(1)[0]))
+        query = self.queries[self.used]
+        self.used += 1
+        return query
+
+
+class Profiler(object):
+
+    def __init__(self, enabled=None, gpu=True, buffers=BUFFERS, history=HISTORY):
+        fromEnvironment = enabled is None
+        self.enabled = bool(PROFILE_PATH or TRACE_PATH) if fromEnvironment else enabled
+        self.gpu = gpu
+        self.frame = 0
+        self.dropped = 0
+        self.cpuTimes = collections.defaultdict(lambda: collections.deque(maxlen=history))
+        self.gpuTimes = collections.defaultdict(lambda: collections.deque(maxlen=history))
+        self.frameTimes = collections.deque(maxlen=history)
+        self.deltaTimes = collections.deque(maxlen=history)
+        # per frame event lists for the trace
+        self.frames = collections.deque(maxlen=history)
+        self.__buffers = [_FrameQueries() for i in range(buffers)]
+        self.__current = None
+        self.__stack = []
+        self.__events = None
+        self.__frameStart = 0.0
+        self.__origin = timer()
+        if self.enabled and fromEnvironment:
+            atexit.register(self.save)
+
+    def section(self, name):
+        """Context manager timing the GL work issued inside it as pass name."""
+        if not self.enabled or self.__events is None:
+            return _nullSection
+        return _Section(self, name)
+
+    def beginFrame(self):
+        if not self.enabled:
+            return
+        self.__current = self.__buffers[self.frame % len(self.__buffers)]
+        self.__collect(self.__current, wait=False)
+        self.__current.used = 0
+        self.__events = []
+        self.__frameStart = timer()
+
+    def begin(self, name):
+        event = {'name': name, 'depth': len(self.__stack), 'start': timer()}
+        query = None
+        if self.gpu and not any(q is not None for _e, q in self.__stack):
+            query = self.__current.acquire()
+            glBeginQuery(GL_TIME_ELAPSED, query)
+        self.__stack.append((event, query))
+
+    def end(self):
+        event, query = self.__stack.pop()
+        end = timer()
+        if query is not None:
+            glEndQuery(GL_TIME_ELAPSED)
+            self.__current.pending.append((event, query))
+        event['cpu'] = (end - event['start']) * 1000.0
+        event['start'] = (event['start'] - self.__origin) * 1000.0
+        self.cpuTimes[event['name']].append(event['cpu'])
+        self.__events.append(event)
+
+    def endFrame(self, deltaTime=None):
+        """Close the frame, deltaTime is the script's own frame delta in seconds."""
+        if not self.enabled:
+            return
+        end = timer()
+        self.frameTimes.append((end - self.__frameStart) * 1000.0)
+        if deltaTime is not None:
+            self.deltaTimes.append(deltaTime * 1000.0)
+        self.frames.append({'frame': self.frame,
+                            'start': (self.__frameStart - self.__origin) * 1000.0,
+                            'cpu': (end - self.__frameStart) * 1000.0,
+                            'events': self.__events})
+        self.__events = None
+        self.frame += 1
+
+    def finish(self):
+        """Wait for every outstanding query, e.g. before saving at the end of a run."""
+        for frameQueries in self.__buffers:
+            self.__collect(frameQueries, wait=True)
+
+    def __collect(self, frameQueries, wait):
+        for event, query in frameQueries.pending:
+            if wait or glGetQueryObjectiv(query, GL_QUERY_RESULT_AVAILABLE):
+                result = GLuint64(0)
+                _glGetQueryObjectui64v(query, GL_QUERY_RESULT, ctypes.byref(result))
+                event['gpu'] = result.value / 1e6
+                self.gpuTimes[event['name']].append(event['gpu'])
+            else:
+                self.dropped += 1
+        frameQueries.pending = []
+
+    def summary(self):
+        passes = {}
+        for name, samples in self.cpuTimes.items():
+            passes[name] = {'cpu': statistics(samples), 'gpu': statistics(self.gpuTimes.get(name))}
+        return {'frames': self.frame,
+                'droppedQueries': self.dropped,
+                'frame': statistics(self.frameTimes),
+                'deltaTime': statistics(self.deltaTimes),
+                'passes': passes}
+
+    def report(self):
+        lines = ['{:<16} {:>9} {:>9} {:>9} {:>9}'.format('pass (ms)', 'cpu p50', 'cpu p95', 'gpu p50', 'gpu p95')]
+        summary = self.summary()
+        rows = [('frame', {'cpu': summary['frame'], 'gpu': None})] + sorted(summary['passes'].items())
+        for name, stats in rows:
+            cells = []
+            for kind in ('cpu', 'gpu'):
+                for p in ('p50', 'p95'):
+                    cells.append('{:9.3f}'.format(stats[kind][p]) if stats[kind] else '{:>9}'.format('-'))
+            lines.append('{:<16} {}'.format(name, ' '.join(cells)))
+        return '\n'.join(lines)
+
+    def chromeTrace(self):
+        # CPU sections on thread 0; GPU durations on thread 1, laid out back to
+        # back from their section's CPU start since only durations are measured
+        events = [{'name': 'thread_name', 'ph': 'M', 'pid': 0, 'tid': 0, 'args': {'name': 'CPU'}},
+                  {'name': 'thread_name', 'ph': 'M', 'pid': 0, 'tid': 1, 'args': {'name': 'GPU'}}]
+        gpuCursor = 0.0
+        for frame in self.frames:
+            events.append({'name': 'frame {}'.format(frame['frame']), 'ph': 'X', 'pid': 0, 'tid': 0,
+                           'ts': frame['start'] * 1000.0, 'dur': frame['cpu'] * 1000.0})
+            for event in frame['events']:
+                events.append({'name': event['name'], 'ph': 'X', 'pid': 0, 'tid': 0,
+                               'ts': event['start'] * 1000.0, 'dur': event['cpu'] * 1000.0})
+                if 'gpu' in event:
+                    gpuCursor = max(gpuCursor, event['start'])
+                    events.append({'name': event['name'], 'ph': 'X', 'pid': 0, 'tid': 1,
+                                   'ts': gpuCursor * 1000.0, 'dur': event['gpu'] * 1000.0})
+                    gpuCursor += event['gpu']
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def save(self, profilePath=None, tracePath=None):
+        profilePath = profilePath or PROFILE_PATH
+        tracePath = tracePath or TRACE_PATH
+        if profilePath:
+            with open(profilePath, 'w') as f:
+                json.dump(self.summary(), f, indent=2, sort_keys=True)
+        if tracePath:
+            with open(tracePath, 'w') as f:
+                json.dump(self.chromeTrace(), f)
@@ -76,7 +76,8 @@ class String(Structure):
             # Binary length of the string excluding the terminal 0. This is NOT the
             #  logical length of strings containing UTF-8 multibyte sequences! It's
             #  the number of bytes from the beginning of the string to its end.
-            ("length", c_size_t),
+            #  An ai_uint32 since assimp 5; a size_t here shifts every field after it.
+            ("length", c_uint32),
             
             # String buffer. Size limit is MAXLEN
             ("data", c_char*MAXLEN),
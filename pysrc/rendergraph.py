@@ -0,0 +1,251 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Render passes declared with the textures they read and write, culled down
+to the ones a frame needs and run in the order they were declared, their
+textures allocated from a pool.
+
+    def setupGraph(self, graph, width, height):                      # declares the frame
+        graph.addPass('scene', self.drawScene, outputs=[('hdr', rendergraph.Target(GL_RGB16F)),
+                                                        ('depth', rendergraph.Target(GL_DEPTH_COMPONENT24))],
+                      clear=GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+        graph.addPass('tonemap', self.drawTonemap, inputs=['hdr'])   # no outputs: the default framebuffer
+
+    self.graph = rendergraph.RenderGraph(self.setupGraph, self.targets)   # in initializeGL, a rendertarget.Pool
+    self.graph.execute(self.width(), self.height(), self.profiler, (self.bloom,))   # in paintGL
+    gl.bindTexture(GL_TEXTURE_2D, self.graph.texture('hdr'))         # in a pass
+
+A pass draws into a framebuffer with its outputs attached, colors in the
+order given and a depth format on the depth attachment, with a viewport of
+the outputs' size. None among the outputs skips a color location: what the
+pass' shaders write there is dropped (gbuffer.py's compact layouts). A pass
+without outputs draws into the default framebuffer; framebuffer() is the
+one a pass drew into, to blit from later on. An output named by an earlier pass is drawn on top of what is
+in it (additive blending, say); the first pass to name one says what it is.
+Passes without outputs, and those declared keep=True (because they read
+something back, say), always run. The others only run if a pass that runs
+reads or draws on top of one of their outputs, so setup can declare every
+pass and leave it to the last ones what is read.
+
+A texture lives from the pass that first writes it to the last one that
+reads or writes it. Textures of the same size, format and filter whose
+lifetimes don't overlap share one GL texture: the 10 pass ping-pong blur of
+7.bloom.py declares 10 targets and gets by with 2. The GL textures
+come from a rendertarget.Pool and stay the graph's until it is set up
+again, which happens when execute() gets a new size or new options,
+whatever the setup's passes depend on. Then they go back to the pool and
+the new setup takes what still fits; the pool lets go of the rest once
+they have been unused long enough. bytes is what the graph's textures
+take, declaredBytes what they would without sharing.
+
+Consecutive passes with the same section are timed as one profiler
+section, named after the first pass if not given.
+"""
+
+import collections
+import itertools
+
+import numpy as np
+from OpenGL.GL import *
+
+import rendertarget
+from glstate import state as gl
+
+
+class Target(object):
+    """A texture passes draw into, divisor times smaller than the frame each way."""
+
+    def __init__(self, internalFormat, divisor=1, filter=GL_LINEAR):
+        self.internalFormat = internalFormat
+        self.divisor = divisor
+        self.filter = filter
+
+    def size(self, width, height):
+        return max(1, width // self.divisor), max(1, height // self.divisor)
+
+    def key(self, width, height):
+        """What a GL texture has to match to be shared: (width, height, internal format, filter)."""
+        return self.size(width, height) + (self.internalFormat, self.filter)
+
+
+def keyBytes(key):
+    width, height, internalFormat, _filter = key
+    return rendertarget.textureBytes(width, height, internalFormat)
+
+
+class Pass(object):
+
+    def __init__(self, name, callback, inputs, outputs, attachments, loads, clear, keep, section):
+        self.name = name
+        self.callback = callback
+        self.inputs = inputs
+        self.outputs = outputs
+        # outputs in the order they are attached, None for a skipped color location
+        self.attachments = attachments
+        # outputs an earlier pass wrote, drawn on top of
+        self.loads = loads
+        self.clear = clear
+        self.keep = keep
+        self.section = section
+        self.fbo = 0
+        self.size = None
+
+
+class RenderGraph(object):
+
+    def __init__(self, setup, pool):
+        self.setup = setup
+        self.pool = pool
+        self.passes = []
+        # the passes that run, in order
+        self.order = []
+        self.size = None
+        self.options = None
+        self.bytes = 0
+        self.declaredBytes = 0
+        self.__targets = {}
+        self.__textures = {}
+        # every GL texture the graph holds
+        self.__held = []
+        self.__fbos = []
+
+    def addPass(self, name, callback, inputs=(), outputs=(), clear=None, keep=False, section=None):
+        """Declare a pass; outputs are (name, Target) pairs for new textures, names an earlier pass wrote, or None."""
+        for input in inputs:
+            if input not in self.__targets:
+                raise ValueError('pass {} reads {} before any pass writes it'.format(name, input))
+        names, loads, attachments = [], [], []
+        for output in outputs:
+            if output is None:
+                attachments.append(None)
+                continue
+            if isinstance(output, tuple):
+                output, target = output
+                if output in self.__targets:
+                    raise ValueError('pass {} declares {} again'.format(name, output))
+                self.__targets[output] = target
+            elif output in self.__targets:
+                loads.append(output)
+            else:
+                raise ValueError('pass {} draws on top of {} before any pass writes it'.format(name, output))
+            names.append(output)
+            attachments.append(output)
+        self.passes.append(Pass(name, callback, list(inputs), names, attachments, loads, clear, keep or not names,
+                                section or name))
+
+    def texture(self, name):
+        """The GL texture behind name, for the passes that read or write it."""
+        return self.__textures[name]
+
+    def framebuffer(self, name):
+        """The framebuffer pass name draws into, 0 for the default one."""
+        for p in self.order:
+            if p.name == name:
+                return p.fbo
+        raise KeyError('no pass {} runs'.format(name))
+
+    def execute(self, width, height, profiler, options=None):
+        """Run the passes, set up again first if the size or options changed; leaves the default framebuffer bound."""
+        if self.size != (width, height) or self.options != options:
+            self.__build(width, height, options)
+        for section, passes in itertools.groupby(self.order, lambda p: p.section):
+            with profiler.section(section):
+                for p in passes:
+                    gl.bindFramebuffer(GL_FRAMEBUFFER, p.fbo)
+                    glViewport(0, 0, p.size[0], p.size[1])
+                    if p.clear:
+                        glClear(p.clear)
+                    p.callback()
+        gl.bindFramebuffer(GL_FRAMEBUFFER, 0)
+        glViewport(0, 0, width, height)
+
+    def __build(self, width, height, options):
+        self.passes = []
+        self.__targets = {}
+        self.setup(self, width, height)
+        self.size = (width, height)
+        self.options = options
+
+        # walk back from the passes that always run
+        needed = set()
+        order = []
+        for p in reversed(self.passes):
+            if p.keep or needed.intersection(p.outputs):
+                order.append(p)
+                needed.update(p.inputs)
+                needed.update(p.loads)
+        self.order = order[::-1]
+
+        last = {}
+        for i, p in enumerate(self.order):
+            for name in p.inputs + p.outputs:
+                last[name] = i
+        # the last setup's textures back to the pool, to be taken again where they fit
+        for texture in self.__held:
+            self.pool.releaseTexture(texture)
+        self.__held = []
+        self.bytes = 0
+        released = collections.defaultdict(list)
+        self.__textures = {}
+        self.declaredBytes = 0
+        for i, p in enumerate(self.order):
+            for name in p.outputs:
+                if name in self.__textures:
+                    continue
+                key = self.__targets[name].key(width, height)
+                self.declaredBytes += keyBytes(key)
+                if released[key]:
+                    texture = released[key].pop()
+                else:
+                    w, h, internalFormat, filter = key
+                    texture = self.pool.acquireTexture(w, h, internalFormat, filter=filter)
+                    self.__held.append(texture)
+                    self.bytes += keyBytes(key)
+                self.__textures[name] = texture
+            for name in set(p.inputs + p.outputs):
+                if last[name] == i:
+                    released[self.__targets[name].key(width, height)].append(self.__textures[name])
+
+        if self.__fbos:
+            glDeleteFramebuffers(len(self.__fbos), np.array(self.__fbos, np.uint32))
+        self.__fbos = []
+        for p in self.order:
+            p.fbo = 0
+            p.size = (width, height)
+            if not p.outputs:
+                continue
+            p.fbo = glGenFramebuffers(1)
+            self.__fbos.append(p.fbo)
+            p.size = self.__targets[p.outputs[0]].size(width, height)
+            glBindFramebuffer(GL_FRAMEBUFFER, p.fbo)
+            colors = []
+            for name in p.attachments:
+                if name is None:
+                    colors.append(GL_NONE)
+                    continue
+                internalFormat = self.__targets[name].internalFormat
+                if internalFormat in rendertarget.DEPTH_ATTACHMENTS:
+                    attachment = rendertarget.DEPTH_ATTACHMENTS[internalFormat]
+                else:
+                    attachment = GL_COLOR_ATTACHMENT0 + len(colors)
+                    colors.append(attachment)
+                glFramebufferTexture2D(GL_FRAMEBUFFER, attachment, GL_TEXTURE_2D, self.__textures[name], 0)
+            drawBuffers = colors or [GL_NONE]
+            glDrawBuffers(len(drawBuffers), np.array(drawBuffers, np.uint32))
+            if glCheckFramebufferStatus(GL_FRAMEBUFFER) != GL_FRAMEBUFFER_COMPLETE:
+                print('Framebuffer of pass {} not complete!'.format(p.name))
+        glBindFramebuffer(GL_FRAMEBUFFER, 0)
+        # the above went around the state cache
+        gl.invalidate()
+
+    def delete(self):
+        """Delete the framebuffers and give the textures back to the pool."""
+        if self.__fbos:
+            glDeleteFramebuffers(len(self.__fbos), np.array(self.__fbos, np.uint32))
+        for texture in self.__held:
+            self.pool.releaseTexture(texture)
+        self.__fbos = []
+        self.__held = []
+        self.__textures = {}
+        self.size = None
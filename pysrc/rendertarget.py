@@ -0,0 +1,238 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Render targets handed out by size and format, and taken back to hand out
+again.
+
+    self.targets = rendertarget.Pool()                                  # in initializeGL, needs the context
+
+    target = self.targets.acquire(width, height, GL_RGB16F, depth=GL_DEPTH24_STENCIL8)
+    glBindFramebuffer(GL_FRAMEBUFFER, target.fbo)
+    ... draw, then sample target.texture ...
+    self.targets.release(target)                                        # free for the next pass or frame
+    self.targets.endFrame()                                             # at the end of paintGL
+
+A target is a framebuffer with one color texture of (width, height,
+format, samples) and, if asked for, a depth(-stencil) renderbuffer. With
+samples > 0 the texture is a GL_TEXTURE_2D_MULTISAMPLE one and the
+renderbuffer is multisampled too; blit to a single sampled target to read
+it. acquireTexture() and releaseTexture() do the same for bare textures,
+which rendergraph.RenderGraph attaches to framebuffers of its own.
+
+An acquire takes a free entry with the same key if there is one and only
+allocates if not, so passes of one frame and frames after each other share
+targets. Entries still free idleFrames frames after they were released are
+deleted at endFrame(): toggling an effect off and on again, or resizing
+back and forth, takes what is still there, and a size no longer asked for
+is let go of. Nothing is freed behind an owner's back: acquired entries
+stay until released.
+
+bytes is what the pool holds in all, usedBytes what is handed out and
+peakBytes the most it ever held; allocations and reuses count acquires.
+Texel sizes are FORMATS', as drivers store them, three channels padded.
+"""
+
+import collections
+
+import numpy as np
+from OpenGL.GL import *
+# unwrapped: PyOpenGL has no array type for GL_UNSIGNED_INT_24_8, and there's no data to convert
+from OpenGL.raw.GL.VERSION.GL_1_0 import glTexImage2D as rawTexImage2D
+
+from glstate import state as gl
+
+# free entries are deleted after this many frames unused
+IDLE_FRAMES = 120
+
+# internal format: (pixel format, pixel type, bytes a texel takes in video memory)
+FORMATS = {GL_RGB16F: (GL_RGB, GL_FLOAT, 8),
+           GL_RGBA16F: (GL_RGBA, GL_FLOAT, 8),
+           GL_R11F_G11F_B10F: (GL_RGB, GL_FLOAT, 4),
+           GL_R16F: (GL_RED, GL_FLOAT, 2),
+           GL_RG16: (GL_RG, GL_UNSIGNED_SHORT, 4),
+           GL_RGBA8: (GL_RGBA, GL_UNSIGNED_BYTE, 4),
+           GL_RGBA: (GL_RGBA, GL_UNSIGNED_BYTE, 4),
+           GL_RGB: (GL_RGB, GL_UNSIGNED_BYTE, 4),
+           GL_RED: (GL_RED, GL_UNSIGNED_BYTE, 1),
+           GL_DEPTH_COMPONENT24: (GL_DEPTH_COMPONENT, GL_UNSIGNED_INT, 4),
+           GL_DEPTH24_STENCIL8: (GL_DEPTH_STENCIL, GL_UNSIGNED_INT_24_8, 4)}
+DEPTH_ATTACHMENTS = {GL_DEPTH_COMPONENT24: GL_DEPTH_ATTACHMENT,
+                     GL_DEPTH24_STENCIL8: GL_DEPTH_STENCIL_ATTACHMENT}
+
+
+def textureBytes(width, height, format, samples=0):
+    return width * height * FORMATS[format][2] * max(1, samples)
+
+
+class RenderTarget(object):
+    """A framebuffer with a color texture and maybe a depth renderbuffer, from Pool.acquire()."""
+
+    def __init__(self, key, fbo, texture, depth):
+        self.key = key
+        self.width, self.height, self.format, self.samples, self.depthFormat = key
+        self.fbo = fbo
+        self.texture = texture
+        self.depth = depth
+        self.bytes = textureBytes(self.width, self.height, self.format, self.samples)
+        if self.depthFormat is not None:
+            self.bytes += textureBytes(self.width, self.height, self.depthFormat, self.samples)
+
+
+class Pool(object):
+
+    def __init__(self, idleFrames=IDLE_FRAMES):
+        self.idleFrames = idleFrames
+        self.frame = 0
+        self.bytes = 0
+        self.usedBytes = 0
+        self.peakBytes = 0
+        self.allocations = 0
+        self.reuses = 0
+        # key: [(frame released, target or texture), ...]
+        self.__freeTargets = collections.defaultdict(list)
+        self.__freeTextures = collections.defaultdict(list)
+        # texture: key, for every bare texture the pool made
+        self.__textureKeys = {}
+        # texture: the filter it was last given
+        self.__filters = {}
+
+    def acquire(self, width, height, format, samples=0, depth=None, filter=GL_LINEAR):
+        """A width x height target with a format color texture, filtered by filter, and a depth renderbuffer if depth is given."""
+        key = (width, height, format, samples, depth)
+        free = self.__freeTargets.get(key)
+        if free:
+            target = free.pop()[1]
+            self.reuses += 1
+        else:
+            target = self.__target(key)
+            self.__allocated(target.bytes)
+        if not samples:
+            self.__filter(target.texture, filter)
+        self.usedBytes += target.bytes
+        return target
+
+    def release(self, target):
+        self.usedBytes -= target.bytes
+        self.__freeTargets[target.key].append((self.frame, target))
+
+    def acquireTexture(self, width, height, format, samples=0, filter=None):
+        """A bare width x height format texture, filtered by filter, NEAREST for depth and LINEAR otherwise by default."""
+        key = (width, height, format, samples)
+        free = self.__freeTextures.get(key)
+        if free:
+            texture = free.pop()[1]
+            self.reuses += 1
+        else:
+            texture = self.__texture(key)
+            self.__textureKeys[texture] = key
+            self.__allocated(textureBytes(*key))
+        if not samples:
+            self.__filter(texture, filter or (GL_NEAREST if format in DEPTH_ATTACHMENTS else GL_LINEAR))
+        self.usedBytes += textureBytes(*key)
+        return texture
+
+    def releaseTexture(self, texture):
+        key = self.__textureKeys[texture]
+        self.usedBytes -= textureBytes(*key)
+        self.__freeTextures[key].append((self.frame, texture))
+
+    def endFrame(self):
+        """Delete the entries unused for more than idleFrames frames."""
+        self.frame += 1
+        oldest = self.frame - self.idleFrames
+        for key, free in self.__freeTargets.items():
+            if free and free[0][0] < oldest:
+                self.__deleteTargets([target for released, target in free if released < oldest])
+                free[:] = [entry for entry in free if entry[0] >= oldest]
+        for key, free in self.__freeTextures.items():
+            if free and free[0][0] < oldest:
+                self.__deleteTextures([texture for released, texture in free if released < oldest])
+                free[:] = [entry for entry in free if entry[0] >= oldest]
+
+    @property
+    def freeBytes(self):
+        return self.bytes - self.usedBytes
+
+    def __filter(self, texture, filter):
+        # the entry's last user may have wanted another
+        if self.__filters.get(texture) != filter:
+            glBindTexture(GL_TEXTURE_2D, texture)
+            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, filter)
+            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, filter)
+            glBindTexture(GL_TEXTURE_2D, 0)
+            self.__filters[texture] = filter
+            # the above went around the state cache
+            gl.invalidate()
+
+    def __allocated(self, bytes):
+        self.allocations += 1
+        self.bytes += bytes
+        self.peakBytes = max(self.peakBytes, self.bytes)
+
+    def __texture(self, key):
+        width, height, format, samples = key
+        texture = glGenTextures(1)
+        if samples:
+            glBindTexture(GL_TEXTURE_2D_MULTISAMPLE, texture)
+            glTexImage2DMultisample(GL_TEXTURE_2D_MULTISAMPLE, samples, format, width, height, GL_TRUE)
+            glBindTexture(GL_TEXTURE_2D_MULTISAMPLE, 0)
+        else:
+            pixelFormat, pixelType, _bytes = FORMATS[format]
+            glBindTexture(GL_TEXTURE_2D, texture)
+            rawTexImage2D(GL_TEXTURE_2D, 0, format, width, height, 0, pixelFormat, pixelType, None)
+            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_EDGE)
+            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_EDGE)
+            glBindTexture(GL_TEXTURE_2D, 0)
+        # the above went around the state cache
+        gl.invalidate()
+        return texture
+
+    def __target(self, key):
+        width, height, format, samples, depthFormat = key
+        texture = self.__texture((width, height, format, samples))
+        fbo = glGenFramebuffers(1)
+        glBindFramebuffer(GL_FRAMEBUFFER, fbo)
+        textureTarget = GL_TEXTURE_2D_MULTISAMPLE if samples else GL_TEXTURE_2D
+        glFramebufferTexture2D(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, textureTarget, texture, 0)
+        depth = None
+        if depthFormat is not None:
+            depth = glGenRenderbuffers(1)
+            glBindRenderbuffer(GL_RENDERBUFFER, depth)
+            if samples:
+                glRenderbufferStorageMultisample(GL_RENDERBUFFER, samples, depthFormat, width, height)
+            else:
+                glRenderbufferStorage(GL_RENDERBUFFER, depthFormat, width, height)
+            glBindRenderbuffer(GL_RENDERBUFFER, 0)
+            glFramebufferRenderbuffer(GL_FRAMEBUFFER, DEPTH_ATTACHMENTS[depthFormat], GL_RENDERBUFFER, depth)
+        if glCheckFramebufferStatus(GL_FRAMEBUFFER) != GL_FRAMEBUFFER_COMPLETE:
+            print('Framebuffer not complete!')
+        glBindFramebuffer(GL_FRAMEBUFFER, 0)
+        # the above went around the state cache
+        gl.invalidate()
+        return RenderTarget(key, fbo, texture, depth)
+
+    def __deleteTargets(self, targets):
+        for target in targets:
+            glDeleteFramebuffers(1, np.array([target.fbo], np.uint32))
+            glDeleteTextures(np.array([target.texture], np.uint32))
+            if target.depth is not None:
+                glDeleteRenderbuffers(1, np.array([target.depth], np.uint32))
+            self.__filters.pop(target.texture, None)
+            self.bytes -= target.bytes
+
+    def __deleteTextures(self, textures):
+        if textures:
+            glDeleteTextures(np.array(textures, np.uint32))
+        for texture in textures:
+            self.__filters.pop(texture, None)
+            self.bytes -= textureBytes(*self.__textureKeys.pop(texture))
+
+    def delete(self):
+        """Delete the free entries; acquired ones are their owners' to release first."""
+        for free in self.__freeTargets.values():
+            self.__deleteTargets([target for released, target in free])
+        for free in self.__freeTextures.values():
+            self.__deleteTextures([texture for released, texture in free])
+        self.__freeTargets.clear()
+        self.__freeTextures.clear()
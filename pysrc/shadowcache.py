@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Shadow map caching: re-render a depth map only when something it shows
+changed.
+
+    self.shadowCache = shadowcache.ShadowCache()          # in initializeGL
+
+    renderStatic, renderDynamic = self.shadowCache.check(lightSpaceMatrix, staticCasters, dynamicCasters)
+    if renderStatic:
+        ...                                 # static casters into the static map
+    if renderDynamic:
+        ...                                 # copy the static map, draw dynamic casters on top
+
+A caster is a model matrix, its local bounds and a draw function. check()
+compares the light (any array: a position, a light space matrix) and every
+caster's matrix and bounds with what the maps were last rendered from:
+
+    light or a static caster changed    render both
+    only a dynamic caster changed       copy the static map, draw dynamic casters
+    nothing changed                     keep the map, counted in skipped
+
+Casters are compared by value, so moving one is just changing its model
+matrix. Call invalidate() for anything else that changes the map (its size,
+the depth shader).
+"""
+
+import numpy as np
+from OpenGL.GL import *
+
+
+class Caster(object):
+    """A shadow casting object: model matrix, (min, max) local bounds and draw(shader)."""
+    __slots__ = ['model', 'bounds', 'draw']
+
+    def __init__(self, model, bounds, draw):
+        self.model = model
+        self.bounds = np.asarray(bounds, np.float32)
+        self.draw = draw
+
+
+def _key(casters):
+    # every caster's matrix and bounds in one array, compared with array_equal
+    if not casters:
+        return np.zeros(0, np.float32)
+    return np.concatenate([np.concatenate([np.ravel(caster.model), caster.bounds.ravel()]) for caster in casters])
+
+
+class ShadowCache(object):
+
+    def __init__(self):
+        # shadow passes: rendered (of which static casters rendered too) and skipped
+        self.rendered = 0
+        self.staticRendered = 0
+        self.skipped = 0
+        self.invalidate()
+
+    def invalidate(self):
+        """Render everything on the next check()."""
+        self.__light = None
+        self.__static = None
+        self.__dynamic = None
+
+    def check(self, light, staticCasters, dynamicCasters=()):
+        """(render static casters, render dynamic casters) for this frame."""
+        light = np.array(light, np.float32)
+        staticKey = _key(staticCasters)
+        dynamicKey = _key(dynamicCasters)
+        renderStatic = (self.__light is None or not np.array_equal(light, self.__light) or
+                        not np.array_equal(staticKey, self.__static))
+        renderDynamic = renderStatic or not np.array_equal(dynamicKey, self.__dynamic)
+        self.__light, self.__static, self.__dynamic = light, staticKey, dynamicKey
+        if renderDynamic:
+            self.rendered += 1
+            self.staticRendered += renderStatic
+        else:
+            self.skipped += 1
+        return renderStatic, renderDynamic
+
+    def report(self):
+        return 'shadow passes: {} rendered ({} with static casters), {} skipped'.format(
+            self.rendered, self.staticRendered, self.skipped)
+
+
+class DepthCopy(object):
+    """Copies depth textures, or cubemap faces, with glBlitFramebuffer."""
+
+    def __init__(self):
+        self.readFBO, self.drawFBO = glGenFramebuffers(2)
+        # depth only, no color buffer to read from or draw to
+        glBindFramebuffer(GL_FRAMEBUFFER, self.readFBO)
+        glReadBuffer(GL_NONE)
+        glDrawBuffer(GL_NONE)
+        glBindFramebuffer(GL_FRAMEBUFFER, self.drawFBO)
+        glReadBuffer(GL_NONE)
+        glDrawBuffer(GL_NONE)
+        glBindFramebuffer(GL_FRAMEBUFFER, 0)
+
+    def copy(self, source, target, width, height, textureTarget=GL_TEXTURE_2D, layers=1):
+        """Copy level 0 of a depth texture: every face of a GL_TEXTURE_CUBE_MAP, the first layers layers of an array."""
+        glBindFramebuffer(GL_READ_FRAMEBUFFER, self.readFBO)
+        glBindFramebuffer(GL_DRAW_FRAMEBUFFER, self.drawFBO)
+        if textureTarget in (GL_TEXTURE_2D_ARRAY, GL_TEXTURE_CUBE_MAP_ARRAY):
+            for layer in range(layers):
+                glFramebufferTextureLayer(GL_READ_FRAMEBUFFER, GL_DEPTH_ATTACHMENT, source, 0, layer)
+                glFramebufferTextureLayer(GL_DRAW_FRAMEBUFFER, GL_DEPTH_ATTACHMENT, target, 0, layer)
+                glBlitFramebuffer(0, 0, width, height, 0, 0, width, height, GL_DEPTH_BUFFER_BIT, GL_NEAREST)
+        else:
+            if textureTarget == GL_TEXTURE_CUBE_MAP:
+                faces = [GL_TEXTURE_CUBE_MAP_POSITIVE_X + i for i in range(6)]
+            else:
+                faces = [textureTarget]
+            for face in faces:
+                glFramebufferTexture2D(GL_READ_FRAMEBUFFER, GL_DEPTH_ATTACHMENT, face, source, 0)
+                glFramebufferTexture2D(GL_DRAW_FRAMEBUFFER, GL_DEPTH_ATTACHMENT, face, target, 0)
+                glBlitFramebuffer(0, 0, width, height, 0, 0, width, height, GL_DEPTH_BUFFER_BIT, GL_NEAREST)
+        glBindFramebuffer(GL_FRAMEBUFFER, 0)
+
+    def delete(self):
+        glDeleteFramebuffers(2, np.array([self.readFBO, self.drawFBO], np.uint32))
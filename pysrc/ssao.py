@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Screen space ambient occlusion at full, half or quarter resolution.
+
+    kernel = ssao.hemisphereKernel(32)                                  # (32, 3), built once per size
+    glUniform3fv(glGetUniformLocation(program, 'samples'), len(kernel), kernel)
+
+    graph.addPass('ssao', ..., outputs=[('ssao', ssao.target(scale))])             # in the render graph's setup
+    graph.addPass('ssao blur', ..., inputs=['ssao'], outputs=[('ssao blurred', ssao.target(scale))])
+    ... with scale > 1, the bilateral upsample into ssao.target(1) ...
+    ... lighting samples the last of them, with noiseScale(width, height, scale) for the SSAO pass ...
+
+At scale 2 or 4 the occlusion is computed and blurred for one pixel in 4
+or 16, each reading the G-buffer at its centre. Upsampling to full size
+weighs the 2x2 nearest AO texels bilinearly and by how close the depth the
+G-buffer has at each of them is to the full resolution pixel's, so
+occlusion doesn't bleed across silhouettes the way a plain bilinear
+upsample would.
+
+The targets are render graph ones, single channel and NEAREST filtered,
+set up again with the graph when the scale changes; the graph's pool keeps
+the other scales' for a while, so switching back and forth takes the ones
+still there.
+
+The kernel and rotation noise come from a seeded numpy RandomState, the same
+on every run and for every quality level, so levels can be compared pixel
+by pixel; hemisphereKernel() caches one kernel per size. The kernel goes to
+the shader as one uniform array upload, and only when its size changes.
+"""
+
+import numpy as np
+from OpenGL.GL import *
+
+import rendergraph
+
+
+# the SSAO shader's samples[] length
+MAX_KERNEL_SIZE = 64
+KERNEL_SIZES = (16, 32, 64)
+SCALES = (1, 2, 4)
+
+_kernels = {}
+
+
+def hemisphereKernel(size, seed=0):
+    """(size, 3) float32 samples in the unit +z hemisphere, denser towards the origin."""
+    key = (size, seed)
+    if key not in _kernels:
+        rng = np.random.RandomState(seed)
+        samples = rng.uniform(-1.0, 1.0, (size, 3))
+        samples[:, 2] = rng.uniform(0.0, 1.0, size)
+        samples /= np.linalg.norm(samples, axis=1)[:, np.newaxis]
+        samples *= rng.uniform(0.0, 1.0, (size, 1))
+        # scale samples s.t. they're more aligned to center of kernel
+        scale = np.arange(size) / float(size)
+        samples *= (0.1 + 0.9 * scale * scale)[:, np.newaxis]
+        _kernels[key] = samples.astype(np.float32)
+    return _kernels[key]
+
+
+def rotationNoise(seed=0):
+    """(4, 4, 3) float32 random rotations around z for the tiled noise texture."""
+    rng = np.random.RandomState(seed)
+    noise = np.zeros((4, 4, 3), np.float32)
+    noise[..., :2] = rng.uniform(-1.0, 1.0, (4, 4, 2))
+    return noise
+
+
+def target(scale):
+    """The render graph target of the AO passes at 1 / scale of the resolution."""
+    return rendergraph.Target(GL_RED, scale, GL_NEAREST)
+
+
+def noiseScale(width, height, scale):
+    """Tiles of the 4x4 noise texture across the SSAO target of a width x height frame."""
+    return np.array(target(scale).size(width, height), np.float32) / 4.0
@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+
+from PIL import Image
+from OpenGL.GL import *
+from OpenGL.GL.EXT.texture_compression_s3tc import *
+from OpenGL.GL.EXT.texture_sRGB import *
+
+import assetpack
+import mipmap
+
+# set LEARNOPENGL_GPU_MIPMAPS=1 to go back to glGenerateMipmap for unpacked textures
+CPU_MIPMAPS = not os.environ.get('LEARNOPENGL_GPU_MIPMAPS')
+MIPMAP_KERNEL = os.environ.get('LEARNOPENGL_MIPMAP_KERNEL', 'box')
+# set LEARNOPENGL_UNCOMPRESSED=1 to ignore block compressed textures in asset packs
+COMPRESSED_TEXTURES = not os.environ.get('LEARNOPENGL_UNCOMPRESSED')
+
+# (linear, sRGB) internal formats and the extensions they need
+COMPRESSED_FORMATS = {
+    'bc1': ((GL_COMPRESSED_RGB_S3TC_DXT1_EXT, GL_COMPRESSED_SRGB_S3TC_DXT1_EXT), 'GL_EXT_texture_compression_s3tc'),
+    'bc3': ((GL_COMPRESSED_RGBA_S3TC_DXT5_EXT, GL_COMPRESSED_SRGB_ALPHA_S3TC_DXT5_EXT), 'GL_EXT_texture_compression_s3tc'),
+    'bc5': ((GL_COMPRESSED_RG_RGTC2, None), None), # core since 3.0
+}
+
+# bytes of texture memory uploaded, and what it would have been uncompressed
+memoryStats = {'uploaded': 0, 'uncompressed': 0}
+
+_extensions = None
+
+def hasExtension(name):
+    global _extensions
+    if _extensions is None:
+        _extensions = set(glGetStringi(GL_EXTENSIONS, i).decode('utf-8')
+                           for i in range(glGetIntegerv(GL_NUM_EXTENSIONS)))
+    return name in _extensions
+
+
+def compressedFormat(fmt, gamma):
+    # the GL internal format for a block format, or None when the driver can't take it
+    formats, extension = COMPRESSED_FORMATS[fmt]
+    internalFormat = formats[1] if gamma else formats[0]
+    if internalFormat is None or (extension is not None and not hasExtension(extension)):
+        return None
+    if gamma and not (hasExtension('GL_EXT_texture_sRGB') or hasExtension('GL_EXT_texture_compression_s3tc_srgb')):
+        return None
+    return internalFormat
+
+
+def uploadMipChain(levels, iformat, pformat):
+    # levels are (height, width, channels) uint8 arrays, largest first
+    textureID = glGenTextures(1)
+    glBindTexture(GL_TEXTURE_2D, textureID)
+    # small mip levels of RGB images are not 4-byte aligned
+    glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
+    for i, level in enumerate(levels):
+        glTexImage2D(GL_TEXTURE_2D, i, iformat, level.shape[1], level.shape[0], 0, pformat, GL_UNSIGNED_BYTE, level)
+        memoryStats['uploaded'] += level.nbytes
+        memoryStats['uncompressed'] += level.nbytes
+    glPixelStorei(GL_UNPACK_ALIGNMENT, 4)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_BASE_LEVEL, 0)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAX_LEVEL, len(levels) - 1)
+    return textureID
+
+
+def uploadCompressedMipChain(levels, iformat, width, height, channels):
+    # levels are raw block data, largest first
+    textureID = glGenTextures(1)
+    glBindTexture(GL_TEXTURE_2D, textureID)
+    for i, level in enumerate(levels):
+        w, h = max(1, width >> i), max(1, height >> i)
+        glCompressedTexImage2D(GL_TEXTURE_2D, i, iformat, w, h, 0, level)
+        memoryStats['uploaded'] += level.nbytes
+        memoryStats['uncompressed'] += w * h * channels
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_BASE_LEVEL, 0)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAX_LEVEL, len(levels) - 1)
+    return textureID
+
+
+def _setParameters(alpha, clampAlpha):
+    wrap = GL_CLAMP_TO_EDGE if alpha and clampAlpha else GL_REPEAT
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, wrap)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, wrap)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR_MIPMAP_LINEAR)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+
+
+def _uploadTexture(levels, gamma, clampAlpha):
+    alpha = levels[0].shape[2] == 4
+    pformat = GL_RGBA if alpha else GL_RGB
+    iformat = pformat
+    if gamma:
+        iformat = GL_SRGB_ALPHA if alpha else GL_SRGB
+    textureID = uploadMipChain(levels, iformat, pformat)
+    _setParameters(alpha, clampAlpha)
+    glBindTexture(GL_TEXTURE_2D, 0)
+    return textureID
+
+
+def loadPackedTexture(path, gamma=False, clampAlpha=False):
+    """Upload path's precompiled mip chain from the asset pack.
+
+    Returns None when there is no (fresh) pack entry for path so callers
+    can fall back to decoding the image themselves.
+    """
+    pack, key = assetpack.lookupTexture(path)
+    if pack is None:
+        return None
+
+    # gamma corrected textures get the chain filtered in linear light
+    fmt, levels = pack.compressedLevels(key, srgb=gamma)
+    iformat = compressedFormat(fmt, gamma) if fmt is not None and COMPRESSED_TEXTURES else None
+    if iformat is None:
+        return _uploadTexture(pack.textureLevels(key, srgb=gamma), gamma, clampAlpha)
+
+    entry = pack.textures[key]
+    textureID = uploadCompressedMipChain(levels, iformat, entry['width'], entry['height'], entry['channels'])
+    _setParameters(entry['channels'] == 4, clampAlpha)
+    glBindTexture(GL_TEXTURE_2D, 0)
+    return textureID
+
+
+def loadMipmappedTexture(path, gamma=False, clampAlpha=False):
+    """Upload path with a precomputed mip chain, from the asset pack if it
+    has one or else from the CPU mip cache.
+
+    Returns None when CPU mipmaps are disabled and there is no pack entry.
+    """
+    textureID = loadPackedTexture(path, gamma, clampAlpha)
+    if textureID is not None or not CPU_MIPMAPS:
+        return textureID
+
+    # only the header is read here, the pixels come from the cache when possible
+    im = Image.open(path)
+    wrap = not (mipmap.hasAlpha(im) and clampAlpha)
+    im.close()
+    # gamma corrected textures are sRGB encoded, filter them in linear light
+    levels = mipmap.cachedMipChain(path, srgb=gamma, kernel=MIPMAP_KERNEL, wrap=wrap)
+    return _uploadTexture(levels, gamma, clampAlpha)
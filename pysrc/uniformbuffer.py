@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+std140 uniform blocks backed by numpy structured arrays.
+
+    camera = uniformbuffer.UniformBuffer('Camera', uniformbuffer.CAMERA, uniformbuffer.CAMERA_BINDING)
+    camera.attach(shaderA, shaderB)         # once, after linking
+
+    camera['projection'] = projection
+    camera['view'] = view
+    camera.upload()                         # one glBufferSubData
+
+std140() lays out a dtype field by field with the std140 base alignments, so
+the array's bytes are exactly what the shader's block reads. Matrices are
+stored as numpy holds them, which is what glUniformMatrix4fv(..., GL_FALSE,
+...) uploads as well.
+"""
+
+import numpy as np
+from OpenGL.GL import *
+
+# binding points shared by every program that declares the block
+CAMERA_BINDING = 0
+LIGHTS_BINDING = 1
+
+# base alignment, size and numpy format of the std140 types used here
+_TYPES = {
+    'float': (4, 4, (np.float32, ())),
+    'int': (4, 4, (np.int32, ())),
+    'uint': (4, 4, (np.uint32, ())),
+    'vec2': (8, 8, (np.float32, (2,))),
+    'vec3': (16, 12, (np.float32, (3,))),
+    'vec4': (16, 16, (np.float32, (4,))),
+    'ivec4': (16, 16, (np.int32, (4,))),
+    'uvec4': (16, 16, (np.uint32, (4,))),
+    'mat4': (16, 64, (np.float32, (4, 4))),
+}
+
+
+def _align(offset, alignment):
+    return (offset + alignment - 1) // alignment * alignment
+
+
+def std140(fields):
+    """dtype of a std140 block or struct.
+
+    fields are (name, type) or (name, type, count) with type a GLSL type
+    name or another std140() dtype (a struct). Arrays are only supported for
+    types whose size is already a multiple of 16, so that numpy's element
+    stride matches std140's.
+    """
+    names, formats, offsets = [], [], []
+    offset = 0
+    for field in fields:
+        name, glslType = field[0], field[1]
+        count = field[2] if len(field) > 2 else None
+        if isinstance(glslType, np.dtype):
+            alignment, size, fmt = 16, glslType.itemsize, (glslType, ())
+        else:
+            alignment, size, fmt = _TYPES[glslType]
+        if count is not None:
+            if size % 16:
+                raise ValueError('std140 arrays of {} need padding, use a 16 byte type'.format(glslType))
+            alignment = 16
+            fmt = (fmt[0], (count,) + fmt[1])
+            size *= count
+        offset = _align(offset, alignment)
+        names.append(name)
+        formats.append(fmt)
+        offsets.append(offset)
+        offset += size
+    # structs and the block itself round up to a vec4
+    return np.dtype({'names': names, 'formats': formats, 'offsets': offsets, 'itemsize': _align(offset, 16)})
+
+
+CAMERA = std140([('projection', 'mat4'),
+                 ('view', 'mat4'),
+                 ('viewPos', 'vec3')])
+
+LIGHT = std140([('Position', 'vec3'),
+                ('Color', 'vec3'),
+                ('Linear', 'float'),
+                ('Quadratic', 'float'),
+                ('Radius', 'float')])
+
+
+def lightsBlock(count):
+    """dtype of a `Lights { Light lights[count]; }` block."""
+    return std140([('lights', LIGHT, count)])
+
+
+class UniformBuffer(object):
+
+    def __init__(self, name, dtype, binding, usage=GL_DYNAMIC_DRAW):
+        self.name = name
+        self.binding = binding
+        self.data = np.zeros(1, dtype)
+        self.buffer = glGenBuffers(1)
+        glBindBuffer(GL_UNIFORM_BUFFER, self.buffer)
+        glBufferData(GL_UNIFORM_BUFFER, dtype.itemsize, None, usage)
+        glBindBuffer(GL_UNIFORM_BUFFER, 0)
+        glBindBufferBase(GL_UNIFORM_BUFFER, binding, self.buffer)
+
+    def attach(self, *programs):
+        """Point the block called name in each program at this buffer's binding."""
+        for program in programs:
+            index = glGetUniformBlockIndex(program, self.name.encode('ascii'))
+            if index != GL_INVALID_INDEX:
+                glUniformBlockBinding(program, index, self.binding)
+
+    def __getitem__(self, field):
+        return self.data[field][0]
+
+    def __setitem__(self, field, value):
+        self.data[field][0] = value
+
+    def upload(self):
+        glBindBuffer(GL_UNIFORM_BUFFER, self.buffer)
+        glBufferSubData(GL_UNIFORM_BUFFER, 0, self.data.nbytes, self.data)
+        glBindBuffer(GL_UNIFORM_BUFFER, 0)
+
+    def delete(self):
+        glDeleteBuffers(1, np.array([self.buffer], np.uint32))